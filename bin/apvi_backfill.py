@@ -3,35 +3,34 @@
 
 will run from first_seen date forward
 """
+import asyncio
 import logging
 
-from opennem.crawlers.apvi import run_apvi_crawl
+from opennem.crawlers.apvi import run_apvi_crawl_days
 from opennem.schema.network import NetworkAPVI
 from opennem.utils.dates import date_series, get_today_nem
 
 logger = logging.getLogger("opennem.apvi_backfill")
 
 
-def run_apvi_backfill(days: int | None = None) -> None:
+async def run_apvi_backfill(days: int | None = None, concurrency: int | None = None) -> None:
     """For a number of days run APVI backfill"""
     if not NetworkAPVI.data_first_seen:
         raise Exception("Require a data first seen date for network to parse")
 
-    for date_run in date_series(start=NetworkAPVI.data_first_seen, end=get_today_nem().date(), reverse=False):
-        if days and days <= 0:
-            break
+    date_runs = list(date_series(start=NetworkAPVI.data_first_seen, end=get_today_nem().date(), reverse=False))
 
-        logger.info(f"Running APVI crawl for {date_run}")
+    if days:
+        date_runs = date_runs[:days]
 
-        try:
-            apvi_forecast_return = run_apvi_crawl(date_run)
-            logger.info(f"APVI crawl for {date_run} inserted {apvi_forecast_return.inserted_records} records")
-        except Exception as e:
-            logger.error(f"Error for {date_run}: {e}")
+    logger.info(f"Running APVI crawl for {len(date_runs)} days")
 
-        if days:
-            days -= 1
+    apvi_forecast_return = await run_apvi_crawl_days(date_runs, concurrency=concurrency)
+
+    logger.info(
+        f"APVI backfill inserted {apvi_forecast_return.inserted_records} records with {apvi_forecast_return.errors} errors"
+    )
 
 
 if __name__ == "__main__":
-    run_apvi_backfill()
+    asyncio.run(run_apvi_backfill())
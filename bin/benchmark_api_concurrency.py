@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Load test for concurrent request throughput on the v3 stats endpoints
+
+Fires a fixed number of requests at each endpoint with a given number in flight
+at once and reports requests per second and latency percentiles. Run it against
+an API server before and after a change to compare. Requests send `Cache-Control: no-store`
+so that they hit the database rather than the API cache, unless run with `--cached` to
+measure the cache itself. Run that for longer than the cache expiry and compare p99 to see
+the requests that land on an expired key.
+
+    ./bin/benchmark_api_concurrency.py --base-url http://127.0.0.1:8000 --concurrency 1 --concurrency 16
+    ./bin/benchmark_api_concurrency.py --cached --concurrency 64 --requests 50000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/v3/stats/power/station/NEM/BAYSW",
+    "/v3/stats/energy/station/NEM/BAYSW",
+    "/v3/stats/flow/network/NEM",
+    "/v3/stats/emissionfactor/network/NEM",
+    "/v3/stats/price/NEM",
+    "/v3/dash/now",
+]
+
+
+@dataclass
+class LoadTestResult:
+    path: str
+    concurrency: int
+    requests: int
+    errors: int
+    duration: float
+    latencies: list[float]
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.duration if self.duration else 0
+
+    def percentile(self, percent: int) -> float:
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0
+
+        return statistics.quantiles(self.latencies, n=100)[percent - 1]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.path:<45} c={self.concurrency:<3} {self.requests_per_second:8.1f} req/s "
+            f"p50={self.percentile(50) * 1000:7.1f}ms p95={self.percentile(95) * 1000:7.1f}ms "
+            f"p99={self.percentile(99) * 1000:7.1f}ms errors={self.errors}"
+        )
+
+
+async def run_load_test(
+    client: httpx.AsyncClient, path: str, concurrency: int, requests: int, headers: dict[str, str]
+) -> LoadTestResult:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def _request() -> None:
+        nonlocal errors
+
+        async with semaphore:
+            start = time.perf_counter()
+
+            try:
+                response = await client.get(path, headers=headers)
+
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_request() for _ in range(requests)])
+    duration = time.perf_counter() - start
+
+    return LoadTestResult(
+        path=path, concurrency=concurrency, requests=requests, errors=errors, duration=duration, latencies=latencies
+    )
+
+
+async def main(
+    base_url: str,
+    paths: list[str],
+    concurrency_levels: list[int],
+    requests: int,
+    api_key: str | None = None,
+    cached: bool = False,
+) -> None:
+    headers = {} if cached else {"Cache-Control": "no-store"}
+
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for path in paths:
+            # warm up connections and the query plan cache
+            await client.get(path, headers=headers)
+
+            for concurrency in concurrency_levels:
+                print(await run_load_test(client, path, concurrency, requests, headers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent request load test for the stats API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", dest="paths", help="Endpoint path, can be repeated")
+    parser.add_argument("--concurrency", action="append", type=int, help="Requests in flight, can be repeated")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--cached", action="store_true", help="Go through the API cache")
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            base_url=args.base_url,
+            paths=args.paths or DEFAULT_PATHS,
+            concurrency_levels=args.concurrency or [1, 8, 32],
+            requests=args.requests,
+            api_key=args.api_key,
+            cached=args.cached,
+        )
+    )
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Ingest rate and query latency of the facility_scada storage layouts
+
+Builds a synthetic multi-year facility_scada dataset in a scratch schema of a local
+timescale postgres twice, once with the legacy set of indexes and once with the managed
+layout from opennem.db.storage_layout with its old chunks compressed. Each is then timed
+for:
+
+ * ingesting batches of the latest interval for every facility the way the bulk insert
+   does, with a copy into a temporary table and an upsert
+ * ingesting late batches into an interval that is already compressed
+ * the common reads of facility_scada
+
+    ./bin/benchmark_facility_scada_storage.py --years 3 --facilities 100
+
+The scratch schema is dropped afterwards unless --keep is passed.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from opennem import settings
+from opennem.db.storage_layout import FACILITY_SCADA_LAYOUT, layout_statements
+
+BENCH_SCHEMA = "opennem_bench"
+
+# same ingest batches for both layouts
+_random = random.Random(42)
+
+# facility_scada indexes before the managed layout
+LEGACY_INDEXES = {
+    "facility_code_interval": "facility_code, interval",
+    "network_id": "network_id",
+    "interval_facility_code": "interval, facility_code",
+    "is_forecast_interval": "is_forecast, interval",
+    "network_interval": "network_id, interval, is_forecast",
+    "network_facility_interval": "network_id, facility_code, interval",
+    "interval_network": "interval DESC, network_id",
+    "new_interval": "interval DESC",
+}
+
+QUERIES = {
+    "network_day": """
+        select facility_code, sum(energy)
+        from {table}
+        where network_id = 'NEM' and interval >= $1::timestamp - interval '1 day' and interval < $1 and is_forecast is false
+        group by 1
+    """,
+    "facility_year": """
+        select date_trunc('day', interval), sum(energy)
+        from {table}
+        where facility_code = 'BENCH0001' and interval >= $1::timestamp - interval '1 year' and interval < $1
+        group by 1
+    """,
+    "network_month_compressed": """
+        select date_trunc('day', interval), sum(energy)
+        from {table}
+        where
+            network_id = 'NEM'
+            and interval >= $1::timestamp - interval '400 days'
+            and interval < $1::timestamp - interval '370 days'
+            and is_forecast is false
+        group by 1
+    """,
+    "latest_interval": """
+        select max(interval)
+        from {table}
+        where network_id = 'NEM' and is_forecast is false and interval >= $1::timestamp - interval '1 day'
+    """,
+}
+
+
+def _facility(number: int) -> tuple[str, str]:
+    return ("WEM" if number % 5 == 0 else "NEM", f"BENCH{number:04d}")
+
+
+async def create_table(conn: asyncpg.Connection, table: str) -> None:
+    await conn.execute(
+        f"""
+        create table {table} (
+            network_id text not null,
+            interval timestamp not null,
+            facility_code text not null,
+            generated numeric,
+            is_forecast boolean not null default false,
+            eoi_quantity numeric,
+            energy numeric,
+            energy_quality_flag numeric not null default 0,
+            primary key (network_id, interval, facility_code, is_forecast)
+        )
+        """
+    )
+    # each layout creates its own time index
+    await conn.execute(
+        f"select create_hypertable('{table}', 'interval', "
+        "chunk_time_interval => interval '7 days', create_default_indexes => false)"
+    )
+
+
+async def load_history(conn: asyncpg.Connection, table: str, date_start: datetime, date_end: datetime, facilities: int) -> float:
+    """Generate the history server side. Forecasts cover the last 30 days. Returns rows per second"""
+    start = time.perf_counter()
+
+    status = await conn.execute(
+        f"""
+        insert into {table} (network_id, interval, facility_code, generated, is_forecast, energy)
+        select
+            case when f % 5 = 0 then 'WEM' else 'NEM' end,
+            i,
+            'BENCH' || lpad(f::text, 4, '0'),
+            g,
+            false,
+            g / 12
+        from (
+            select i, f, random() * 100 as g
+            from
+                generate_series($1::timestamp, $2::timestamp, interval '5 minutes') as i,
+                generate_series(1, $3) as f
+        ) as history
+        union all
+        select
+            case when f % 5 = 0 then 'WEM' else 'NEM' end,
+            i,
+            'BENCH' || lpad(f::text, 4, '0'),
+            random() * 100,
+            true,
+            null
+        from
+            generate_series($2::timestamp - interval '30 days', $2::timestamp, interval '5 minutes') as i,
+            generate_series(1, $3) as f
+        """,
+        date_start,
+        date_end,
+        facilities,
+    )
+
+    rows = int(status.split()[-1])
+
+    return rows / (time.perf_counter() - start)
+
+
+async def ingest_batches(conn: asyncpg.Connection, table: str, interval_start: datetime, batches: int, facilities: int) -> float:
+    """Upsert a batch per interval of every facility like the bulk insert. Returns rows per second"""
+    elapsed = 0.0
+    rows = 0
+
+    for batch in range(batches):
+        interval = interval_start + timedelta(minutes=5 * batch)
+        records = [(*_facility(f), interval, _random.random() * 100, False) for f in range(1, facilities + 1)]
+
+        start = time.perf_counter()
+
+        async with conn.transaction():
+            await conn.execute(
+                "create temp table bench_ingest "
+                "(network_id text, facility_code text, interval timestamp, generated numeric, is_forecast boolean) "
+                "on commit drop"
+            )
+            await conn.copy_records_to_table(
+                "bench_ingest", records=records, columns=["network_id", "facility_code", "interval", "generated", "is_forecast"]
+            )
+            await conn.execute(
+                f"""
+                insert into {table} (network_id, facility_code, interval, generated, is_forecast, energy)
+                select network_id, facility_code, interval, generated, is_forecast, generated / 12 from bench_ingest
+                on conflict (network_id, interval, facility_code, is_forecast) do update set
+                    generated = excluded.generated,
+                    energy = excluded.energy
+                """
+            )
+
+        elapsed += time.perf_counter() - start
+        rows += len(records)
+
+    return rows / elapsed
+
+
+async def query_latency(conn: asyncpg.Connection, table: str, date_end: datetime, runs: int) -> dict[str, float]:
+    """Median latency of each query in milliseconds"""
+    latencies: dict[str, float] = {}
+
+    for name, query in QUERIES.items():
+        timings = []
+
+        for _ in range(runs):
+            start = time.perf_counter()
+            await conn.fetch(query.format(table=table), date_end)
+            timings.append(time.perf_counter() - start)
+
+        latencies[name] = statistics.median(timings) * 1000
+
+    return latencies
+
+
+async def benchmark_layout(conn: asyncpg.Connection, layout: str, args: argparse.Namespace) -> dict[str, float]:
+    table = f"facility_scada_{layout}"
+    date_end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    date_start = date_end - timedelta(days=365 * args.years)
+
+    await create_table(conn, table)
+
+    if layout == "legacy":
+        for name, columns in LEGACY_INDEXES.items():
+            await conn.execute(f"create index idx_{table}_{name} on {table} ({columns})")
+    else:
+        managed = FACILITY_SCADA_LAYOUT.for_table(table)
+
+        for statement in layout_statements(managed, timedelta(days=args.compress_after_days)):
+            await conn.execute(statement)
+
+    results = {"history_rows_per_sec": await load_history(conn, table, date_start, date_end, args.facilities)}
+
+    if layout == "managed":
+        # what the compression policy would have done by now
+        start = time.perf_counter()
+        await conn.execute(
+            f"select compress_chunk(c, if_not_compressed => true) "
+            f"from show_chunks('{table}', older_than => interval '{args.compress_after_days} days') c"
+        )
+        results["compress_sec"] = time.perf_counter() - start
+
+    await conn.execute(f"analyze {table}")
+
+    results["table_mb"] = await conn.fetchval(f"select hypertable_size('{table}')") / 1024 / 1024
+    results["ingest_rows_per_sec"] = await ingest_batches(
+        conn, table, date_end + timedelta(minutes=5), args.batches, args.facilities
+    )
+    results["late_ingest_rows_per_sec"] = await ingest_batches(
+        conn, table, date_end - timedelta(days=args.compress_after_days * 2), args.late_batches, args.facilities
+    )
+
+    for name, latency in (await query_latency(conn, table, date_end, args.runs)).items():
+        results[f"{name}_ms"] = latency
+
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    conn = await asyncpg.connect(dsn=args.dsn or settings.db_url.replace("+asyncpg", ""))
+
+    await conn.execute(f"drop schema if exists {BENCH_SCHEMA} cascade")
+    await conn.execute(f"create schema {BENCH_SCHEMA}")
+    await conn.execute(f"set search_path to {BENCH_SCHEMA}, public")
+
+    try:
+        results = {layout: await benchmark_layout(conn, layout, args) for layout in ["legacy", "managed"]}
+    finally:
+        if not args.keep:
+            await conn.execute(f"drop schema if exists {BENCH_SCHEMA} cascade")
+
+        await conn.close()
+
+    rows = args.years * 365 * 288 * args.facilities
+    print(f"{args.years} years, {args.facilities} facilities, ~{rows:,} actual rows")
+    print(f"{'':<32}{'legacy':>14}{'managed':>14}")
+
+    for metric in results["managed"]:
+        legacy = results["legacy"].get(metric)
+        legacy_value = f"{legacy:14.1f}" if legacy is not None else f"{'-':>14}"
+        print(f"{metric:<32}{legacy_value}{results['managed'][metric]:14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest rate and query latency of the facility_scada storage layouts")
+    parser.add_argument("--dsn", type=str, default=None, help="Defaults to the opennem database")
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--facilities", type=int, default=50)
+    parser.add_argument("--batches", type=int, default=100, help="Latest interval batches ingested")
+    parser.add_argument("--late-batches", type=int, default=20, help="Batches ingested into compressed chunks")
+    parser.add_argument("--runs", type=int, default=10, help="Runs of each query")
+    parser.add_argument(
+        "--compress-after-days",
+        type=int,
+        default=settings.scada_compress_after_days or 30,
+        help="Defaults to the scada_compress_after_days setting or 30 days when compression is off",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+End to end ingest benchmark against synthetic NEMWeb archives
+
+Generates archives shaped like the NEMWeb archives of the DISPATCH_SCADA, DispatchIS, TradingIS,
+Next_Day_Actual_Gen and ROOFTOP reports. The archives are zips of per interval zips of MMS CSVs
+with the same namespaces, tables and fields. Generation is seeded and the archives are byte
+for byte reproducible, with their hashes saved in the results.
+
+Each archive is served from a local http server and ingested with the bulk archive path of the
+crawlers: download and unzip, parse, transform and copy into postgres. Every run is in a fresh
+process so peak RSS is per archive. Stage times come from the ingest tracing spans and "other" is
+the rest of the run: unzipping, the inserts of the processors that don't copy, and the energy
+calculation.
+
+The archives are dated in 1990, before the NEM started, and each run deletes that range first so
+every run inserts into empty days. Run it against a scratch database only, such as a local
+timescale container at alembic head. Watermarks of the interconnectors and rooftop facilities
+will be moved back to 1990.
+
+    ./bin/benchmark_ingest.py --days 1 --duids 400 --runs 3 --output before.json
+    ./bin/benchmark_ingest.py --days 1 --duids 400 --runs 3 --compare before.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+import asyncpg
+
+from opennem import settings
+from opennem.core.parsers.aemo.nemweb import parse_aemo_url_optimized_bulk
+from opennem.core.tracing import STAGE_DURATION_METRIC, IngestMetric, IngestStage, ingest_metrics
+
+REGIONS = ["NSW1", "QLD1", "SA1", "TAS1", "VIC1"]
+
+INTERCONNECTORS = ["N-Q-MNSP1", "NSW1-QLD1", "T-V-MNSP1", "V-S-MNSP1", "V-SA", "VIC1-NSW1"]
+
+# stages timed by the ingest spans of an archive
+STAGES = [IngestStage.download, IngestStage.parse, IngestStage.transform, IngestStage.copy]
+
+# fixed zip entry times so the archives are reproducible
+_ZIP_DATE_TIME = (1990, 1, 1, 0, 0, 0)
+
+
+@dataclass
+class MMSTable:
+    namespace: str
+    name: str
+    version: int
+    fields: list[str]
+    rows: list[list[Any]]
+
+
+@dataclass(frozen=True)
+class FixtureArchive:
+    name: str
+    report: str
+    # one file per interval, or one per day
+    file_interval: timedelta
+    tables: Callable[[datetime, timedelta, random.Random, list[str]], list[MMSTable]]
+
+
+def _intervals(start: datetime, end: datetime, step: timedelta) -> Iterator[datetime]:
+    interval = start + step
+
+    while interval <= end:
+        yield interval
+        interval += step
+
+
+def dispatch_scada_tables(interval: datetime, _: timedelta, rng: random.Random, duids: list[str]) -> list[MMSTable]:
+    return [
+        MMSTable(
+            "DISPATCH",
+            "UNIT_SCADA",
+            1,
+            ["SETTLEMENTDATE", "DUID", "SCADAVALUE", "LASTCHANGED"],
+            [[interval, duid, rng.uniform(0, 700), interval] for duid in duids],
+        )
+    ]
+
+
+def dispatch_is_tables(interval: datetime, _: timedelta, rng: random.Random, __: list[str]) -> list[MMSTable]:
+    return [
+        MMSTable(
+            "DISPATCH",
+            "PRICE",
+            5,
+            ["SETTLEMENTDATE", "RUNNO", "REGIONID", "DISPATCHINTERVAL", "INTERVENTION", "RRP", "EEP", "ROP", "LASTCHANGED"],
+            [[interval, 1, region, 1, 0, rng.uniform(-50, 300), 0, 0, interval] for region in REGIONS],
+        ),
+        MMSTable(
+            "DISPATCH",
+            "REGIONSUM",
+            8,
+            [
+                "SETTLEMENTDATE",
+                "RUNNO",
+                "REGIONID",
+                "DISPATCHINTERVAL",
+                "INTERVENTION",
+                "TOTALDEMAND",
+                "AVAILABLEGENERATION",
+                "NETINTERCHANGE",
+                "DEMAND_AND_NONSCHEDGEN",
+                "LASTCHANGED",
+            ],
+            [
+                [interval, 1, region, 1, 0, demand, demand * 1.3, rng.uniform(-500, 500), demand * 1.05, interval]
+                for region in REGIONS
+                for demand in [rng.uniform(1_000, 9_000)]
+            ],
+        ),
+        MMSTable(
+            "DISPATCH",
+            "INTERCONNECTORRES",
+            3,
+            [
+                "SETTLEMENTDATE",
+                "RUNNO",
+                "INTERCONNECTORID",
+                "DISPATCHINTERVAL",
+                "INTERVENTION",
+                "METEREDMWFLOW",
+                "MWFLOW",
+                "MWLOSSES",
+                "LASTCHANGED",
+            ],
+            [
+                [interval, 1, ic, 1, 0, flow, flow, abs(flow) * 0.02, interval]
+                for ic in INTERCONNECTORS
+                for flow in [rng.uniform(-800, 800)]
+            ],
+        ),
+    ]
+
+
+def trading_is_tables(interval: datetime, _: timedelta, rng: random.Random, __: list[str]) -> list[MMSTable]:
+    period = (interval.hour * 60 + interval.minute) // 5 or 288
+
+    return [
+        MMSTable(
+            "TRADING",
+            "PRICE",
+            3,
+            ["SETTLEMENTDATE", "RUNNO", "REGIONID", "PERIODID", "RRP", "EEP", "INVALIDFLAG", "LASTCHANGED"],
+            [[interval, 1, region, period, rng.uniform(-50, 300), 0, 0, interval] for region in REGIONS],
+        ),
+        MMSTable(
+            "TRADING",
+            "REGIONSUM",
+            4,
+            ["SETTLEMENTDATE", "RUNNO", "REGIONID", "PERIODID", "TOTALDEMAND", "NETINTERCHANGE", "LASTCHANGED"],
+            [[interval, 1, region, period, rng.uniform(1_000, 9_000), rng.uniform(-500, 500), interval] for region in REGIONS],
+        ),
+    ]
+
+
+def next_day_actual_gen_tables(
+    day_end: datetime, file_interval: timedelta, rng: random.Random, duids: list[str]
+) -> list[MMSTable]:
+    return [
+        MMSTable(
+            "METER_DATA",
+            "GEN_DUID",
+            1,
+            ["INTERVAL_DATETIME", "DUID", "MWH_READING", "LASTCHANGED"],
+            [
+                [interval, duid, rng.uniform(0, 60), day_end]
+                for interval in _intervals(day_end - file_interval, day_end, timedelta(minutes=5))
+                for duid in duids
+            ],
+        )
+    ]
+
+
+def rooftop_tables(interval: datetime, _: timedelta, rng: random.Random, __: list[str]) -> list[MMSTable]:
+    return [
+        MMSTable(
+            "ROOFTOP",
+            "ACTUAL",
+            2,
+            ["INTERVAL_DATETIME", "REGIONID", "POWER", "QI", "TYPE", "LASTCHANGED"],
+            [[interval, region, rng.uniform(0, 4_000), 1, "MEASUREMENT", interval] for region in REGIONS],
+        )
+    ]
+
+
+FIXTURE_ARCHIVES = [
+    FixtureArchive("DISPATCH_SCADA", "DISPATCHSCADA", timedelta(minutes=5), dispatch_scada_tables),
+    FixtureArchive("DispatchIS", "DISPATCHIS", timedelta(minutes=5), dispatch_is_tables),
+    FixtureArchive("TradingIS", "TRADINGIS", timedelta(minutes=5), trading_is_tables),
+    FixtureArchive("Next_Day_Actual_Gen", "NEXT_DAY_ACTUAL_GEN", timedelta(days=1), next_day_actual_gen_tables),
+    FixtureArchive("ROOFTOP", "ROOFTOP_PV_ACTUAL_MEASUREMENT", timedelta(minutes=30), rooftop_tables),
+]
+
+
+def _csv_value(value: Any) -> str:
+    if isinstance(value, datetime):
+        return f'"{value:%Y/%m/%d %H:%M:%S}"'
+
+    if isinstance(value, float):
+        return f"{value:.5f}"
+
+    return str(value)
+
+
+def mms_csv(report: str, created: datetime, tables: list[MMSTable]) -> str:
+    lines = [
+        f"C,NEMP.WORLD,{report},AEMO,PUBLIC,{created:%Y/%m/%d},{created:%H:%M:%S},0000000000000001,{report},0000000000000001"
+    ]
+
+    for table in tables:
+        lines.append(",".join(["I", table.namespace, table.name, str(table.version), *table.fields]))
+        lines.extend(
+            ",".join(["D", table.namespace, table.name, str(table.version), *map(_csv_value, row)]) for row in table.rows
+        )
+
+    lines.append(f'C,"END OF REPORT",{len(lines) + 1}')
+
+    return "\n".join(lines) + "\n"
+
+
+def _zip_bytes(entries: list[tuple[str, bytes]]) -> bytes:
+    with tempfile.SpooledTemporaryFile() as fh:
+        with zipfile.ZipFile(fh, "w") as zf:
+            for filename, content in entries:
+                zf.writestr(zipfile.ZipInfo(filename, date_time=_ZIP_DATE_TIME), content, compress_type=zipfile.ZIP_DEFLATED)
+
+        fh.seek(0)
+        return fh.read()
+
+
+def generate_archive(fixture: FixtureArchive, directory: Path, args: argparse.Namespace) -> Path:
+    """Write an archive of one zipped CSV per file interval over the benchmark days"""
+    rng = random.Random(f"{args.seed}-{fixture.name}")
+    duids = [f"BENCH{number:04d}" for number in range(1, args.duids + 1)]
+    date_end = args.date_start + timedelta(days=args.days)
+
+    entries = []
+
+    for sequence, interval in enumerate(_intervals(args.date_start, date_end, fixture.file_interval), start=1):
+        filename = f"PUBLIC_{fixture.report}_{interval:%Y%m%d%H%M}_{sequence:016d}"
+        csv_content = mms_csv(fixture.report, interval, fixture.tables(interval, fixture.file_interval, rng, duids))
+        entries.append((f"{filename}.zip", _zip_bytes([(f"{filename}.CSV", csv_content.encode())])))
+
+    archive = directory / f"PUBLIC_{fixture.report}_{args.date_start:%Y%m%d}_{date_end:%Y%m%d}.zip"
+    archive.write_bytes(_zip_bytes(entries))
+
+    return archive
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@contextmanager
+def serve_directory(directory: Path) -> Iterator[str]:
+    """Serve the archives on loopback so the download is part of the benchmark"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # bytes on macos, kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def ingest_archive(url: str) -> dict[str, Any]:
+    """Ingest an archive in this process. Run in a fresh process per archive"""
+    startup_rss = _peak_rss_mb()
+    ingest_metrics.reset()
+
+    start = time.perf_counter()
+    asyncio.run(parse_aemo_url_optimized_bulk(url, persist_to_db=True))
+    seconds = time.perf_counter() - start
+
+    snapshot = ingest_metrics.snapshot()
+    stages = {stage.value: 0.0 for stage in STAGES}
+    counts = {metric.name: 0 for metric in IngestMetric}
+
+    for histogram in snapshot["histograms"]:
+        if histogram["name"] == STAGE_DURATION_METRIC and histogram["labels"]["stage"] in stages:
+            stages[histogram["labels"]["stage"]] += histogram["sum"]
+
+    for counter in snapshot["counters"]:
+        counts[IngestMetric(counter["name"]).name] += counter["value"]
+
+    stages["other"] = max(seconds - sum(stages.values()), 0)
+
+    return {
+        "seconds": seconds,
+        "stages": stages,
+        "counts": counts,
+        "startup_rss_mb": startup_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# networks the fixtures are stored under and the codes they write besides the BENCH units
+BENCH_NETWORKS = ["NEM", "AEMO_ROOFTOP"]
+FIXTURE_FACILITY_CODES = [*INTERCONNECTORS, *(f"ROOFTOP_NEM_{region.rstrip('1')}" for region in REGIONS)]
+
+_CLEAN_SCADA_QUERY = """
+    delete from facility_scada
+    where
+        network_id = any($3::text[])
+        and (facility_code like 'BENCH%' or facility_code = any($4::text[]))
+        and interval > $1 and interval <= $2
+"""
+
+_CLEAN_BALANCING_SUMMARY_QUERY = """
+    delete from balancing_summary
+    where network_id = any($3::text[]) and network_region = any($4::text[]) and interval > $1 and interval <= $2
+"""
+
+_CLEAN_DAY_QUERIES = [
+    "delete from interval_completeness where network_id = any($3::text[]) and day >= $1::date and day <= $2::date",
+    "delete from aggregate_changed_day where network_id = any($3::text[]) and day >= $1::date and day <= $2::date",
+]
+
+
+async def clean_benchmark_range(args: argparse.Namespace) -> None:
+    """Remove what the fixtures wrote over the benchmark range, leaving other facilities and networks"""
+    conn = await asyncpg.connect(dsn=settings.db_url.replace("+asyncpg", ""))
+    date_start, date_end = args.date_start, args.date_start + timedelta(days=args.days)
+
+    try:
+        await conn.execute(_CLEAN_SCADA_QUERY, date_start, date_end, BENCH_NETWORKS, FIXTURE_FACILITY_CODES)
+        await conn.execute(_CLEAN_BALANCING_SUMMARY_QUERY, date_start, date_end, BENCH_NETWORKS, REGIONS)
+
+        for query in _CLEAN_DAY_QUERIES:
+            await conn.execute(query, date_start, date_end, BENCH_NETWORKS)
+
+        await conn.execute("delete from facility_scada_watermark where facility_code like 'BENCH%'")
+    finally:
+        await conn.close()
+
+
+def summarise(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    seconds = statistics.median(run["seconds"] for run in runs)
+    counts = runs[0]["counts"]
+
+    return {
+        "rows_parsed": counts["rows_parsed"],
+        "rows_copied": counts["rows_copied"],
+        "rows_inserted": counts["rows_inserted"],
+        "seconds": seconds,
+        "rows_per_sec": counts["rows_parsed"] / seconds if seconds else 0,
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "startup_rss_mb": statistics.median(run["startup_rss_mb"] for run in runs),
+        "stages": {stage: statistics.median(run["stages"][stage] for run in runs) for stage in runs[0]["stages"]},
+        "runs": runs,
+    }
+
+
+def _git(*command: str) -> str:
+    try:
+        return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _change(current: float, baseline: float | None) -> str:
+    if not baseline:
+        return f"{'-':>9}"
+
+    return f"{(current - baseline) / baseline * 100:+8.1f}%"
+
+
+def print_results(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    print(f"{results['commit'] or 'unknown'}: {results['args']['days']} days, {results['args']['duids']} duids")
+
+    if baseline:
+        print(f"compared to {baseline['commit'] or 'unknown'}")
+
+    stage_names = [stage.value for stage in STAGES] + ["other"]
+    print(f"{'':<22}{'rows':>10}{'rows/sec':>12}{'':>10}{'peak MB':>10}{'':>10}" + "".join(f"{s:>11}" for s in stage_names))
+
+    for name, archive in results["archives"].items():
+        previous = (baseline or {}).get("archives", {}).get(name, {})
+
+        if previous and previous.get("sha256") != archive["sha256"]:
+            print(f"{name}: fixture differs from the baseline")
+            previous = {}
+
+        print(
+            f"{name:<22}{archive['rows_parsed']:>10,}{archive['rows_per_sec']:>12,.0f}"
+            f"{_change(archive['rows_per_sec'], previous.get('rows_per_sec'))}"
+            f"{archive['peak_rss_mb']:>10.0f}{_change(archive['peak_rss_mb'], previous.get('peak_rss_mb'))}"
+            + "".join(f"{archive['stages'][stage]:>10.2f}s" for stage in stage_names)
+        )
+
+
+def main(args: argparse.Namespace) -> None:
+    hostname = urlparse(settings.db_url).hostname
+
+    if hostname not in ("localhost", "127.0.0.1", "::1") and not args.allow_remote:
+        raise SystemExit(f"Refusing to benchmark against {hostname}. Use a scratch database or pass --allow-remote")
+
+    commit = _git("rev-parse", "--short", "HEAD")
+    fixtures = [f for f in FIXTURE_ARCHIVES if not args.archive or f.name in args.archive]
+    fixtures_dir = Path(args.fixtures_dir or tempfile.mkdtemp(prefix="opennem_ingest_bench_"))
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+
+    results: dict[str, Any] = {
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now().astimezone().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "energy_at_ingest": settings.energy_at_ingest,
+        "args": {**vars(args), "date_start": args.date_start.isoformat()},
+        "archives": {},
+    }
+
+    spawn = get_context("spawn")
+
+    with serve_directory(fixtures_dir) as base_url:
+        for fixture in fixtures:
+            archive = generate_archive(fixture, fixtures_dir, args)
+            runs = []
+
+            for _ in range(args.runs):
+                asyncio.run(clean_benchmark_range(args))
+
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                    runs.append(executor.submit(ingest_archive, f"{base_url}/{archive.name}").result())
+
+            results["archives"][fixture.name] = {
+                "archive": archive.name,
+                "bytes": archive.stat().st_size,
+                "sha256": hashlib.sha256(archive.read_bytes()).hexdigest(),
+                **summarise(runs),
+            }
+
+    if not args.keep:
+        asyncio.run(clean_benchmark_range(args))
+
+    output = Path(args.output or f"ingest-benchmark-{commit or 'unknown'}.json")
+    output.write_text(json.dumps(results, indent=2))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_results(results, baseline)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End to end ingest benchmark against synthetic NEMWeb archives")
+    parser.add_argument("--days", type=int, default=1, help="Days covered by each archive")
+    parser.add_argument("--duids", type=int, default=300, help="Units in the scada and meter data archives")
+    parser.add_argument("--runs", type=int, default=3, help="Runs of each archive, each in a fresh process")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--date-start", type=datetime.fromisoformat, default=datetime(1990, 1, 1))
+    parser.add_argument("--archive", action="append", choices=[f.name for f in FIXTURE_ARCHIVES], help="Only these archives")
+    parser.add_argument("--fixtures-dir", type=str, default=None, help="Defaults to a temporary directory")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON, defaults to ingest-benchmark-<commit>.json")
+    parser.add_argument("--compare", type=str, default=None, help="Results JSON of a previous run to compare to")
+    parser.add_argument("--keep", action="store_true", help="Keep the ingested rows")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a database that isn't on localhost")
+
+    main(parser.parse_args())
@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+"""
+Latency and plan regression suite for the export and API queries
+
+Loads a deterministic synthetic year of NEM and WEM data at 5 minute resolution into a local
+database: facilities, facility_scada, rooftop, interconnectors and balancing_summary, with the
+at_ aggregates the exports read derived from them. Values are hashes of the facility and
+interval so every load of the same year and size is identical.
+
+Each query builder of opennem/api/export/queries.py, opennem/queries and the stats router is
+run across representative parameters. The suite records the latency distribution of every case
+and an EXPLAIN (ANALYZE, BUFFERS) plan. The plan is reduced to its shape: node types, joins,
+relations and indexes, with hypertable chunk names folded and runs of identical chunk scans
+collapsed. Results are saved as JSON.
+
+Against a baseline the run fails when a plan changes shape or the median latency regresses
+past the threshold:
+
+    ./bin/benchmark_queries.py --load --output baseline.json
+    ./bin/benchmark_queries.py --baseline baseline.json
+
+Run it against a scratch database only, such as a local timescale container at alembic head.
+Loading replaces the facility_scada, balancing_summary and aggregate rows of the NEM and WEM
+networks in the benchmark year.
+"""
+
+import argparse
+import asyncio
+import difflib
+import hashlib
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+from opennem import settings
+from opennem.api.export import queries as export_queries
+from opennem.api.stats import queries as stats_queries
+from opennem.api.time import human_to_interval, human_to_period
+from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.db import get_read_session
+from opennem.db.load_fixtures import load_facilitystatus, load_fueltechs, load_network_regions, load_networks
+from opennem.queries import emissions, flows, price, summary, tod
+from opennem.schema.network import NetworkAEMORooftop, NetworkAPVI, NetworkNEM, NetworkSchema, NetworkWEM
+
+BENCH_PREFIX = "BENCH_"
+
+NEM_REGIONS = ["NSW1", "QLD1", "SA1", "TAS1", "VIC1"]
+
+NEM_INTERCONNECTORS = [
+    ("N-Q-MNSP1", "NSW1", "QLD1"),
+    ("NSW1-QLD1", "NSW1", "QLD1"),
+    ("T-V-MNSP1", "TAS1", "VIC1"),
+    ("V-S-MNSP1", "VIC1", "SA1"),
+    ("V-SA", "VIC1", "SA1"),
+    ("VIC1-NSW1", "VIC1", "NSW1"),
+]
+
+# fueltechs of the synthetic units in turn, with their emission factors
+FUELTECH_MIX = [
+    ("coal_black", 0.9),
+    ("coal_brown", 1.2),
+    ("gas_ccgt", 0.4),
+    ("gas_ocgt", 0.6),
+    ("hydro", 0),
+    ("wind", 0),
+    ("wind", 0),
+    ("solar_utility", 0),
+    ("solar_utility", 0),
+    ("battery_discharging", 0),
+    ("bioenergy_biomass", 0),
+    ("distillate", 0.8),
+]
+
+SOLAR_FUELTECHS = ["solar_utility", "solar_rooftop"]
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    year: int
+    nem_units: int
+    wem_units: int
+
+    @property
+    def date_start(self) -> datetime:
+        return datetime(self.year, 1, 1)
+
+    @property
+    def date_end(self) -> datetime:
+        return datetime(self.year + 1, 1, 1)
+
+
+def _facilities(spec: DatasetSpec) -> list[dict[str, Any]]:
+    facilities = []
+
+    for network_id, regions, units in [("NEM", NEM_REGIONS, spec.nem_units), ("WEM", ["WEM"], spec.wem_units)]:
+        for number in range(units):
+            fueltech, emissions_factor = FUELTECH_MIX[number % len(FUELTECH_MIX)]
+            facilities.append(
+                {
+                    "code": f"{BENCH_PREFIX}{network_id}_{number:04d}",
+                    "network_id": network_id,
+                    "network_region": regions[number % len(regions)],
+                    "fueltech_id": fueltech,
+                    "capacity": 50 + (number * 37) % 650,
+                    "emissions_factor": emissions_factor,
+                    "region_from": None,
+                    "region_to": None,
+                }
+            )
+
+    for region in NEM_REGIONS:
+        facilities.append(
+            {
+                "code": f"{BENCH_PREFIX}ROOFTOP_{region}",
+                "network_id": "AEMO_ROOFTOP",
+                "network_region": region,
+                "fueltech_id": "solar_rooftop",
+                "capacity": 4_000,
+                "emissions_factor": 0,
+                "region_from": None,
+                "region_to": None,
+            }
+        )
+
+    for code, region_from, region_to in NEM_INTERCONNECTORS:
+        facilities.append(
+            {
+                "code": f"{BENCH_PREFIX}{code}",
+                "network_id": "NEM",
+                "network_region": region_from,
+                "fueltech_id": None,
+                "capacity": 1_000,
+                "emissions_factor": 0,
+                "region_from": region_from,
+                "region_to": region_to,
+            }
+        )
+
+    return facilities
+
+
+_FACILITY_INSERT_QUERY = """
+    insert into facility (
+        network_id, fueltech_id, status_id, code, network_code, network_region, active, dispatch_type,
+        capacity_registered, emissions_factor_co2, interconnector, interconnector_region_from,
+        interconnector_region_to, approved
+    )
+    select
+        t.network_id, t.fueltech_id, 'operating', t.code, t.code, t.network_region, true, 'GENERATOR',
+        t.capacity, t.emissions_factor, t.region_from is not null, t.region_from, t.region_to, true
+    from unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::numeric[], $6::numeric[], $7::text[], $8::text[])
+        as t(code, network_id, network_region, fueltech_id, capacity, emissions_factor, region_from, region_to)
+    on conflict (code) do nothing
+"""
+
+# a value between 0 and 1 from the facility and interval, shaped by daylight for solar and
+# between -1 and 1 for interconnectors
+_SCADA_INSERT_QUERY = """
+    insert into facility_scada (network_id, interval, facility_code, generated, is_forecast, eoi_quantity, energy)
+    select
+        f.network_id, i, f.code, g, false, g * $3::numeric / 60, g * $3::numeric / 60
+    from facility f
+    cross join generate_series($1::timestamp, $2::timestamp - make_interval(mins => $3), make_interval(mins => $3)) as i
+    cross join lateral (
+        select
+            f.capacity_registered * (abs(hashtext(f.code || i::text)) % 10000) / 10000.0
+            * case
+                when f.fueltech_id = any($5::text[])
+                    then greatest(sin(pi() * (extract(hour from i) + extract(minute from i) / 60 - 6) / 12), 0)
+                else 1
+            end
+            - case when f.interconnector then f.capacity_registered / 2 else 0 end as g
+    ) as v
+    where f.code like 'BENCH\\_%' and f.network_id = $4
+"""
+
+_BALANCING_SUMMARY_INSERT_QUERY = """
+    insert into balancing_summary (network_id, interval, network_region, demand, demand_total, net_interchange, price,
+        price_dispatch, is_forecast)
+    select
+        r.network_id, i, r.network_region, d, d * 1.05, (abs(hashtext(r.network_region || i::text || 'ni')) % 1000) - 500,
+        p, p, false
+    from unnest($3::text[], $4::text[]) as r(network_id, network_region)
+    cross join generate_series($1::timestamp, $2::timestamp - interval '5 minutes', interval '5 minutes') as i
+    cross join lateral (
+        select
+            1000 + (abs(hashtext(r.network_region || i::text)) % 8000) as d,
+            (abs(hashtext(r.network_region || i::text || 'price')) % 35000) / 100.0 - 50 as p
+    ) as v
+"""
+
+_FUELTECH_INTERVALS_INSERT_QUERY = """
+    insert into at_network_fueltech_intervals (interval, network_id, network_region, fueltech_id, is_forecast, generated,
+        energy, emissions, market_value)
+    select
+        fs.interval, f.network_id, f.network_region, f.fueltech_id, false, sum(fs.generated), sum(fs.energy),
+        sum(fs.energy * f.emissions_factor_co2), sum(fs.energy * coalesce(bs.price, 0))
+    from facility_scada fs
+    join facility f on f.code = fs.facility_code
+    left join balancing_summary bs on
+        bs.interval = fs.interval
+        and bs.network_id = case when f.network_id = 'AEMO_ROOFTOP' then 'NEM' else f.network_id end
+        and bs.network_region = f.network_region
+    where
+        fs.facility_code like 'BENCH\\_%' and not f.interconnector
+        and fs.interval >= $1 and fs.interval < $2
+    group by 1, 2, 3, 4
+"""
+
+_FACILITY_DAILY_INSERT_QUERY = """
+    insert into at_facility_daily (trading_day, network_id, network_region, facility_code, fueltech_id, energy,
+        market_value, emissions)
+    select
+        (date_trunc('day', fs.interval) - make_interval(mins => n.offset)) at time zone 'UTC', f.network_id,
+        f.network_region, f.code, f.fueltech_id, sum(fs.energy), sum(fs.energy * coalesce(bs.price, 0)),
+        sum(fs.energy * f.emissions_factor_co2)
+    from facility_scada fs
+    join facility f on f.code = fs.facility_code
+    join network n on n.code = f.network_id
+    left join balancing_summary bs on
+        bs.interval = fs.interval
+        and bs.network_id = case when f.network_id = 'AEMO_ROOFTOP' then 'NEM' else f.network_id end
+        and bs.network_region = f.network_region
+    where
+        fs.facility_code like 'BENCH\\_%' and not f.interconnector
+        and fs.interval >= $1 and fs.interval < $2
+    group by 1, 2, 3, 4, 5
+"""
+
+_NETWORK_DEMAND_INSERT_QUERY = """
+    insert into at_network_demand (trading_day, network_id, network_region, demand_energy, demand_market_value)
+    select
+        (date_trunc('day', bs.interval) - make_interval(mins => n.offset)) at time zone 'UTC', bs.network_id,
+        bs.network_region, sum(bs.demand_total) / 12, sum(bs.demand_total * bs.price) / 12
+    from balancing_summary bs
+    join network n on n.code = bs.network_id
+    where bs.network_id = any($3::text[]) and bs.interval >= $1 and bs.interval < $2
+    group by 1, 2, 3
+"""
+
+_NETWORK_FLOWS_INSERT_QUERY = """
+    insert into at_network_flows (trading_interval, network_id, network_region, energy_imports, energy_exports,
+        market_value_imports, market_value_exports, emissions_imports, emissions_exports)
+    with flows as (
+        select fs.interval, f.interconnector_region_from as region_from, f.interconnector_region_to as region_to,
+            fs.energy
+        from facility_scada fs
+        join facility f on f.code = fs.facility_code
+        where
+            fs.facility_code like 'BENCH\\_%' and f.interconnector
+            and fs.interval >= $1 and fs.interval < $2
+    ),
+    region_flows as (
+        select interval, region_to as network_region, greatest(energy, 0) as imports, greatest(-energy, 0) as exports
+        from flows
+        union all
+        select interval, region_from, greatest(-energy, 0), greatest(energy, 0)
+        from flows
+    )
+    select
+        (rf.interval - interval '10 hours') at time zone 'UTC', 'NEM', rf.network_region, sum(rf.imports),
+        sum(rf.exports), sum(rf.imports * coalesce(bs.price, 0)), sum(rf.exports * coalesce(bs.price, 0)),
+        sum(rf.imports) * 0.7, sum(rf.exports) * 0.7
+    from region_flows rf
+    left join balancing_summary bs on
+        bs.interval = rf.interval and bs.network_id = 'NEM' and bs.network_region = rf.network_region
+    group by 1, 2, 3
+"""
+
+_CLEAR_QUERIES = [
+    "delete from facility_scada where facility_code like 'BENCH\\_%'",
+    "delete from at_facility_daily where facility_code like 'BENCH\\_%'",
+    "delete from balancing_summary where network_id = any($3::text[]) and interval >= $1 and interval < $2",
+    "delete from at_network_fueltech_intervals where network_id = any($3::text[]) and interval >= $1 and interval < $2",
+    "delete from at_network_demand where network_id = any($3::text[]) and trading_day >= $1 and trading_day < $2",
+    "delete from at_network_flows where network_id = any($3::text[]) and trading_interval >= $1 and trading_interval < $2",
+    "delete from facility where code like 'BENCH\\_%'",
+]
+
+
+def _months(spec: DatasetSpec) -> list[tuple[datetime, datetime]]:
+    months = [datetime(spec.year, month, 1) for month in range(1, 13)] + [spec.date_end]
+
+    return list(zip(months[:-1], months[1:], strict=True))
+
+
+async def load_dataset(spec: DatasetSpec) -> None:
+    """Replace the benchmark year with the synthetic dataset"""
+    await load_networks()
+    await load_network_regions()
+    await load_facilitystatus()
+    await load_fueltechs()
+
+    networks = ["NEM", "WEM", "AEMO_ROOFTOP"]
+    balancing_regions = [("NEM", region) for region in NEM_REGIONS] + [("WEM", "WEM")]
+    facilities = _facilities(spec)
+
+    conn = await asyncpg.connect(dsn=settings.db_url.replace("+asyncpg", ""))
+
+    try:
+        for query in _CLEAR_QUERIES:
+            await conn.execute(query, *((spec.date_start, spec.date_end, networks) if "$1" in query else ()))
+
+        await conn.execute(
+            _FACILITY_INSERT_QUERY,
+            *[[f[key] for f in facilities] for key in facilities[0]],
+        )
+
+        for month_start, month_end in _months(spec):
+            start = time.perf_counter()
+
+            for network in [NetworkNEM, NetworkWEM, NetworkAEMORooftop]:
+                interval_size = NetworkAEMORooftop.interval_size if network == NetworkAEMORooftop else 5
+                await conn.execute(_SCADA_INSERT_QUERY, month_start, month_end, interval_size, network.code, SOLAR_FUELTECHS)
+
+            await conn.execute(
+                _BALANCING_SUMMARY_INSERT_QUERY,
+                month_start,
+                month_end,
+                [network_id for network_id, _ in balancing_regions],
+                [region for _, region in balancing_regions],
+            )
+            await conn.execute(_FUELTECH_INTERVALS_INSERT_QUERY, month_start, month_end)
+            await conn.execute(_FACILITY_DAILY_INSERT_QUERY, month_start, month_end)
+            await conn.execute(_NETWORK_DEMAND_INSERT_QUERY, month_start, month_end, networks)
+            await conn.execute(_NETWORK_FLOWS_INSERT_QUERY, month_start, month_end)
+
+            print(f"Loaded {month_start:%Y-%m} in {time.perf_counter() - start:.1f}s")
+
+        for table in ["facility", "facility_scada", "balancing_summary", "at_network_fueltech_intervals", "at_facility_daily"]:
+            await conn.execute(f"analyze {table}")
+    finally:
+        await conn.close()
+
+
+# cases
+
+
+@dataclass(frozen=True)
+class QueryCase:
+    name: str
+    build: Callable[[datetime], TextClause | str]
+
+
+def _series(network: NetworkSchema, interval: str, period: str, days: int) -> Callable[[datetime], OpennemExportSeries]:
+    def series(end: datetime) -> OpennemExportSeries:
+        end = end.replace(tzinfo=network.get_fixed_offset())
+
+        return OpennemExportSeries(
+            start=end - timedelta(days=days),
+            end=end,
+            network=network,
+            interval=human_to_interval(interval),
+            period=human_to_period(period),
+        )
+
+    return series
+
+
+nem_week = _series(NetworkNEM, "5m", "7d", 7)
+nem_week_30m = _series(NetworkNEM, "30m", "7d", 7)
+wem_week = _series(NetworkWEM, "5m", "7d", 7)
+nem_year = _series(NetworkNEM, "1d", "1Y", 365)
+
+NEM_NETWORKS = [NetworkNEM, NetworkAEMORooftop]
+
+QUERY_CASES = [
+    # exports
+    QueryCase(
+        "power_network_fueltech_nem",
+        lambda end: export_queries.power_network_fueltech_query(nem_week(end), networks_query=NEM_NETWORKS),
+    ),
+    QueryCase(
+        "power_network_fueltech_nsw1",
+        lambda end: export_queries.power_network_fueltech_query(
+            nem_week(end), network_region="NSW1", networks_query=NEM_NETWORKS
+        ),
+    ),
+    QueryCase(
+        "power_network_fueltech_wem",
+        lambda end: export_queries.power_network_fueltech_query(wem_week(end), networks_query=[NetworkWEM, NetworkAPVI]),
+    ),
+    QueryCase(
+        "power_network_rooftop_nem",
+        lambda end: export_queries.power_network_rooftop_query(nem_week_30m(end), networks_query=[NetworkAEMORooftop]),
+    ),
+    QueryCase(
+        "power_and_emissions_network_fueltech_nem",
+        lambda end: export_queries.power_and_emissions_network_fueltech_query(nem_week(end)),
+    ),
+    QueryCase(
+        "power_network_interconnector_emissions_nsw1",
+        lambda end: export_queries.power_network_interconnector_emissions_query(nem_week(end), network_region="NSW1"),
+    ),
+    QueryCase(
+        "interconnector_flow_network_regions_nsw1",
+        lambda end: export_queries.interconnector_flow_network_regions_query(nem_week(end), network_region="NSW1"),
+    ),
+    QueryCase(
+        "price_network_nem",
+        lambda end: export_queries.price_network_query(
+            nem_week(end), group_field="bs.network_region", networks_query=[NetworkNEM]
+        ),
+    ),
+    QueryCase(
+        "network_demand_nem_year", lambda end: export_queries.network_demand_query(nem_year(end), networks_query=[NetworkNEM])
+    ),
+    QueryCase(
+        "demand_network_region_nsw1",
+        lambda end: export_queries.demand_network_region_query(nem_week(end), network_region="NSW1", networks=[NetworkNEM]),
+    ),
+    QueryCase(
+        "energy_network_fueltech_nem_year",
+        lambda end: export_queries.energy_network_fueltech_query(nem_year(end), networks_query=NEM_NETWORKS),
+    ),
+    QueryCase(
+        "energy_network_fueltech_nsw1_year",
+        lambda end: export_queries.energy_network_fueltech_query(
+            nem_year(end), network_region="NSW1", networks_query=NEM_NETWORKS
+        ),
+    ),
+    QueryCase(
+        "energy_network_interconnector_emissions_nsw1_year",
+        lambda end: export_queries.energy_network_interconnector_emissions_query(
+            nem_year(end), network_region="NSW1", networks_query=[NetworkNEM]
+        ),
+    ),
+    # opennem.queries
+    QueryCase(
+        "emission_factor_region_nem",
+        lambda end: emissions.get_emission_factor_region_query(
+            date_min=end - timedelta(days=3), date_max=end, interval=human_to_interval("5m"), network=NetworkNEM
+        ),
+    ),
+    QueryCase(
+        "network_region_price_nem",
+        lambda end: price.get_network_region_price_query(
+            network=NetworkNEM, date_min=end - timedelta(days=3), date_max=end, interval=human_to_interval("5m")
+        ),
+    ),
+    QueryCase("power_network_flow_nsw1", lambda end: flows.power_network_flow_query(nem_week(end), network_region="NSW1")),
+    QueryCase(
+        "network_flows_emissions_market_value_nem_year",
+        lambda end: flows.get_network_flows_emissions_market_value_query(nem_year(end)),
+    ),
+    QueryCase(
+        "interconnector_intervals_nem",
+        lambda end: flows.get_interconnector_intervals_query(end - timedelta(days=7), end, NetworkNEM),
+    ),
+    QueryCase(
+        "daily_fueltech_summary_nem", lambda end: summary.get_daily_fueltech_summary_query(end - timedelta(days=1), NetworkNEM)
+    ),
+    QueryCase("time_of_day_nem", lambda end: tod.get_time_of_day_query(end - timedelta(days=1), NetworkNEM)),
+    # stats router
+    QueryCase("stats_power_facility", lambda end: stats_queries.power_facility_query(nem_week(end), [f"{BENCH_PREFIX}NEM_0000"])),
+    QueryCase(
+        "stats_energy_facility_year", lambda end: stats_queries.energy_facility_query(nem_year(end), [f"{BENCH_PREFIX}NEM_0000"])
+    ),
+    QueryCase(
+        "stats_emission_factor_region_nsw1",
+        lambda end: stats_queries.emission_factor_region_query(nem_week(end), network_region_code="NSW1"),
+    ),
+    QueryCase("stats_network_fueltech_demand_nem", lambda end: stats_queries.network_fueltech_demand_query(nem_week(end))),
+    QueryCase(
+        "stats_network_region_price_nsw1",
+        lambda end: stats_queries.network_region_price_query(nem_week(end), network_region_code="NSW1"),
+    ),
+]
+
+
+# plans
+
+_CHUNK_PATTERN = re.compile(r"(compress)?_hyper_\d+_\d+_chunk")
+
+# plan node properties that make up its shape. costs, row counts and timings are left out
+_SHAPE_PROPERTIES = [
+    "Custom Plan Provider",
+    "Join Type",
+    "Strategy",
+    "Partial Mode",
+    "Scan Direction",
+    "Relation Name",
+    "Index Name",
+]
+
+
+def _node_label(node: dict[str, Any]) -> str:
+    properties = [f"{key}={_CHUNK_PATTERN.sub('_hyper_chunk', str(node[key]))}" for key in _SHAPE_PROPERTIES if key in node]
+
+    return " ".join([node["Node Type"], *properties])
+
+
+def plan_shape(node: dict[str, Any], depth: int = 0) -> list[str]:
+    """
+    The shape of an EXPLAIN (FORMAT JSON) plan as indented lines. Runs of identical child shapes,
+    such as the scans of each chunk of a hypertable, are collapsed into one
+    """
+    lines = ["  " * depth + _node_label(node)]
+    previous: list[str] | None = None
+
+    for child in node.get("Plans", []):
+        child_shape = plan_shape(child, depth + 1)
+
+        if child_shape != previous:
+            lines.extend(child_shape)
+
+        previous = child_shape
+
+    return lines
+
+
+def plan_fingerprint(shape: list[str]) -> str:
+    return hashlib.sha1("\n".join(shape).encode()).hexdigest()[:12]
+
+
+def latency_stats(timings: list[float]) -> dict[str, float]:
+    """Latency distribution in milliseconds"""
+    timings_ms = sorted(t * 1000 for t in timings)
+    quantiles = statistics.quantiles(timings_ms, n=100, method="inclusive") if len(timings_ms) > 1 else timings_ms * 99
+
+    return {
+        "min": timings_ms[0],
+        "p50": statistics.median(timings_ms),
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "max": timings_ms[-1],
+        "mean": statistics.fmean(timings_ms),
+    }
+
+
+def _as_text(query: TextClause | str) -> TextClause:
+    return text(query) if isinstance(query, str) else query
+
+
+def _explain(query: TextClause) -> TextClause:
+    return text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query.text}").bindparams(*query._bindparams.values())
+
+
+async def run_case(case: QueryCase, end: datetime, runs: int, warmup: int) -> dict[str, Any]:
+    query = _as_text(case.build(end))
+    timings = []
+
+    async with get_read_session() as session:
+        for run in range(warmup + runs):
+            start = time.perf_counter()
+            result = await session.execute(query)
+            rows = len(result.fetchall())
+
+            if run >= warmup:
+                timings.append(time.perf_counter() - start)
+
+        explain = (await session.execute(_explain(query))).scalar()
+
+    explain = explain[0] if isinstance(explain, list) else json.loads(explain)[0]
+    plan = explain["Plan"]
+    shape = plan_shape(plan)
+
+    return {
+        "rows": rows,
+        "latency_ms": latency_stats(timings),
+        "planning_ms": explain.get("Planning Time"),
+        "execution_ms": explain.get("Execution Time"),
+        "shared_hit_blocks": plan.get("Shared Hit Blocks"),
+        "shared_read_blocks": plan.get("Shared Read Blocks"),
+        "fingerprint": plan_fingerprint(shape),
+        "shape": shape,
+        "plan": plan,
+    }
+
+
+def compare_results(results: dict[str, Any], baseline: dict[str, Any], threshold: float, min_delta_ms: float) -> list[str]:
+    """Plan shape changes and median latency regressions against a baseline"""
+    failures = []
+
+    if results["dataset"] != baseline["dataset"]:
+        return [f"dataset {results['dataset']} differs from the baseline dataset {baseline['dataset']}"]
+
+    for name, case in results["cases"].items():
+        previous = baseline["cases"].get(name)
+
+        if not previous:
+            continue
+
+        if case["fingerprint"] != previous["fingerprint"]:
+            diff = difflib.unified_diff(previous["shape"], case["shape"], "baseline", "current", lineterm="")
+            failures.append(f"{name}: plan changed shape\n" + "\n".join(diff))
+
+        p50, previous_p50 = case["latency_ms"]["p50"], previous["latency_ms"]["p50"]
+
+        if p50 > previous_p50 * threshold and p50 - previous_p50 > min_delta_ms:
+            failures.append(f"{name}: median latency {p50:.1f}ms regressed from {previous_p50:.1f}ms")
+
+    return failures
+
+
+def _git(*command: str) -> str:
+    try:
+        return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def main(args: argparse.Namespace) -> int:
+    hostname = urlparse(settings.db_url).hostname
+
+    if hostname not in ("localhost", "127.0.0.1", "::1") and not args.allow_remote:
+        raise SystemExit(f"Refusing to benchmark against {hostname}. Use a scratch database or pass --allow-remote")
+
+    spec = DatasetSpec(year=args.year, nem_units=args.nem_units, wem_units=args.wem_units)
+
+    if args.load:
+        await load_dataset(spec)
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    commit = _git("rev-parse", "--short", "HEAD")
+
+    results: dict[str, Any] = {
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now().astimezone().isoformat(),
+        "python": platform.python_version(),
+        "dataset": asdict(spec),
+        "runs": args.runs,
+        "cases": {},
+    }
+
+    # the last day of the dataset, as the live exports read up to the latest interval
+    end = spec.date_end - timedelta(days=1)
+
+    for case in QUERY_CASES:
+        if args.case and case.name not in args.case:
+            continue
+
+        result = await run_case(case, end, runs=args.runs, warmup=args.warmup)
+        results["cases"][case.name] = result
+
+        latency = result["latency_ms"]
+        previous = (baseline or {}).get("cases", {}).get(case.name)
+        change = f"{(latency['p50'] / previous['latency_ms']['p50'] - 1) * 100:+7.1f}%" if previous else ""
+
+        print(
+            f"{case.name:<52} p50={latency['p50']:8.1f}ms p95={latency['p95']:8.1f}ms "
+            f"plan={result['planning_ms'] or 0:6.2f}ms {result['fingerprint']} {change}"
+        )
+
+    output = Path(args.output or f"query-benchmark-{commit or 'unknown'}.json")
+    output.write_text(json.dumps(results, indent=2, default=str))
+    print(f"Wrote {output}")
+
+    if not baseline:
+        return 0
+
+    failures = compare_results(results, baseline, threshold=args.threshold, min_delta_ms=args.min_delta_ms)
+
+    for failure in failures:
+        print(failure)
+
+    print(f"{len(failures)} regressions against {baseline['commit'] or 'unknown'}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and plan regression suite for the export and API queries")
+    parser.add_argument("--load", action="store_true", help="Load the synthetic dataset first")
+    parser.add_argument("--year", type=int, default=2023, help="Year of the synthetic dataset")
+    parser.add_argument("--nem-units", type=int, default=150)
+    parser.add_argument("--wem-units", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs of each case")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs of each case first")
+    parser.add_argument("--case", action="append", choices=[c.name for c in QUERY_CASES], help="Only these cases")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON, defaults to query-benchmark-<commit>.json")
+    parser.add_argument("--baseline", type=str, default=None, help="Results JSON to check against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median latency ratio counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore regressions smaller than this")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a database that isn't on localhost")
+
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Planning and execution time for the hot export queries
+
+Runs each query a number of times over a sliding date range, the way the live
+exports call them, and reports client side latency along with the planning and
+execution times postgres recorded in pg_stat_statements. Requires the
+pg_stat_statements extension with `pg_stat_statements.track_planning = on`.
+
+Because the query builders bind dates and codes as parameters every run shares a
+single statement, so it shows up as one row with the number of calls and the
+mean planning time across them.
+
+    ./bin/benchmark_query_planning.py --runs 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Callable
+from datetime import timedelta
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+from opennem.api.export.queries import (
+    interconnector_flow_network_regions_query,
+    power_and_emissions_network_fueltech_query,
+    power_network_fueltech_query,
+    power_network_rooftop_query,
+    price_network_query,
+)
+from opennem.api.time import human_to_interval, human_to_period
+from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.db import get_read_session
+from opennem.schema.network import NetworkNEM
+from opennem.utils.dates import get_last_completed_interval_for_network
+
+HOT_QUERIES: dict[str, Callable[[OpennemExportSeries], TextClause]] = {
+    "power_network_fueltech": lambda ts: power_network_fueltech_query(time_series=ts),
+    "power_network_rooftop": lambda ts: power_network_rooftop_query(time_series=ts),
+    "power_and_emissions_network_fueltech": lambda ts: power_and_emissions_network_fueltech_query(time_series=ts),
+    "interconnector_flow_network_regions": lambda ts: interconnector_flow_network_regions_query(time_series=ts),
+    "price_network": lambda ts: price_network_query(time_series=ts),
+}
+
+_STATEMENT_STATS_QUERY = text(
+    """
+    select calls, mean_plan_time, mean_exec_time
+    from pg_stat_statements
+    where query = :query
+    """
+)
+
+
+async def benchmark_query(name: str, builder: Callable[[OpennemExportSeries], TextClause], runs: int) -> None:
+    latest_interval = get_last_completed_interval_for_network(network=NetworkNEM)
+    latencies: list[float] = []
+    statement: str | None = None
+
+    async with get_read_session() as session:
+        await session.execute(text("select pg_stat_statements_reset()"))
+
+        for run in range(runs):
+            time_series = OpennemExportSeries(
+                start=latest_interval - timedelta(days=7),
+                end=latest_interval - timedelta(minutes=5 * run),
+                network=NetworkNEM,
+                interval=human_to_interval("5m"),
+                period=human_to_period("7d"),
+            )
+
+            query = builder(time_series)
+
+            start = time.perf_counter()
+            result = await session.execute(query)
+            result.fetchall()
+            latencies.append(time.perf_counter() - start)
+
+            statement = str(query.compile(dialect=session.bind.dialect))
+
+        stats = (await session.execute(_STATEMENT_STATS_QUERY, {"query": statement})).fetchone()
+
+    line = f"{name:<40} runs={runs:<4} first={latencies[0] * 1000:8.1f}ms median={statistics.median(latencies) * 1000:8.1f}ms"
+
+    if stats:
+        line += f" statements=1 calls={stats.calls} plan={stats.mean_plan_time:6.2f}ms exec={stats.mean_exec_time:8.2f}ms"
+    else:
+        line += " (no pg_stat_statements entry)"
+
+    print(line)
+
+
+async def main(runs: int, queries: list[str]) -> None:
+    for name in queries:
+        await benchmark_query(name, HOT_QUERIES[name], runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Planning time for the hot export queries")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--query", action="append", dest="queries", choices=list(HOT_QUERIES.keys()))
+    args = parser.parse_args()
+
+    asyncio.run(main(runs=args.runs, queries=args.queries or list(HOT_QUERIES.keys())))
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 """ Initialization Python Script """
+import asyncio
 import subprocess
 
 from opennem.api.export.tasks import export_energy, export_power
@@ -16,37 +17,37 @@ from opennem.workers.facility_data_ranges import update_facility_seen_range
 from opennem.workers.network_data_range import run_network_data_range_update
 
 
-def run_crawls() -> None:
+async def run_crawls() -> None:
     cs = get_crawl_set()
 
     for crawler in cs.crawlers:
         if crawler.schedule and crawler.schedule == CrawlerSchedule.live:
-            run_crawl(crawler)
+            await run_crawl(crawler)
 
 
-def init_db() -> None:
+async def init_db() -> None:
     subprocess.run(["alembic", "upgrade", "head"])
-    db_init()
-    load_fixtures()
+    await db_init()
+    await load_fixtures()
     opennem_import()
-    import_facilities()
+    await import_facilities()
     import_nem_interconnects()
 
 
-def run_exports() -> None:
-    all_runner()
-    export_energy(latest=False)
-    export_power(latest=False)
+async def run_exports() -> None:
+    await all_runner()
+    await export_energy(latest=False)
+    await export_power(latest=False)
 
 
-def run_init() -> None:
-    db_init()
-    export_facility_geojson()
-    run_crawls()
-    run_network_data_range_update()
-    update_facility_seen_range(include_first_seen=True)
-    run_exports()
+async def run_init() -> None:
+    await db_init()
+    await export_facility_geojson()
+    await run_crawls()
+    await run_network_data_range_update()
+    await update_facility_seen_range(include_first_seen=True)
+    await run_exports()
 
 
 if __name__ == "__main__":
-    run_init()
+    asyncio.run(run_init())
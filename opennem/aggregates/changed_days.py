@@ -0,0 +1,125 @@
+"""
+OpenNEM aggregate changed days
+
+The bulk insert, `index_inserted_records` for writers that insert on a session, and energy
+calculation mark each network day a batch of facility_scada or balancing_summary records touched
+in aggregate_changed_day, in the same transaction as the records. The daily aggregates
+claim and recompute only the marked days so the cost of a catch-up run follows how much data
+arrived late rather than the length of the lookback window.
+
+Days are in network time. Balancing summary days also mark the facility daily aggregate of every
+network priced from that network as market value is calculated from its price.
+"""
+
+import enum
+import logging
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import asyncpg
+
+from opennem.core.networks import network_from_network_code
+
+logger = logging.getLogger("opennem.aggregates.changed_days")
+
+
+class ChangedDayAggregate(enum.Enum):
+    facility_daily = "facility_daily"
+    network_demand = "network_demand"
+
+
+@dataclass(frozen=True, slots=True)
+class ChangedDay:
+    aggregate: ChangedDayAggregate
+    network_id: str
+    day: date
+
+
+# asyncpg as it runs in the bulk insert transaction
+_CHANGED_DAYS_UPSERT_QUERY = """
+    insert into aggregate_changed_day (aggregate, network_id, day)
+    select t.aggregate, t.network_id, t.day
+    from unnest($1::text[], $2::text[], $3::date[]) as t(aggregate, network_id, day)
+    on conflict (aggregate, network_id, day) do update set
+        marked_at = now()
+"""
+
+# marks the facility daily aggregate for networks priced from the balancing summary network
+_PRICED_CHANGED_DAYS_UPSERT_QUERY = """
+    insert into aggregate_changed_day (aggregate, network_id, day)
+    select distinct 'facility_daily', n.code, t.day
+    from unnest($1::text[], $2::date[]) as t(network_price, day)
+    join network n on n.network_price = t.network_price
+    on conflict (aggregate, network_id, day) do update set
+        marked_at = now()
+"""
+
+
+def _interval_shift(network_id: str) -> int | None:
+    try:
+        return network_from_network_code(network_id).interval_shift or 0
+    except Exception:
+        logger.warning(f"No network {network_id}, not marking changed days")
+        return None
+
+
+def changed_days_from_records(aggregate: ChangedDayAggregate, records: Iterable[dict[Hashable, Any]]) -> set[ChangedDay]:
+    """
+    Network days touched by a batch of records. The network demand aggregate shifts intervals back
+    by the network interval shift so the interval ending at midnight is part of the previous day.
+    """
+    changed: set[ChangedDay] = set()
+    interval_shifts: dict[str, int | None] = {}
+
+    for record in records:
+        network_id = record["network_id"]
+
+        if network_id not in interval_shifts:
+            interval_shifts[network_id] = _interval_shift(network_id)
+
+        interval_shift = interval_shifts[network_id]
+
+        if interval_shift is None:
+            continue
+
+        interval = record["interval"]
+
+        if isinstance(interval, str):
+            interval = datetime.fromisoformat(interval)
+
+        if aggregate == ChangedDayAggregate.network_demand:
+            interval -= timedelta(minutes=interval_shift)
+
+        changed.add(ChangedDay(aggregate, network_id, interval.date()))
+
+    return changed
+
+
+async def mark_changed_days(conn: asyncpg.Connection, changed: set[ChangedDay]) -> None:
+    """Mark changed days on a bulk insert connection"""
+    if not changed:
+        return None
+
+    await conn.execute(
+        _CHANGED_DAYS_UPSERT_QUERY,
+        [i.aggregate.value for i in changed],
+        [i.network_id for i in changed],
+        [i.day for i in changed],
+    )
+
+
+async def mark_priced_changed_days(conn: asyncpg.Connection, changed: set[ChangedDay]) -> None:
+    """
+    Mark the facility daily aggregate of networks priced from the changed balancing summary days on
+    a bulk insert connection
+    """
+    if not changed:
+        return None
+
+    await conn.execute(
+        _PRICED_CHANGED_DAYS_UPSERT_QUERY,
+        [i.network_id for i in changed],
+        [i.day for i in changed],
+    )
@@ -8,8 +8,9 @@ from typing import Any
 from sqlalchemy import text as sql
 
 from opennem import settings
+from opennem.aggregates.changed_days import ChangedDayAggregate
 from opennem.aggregates.utils import get_aggregate_month_range, get_aggregate_year_range
-from opennem.db import get_database_engine
+from opennem.db import SessionLocalAsync, get_database_engine
 from opennem.schema.network import (
     NetworkAEMORooftop,
     NetworkAPVI,
@@ -115,9 +116,114 @@ def aggregates_facility_daily_query(date_max: datetime, date_min: datetime, netw
     return dedent(query)
 
 
+# recalculates the days of a network in the changed cte and returns them
+_FACILITY_DAILY_DAYS_UPSERT = """
+    upserted as (
+        insert into at_facility_daily
+            (trading_day, network_id, network_region, facility_code, fueltech_id, energy, market_value, emissions)
+        select
+            date_trunc('day', fs.interval) as trading_day,
+            f.network_id,
+            f.network_region,
+            f.code as facility_code,
+            f.fueltech_id,
+            sum(fs.energy) as energy,
+            sum(fs.market_value) as market_value,
+            sum(fs.emissions) as emissions
+        from (
+            select
+                time_bucket('1 hour', fs.interval) as interval,
+                fs.facility_code as code,
+                case
+                    when sum(fs.energy) > 0 then sum(fs.energy)
+                    else 0
+                end as energy,
+                case
+                    when sum(fs.energy) > 0 then sum(fs.energy) * coalesce(avg(bs.price), avg(bs.price_dispatch), 0)
+                    else 0
+                end as market_value,
+                case
+                    when sum(fs.energy) > 0 then sum(fs.energy) * coalesce(max(f.emissions_factor_co2), 0)
+                    else 0
+                end as emissions
+            from facility_scada fs
+            join changed c on
+                fs.interval >= c.day
+                and fs.interval < c.day + interval '1 day'
+            join facility f on fs.facility_code = f.code
+            join network n on f.network_id = n.code
+            left join balancing_summary bs on
+                bs.interval = fs.interval
+                and bs.network_id = n.network_price
+                and bs.network_region = f.network_region
+            where
+                fs.is_forecast is false
+                and fs.network_id = :network_id
+            group by 1, 2
+        ) as fs
+        join facility f on fs.code = f.code
+        where
+            f.fueltech_id is not null
+        group by
+            1,
+            f.network_id,
+            f.code,
+            f.fueltech_id,
+            f.network_region
+        on conflict (trading_day, network_id, facility_code) do update set
+            energy = excluded.energy,
+            market_value = excluded.market_value,
+            emissions = excluded.emissions
+    )
+    select c.day from changed c order by 1
+"""
+
+# claims the changed days for a network and recalculates them in one statement. days are removed
+# in the same transaction so days marked while it runs are kept for the next run. days locked by
+# an ingest that hasn't committed are skipped, as its rows aren't visible yet, and left for the
+# next run
+_FACILITY_DAILY_CHANGED_DAYS_QUERY = sql(
+    """
+    with claimed as (
+        select ctid
+        from aggregate_changed_day
+        where
+            aggregate = :aggregate
+            and network_id = :network_id
+        for update skip locked
+    ),
+    changed as (
+        delete from aggregate_changed_day d
+        using claimed
+        where d.ctid = claimed.ctid
+        returning d.day
+    ),
+    """
+    + _FACILITY_DAILY_DAYS_UPSERT
+)
+
+# recalculates every day of a network in a range with the end exclusive
+_FACILITY_DAILY_RANGE_QUERY = sql(
+    """
+    with changed as (
+        select cast(generate_series(
+            date_trunc('day', cast(:date_start as timestamp)),
+            cast(:date_end as timestamp) - interval '1 second',
+            interval '1 day'
+        ) as date) as day
+    ),
+    """
+    + _FACILITY_DAILY_DAYS_UPSERT
+)
+
+_ROOFTOP_FIX_QUERY = sql(
+    "delete from at_facility_daily where trading_day < '2018-03-01 00:00:00+00' and network_id='AEMO_ROOFTOP';"
+)
+
+
 def run_rooftop_fix() -> None:
     """Fixes overlap in rooftop backfill and backfill"""
-    query = sql("delete from at_facility_daily where trading_day < '2018-03-01 00:00:00+00' and network_id='AEMO_ROOFTOP';")
+    query = _ROOFTOP_FIX_QUERY
 
     engine = get_database_engine()
 
@@ -157,6 +263,67 @@ def exec_aggregates_facility_daily_query(date_min: datetime, date_max: datetime,
     return result
 
 
+async def run_aggregates_facility_changed_days(network: NetworkSchema) -> list[date]:
+    """
+    Recalculate the facility daily aggregate for the days of a network with data inserted since
+    they were last calculated. Returns the days recalculated.
+    """
+    if settings.dry_run:
+        return []
+
+    async with SessionLocalAsync() as session:
+        result = await session.execute(
+            _FACILITY_DAILY_CHANGED_DAYS_QUERY,
+            {"aggregate": ChangedDayAggregate.facility_daily.value, "network_id": network.code},
+        )
+        days = list(result.scalars().all())
+
+        # @NOTE rooftop fix for double counts
+        if network is NetworkAEMORooftop:
+            await session.execute(_ROOFTOP_FIX_QUERY)
+
+        await session.commit()
+
+    logger.info(f"Updated {len(days)} {network.code} facility daily aggregate days for changed days")
+
+    return days
+
+
+async def run_aggregates_facility_daily_range(network: NetworkSchema, date_start: datetime, date_end: datetime) -> list[date]:
+    """
+    Recalculate the facility daily aggregate for every day of a network from date_start to
+    date_end in network time with the end exclusive. Returns the days recalculated.
+    """
+    if date_end <= date_start:
+        raise AggregateFacilityDailyException(
+            f"run_aggregates_facility_daily_range: date_end ({date_end}) is before or equal to date_start ({date_start})"
+        )
+
+    if settings.dry_run:
+        return []
+
+    async with SessionLocalAsync() as session:
+        result = await session.execute(
+            _FACILITY_DAILY_RANGE_QUERY,
+            {
+                "network_id": network.code,
+                "date_start": date_start.replace(tzinfo=None),
+                "date_end": date_end.replace(tzinfo=None),
+            },
+        )
+        days = list(result.scalars().all())
+
+        # @NOTE rooftop fix for double counts
+        if network is NetworkAEMORooftop:
+            await session.execute(_ROOFTOP_FIX_QUERY)
+
+        await session.commit()
+
+    logger.info(f"Updated {len(days)} {network.code} facility daily aggregate days for {date_start} => {date_end}")
+
+    return days
+
+
 def run_aggregates_facility_for_interval(interval: datetime, network: NetworkSchema | None = None, offset: int = 1) -> int | None:
     """Runs and stores emission flows for a particular interval"""
 
@@ -3,13 +3,17 @@
 This populated the at_network_demand aggregate table with demand data.
 """
 
+import functools
 import logging
 from datetime import datetime, timedelta
 
 from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 
 from opennem import settings
-from opennem.db import get_database_engine
+from opennem.aggregates.changed_days import ChangedDayAggregate
+from opennem.db import SessionLocalAsync, get_database_engine
+from opennem.queries.utils import network_time
 from opennem.schema.network import NetworkNEM, NetworkSchema, NetworkWEM
 from opennem.utils.dates import get_last_completed_interval_for_network, get_today_nem
 
@@ -22,10 +26,12 @@ class AggregateDemandException(Exception):
     pass
 
 
-def aggregates_network_demand_query(date_max: datetime, date_min: datetime, network: NetworkSchema) -> str:
-    """This query updates the aggregate demand table with market_value and energy"""
+@functools.cache
+def _network_demand_aggregate_template(intervals_per_hour: float, interval_shift: int) -> TextClause:
+    network_interval_offset = f" - interval '{interval_shift} minutes'" if interval_shift else ""
 
-    __query = """
+    return text(
+        f"""
     insert into at_network_demand
         select
             date_trunc('day', fs.trading_interval at time zone n.timezone_database {network_interval_offset})
@@ -44,9 +50,9 @@ def aggregates_network_demand_query(date_max: datetime, date_min: datetime, netw
                     * coalesce(max(bs.price_dispatch), max(bs.price)) * 1000 as market_value
             from balancing_summary bs
             where
-                bs.network_id = '{network_id}'
-                and bs.trading_interval >= '{date_min}'
-                and bs.trading_interval <= '{date_max}'
+                bs.network_id = :network_id
+                and bs.trading_interval >= :date_min
+                and bs.trading_interval <= :date_max
             group by
                 1, 2, 3
         ) as fs
@@ -57,27 +63,85 @@ def aggregates_network_demand_query(date_max: datetime, date_min: datetime, netw
             demand_energy = EXCLUDED.demand_energy,
             demand_market_value = EXCLUDED.demand_market_value;
     """
+    )
+
+
+@functools.cache
+def _network_demand_changed_days_template(intervals_per_hour: float, interval_shift: int) -> TextClause:
+    """
+    Claims the changed days for a network and recalculates them in one statement. Days are removed
+    in the same transaction so days marked while it runs are kept for the next run. Days locked by
+    an ingest that hasn't committed are skipped, as its rows aren't visible yet, and left for the
+    next run
+    """
+    network_interval_offset = f" - interval '{interval_shift} minutes'" if interval_shift else ""
+    day_interval_offset = f" + interval '{interval_shift} minutes'" if interval_shift else ""
+
+    return text(
+        f"""
+    with claimed as (
+        select ctid
+        from aggregate_changed_day
+        where
+            aggregate = :aggregate
+            and network_id = :network_id
+        for update skip locked
+    ),
+    changed as (
+        delete from aggregate_changed_day d
+        using claimed
+        where d.ctid = claimed.ctid
+        returning d.day
+    )
+    insert into at_network_demand
+        select
+            date_trunc('day', fs.interval {network_interval_offset}) as trading_day,
+            fs.network_id,
+            fs.network_region,
+            sum(fs.energy) as demand_energy,
+            sum(fs.market_value) as demand_market_value
+        from (
+            select
+                time_bucket('5 minutes', bs.interval) as interval,
+                bs.network_id,
+                bs.network_region,
+                (sum(coalesce(bs.demand_total, bs.demand)) / {intervals_per_hour}) as energy,
+                (sum(coalesce(bs.demand_total, bs.demand)) / {intervals_per_hour})
+                    * coalesce(max(bs.price_dispatch), max(bs.price)) * 1000 as market_value
+            from balancing_summary bs
+            join changed c on
+                bs.interval >= c.day {day_interval_offset}
+                and bs.interval < c.day + interval '1 day' {day_interval_offset}
+            where
+                bs.network_id = :network_id
+            group by
+                1, 2, 3
+        ) as fs
+        group by
+            1, 2, 3
+    on conflict (trading_day, network_id, network_region) DO UPDATE set
+            demand_energy = EXCLUDED.demand_energy,
+            demand_market_value = EXCLUDED.demand_market_value;
+    """
+    )
+
+
+def aggregates_network_demand_query(date_max: datetime, date_min: datetime, network: NetworkSchema) -> TextClause:
+    """This query updates the aggregate demand table with market_value and energy"""
 
     if date_max <= date_min:
         raise AggregateDemandException(
             f"aggregates_network_demand_query: date_max ({date_max}) is before or equal to date_min ({date_min})"
         )
 
-    network_interval_offset = ""
-
-    if network.interval_shift:
-        network_interval_offset = f" - interval '{network.interval_shift} minutes'"
-
-    query = __query.format(
-        network_interval_offset=network_interval_offset,
-        date_min=date_min,
-        date_max=date_max,
+    return _network_demand_aggregate_template(
+        intervals_per_hour=network.intervals_per_hour * 1000, interval_shift=network.interval_shift or 0
+    ).bindparams(
         network_id=network.code,
-        intervals_per_hour=network.intervals_per_hour * 1000,
+        date_min=network_time(date_min),
+        date_max=network_time(date_max),
     )
 
-    return text(query)
-
 
 def exec_aggregates_network_demand_query(date_min: datetime, date_max: datetime, network: NetworkSchema) -> bool:
     engine = get_database_engine()
@@ -101,6 +165,27 @@ def exec_aggregates_network_demand_query(date_min: datetime, date_max: datetime,
     return False
 
 
+async def run_aggregates_demand_changed_days(network: NetworkSchema) -> int:
+    """
+    Recalculate the demand aggregate for the days of a network with balancing summary data inserted
+    since they were last calculated. Returns the number of rows written.
+    """
+    if settings.dry_run:
+        return 0
+
+    query = _network_demand_changed_days_template(
+        intervals_per_hour=network.intervals_per_hour * 1000, interval_shift=network.interval_shift or 0
+    )
+
+    async with SessionLocalAsync() as session:
+        result = await session.execute(query, {"aggregate": ChangedDayAggregate.network_demand.value, "network_id": network.code})
+        await session.commit()
+
+    logger.info(f"Updated {result.rowcount} {network.code} demand aggregates for changed days")
+
+    return result.rowcount
+
+
 def run_aggregates_demand_network(networks: list[NetworkSchema] | None = None) -> None:
     """Run the demand aggregates for each provided network
 
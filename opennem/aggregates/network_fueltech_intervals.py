@@ -0,0 +1,192 @@
+"""Runs queries to populate the at_network_fueltech_intervals aggregate
+
+This is a per-interval rollup of facility_scada by network, network region and
+fueltech with power, energy, emissions and market value. It is maintained
+incrementally for intervals as they are ingested, recomputed for the recent hours of
+every network on a schedule and can be backfilled in chunks.
+
+Once the backfill has been run, the power export queries read from this table rather
+than re-aggregating facility_scada on every call (settings.network_fueltech_intervals_queries).
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from opennem import settings
+from opennem.aggregates.utils import get_aggregate_date_chunks
+from opennem.db import SessionLocalAsync
+from opennem.schema.network import (
+    NetworkAEMORooftop,
+    NetworkAPVI,
+    NetworkNEM,
+    NetworkOpenNEMRooftopBackfill,
+    NetworkSchema,
+    NetworkWEM,
+)
+from opennem.utils.dates import get_last_completed_interval_for_network
+
+logger = logging.getLogger("opennem.aggregates.network_fueltech_intervals")
+
+NETWORK_FUELTECH_INTERVAL_NETWORKS = [NetworkNEM, NetworkWEM, NetworkAPVI, NetworkAEMORooftop, NetworkOpenNEMRooftopBackfill]
+
+
+class AggregateNetworkFueltechIntervalsException(Exception):
+    """Exception raised when running the network fueltech intervals aggregate"""
+
+    pass
+
+
+_NETWORK_FUELTECH_INTERVALS_QUERY = text(
+    """
+    insert into at_network_fueltech_intervals
+        (interval, network_id, network_region, fueltech_id, is_forecast, generated, energy, emissions, market_value)
+    select
+        fs.interval,
+        f.network_id,
+        f.network_region,
+        f.fueltech_id,
+        fs.is_forecast,
+        sum(fs.generated) as generated,
+        sum(fs.energy) as energy,
+        sum(case when fs.energy > 0 then fs.energy * coalesce(f.emissions_factor_co2, 0) else 0 end) as emissions,
+        sum(fs.energy * coalesce(bs.price, bs.price_dispatch, 0)) as market_value
+    from (
+        select
+            fs.interval,
+            fs.network_id,
+            fs.facility_code,
+            fs.is_forecast,
+            fs.generated,
+            coalesce(fs.energy, fs.generated / (60.0 / n.interval_size)) as energy
+        from facility_scada fs
+        join network n on fs.network_id = n.code
+        where
+            fs.network_id = :network_id
+            and fs.interval >= :date_start
+            and fs.interval < :date_end
+    ) as fs
+    join facility f on fs.facility_code = f.code
+    join network n on f.network_id = n.code
+    left join balancing_summary bs on
+        bs.interval = fs.interval
+        and bs.network_id = n.network_price
+        and bs.network_region = f.network_region
+    where
+        f.fueltech_id is not null
+    group by 1, 2, 3, 4, 5
+    on conflict (interval, network_id, network_region, fueltech_id, is_forecast) do update set
+        generated = EXCLUDED.generated,
+        energy = EXCLUDED.energy,
+        emissions = EXCLUDED.emissions,
+        market_value = EXCLUDED.market_value
+    """
+)
+
+
+def _to_network_time(dt: datetime, network: NetworkSchema) -> datetime:
+    """facility_scada intervals are stored as naive network time"""
+    if dt.tzinfo:
+        dt = dt.astimezone(network.get_fixed_offset()).replace(tzinfo=None)
+
+    return dt
+
+
+async def run_network_fueltech_intervals(network: NetworkSchema, date_start: datetime, date_end: datetime) -> int:
+    """Aggregate network fueltech intervals for a range with end exclusive"""
+    date_start = _to_network_time(date_start, network)
+    date_end = _to_network_time(date_end, network)
+
+    if date_end <= date_start:
+        raise AggregateNetworkFueltechIntervalsException(
+            f"run_network_fueltech_intervals: date_end ({date_end}) is before or equal to date_start ({date_start})"
+        )
+
+    if settings.dry_run:
+        logger.debug(f"Dry run: Skipping network fueltech intervals for {network.code} {date_start} => {date_end}")
+        return 0
+
+    async with SessionLocalAsync() as session:
+        result = await session.execute(
+            _NETWORK_FUELTECH_INTERVALS_QUERY,
+            {"network_id": network.code, "date_start": date_start, "date_end": date_end},
+        )
+        await session.commit()
+
+    logger.info(f"Aggregated {result.rowcount} network fueltech intervals for {network.code} {date_start} => {date_end}")
+
+    return result.rowcount
+
+
+async def run_network_fueltech_intervals_for_interval(network: NetworkSchema, interval: datetime) -> int:
+    """Incremental update for a single just-ingested interval"""
+    return await run_network_fueltech_intervals(
+        network=network, date_start=interval, date_end=interval + timedelta(minutes=network.interval_size)
+    )
+
+
+async def run_network_fueltech_intervals_for_latest_interval(network: NetworkSchema) -> int:
+    interval = get_last_completed_interval_for_network(network=network)
+
+    return await run_network_fueltech_intervals_for_interval(network=network, interval=interval)
+
+
+async def run_network_fueltech_intervals_catchup(networks: list[NetworkSchema] | None = None, hours: int | None = None) -> int:
+    """Recompute the recent intervals for each network on a schedule
+
+    Only NEM energy and AEMO rooftop are updated from events as they land. This keeps the other
+    networks current and picks up late and revised data for all of them
+    """
+    if not networks:
+        networks = NETWORK_FUELTECH_INTERVAL_NETWORKS
+
+    lookback = timedelta(hours=hours or settings.network_fueltech_intervals_catchup_hours)
+    updated = 0
+
+    for network in networks:
+        # networks with a fixed end are historic and covered by the backfill
+        if network.data_last_seen:
+            continue
+
+        date_end = _to_network_time(get_last_completed_interval_for_network(network=network), network) + timedelta(
+            minutes=network.interval_size
+        )
+
+        updated += await run_network_fueltech_intervals(network=network, date_start=date_end - lookback, date_end=date_end)
+
+    return updated
+
+
+async def run_network_fueltech_intervals_backfill(
+    networks: list[NetworkSchema] | None = None,
+    date_start: datetime | None = None,
+    date_end: datetime | None = None,
+    chunk_size: timedelta = timedelta(days=7),
+) -> None:
+    """Backfill the aggregate in chunks, most recent first, from data_first_seen for each network"""
+    if not networks:
+        networks = NETWORK_FUELTECH_INTERVAL_NETWORKS
+
+    for network in networks:
+        network_date_start = date_start or network.data_first_seen
+        network_date_end = date_end or network.data_last_seen or get_last_completed_interval_for_network(network=network)
+
+        if not network_date_start:
+            logger.error(f"run_network_fueltech_intervals_backfill: Network {network.code} has no data_first_seen")
+            continue
+
+        network_date_start = _to_network_time(network_date_start, network)
+
+        # include the last interval as ranges are end exclusive
+        network_date_end = _to_network_time(network_date_end, network) + timedelta(minutes=network.interval_size)
+
+        for chunk_start, chunk_end in get_aggregate_date_chunks(network_date_start, network_date_end, chunk_size, reverse=True):
+            await run_network_fueltech_intervals(network=network, date_start=chunk_start, date_end=chunk_end)
+
+
+# debug entry point
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(run_network_fueltech_intervals_for_latest_interval(network=NetworkNEM))
@@ -1,6 +1,6 @@
 """Utilities for aggregate methods"""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from opennem.schema.network import NetworkNEM, NetworkSchema
 from opennem.utils.dates import get_today_opennem
@@ -38,5 +38,23 @@ def get_aggregate_month_range(year: int, month: int, network: NetworkSchema = Ne
     return date_min, date_max
 
 
+def get_aggregate_date_chunks(
+    date_start: datetime, date_end: datetime, chunk_size: timedelta, reverse: bool = False
+) -> list[tuple[datetime, datetime]]:
+    """Split a date range into chunks with end exclusive. With reverse the most recent chunk is first"""
+    chunks = []
+    chunk_start = date_start
+
+    while chunk_start < date_end:
+        chunk_end = min(chunk_start + chunk_size, date_end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+
+    if reverse:
+        chunks.reverse()
+
+    return chunks
+
+
 if __name__ == "__main__":
     print(get_aggregate_year_range(2023))
@@ -4,6 +4,7 @@ OpenNEM API
 Primary Router. All the main setup of the API is here.
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -13,29 +14,28 @@ from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.param_functions import Query
 from fastapi.responses import FileResponse
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
-from fastapi_cache.backends.redis import RedisBackend
 from fastapi_versionizer import api_version
 from fastapi_versionizer.versionizer import Versionizer
-from redis import asyncio as aioredis
 from sqlalchemy.orm import Session
 from starlette.requests import Request
 
 from opennem import settings
 from opennem.api import throttle
+from opennem.api.cache import init_response_cache
+from opennem.api.catalogue import init_facility_catalogue
 from opennem.api.dash.router import router as dash_router
 from opennem.api.exceptions import OpennemBaseHttpException, OpennemExceptionResponse
 from opennem.api.facility.router import router as facility_router
 from opennem.api.feedback.router import router as feedback_router
-from opennem.api.keys import api_protected, unkey_client
+from opennem.api.geo.router import router as geo_router
+from opennem.api.keys import api_protected
 from opennem.api.milestones.router import milestones_router
 from opennem.api.schema import APINetworkRegion, APINetworkSchema
 from opennem.api.station.router import router as station_router
 from opennem.api.stats.router import router as stats_router
 from opennem.api.weather.router import router as weather_router
 from opennem.api.webhooks.router import router as webhooks_router
-from opennem.clients.unkey import OpenNEMUser
+from opennem.clients.unkey import OpenNEMUser, close_unkey_client, unkey_usage
 from opennem.core.time import INTERVALS, PERIODS
 from opennem.core.units import UNITS
 from opennem.db import get_scoped_session
@@ -56,17 +56,19 @@ logger = logging.getLogger("opennem.api")
 async def lifespan(app: FastAPI):
     # Startup logic
     if settings.is_dev:
-        logger.info("Cache disabled")
-        FastAPICache.init(backend=InMemoryBackend())
+        logger.info("Using local API cache")
+        init_response_cache("local")
+        init_facility_catalogue("local")
     else:
-        redis = await aioredis.from_url(str(settings.redis_url), encoding="utf8", decode_responses=True)
-        FastAPICache.init(RedisBackend(redis), prefix="api-cache")
-        logger.info("Enabled API cache")
+        init_response_cache(settings.api_cache_backend)
+        init_facility_catalogue(settings.api_cache_backend)
+        logger.info(f"Enabled API cache with backend {settings.api_cache_backend}")
 
-    await unkey_client.start()
+    usage_sync = asyncio.create_task(unkey_usage.run())
     yield
     # Shutdown logic
-    await unkey_client.close()
+    usage_sync.cancel()
+    await close_unkey_client()
 
 
 app = FastAPI(title="OpenNEM", debug=settings.debug, version=get_version(), redoc_url="/docs", docs_url=None, lifespan=lifespan)
@@ -151,6 +153,7 @@ async def http_type_exception_handler(request: Request, exc: HTTPException) -> O
 app.include_router(stats_router, tags=["Stats"], prefix="/stats")
 app.include_router(station_router, tags=["Stations"], prefix="/station")
 app.include_router(facility_router, tags=["Facilities"], prefix="/facility")
+app.include_router(geo_router, tags=["Geo"], include_in_schema=False)
 app.include_router(weather_router, tags=["Weather"], prefix="/weather")
 app.include_router(feedback_router, tags=["Feedback"], prefix="/feedback", include_in_schema=False)
 app.include_router(dash_router, tags=["Dashboard"], prefix="/dash", include_in_schema=False)
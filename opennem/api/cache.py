@@ -0,0 +1,446 @@
+"""
+OpenNEM API response cache
+
+A per-process LRU of encoded responses in front of redis, shared between API processes.
+
+ * concurrent misses for a key, and the requests that find it expired, share a single call
+   to the endpoint. With redis the call is also locked across processes and the others wait
+   for its result to land.
+ * expired responses are served for a further `stale` seconds while they are refreshed in the
+   background, so a popular key expiring doesn't hold up requests.
+ * responses are tagged, for example by network, and invalidating a tag when new intervals are
+   ingested marks its responses stale. Tags are versioned counters in redis so workers can
+   invalidate responses held by the API processes.
+
+Usage:
+
+    @router.get("/power/{network_code}")
+    @cache(expire=60 * 5, tags=network_cache_tags)
+    async def power(network_code: str) -> OpennemDataSet:
+        ...
+
+    await invalidate_cache_tags(network_cache_tag("NEM"))
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import time
+import weakref
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any
+
+from cachetools import LRUCache, TTLCache
+from fastapi_cache.coder import Coder, JsonCoder
+from redis import asyncio as aioredis
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from opennem import settings
+
+logger = logging.getLogger("opennem.api.cache")
+
+CACHE_STATUS_HEADER = "X-FastAPI-Cache"
+
+CacheTags = Callable[..., Iterable[str]]
+
+
+class ResponseCacheException(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    value: bytes
+    stored_at: float
+    fresh_until: float
+    stale_until: float
+    tags: dict[str, int] = field(default_factory=dict)
+
+    def dumps(self) -> bytes:
+        header = {
+            "stored_at": self.stored_at,
+            "fresh_until": self.fresh_until,
+            "stale_until": self.stale_until,
+            "tags": self.tags,
+        }
+        return json.dumps(header).encode() + b"\n" + self.value
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CacheEntry":
+        header, _, value = data.partition(b"\n")
+        return cls(value=value, **json.loads(header))
+
+
+class RedisCacheStore:
+    """Cache entries, tag versions and fill locks shared between processes in redis"""
+
+    def __init__(self, redis_url: str, prefix: str = "opennem:api-cache") -> None:
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis] = weakref.WeakKeyDictionary()
+
+    def _client(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+
+        if loop not in self._clients:
+            self._clients[loop] = aioredis.from_url(self.redis_url, decode_responses=False)
+
+        return self._clients[loop]
+
+    async def get(self, key: str) -> CacheEntry | None:
+        data = await self._client().get(f"{self.prefix}:entry:{key}")
+
+        return CacheEntry.loads(data) if data else None
+
+    async def set(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        await self._client().set(f"{self.prefix}:entry:{key}", entry.dumps(), px=max(int(ttl * 1000), 1))
+
+    async def tag_versions(self, tags: list[str]) -> dict[str, int]:
+        if not tags:
+            return {}
+
+        versions = await self._client().mget([f"{self.prefix}:tag:{t}" for t in tags])
+
+        return {t: int(v or 0) for t, v in zip(tags, versions, strict=True)}
+
+    async def invalidate(self, tags: list[str]) -> None:
+        async with self._client().pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{self.prefix}:tag:{tag}")
+            await pipe.execute()
+
+    async def acquire(self, key: str, timeout: float) -> bool:
+        return bool(await self._client().set(f"{self.prefix}:lock:{key}", b"1", nx=True, px=int(timeout * 1000)))
+
+    async def release(self, key: str) -> None:
+        await self._client().delete(f"{self.prefix}:lock:{key}")
+
+
+class ResponseCache:
+    """Two tier response cache with single flight fills and stale while revalidate
+
+    The local tier is an LRU bounded by the size of the responses held. With a remote store
+    tag versions are read from it at most every `tag_refresh` seconds per process.
+    """
+
+    def __init__(
+        self,
+        remote: RedisCacheStore | None = None,
+        local_max_bytes: int | None = None,
+        stale: int | None = None,
+        lock_timeout: float | None = None,
+        tag_refresh: float | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.remote = remote
+        self.stale = stale if stale is not None else settings.api_cache_stale_ttl
+        self.lock_timeout = lock_timeout or settings.api_cache_lock_timeout
+        self.clock = clock
+        self._local: LRUCache[str, CacheEntry] = LRUCache(
+            maxsize=local_max_bytes or settings.api_cache_local_max_bytes, getsizeof=lambda e: len(e.value)
+        )
+        self._tag_versions: TTLCache[str, int] | dict[str, int] = (
+            TTLCache(maxsize=4096, ttl=tag_refresh or settings.api_cache_tag_refresh) if remote else {}
+        )
+        self._inflight: dict[str, asyncio.Task[CacheEntry]] = {}
+
+    async def get(self, key: str) -> CacheEntry | None:
+        if entry := self._local.get(key):
+            return entry
+
+        if not self.remote:
+            return None
+
+        try:
+            entry = await self.remote.get(key)
+        except Exception as e:
+            logger.warning(f"Error getting {key} from the remote cache: {e}")
+            return None
+
+        if entry:
+            self._store_local(key, entry)
+
+        return entry
+
+    def _store_local(self, key: str, entry: CacheEntry) -> None:
+        try:
+            self._local[key] = entry
+        except ValueError:
+            # larger than the whole local cache
+            pass
+
+    async def set(self, key: str, value: bytes, expire: int, tags: Iterable[str] = ()) -> CacheEntry:
+        return await self._set(key, value, expire, await self.tag_versions(tags))
+
+    async def _set(self, key: str, value: bytes, expire: int, tag_versions: dict[str, int]) -> CacheEntry:
+        now = self.clock()
+
+        entry = CacheEntry(
+            value=value,
+            stored_at=now,
+            fresh_until=now + expire,
+            stale_until=now + expire + self.stale,
+            tags=tag_versions,
+        )
+
+        self._store_local(key, entry)
+
+        if self.remote:
+            try:
+                await self.remote.set(key, entry, ttl=expire + self.stale)
+            except Exception as e:
+                logger.warning(f"Error setting {key} in the remote cache: {e}")
+
+        return entry
+
+    async def tag_versions(self, tags: Iterable[str]) -> dict[str, int]:
+        tags = list(tags)
+        missing = [t for t in tags if t not in self._tag_versions]
+
+        if missing and self.remote:
+            try:
+                self._tag_versions.update(await self.remote.tag_versions(missing))
+            except Exception as e:
+                logger.warning(f"Error getting cache tag versions: {e}")
+
+        return {t: self._tag_versions.get(t, 0) for t in tags}
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        """Mark every response with any of tags as stale"""
+        tags = list(tags)
+
+        for tag in tags:
+            self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+        if self.remote:
+            await self.remote.invalidate(tags)
+
+            for tag in tags:
+                self._tag_versions.pop(tag, None)
+
+    async def is_current(self, entry: CacheEntry) -> bool:
+        return self.clock() < entry.fresh_until and await self.tag_versions(entry.tags) == entry.tags
+
+    async def _fill(
+        self, key: str, fetch: Callable[[], Awaitable[bytes]], expire: int, tags: list[str], wait: bool
+    ) -> CacheEntry:
+        started = self.clock()
+        locked = True
+
+        if self.remote:
+            try:
+                locked = await self.remote.acquire(key, self.lock_timeout)
+            except Exception as e:
+                logger.warning(f"Error locking {key} in the remote cache: {e}")
+
+        if not locked:
+            # another process is filling the key. leave revalidation to it or wait for its result
+            if not wait and (entry := await self.get(key)):
+                return entry
+
+            while self.clock() - started < self.lock_timeout:
+                await asyncio.sleep(0.05)
+
+                try:
+                    entry = await self.remote.get(key)  # type: ignore
+                except Exception:
+                    break
+
+                if entry and entry.stored_at >= started:
+                    self._store_local(key, entry)
+                    return entry
+
+        # versions from before the fetch so an invalidation while it runs leaves the result stale
+        tag_versions = await self.tag_versions(tags)
+
+        try:
+            return await self._set(key, await fetch(), expire, tag_versions)
+        finally:
+            if self.remote and locked:
+                try:
+                    await self.remote.release(key)
+                except Exception as e:
+                    logger.warning(f"Error unlocking {key} in the remote cache: {e}")
+
+    def _single_flight(
+        self, key: str, fetch: Callable[[], Awaitable[bytes]], expire: int, tags: list[str], wait: bool = True
+    ) -> asyncio.Task[CacheEntry]:
+        """Fill key in a task shared by everyone asking for it, so that it completes even if the
+        request that started it goes away"""
+        if task := self._inflight.get(key):
+            return task
+
+        def _done(task: asyncio.Task[CacheEntry]) -> None:
+            self._inflight.pop(key, None)
+
+            if task.cancelled() or not (e := task.exception()):
+                return None
+
+            # errors filling for requests are raised to them
+            if not wait:
+                logger.error(f"Error revalidating {key}: {e}")
+
+        task = asyncio.create_task(self._fill(key, fetch, expire, tags, wait=wait), name=f"cache-fill-{key}")
+        self._inflight[key] = task
+        task.add_done_callback(_done)
+
+        return task
+
+    async def get_or_set(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[bytes]],
+        expire: int,
+        tags: Iterable[str] = (),
+        refresh: bool = False,
+    ) -> tuple[CacheEntry, str]:
+        """Get the entry for key calling fetch to fill it if needed. Returns the entry and
+        whether it was a HIT, STALE or MISS"""
+        tags = list(tags)
+
+        if not refresh and (entry := await self.get(key)):
+            if await self.is_current(entry):
+                return entry, "HIT"
+
+            if self.clock() < entry.stale_until:
+                self._single_flight(key, fetch, expire, tags, wait=False)
+                return entry, "STALE"
+
+        return await asyncio.shield(self._single_flight(key, fetch, expire, tags)), "MISS"
+
+
+_RESPONSE_CACHE: ResponseCache | None = None
+
+
+def init_response_cache(backend: str | None) -> ResponseCache | None:
+    """Set up the response cache for the process with backend local, redis or None to disable"""
+    global _RESPONSE_CACHE
+
+    match backend:
+        case "redis":
+            _RESPONSE_CACHE = ResponseCache(remote=RedisCacheStore(str(settings.redis_url)))
+        case "local":
+            _RESPONSE_CACHE = ResponseCache()
+        case None:
+            _RESPONSE_CACHE = None
+        case _:
+            raise ResponseCacheException(f"Unknown api cache backend: {backend}")
+
+    return _RESPONSE_CACHE
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Response cache for the process, set up from settings.api_cache_backend if it hasn't been. None when disabled"""
+    if not _RESPONSE_CACHE and settings.api_cache_backend:
+        return init_response_cache(settings.api_cache_backend)
+
+    return _RESPONSE_CACHE
+
+
+def network_cache_tag(network_code: str) -> str:
+    return f"network:{network_code.upper()}"
+
+
+def network_cache_tags(network_code: str | None = None, **kwargs: Any) -> list[str]:
+    """Tag responses by the network_code of the endpoint"""
+    return [network_cache_tag(network_code)] if network_code else []
+
+
+async def invalidate_cache_tags(*tags: str) -> None:
+    """Mark cached responses with any of tags stale. Does nothing when the cache is disabled"""
+    response_cache = get_response_cache()
+
+    if not response_cache or not tags:
+        return None
+
+    await response_cache.invalidate(tags)
+
+
+def _cache_key(func: Callable, namespace: str, args: tuple, kwargs: dict[str, Any]) -> str:
+    key = hashlib.md5(f"{func.__module__}:{func.__name__}:{args}:{kwargs}".encode()).hexdigest()  # noqa: S324
+    return f"{namespace}:{key}"
+
+
+_REQUEST_PARAM = inspect.Parameter("__opennem_cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+_RESPONSE_PARAM = inspect.Parameter("__opennem_cache_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+
+
+def cache(
+    expire: int,
+    tags: CacheTags | None = None,
+    coder: type[Coder] = JsonCoder,
+    namespace: str = "",
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Cache an endpoint in the process response cache
+
+    Keyed on the endpoint arguments. tags is called with the endpoint arguments to tag the
+    response. Requests with `Cache-Control: no-store` skip the cache and `no-cache` refreshes it.
+    Sets the Cache-Control, ETag and X-FastAPI-Cache headers and answers If-None-Match.
+    """
+
+    def wrapper(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters.values())
+
+        # keep passing the request and response to the endpoint if it takes them
+        request_param = next((p for p in parameters if p.annotation is Request), None)
+        response_param = next((p for p in parameters if p.annotation is Response), None)
+        injected = [p for p, existing in ((_REQUEST_PARAM, request_param), (_RESPONSE_PARAM, response_param)) if not existing]
+        passthrough = {p.name for p in (request_param, response_param) if p}
+
+        @wraps(func)
+        async def inner(*args: Any, **kwargs: Any) -> Any:
+            request: Request | None = kwargs[request_param.name] if request_param else kwargs.pop(_REQUEST_PARAM.name, None)
+            response: Response | None = kwargs[response_param.name] if response_param else kwargs.pop(_RESPONSE_PARAM.name, None)
+
+            response_cache = get_response_cache()
+            cache_control = request.headers.get("Cache-Control") if request else None
+
+            if not response_cache or (request and request.method != "GET") or cache_control == "no-store":
+                return await func(*args, **kwargs)
+
+            key_kwargs = {k: v for k, v in kwargs.items() if k not in passthrough}
+            key = _cache_key(func, namespace, args, key_kwargs)
+
+            async def fetch() -> bytes:
+                return coder.encode(await func(*args, **kwargs))
+
+            entry, cache_status = await response_cache.get_or_set(
+                key,
+                fetch,
+                expire=expire,
+                tags=tags(*args, **key_kwargs) if tags else (),
+                refresh=cache_control == "no-cache",
+            )
+
+            if response:
+                etag = f"W/{hash(entry.value)}"
+
+                response.headers.update(
+                    {
+                        "Cache-Control": f"max-age={max(int(entry.fresh_until - response_cache.clock()), 0)}",
+                        "ETag": etag,
+                        CACHE_STATUS_HEADER: cache_status,
+                    }
+                )
+
+                if cache_status != "MISS" and request and request.headers.get("if-none-match") == etag:
+                    response.status_code = HTTP_304_NOT_MODIFIED
+                    return response
+
+            return coder.decode(entry.value)
+
+        variadic = [p for p in parameters if p.kind is inspect.Parameter.VAR_KEYWORD]
+        parameters = [p for p in parameters if p.kind is not inspect.Parameter.VAR_KEYWORD]
+
+        inner.__signature__ = signature.replace(parameters=[*parameters, *injected, *variadic])  # type: ignore
+
+        return inner
+
+    return wrapper
@@ -0,0 +1,294 @@
+"""
+OpenNEM facility catalogue snapshots
+
+The facility GeoJSON, station list and facility list only change when facilities are imported or
+the registry is updated, but building them is a multi join over stations, facilities and
+locations followed by serializing every record. The catalogue builds each of them once into
+versioned, gzipped JSON held in memory and published to redis so that every API process serves
+the same bytes without touching the database. Processes check redis for a newer version at most
+every `api_catalogue_refresh` seconds.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+import weakref
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from enum import StrEnum
+
+from pydantic import TypeAdapter
+from redis import asyncio as aioredis
+from sqlalchemy import select
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from opennem import settings
+from opennem.api.facility.schema import FacilityRecord
+from opennem.api.geo.controllers import stations_to_geojson
+from opennem.api.station.controllers import get_stations, station_records_query
+from opennem.api.station.schema import StationsResponse
+from opennem.db import get_read_session
+from opennem.db.models.opennem import Facility
+
+logger = logging.getLogger("opennem.api.catalogue")
+
+
+class CatalogueException(Exception):
+    pass
+
+
+class CatalogueName(StrEnum):
+    geojson = "geojson"
+    stations = "stations"
+    facilities = "facilities"
+
+
+@dataclass(slots=True, frozen=True)
+class CatalogueSnapshot:
+    name: str
+    version: str
+    content: bytes
+    compressed: bytes
+    count: int
+    built_at: float
+
+    @classmethod
+    def from_content(cls, name: str, content: bytes, count: int, built_at: float | None = None) -> "CatalogueSnapshot":
+        return cls(
+            name=name,
+            version=hashlib.sha1(content).hexdigest()[:16],  # noqa: S324
+            content=content,
+            # mtime is fixed so the same content compresses to the same bytes
+            compressed=gzip.compress(content, compresslevel=9, mtime=0),
+            count=count,
+            built_at=built_at or time.time(),
+        )
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def dumps(self) -> bytes:
+        header = {"name": self.name, "version": self.version, "count": self.count, "built_at": self.built_at}
+        return json.dumps(header).encode() + b"\n" + self.compressed
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CatalogueSnapshot":
+        header, _, compressed = data.partition(b"\n")
+        return cls(content=gzip.decompress(compressed), compressed=compressed, **json.loads(header))
+
+
+class RedisCatalogueStore:
+    """Catalogue snapshots and their current versions shared between processes in redis"""
+
+    def __init__(self, redis_url: str, prefix: str = "opennem:catalogue") -> None:
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis] = weakref.WeakKeyDictionary()
+
+    def _client(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+
+        if loop not in self._clients:
+            self._clients[loop] = aioredis.from_url(self.redis_url, decode_responses=False)
+
+        return self._clients[loop]
+
+    async def version(self, name: str) -> str | None:
+        version = await self._client().get(f"{self.prefix}:version:{name}")
+
+        return version.decode() if version else None
+
+    async def get(self, name: str) -> CatalogueSnapshot | None:
+        data = await self._client().get(f"{self.prefix}:snapshot:{name}")
+
+        return CatalogueSnapshot.loads(data) if data else None
+
+    async def put(self, snapshot: CatalogueSnapshot) -> None:
+        # the snapshot is written before its version so readers never see a version they can't load
+        async with self._client().pipeline(transaction=True) as pipe:
+            pipe.set(f"{self.prefix}:snapshot:{snapshot.name}", snapshot.dumps())
+            pipe.set(f"{self.prefix}:version:{snapshot.name}", snapshot.version.encode())
+            await pipe.execute()
+
+
+async def _build_geojson() -> CatalogueSnapshot:
+    stations = await get_stations(only_approved=True)
+    stations_geo = await stations_to_geojson(stations)
+
+    return CatalogueSnapshot.from_content(
+        CatalogueName.geojson, stations_geo.model_dump_json(exclude_unset=True).encode(), count=len(stations_geo.features)
+    )
+
+
+async def _build_stations() -> CatalogueSnapshot:
+    async with get_read_session() as session:
+        result = await session.execute(station_records_query())
+        stations = result.unique().scalars().all()
+
+        content = StationsResponse(data=stations, total_records=len(stations)).model_dump_json(exclude_none=True)
+
+    return CatalogueSnapshot.from_content(CatalogueName.stations, content.encode(), count=len(stations))
+
+
+_FACILITY_RECORDS = TypeAdapter(list[FacilityRecord])
+
+
+async def _build_facilities() -> CatalogueSnapshot:
+    async with get_read_session() as session:
+        result = await session.execute(select(Facility))
+        facilities = _FACILITY_RECORDS.validate_python(result.unique().scalars().all())
+
+    return CatalogueSnapshot.from_content(
+        CatalogueName.facilities, _FACILITY_RECORDS.dump_json(facilities), count=len(facilities)
+    )
+
+
+CATALOGUE_BUILDERS: dict[CatalogueName, Callable[[], Awaitable[CatalogueSnapshot]]] = {
+    CatalogueName.geojson: _build_geojson,
+    CatalogueName.stations: _build_stations,
+    CatalogueName.facilities: _build_facilities,
+}
+
+
+class FacilityCatalogue:
+    """Catalogue snapshots held in process and optionally shared through a remote store"""
+
+    def __init__(
+        self,
+        remote: RedisCatalogueStore | None = None,
+        refresh: float | None = None,
+        builders: dict[CatalogueName, Callable[[], Awaitable[CatalogueSnapshot]]] | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.remote = remote
+        self.refresh = refresh if refresh is not None else settings.api_catalogue_refresh
+        self.builders = builders or CATALOGUE_BUILDERS
+        self.clock = clock
+
+        self._snapshots: dict[str, CatalogueSnapshot] = {}
+        self._checked: dict[str, float] = {}
+        self._building: asyncio.Task | None = None
+
+    async def _check_remote(self, name: CatalogueName) -> None:
+        if not self.remote or self.clock() - self._checked.get(name, float("-inf")) < self.refresh:
+            return None
+
+        self._checked[name] = self.clock()
+        snapshot = self._snapshots.get(name)
+        version = await self.remote.version(name)
+
+        if not version or (snapshot and snapshot.version == version):
+            return None
+
+        if remote_snapshot := await self.remote.get(name):
+            self._snapshots[name] = remote_snapshot
+
+    async def get(self, name: CatalogueName) -> CatalogueSnapshot:
+        """Current snapshot for name, building the catalogue if no process has yet"""
+        await self._check_remote(name)
+
+        if name not in self._snapshots:
+            await self.rebuild()
+
+        return self._snapshots[name]
+
+    async def publish(self, snapshot: CatalogueSnapshot) -> None:
+        current = self._snapshots.get(snapshot.name)
+        self._snapshots[snapshot.name] = snapshot
+
+        if current and current.version == snapshot.version:
+            return None
+
+        logger.info(f"Catalogue {snapshot.name} version {snapshot.version} with {snapshot.count} records")
+
+        if self.remote:
+            await self.remote.put(snapshot)
+            self._checked[snapshot.name] = self.clock()
+
+    async def _build(self) -> dict[str, CatalogueSnapshot]:
+        snapshots = await asyncio.gather(*[builder() for builder in self.builders.values()])
+
+        for snapshot in snapshots:
+            await self.publish(snapshot)
+
+        return {s.name: s for s in snapshots}
+
+    async def rebuild(self) -> dict[str, CatalogueSnapshot]:
+        """Build every snapshot and publish those that changed. Concurrent callers share the build"""
+        if not self._building or self._building.done():
+            self._building = asyncio.create_task(self._build(), name="catalogue-build")
+
+        return await asyncio.shield(self._building)
+
+
+_FACILITY_CATALOGUE: FacilityCatalogue | None = None
+
+
+def init_facility_catalogue(backend: str | None) -> FacilityCatalogue:
+    """Set up the facility catalogue for the process shared through the api cache backend"""
+    global _FACILITY_CATALOGUE
+
+    match backend:
+        case "redis":
+            _FACILITY_CATALOGUE = FacilityCatalogue(remote=RedisCatalogueStore(str(settings.redis_url)))
+        case "local" | None:
+            _FACILITY_CATALOGUE = FacilityCatalogue()
+        case _:
+            raise CatalogueException(f"Unknown catalogue backend: {backend}")
+
+    return _FACILITY_CATALOGUE
+
+
+def get_facility_catalogue() -> FacilityCatalogue:
+    if not _FACILITY_CATALOGUE:
+        return init_facility_catalogue(settings.api_cache_backend)
+
+    return _FACILITY_CATALOGUE
+
+
+async def refresh_facility_catalogue() -> dict[str, CatalogueSnapshot]:
+    """Rebuild the catalogue after facilities or the registry change"""
+    return await get_facility_catalogue().rebuild()
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    return any(t.strip().removeprefix("W/") in (etag, "*") for t in if_none_match.split(","))
+
+
+def _accepts_gzip(accept_encoding: str | None) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+
+    return False
+
+
+async def catalogue_response(request: Request, name: CatalogueName, media_type: str = "application/json") -> Response:
+    """Serve a catalogue snapshot answering If-None-Match and gzipped when the client accepts it"""
+    snapshot = await get_facility_catalogue().get(name)
+
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"max-age={settings.api_catalogue_max_age}",
+        "Vary": "Accept-Encoding",
+        "X-Total-Count": str(snapshot.count),
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if _accepts_gzip(request.headers.get("accept-encoding")):
+        return Response(content=snapshot.compressed, media_type=media_type, headers={**headers, "Content-Encoding": "gzip"})
+
+    return Response(content=snapshot.content, media_type=media_type, headers=headers)
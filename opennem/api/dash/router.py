@@ -6,16 +6,16 @@ Interval for OpenNEM frontends
 import logging
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
 from fastapi_versionizer import api_version
-from sqlalchemy.engine.base import Engine
 from starlette import status
 
-from opennem.api.stats.controllers import stats_factory
-from opennem.api.stats.schema import DataQueryResult, OpennemDataSet
+from opennem.api.stats.controllers import stats_factory, stream_query_results
+from opennem.api.stats.encoders import DATASET_RESPONSES, dataset_response
+from opennem.api.stats.schema import OpennemDataSet
 from opennem.api.time import human_to_period
 from opennem.core.units import get_unit
-from opennem.db import get_database_engine
+from opennem.db import get_read_session
 from opennem.queries.price import get_network_region_price_query
 from opennem.schema.network import NetworkNEM
 from opennem.utils.dates import get_last_completed_interval_for_network
@@ -30,24 +30,20 @@ router = APIRouter()
     "/now",
     name="Live Dashboard view results",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
     include_in_schema=False,
 )
+@dataset_response
 # @cache(expire=60 * 5)
-async def now_endpoint(
-    engine: Engine = Depends(get_database_engine),
-) -> OpennemDataSet:
+async def now_endpoint() -> OpennemDataSet:
     """
-    Args:
-        engine ([type], optional): Database engine. Defaults to Depends(get_database_engine).
-
     Raises:
         HTTPException: No results
 
     Returns:
         OpennemData: data set
     """
-    engine = get_database_engine()
     human_to_period("1d")
     network = NetworkNEM
 
@@ -67,18 +63,17 @@ async def now_endpoint(
         network=network,
     )
 
-    with engine.begin() as c:
-        logger.debug(query)
-        row = list(c.execute(query))
+    logger.debug(query)
+
+    async with get_read_session() as session:
+        result_set = await stream_query_results(session, query, result_column=3, group_by_column=2)
 
-    if not row:
+    if not result_set:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No results",
         )
 
-    result_set = [DataQueryResult(interval=i[0], result=i[3], group_by=i[2] if len(i) > 1 else None) for i in row]
-
     response_model = stats_factory(
         result_set,
         network=network,
@@ -1,5 +1,6 @@
 import logging
 import re
+from datetime import date, datetime, time
 
 from sqlalchemy import TextClause
 
@@ -8,6 +9,7 @@ from opennem.api.exceptions import OpennemBaseHttpException, OpenNEMInvalidNetwo
 from opennem.api.export.queries import (
     country_stats_query,
     demand_network_region_query,
+    energy_network_fueltech_clickhouse_query,
     energy_network_fueltech_query,
     interconnector_flow_network_regions_query,
     interconnector_power_flow,
@@ -26,6 +28,7 @@ from opennem.api.time import human_to_interval
 from opennem.controllers.output.schema import OpennemExportSeries
 from opennem.core.units import get_unit
 from opennem.db import db_connect, get_database_engine
+from opennem.db.clickhouse_mirror import clickhouse_query, use_clickhouse
 from opennem.queries.flows import get_network_flows_emissions_market_value_query
 from opennem.schema.network import NetworkAEMORooftop, NetworkNEM, NetworkSchema
 from opennem.schema.stats import StatTypes
@@ -733,19 +736,33 @@ async def energy_fueltech_daily(
     network_region_code: str | None = None,
     networks_query: list[NetworkSchema] | None = None,
 ) -> OpennemDataSet | None:
-    engine = db_connect()
     units = get_unit("energy_giga")
+    time_series_range = time_series.get_range()
+
+    # long ranges such as yearly exports are read from the clickhouse mirror when routing is on
+    if use_clickhouse(time_series_range.start, time_series_range.end):
+        query, parameters = energy_network_fueltech_clickhouse_query(
+            time_series=time_series,
+            network_region=network_region_code,
+            networks_query=networks_query,
+        )
 
-    query = energy_network_fueltech_query(
-        time_series=time_series,
-        network_region=network_region_code,
-        networks_query=networks_query,
-    )
-
-    async with engine.begin() as conn:
         logger.debug(query)
-        result = await conn.execute(query)
-        row = result.fetchall()
+        row = [
+            (datetime.combine(i[0], time()) if isinstance(i[0], date) else i[0], *i[1:])
+            for i in await clickhouse_query(query, parameters)
+        ]
+    else:
+        query = energy_network_fueltech_query(
+            time_series=time_series,
+            network_region=network_region_code,
+            networks_query=networks_query,
+        )
+
+        async with db_connect().begin() as conn:
+            logger.debug(query)
+            result = await conn.execute(query)
+            row = result.fetchall()
 
     results_energy = [DataQueryResult(interval=i[0], group_by=i[1], result=i[2] if len(i) > 1 else None) for i in row]
 
@@ -1,15 +1,49 @@
+"""Export and stats query builders
+
+Queries are `text()` templates with bound parameters for dates, network codes and
+regions so that the SQL is the same across calls and both the SQLAlchemy compiled
+cache and the asyncpg prepared statement cache are reused. A template is built once
+per shape - the optional clauses present, the bucket size and network scale factors -
+and the builders bind values to it.
+"""
+
+import functools
 from datetime import timedelta
 from textwrap import dedent
 
 from sqlalchemy import sql, text
 from sqlalchemy.sql.elements import TextClause
 
-from opennem.api.stats.controllers import networks_to_in
+from opennem import settings
 from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.queries.utils import network_codes, network_time
 from opennem.schema.network import NetworkAPVI, NetworkAU, NetworkNEM, NetworkSchema, NetworkWEM
 from opennem.schema.stats import StatTypes
 
 
+@functools.cache
+def _weather_observation_template(interval: str, timezone: str) -> TextClause:
+    return text(
+        dedent(
+            f"""
+            select
+                time_bucket_gapfill('{interval}', fs.observation_time, '{timezone}') as ot,
+                fs.station_id as station_id,
+                avg(fs.temp_air),
+                min(fs.temp_min),
+                max(fs.temp_max)
+            from mv_weather_observations fs
+            where
+                fs.station_id = any(:station_codes) and
+                fs.observation_time <= :date_end and
+                fs.observation_time >= :date_start
+            group by 1, 2
+            order by 1 desc;
+            """
+        )
+    )
+
+
 def weather_observation_query(time_series: OpennemExportSeries, station_codes: list[str]) -> TextClause:
     """
     Get weather observations for a list of stations and a date range.
@@ -18,132 +52,118 @@ def weather_observation_query(time_series: OpennemExportSeries, station_codes: l
     fence_post_delta: timedelta = timedelta(minutes=0)
 
     time_series_range = time_series.get_range()
-    date_start = time_series_range.start
-    date_end = time_series_range.end
 
-    __query = """
-    select
-        time_bucket_gapfill('{interval}', fs.observation_time, '{timezone}') as ot,
-        fs.station_id as station_id,
-        avg(fs.temp_air),
-        min(fs.temp_min),
-        max(fs.temp_max)
-    from mv_weather_observations fs
-    where
-        fs.station_id in ({station_codes}) and
-        fs.observation_time <= '{date_end}' and
-        fs.observation_time >= '{date_start}'
-    group by 1, 2
-    order by 1 desc;
-    """
-
-    query = __query.format(
-        station_codes=",".join([f"'{i}'" for i in station_codes]),
-        date_start=date_start,
-        date_end=date_end - fence_post_delta,
-        tz=time_series.network.timezone_database,
-        interval=time_series.interval.interval_sql,
-        timezone=time_series.network.timezone_database,
+    return _weather_observation_template(
+        interval=time_series.interval.interval_sql, timezone=time_series.network.timezone_database
+    ).bindparams(
+        station_codes=list(station_codes),
+        date_start=time_series_range.start,
+        date_end=time_series_range.end - fence_post_delta,
     )
 
-    return dedent(query)
 
-
-def interconnector_power_flow(time_series: OpennemExportSeries, network_region: str) -> str:
-    """Get interconnector region flows using materialized view"""
-
-    ___query = """
-    select
-        time_bucket_gapfill(INTERVAL '5 minutes', bs.trading_interval) as trading_interval,
-        bs.network_region,
-        case when max(bs.net_interchange) < 0 then
-            max(bs.net_interchange)
-        else 0
-        end as imports,
-        case when max(bs.net_interchange) > 0 then
-            max(bs.net_interchange)
-        else 0
-        end as exports
-    from balancing_summary bs
-    where
-        bs.network_id = '{network_id}' and
-        bs.network_region= '{region}' and
-        bs.trading_interval <= '{date_end}' and
-        bs.trading_interval >= '{date_start}'
-    group by 1, 2
-    order by trading_interval desc;
+@functools.cache
+def _interconnector_power_flow_template() -> TextClause:
+    return text(
+        dedent(
+            """
+            select
+                time_bucket_gapfill(INTERVAL '5 minutes', bs.trading_interval) as trading_interval,
+                bs.network_region,
+                case when max(bs.net_interchange) < 0 then
+                    max(bs.net_interchange)
+                else 0
+                end as imports,
+                case when max(bs.net_interchange) > 0 then
+                    max(bs.net_interchange)
+                else 0
+                end as exports
+            from balancing_summary bs
+            where
+                bs.network_id = :network_id and
+                bs.network_region = :network_region and
+                bs.trading_interval <= :date_end and
+                bs.trading_interval >= :date_start
+            group by 1, 2
+            order by trading_interval desc;
+            """
+        )
+    )
 
 
-    """
+def interconnector_power_flow(time_series: OpennemExportSeries, network_region: str) -> TextClause:
+    """Get interconnector region flows using materialized view"""
 
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    query = ___query.format(
+    return _interconnector_power_flow_template().bindparams(
         network_id=time_series.network.code,
-        region=network_region,
-        date_start=date_min,
-        date_end=date_max,
+        network_region=network_region,
+        date_start=network_time(time_series_range.start),
+        date_end=network_time(time_series_range.end),
     )
 
-    return text(query)
-
 
-def interconnector_flow_network_regions_query(time_series: OpennemExportSeries, network_region: str | None = None) -> TextClause:
-    """ """
+@functools.cache
+def _interconnector_flow_network_regions_template(timezone: str, interval_size: str, has_region: bool) -> TextClause:
+    region_query = "and f.network_region = :network_region" if has_region else ""
 
-    __query = """
-    select
-        t.trading_interval at time zone '{timezone}' as trading_interval,
-        t.flow_region,
-        t.network_region,
-        t.interconnector_region_to,
-        coalesce(sum(t.flow_power), NULL) as flow_power
-    from
-    (
-        select
-            time_bucket_gapfill('{interval_size}', fs.trading_interval) as trading_interval,
-            f.network_region || '->' || f.interconnector_region_to as flow_region,
-            f.network_region,
-            f.interconnector_region_to,
-            sum(fs.generated) as flow_power
-        from facility_scada fs
-        left join facility f on fs.facility_code = f.code
-        where
-            f.interconnector is True
-            and f.network_id='{network_id}'
-            and fs.trading_interval <= '{date_end}'
-            and fs.trading_interval >= '{date_start}'
-            {region_query}
-        group by 1, 2, 3, 4
-    ) as t
-    group by 1, 2, 3, 4
-    order by
-        1 desc,
-        2 asc
-    """
+    return text(
+        dedent(
+            f"""
+            select
+                t.trading_interval at time zone '{timezone}' as trading_interval,
+                t.flow_region,
+                t.network_region,
+                t.interconnector_region_to,
+                coalesce(sum(t.flow_power), NULL) as flow_power
+            from
+            (
+                select
+                    time_bucket_gapfill('{interval_size}', fs.trading_interval) as trading_interval,
+                    f.network_region || '->' || f.interconnector_region_to as flow_region,
+                    f.network_region,
+                    f.interconnector_region_to,
+                    sum(fs.generated) as flow_power
+                from facility_scada fs
+                left join facility f on fs.facility_code = f.code
+                where
+                    f.interconnector is True
+                    and f.network_id = :network_id
+                    and fs.trading_interval <= :date_end
+                    and fs.trading_interval >= :date_start
+                    {region_query}
+                group by 1, 2, 3, 4
+            ) as t
+            group by 1, 2, 3, 4
+            order by
+                1 desc,
+                2 asc
+            """
+        )
+    )
 
-    region_query = ""
 
-    if network_region:
-        region_query = f"and f.network_region='{network_region}'"
+def interconnector_flow_network_regions_query(time_series: OpennemExportSeries, network_region: str | None = None) -> TextClause:
+    """ """
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    query = __query.format(
+    query = _interconnector_flow_network_regions_template(
         timezone=time_series.network.timezone_database,
         interval_size=time_series.interval.interval_sql,
+        has_region=bool(network_region),
+    ).bindparams(
         network_id=time_series.network.code,
-        region_query=region_query,
-        date_start=date_min,
-        date_end=date_max,
+        date_start=network_time(time_series_range.start),
+        date_end=network_time(time_series_range.end),
     )
 
-    return text(query)
+    if network_region:
+        query = query.bindparams(network_region=network_region)
+
+    return query
 
 
 def country_stats_query(stat_type: StatTypes, country: str = "au") -> TextClause:
@@ -165,76 +185,71 @@ def country_stats_query(stat_type: StatTypes, country: str = "au") -> TextClause
     )
 
 
-def price_network_query(
-    time_series: OpennemExportSeries,
-    group_field: str = "bs.network_id",
-    network_region: str | None = None,
-    networks_query: list[NetworkSchema] | None = None,
-) -> TextClause:
-    if not networks_query:
-        networks_query = [time_series.network]
-
-    if time_series.network not in networks_query:
-        networks_query.append(time_series.network)
+@functools.cache
+def _price_network_template(trunc: str, group_field: str, has_region: bool) -> TextClause:
+    network_region_query = "bs.network_region = :network_region and" if has_region else ""
 
-    __query = """
+    return text(
+        f"""
         select
             time_bucket_gapfill('{trunc}', bs.trading_interval) as trading_interval,
             {group_field},
             coalesce(avg(bs.price), avg(bs.price_dispatch)) as price
         from balancing_summary bs
         where
-            bs.trading_interval <= '{date_max}' and
-            bs.trading_interval >= '{date_min}' and
-            {network_query}
+            bs.trading_interval <= :date_max and
+            bs.trading_interval >= :date_min and
+            bs.network_id = any(:network_ids) and
             {network_region_query}
             1=1
         group by 1, 2
         order by 1 desc
     """
+    )
+
+
+def price_network_query(
+    time_series: OpennemExportSeries,
+    group_field: str = "bs.network_id",
+    network_region: str | None = None,
+    networks_query: list[NetworkSchema] | None = None,
+) -> TextClause:
+    if not networks_query:
+        networks_query = [time_series.network]
 
-    timezone = time_series.network.timezone_database
-    network_region_query = ""
+    if time_series.network not in networks_query:
+        networks_query.append(time_series.network)
 
     if network_region:
-        network_region_query = f"bs.network_region='{network_region}' and "
         group_field = "bs.network_region"
 
-    network_query = f"bs.network_id IN ({networks_to_in(networks_query)}) and "
-
     if len(networks_query) > 1:
         group_field = "'AU'"
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    return text(
-        __query.format(
-            network_query=network_query,
-            trunc=time_series.interval.interval_sql,
-            network_region_query=network_region_query,
-            timezone=timezone,
-            date_max=date_max,
-            date_min=date_min,
-            group_field=group_field,
-        )
+    query = _price_network_template(
+        trunc=time_series.interval.interval_sql, group_field=group_field, has_region=bool(network_region)
+    ).bindparams(
+        network_ids=network_codes(networks_query),
+        date_max=network_time(time_series_range.end),
+        date_min=network_time(time_series_range.start),
     )
 
+    if network_region:
+        query = query.bindparams(network_region=network_region)
 
-def network_demand_query(
-    time_series: OpennemExportSeries,
-    network_region: str | None = None,
-    networks_query: list[NetworkSchema] | None = None,
-) -> TextClause:
-    if not networks_query:
-        networks_query = [time_series.network]
+    return query
 
-    if time_series.network not in networks_query:
-        networks_query.append(time_series.network)
 
-    __query = """
+@functools.cache
+def _network_demand_template(timezone: str, interval: str, has_region: bool) -> TextClause:
+    network_region_query = "bs.network_region = :network_region and" if has_region else ""
+    groups_additional = "network_id, network_region" if has_region else "network_id"
+
+    return text(
+        f"""
     select
         t.trading_interval at time zone '{timezone}' as trading_interval,
         t.network_id,
@@ -246,9 +261,9 @@ def network_demand_query(
             coalesce(max(demand_total), 0) as demand
         from balancing_summary bs
         where
-            bs.trading_interval <= '{date_max}' and
-            bs.trading_interval >= '{date_min}' and
-            {network_query}
+            bs.trading_interval <= :date_max and
+            bs.trading_interval >= :date_min and
+            bs.network_id = any(:network_ids) and
             {network_region_query}
             1=1
         group by
@@ -256,35 +271,127 @@ def network_demand_query(
     ) as t
     order by 1 desc;
     """
+    )
 
-    group_keys = ["network_id"]
-    network_region_query = ""
-
-    if network_region:
-        group_keys.append("network_region")
-        network_region_query = f"bs.network_region = '{network_region}' and "
 
-    groups_additional = ", ".join(group_keys)
+def network_demand_query(
+    time_series: OpennemExportSeries,
+    network_region: str | None = None,
+    networks_query: list[NetworkSchema] | None = None,
+) -> TextClause:
+    if not networks_query:
+        networks_query = [time_series.network]
 
-    network_query = f"bs.network_id IN ({networks_to_in(networks_query)}) and "
+    if time_series.network not in networks_query:
+        networks_query.append(time_series.network)
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    query = __query.format(
+    query = _network_demand_template(
         timezone=time_series.network.timezone_database,
         interval=time_series.interval.interval_sql,
-        date_max=date_max,
-        date_min=date_min,
-        network_id=time_series.network.code,
-        network_query=network_query,
-        network_region_query=network_region_query,
-        groups_additional=groups_additional,
+        has_region=bool(network_region),
+    ).bindparams(
+        network_ids=network_codes(networks_query),
+        date_max=network_time(time_series_range.end),
+        date_min=network_time(time_series_range.start),
+    )
+
+    if network_region:
+        query = query.bindparams(network_region=network_region)
+
+    return query
+
+
+def _wem_apvi_case(alias: str) -> str:
+    """APVI network is used to provide rooftop for WEM so we require it in country-wide totals"""
+    return f"or ({alias}.network_id='APVI' and {alias}.network_region='WEM')"
+
+
+@functools.cache
+def _power_network_fueltech_template(trunc: str, has_region: bool, wem_apvi: bool) -> TextClause:
+    """Power by fueltech from the at_network_fueltech_intervals aggregate"""
+    network_region_query = "fi.network_region = :network_region and" if has_region else ""
+    wem_apvi_case = _wem_apvi_case("fi") if wem_apvi else ""
+
+    return text(
+        dedent(
+            f"""
+            select
+                time_bucket_gapfill('{trunc}', fi.interval) as trading_interval,
+                fi.fueltech_id as fueltech_code,
+                coalesce(sum(fi.generated), 0) as fueltech_power,
+                case when
+                    sum(fi.generated) > 0 then sum(fi.emissions)
+                    else 0
+                end as fueltech_emissions,
+                case when
+                    sum(fi.generated) > 0 then round(sum(fi.emissions) / sum(fi.generated), 4)
+                    else 0
+                end as fueltech_emissions_intensity
+            from at_network_fueltech_intervals fi
+            where
+                fi.is_forecast is False and
+                fi.fueltech_id <> all(:fueltechs_exclude) and
+                (fi.network_id = any(:network_ids) {wem_apvi_case}) and
+                {network_region_query}
+                fi.interval <= :date_max and
+                fi.interval >= :date_min
+            group by 1, 2
+            order by 1 desc
+            """
+        )
     )
 
-    return text(query)
+
+@functools.cache
+def _power_network_fueltech_scada_template(trunc: str, has_region: bool, wem_apvi: bool) -> TextClause:
+    """Power by fueltech aggregated from facility_scada"""
+    network_region_query = "f.network_region = :network_region and" if has_region else ""
+    wem_apvi_case = _wem_apvi_case("f") if wem_apvi else ""
+
+    return text(
+        dedent(
+            f"""
+            select
+                t.trading_interval,
+                t.fueltech_code,
+                sum(t.fueltech_power) as fueltech_power,
+                case when
+                    sum(t.fueltech_power) > 0 then sum(t.fueltech_emissions)
+                    else 0
+                end as fueltech_emissions,
+                case when
+                    sum(t.fueltech_power) > 0 then round(sum(t.fueltech_emissions) / sum(t.fueltech_power), 4)
+                    else 0
+                end as fueltech_emissions_intensity
+            from (
+                select
+                    time_bucket_gapfill('{trunc}', fs.trading_interval) AS trading_interval,
+                    ft.code as fueltech_code,
+                    coalesce(sum(fs.generated), 0) as fueltech_power,
+                    coalesce(sum(fs.generated), 0) / (60 / max(n.interval_size)) as fueltech_energy,
+                    max(f.emissions_factor_co2) * sum(fs.generated) /  (60 / max(n.interval_size)) as fueltech_emissions
+                from facility_scada fs
+                join facility f on fs.facility_code = f.code
+                join fueltech ft on f.fueltech_id = ft.code
+                join network n on f.network_id = n.code
+                where
+                    fs.is_forecast is False and
+                    f.fueltech_id is not null and
+                    f.fueltech_id <> all(:fueltechs_exclude) and
+                    (f.network_id = any(:network_ids) {wem_apvi_case}) and
+                    {network_region_query}
+                    fs.trading_interval <= :date_max and
+                    fs.trading_interval >= :date_min
+                group by 1, f.code, f.emissions_factor_co2, 2, n.interval_size
+            ) as t
+            group by 1, 2
+            order by 1 desc
+            """
+        )
+    )
 
 
 def power_network_fueltech_query(
@@ -300,112 +407,83 @@ def power_network_fueltech_query(
     if time_series.network not in networks_query:
         networks_query.append(time_series.network)
 
-    __query = """
-    select
-        t.trading_interval,
-        t.fueltech_code,
-        sum(t.fueltech_power) as fueltech_power,
-        case when
-            sum(t.fueltech_power) > 0 then sum(t.fueltech_emissions)
-            else 0
-        end as fueltech_emissions,
-        case when
-            sum(t.fueltech_power) > 0 then round(sum(t.fueltech_emissions) / sum(t.fueltech_power), 4)
-            else 0
-        end as fueltech_emissions_intensity
-    from (
-        select
-            time_bucket_gapfill('{trunc}', fs.trading_interval) AS trading_interval,
-            ft.code as fueltech_code,
-            coalesce(sum(fs.generated), 0) as fueltech_power,
-            coalesce(sum(fs.generated), 0) / (60 / max(n.interval_size)) as fueltech_energy,
-            max(f.emissions_factor_co2) * sum(fs.generated) /  (60 / max(n.interval_size)) as fueltech_emissions
-        from facility_scada fs
-        join facility f on fs.facility_code = f.code
-        join fueltech ft on f.fueltech_id = ft.code
-        join network n on f.network_id = n.code
-        where
-            fs.is_forecast is False and
-            f.fueltech_id is not null and
-            f.fueltech_id not in ({fueltechs_exclude}) and
-            {network_query}
-            {network_region_query}
-            fs.trading_interval <= '{date_max}' and
-            fs.trading_interval >= '{date_min}'
-            {fueltech_filter}
-        group by 1, f.code, f.emissions_factor_co2, 2, n.interval_size
-    ) as t
-    group by 1, 2
-    order by 1 desc
-    """
-
-    network_region_query: str = ""
-    fueltech_filter: str = ""
-    wem_apvi_case: str = ""
-    timezone: str = time_series.network.timezone_database
-
     fueltechs_excluded = ["exports", "imports", "interconnector"]
 
     if NetworkNEM in networks_query or NetworkWEM in networks_query:
         fueltechs_excluded.append("solar_rooftop")
 
-    if network_region:
-        network_region_query = f"f.network_region='{network_region}' and "
-
-    if NetworkWEM in networks_query:
-        # silly single case we'll refactor out
-        # APVI network is used to provide rooftop for WEM so we require it
-        # in country-wide totals
-        wem_apvi_case = "or (f.network_id='APVI' and f.network_region='WEM')"
-
-    network_query = f"(f.network_id IN ({networks_to_in(networks_query)}) {wem_apvi_case}) and "
-
     # Get the data time range
     # use the new v2 feature if it has been provided otherwise use the old method
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    # If we have a fueltech filter, add it to the query
-    fueltechs_exclude = ", ".join(f"'{i}'" for i in fueltechs_excluded)
-
-    query = dedent(
-        __query.format(
-            network_query=network_query,
-            trunc=time_series.interval.interval_sql,
-            network_region_query=network_region_query,
-            timezone=timezone,
-            date_max=date_max,
-            date_min=date_min,
-            fueltech_filter=fueltech_filter,
-            wem_apvi_case=wem_apvi_case,
-            fueltechs_exclude=fueltechs_exclude,
-        )
+    template = (
+        _power_network_fueltech_template
+        if settings.network_fueltech_intervals_queries
+        else _power_network_fueltech_scada_template
     )
 
-    return text(query)
+    query = template(
+        trunc=time_series.interval.interval_sql,
+        has_region=bool(network_region),
+        wem_apvi=NetworkWEM in networks_query,
+    ).bindparams(
+        network_ids=network_codes(networks_query),
+        fueltechs_exclude=fueltechs_excluded,
+        date_max=network_time(time_series_range.end),
+        date_min=network_time(time_series_range.start),
+    )
 
+    if network_region:
+        query = query.bindparams(network_region=network_region)
 
-def power_network_rooftop_query(
-    time_series: OpennemExportSeries,
-    network_region: str | None = None,
-    networks_query: list[NetworkSchema] | None = None,
-) -> TextClause:
-    """Query power stats"""
+    return query
 
-    if not networks_query:
-        networks_query = [time_series.network]
 
-    if time_series.network not in networks_query:
-        networks_query.append(time_series.network)
+@functools.cache
+def _power_network_rooftop_template(timezone: str, agg_func: str, has_region: bool, wem_apvi: bool) -> TextClause:
+    """Rooftop power from the at_network_fueltech_intervals aggregate"""
+    network_region_query = "fi.network_region = :network_region and" if has_region else ""
+    wem_apvi_case = _wem_apvi_case("fi") if wem_apvi else ""
 
-    __query = """
+    return text(
+        f"""
         select
             t.trading_interval at time zone '{timezone}' as trading_interval,
             t.fueltech_code,
-            coalesce(sum(t.facility_power), 0) as power
+            coalesce(t.power, 0) as power
         from (
+            select
+                time_bucket_gapfill('30 minutes', fi.interval) as trading_interval,
+                fi.fueltech_id as fueltech_code,
+                {agg_func}(fi.generated) as power
+            from at_network_fueltech_intervals fi
+            where
+                fi.is_forecast = :is_forecast and
+                fi.fueltech_id = 'solar_rooftop' and
+                (fi.network_id = any(:network_ids) {wem_apvi_case}) and
+                {network_region_query}
+                fi.interval >= :date_min and
+                fi.interval < :date_max
+            group by 1, 2
+        ) as t
+        order by 1 desc
+    """
+    )
 
+
+@functools.cache
+def _power_network_rooftop_scada_template(timezone: str, agg_func: str, has_region: bool, wem_apvi: bool) -> TextClause:
+    """Rooftop power aggregated from facility_scada"""
+    network_region_query = "f.network_region = :network_region and" if has_region else ""
+    wem_apvi_case = _wem_apvi_case("f") if wem_apvi else ""
+
+    return text(
+        f"""
+        select
+            t.trading_interval at time zone '{timezone}' as trading_interval,
+            t.fueltech_code,
+            coalesce(sum(t.facility_power), 0) as power
+        from (
             select
                 time_bucket_gapfill('30 minutes', fs.trading_interval)  AS trading_interval,
                 ft.code as fueltech_code,
@@ -414,42 +492,44 @@ def power_network_rooftop_query(
             join facility f on fs.facility_code = f.code
             join fueltech ft on f.fueltech_id = ft.code
             where
-                {forecast_query}
+                fs.is_forecast = :is_forecast and
                 f.fueltech_id = 'solar_rooftop' and
-                {network_query}
+                (f.network_id = any(:network_ids) {wem_apvi_case}) and
                 {network_region_query}
-                fs.trading_interval >= '{date_min}' and
-                fs.trading_interval < '{date_max}'
+                fs.trading_interval >= :date_min and
+                fs.trading_interval < :date_max
             group by 1, 2
         ) as t
         group by 1, 2
         order by 1 desc
     """
+    )
 
-    network_region_query: str = ""
-    wem_apvi_case: str = ""
-    agg_func = "sum"
-    timezone: str = time_series.network.timezone_database
 
-    forecast_query = f"fs.is_forecast is {time_series.forecast} and"
+def power_network_rooftop_query(
+    time_series: OpennemExportSeries,
+    network_region: str | None = None,
+    networks_query: list[NetworkSchema] | None = None,
+) -> TextClause:
+    """Query power stats"""
 
-    if network_region:
-        network_region_query = f"f.network_region='{network_region}' and "
+    if not networks_query:
+        networks_query = [time_series.network]
 
-    if NetworkWEM in networks_query:
-        # silly single case we'll refactor out
-        # APVI network is used to provide rooftop for WEM so we require it
-        # in country-wide totals
-        wem_apvi_case = "or (f.network_id='APVI' and f.network_region='WEM')"
+    if time_series.network not in networks_query:
+        networks_query.append(time_series.network)
+
+    agg_func = "sum"
+    wem_apvi = NetworkWEM in networks_query
 
+    if wem_apvi:
+        # silly single case we'll refactor out
         if NetworkAPVI in networks_query:
             networks_query.remove(NetworkAPVI)
 
         if NetworkNEM not in networks_query:
             agg_func = "max"
 
-    network_query = f"(f.network_id IN ({networks_to_in(networks_query)}) {wem_apvi_case}) and "
-
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
     date_min = time_series_range.start
@@ -459,29 +539,80 @@ def power_network_rooftop_query(
         # @TODO move to purely in get_range()
         date_max = date_min + timedelta(hours=12)
 
-    return text(
-        __query.format(
-            network_query=network_query,
-            network_region_query=network_region_query,
-            timezone=timezone,
-            date_min=date_min,
-            date_max=date_max,
-            forecast_query=forecast_query,
-            agg_func=agg_func,
-        )
+    template = (
+        _power_network_rooftop_template if settings.network_fueltech_intervals_queries else _power_network_rooftop_scada_template
     )
 
+    query = template(
+        timezone=time_series.network.timezone_database,
+        agg_func=agg_func,
+        has_region=bool(network_region),
+        wem_apvi=wem_apvi,
+    ).bindparams(
+        is_forecast=bool(time_series.forecast),
+        network_ids=network_codes(networks_query),
+        date_min=network_time(date_min),
+        date_max=network_time(date_max),
+    )
+
+    if network_region:
+        query = query.bindparams(network_region=network_region)
+
+    return query
+
 
 """ Emission Queries """
 
 
-def power_and_emissions_network_fueltech_query(
-    time_series: OpennemExportSeries,
-    network_region: str | None = None,
+@functools.cache
+def _power_and_emissions_network_fueltech_template(
+    timezone: str, trunc: str, intervals_per_hour: float, has_region: bool
 ) -> TextClause:
-    """Query emission stats for each network and fueltech"""
+    """Power and emissions by fueltech from the at_network_fueltech_intervals aggregate"""
+    network_region_query = "fi.network_region = :network_region and" if has_region else ""
 
-    __query = """
+    return text(
+        f"""
+        select
+            t.trading_interval at time zone '{timezone}',
+            t.fueltech_code,
+            t.fueltech_power,
+            t.emissions,
+            case
+                when t.fueltech_power <= 0
+                    then 0
+                else
+                    t.emissions / t.fueltech_power * {intervals_per_hour}
+            end
+        from (
+            select
+                time_bucket_gapfill('{trunc}', fi.interval) as trading_interval,
+                fi.fueltech_id as fueltech_code,
+                coalesce(sum(fi.generated), 0) as fueltech_power,
+                coalesce(sum(fi.emissions), 0) as emissions
+            from at_network_fueltech_intervals fi
+            where
+                fi.is_forecast is False and
+                fi.network_id = :network_id and
+                {network_region_query}
+                fi.interval <= :date_max and
+                fi.interval >= :date_min
+            group by 1, 2
+        ) as t
+        order by 1 desc;
+    """
+    )
+
+
+@functools.cache
+def _power_and_emissions_network_fueltech_scada_template(
+    timezone: str, trunc: str, intervals_per_hour: float, has_region: bool
+) -> TextClause:
+    """Power and emissions by fueltech aggregated from facility_scada"""
+    network_region_query = "f.network_region = :network_region and" if has_region else ""
+
+    return text(
+        f"""
         select
             t.trading_interval at time zone '{timezone}',
             t.fueltech_code,
@@ -510,85 +641,72 @@ def power_and_emissions_network_fueltech_query(
             where
                 fs.is_forecast is False and
                 f.fueltech_id is not null and
-                {network_query}
+                f.network_id = :network_id and
                 {network_region_query}
-                fs.trading_interval <= '{date_max}' and
-                fs.trading_interval >= '{date_min}'
-                {fueltech_filter}
+                fs.trading_interval <= :date_max and
+                fs.trading_interval >= :date_min
             group by 1, f.code, 2
         ) as t
         group by 1, 2
         order by 1 desc;
     """
+    )
 
-    network_region_query: str = ""
-    fueltech_filter: str = ""
-    timezone: str = time_series.network.timezone_database
-
-    fueltechs_excluded = ["exports", "imports", "interconnector", "solar_rooftop", "solar_utility", "wind"]
-
-    if network_region:
-        network_region_query = f"f.network_region='{network_region}' and "
 
-    network_query = f"f.network_id ='{time_series.network.code}' and"
+def power_and_emissions_network_fueltech_query(
+    time_series: OpennemExportSeries,
+    network_region: str | None = None,
+) -> TextClause:
+    """Query emission stats for each network and fueltech"""
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    fueltechs_exclude = ", ".join(f"'{i}'" for i in fueltechs_excluded)
-
-    query = text(
-        __query.format(
-            network_query=network_query,
-            trunc=time_series.interval.interval_sql,
-            network_region_query=network_region_query,
-            timezone=timezone,
-            date_max=date_max,
-            date_min=date_min,
-            fueltech_filter=fueltech_filter,
-            fueltechs_exclude=fueltechs_exclude,
-            intervals_per_hour=time_series.network.intervals_per_hour,
-        )
+    template = (
+        _power_and_emissions_network_fueltech_template
+        if settings.network_fueltech_intervals_queries
+        else _power_and_emissions_network_fueltech_scada_template
     )
 
-    return query
+    query = template(
+        timezone=time_series.network.timezone_database,
+        trunc=time_series.interval.interval_sql,
+        intervals_per_hour=time_series.network.intervals_per_hour,
+        has_region=bool(network_region),
+    ).bindparams(
+        network_id=time_series.network.code,
+        date_max=network_time(time_series_range.end),
+        date_min=network_time(time_series_range.start),
+    )
 
+    if network_region:
+        query = query.bindparams(network_region=network_region)
 
-def power_network_interconnector_emissions_query(
-    time_series: OpennemExportSeries,
-    network_region: str | None = None,
-    networks_query: list[NetworkSchema] | None = None,
-) -> TextClause:
-    """
-    Get emissions for a network or network + region
-    based on a year
-    """
+    return query
 
-    if not networks_query:
-        networks_query = [time_series.network]
 
-    if time_series.network not in networks_query:
-        networks_query.append(time_series.network)
+@functools.cache
+def _power_network_interconnector_emissions_template(timezone: str, scale: int, has_region: bool) -> TextClause:
+    network_region_query = "and t.network_region = :network_region" if has_region else ""
 
-    __query = """
+    return text(
+        f"""
     select
         t.trading_interval at time zone '{timezone}' as trading_interval,
-        sum(t.imports_energy) / {energy_scale},
-        sum(t.exports_energy) / {energy_scale},
-        abs(sum(t.emissions_imports)) / {emissions_scale},
-        abs(sum(t.emissions_exports)) / {emissions_scale},
-        sum(t.market_value_imports) / {market_value_scale} as market_value_imports,
-        sum(t.market_value_exports) / {market_value_scale} as market_value_exports,
+        sum(t.imports_energy) / {scale},
+        sum(t.exports_energy) / {scale},
+        abs(sum(t.emissions_imports)) / {scale},
+        abs(sum(t.emissions_exports)) / {scale},
+        sum(t.market_value_imports) / {scale} as market_value_imports,
+        sum(t.market_value_exports) / {scale} as market_value_exports,
         case
             when sum(t.imports_energy) > 0 then
-                sum(t.emissions_imports) / sum(t.imports_energy) / {energy_scale}
+                sum(t.emissions_imports) / sum(t.imports_energy) / {scale}
             else 0.0
         end as imports_emission_factor,
         case
             when sum(t.exports_energy) > 0 then
-                sum(t.emissions_exports) / sum(t.exports_energy) / {energy_scale}
+                sum(t.emissions_exports) / sum(t.exports_energy) / {scale}
             else 0.0
         end as exports_emission_factor
     from (
@@ -604,47 +722,51 @@ def power_network_interconnector_emissions_query(
             coalesce(t.market_value_exports, 0) as market_value_exports
         from at_network_flows t
         where
-            t.trading_interval <= '{date_max}' and
-            t.trading_interval >= '{date_min}' and
-            t.network_id = '{network_id}' and
+            t.trading_interval <= :date_max and
+            t.trading_interval >= :date_min and
+            t.network_id = :network_id
             {network_region_query}
     ) as t
     group by 1
     order by 1 desc
+    """
+    )
+
 
+def power_network_interconnector_emissions_query(
+    time_series: OpennemExportSeries,
+    network_region: str | None = None,
+    networks_query: list[NetworkSchema] | None = None,
+) -> TextClause:
+    """
+    Get emissions for a network or network + region
+    based on a year
     """
 
-    # scale using opennem.units eventually (placeholder sql var)
-    energy_scale: int = int(time_series.network.intervals_per_hour)
-    emissions_scale: int = int(time_series.network.intervals_per_hour)
-    market_value_scale: int = int(time_series.network.intervals_per_hour)
+    if not networks_query:
+        networks_query = [time_series.network]
 
-    timezone = time_series.network.timezone_database
-    network_region_query = ""
+    if time_series.network not in networks_query:
+        networks_query.append(time_series.network)
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    if network_region:
-        network_region_query = f"""
-            t.network_region = '{network_region}'
-        """
-
-    query = text(
-        __query.format(
-            energy_scale=energy_scale,
-            emissions_scale=emissions_scale,
-            market_value_scale=market_value_scale,
-            timezone=timezone,
-            network_id=time_series.network.code,
-            date_min=date_min,
-            date_max=date_max,
-            network_region_query=network_region_query,
-        )
+    # energy, emissions and market value are all scaled per interval
+    # scale using opennem.units eventually (placeholder sql var)
+    query = _power_network_interconnector_emissions_template(
+        timezone=time_series.network.timezone_database,
+        scale=int(time_series.network.intervals_per_hour),
+        has_region=bool(network_region),
+    ).bindparams(
+        network_id=time_series.network.code,
+        date_min=time_series_range.start,
+        date_max=time_series_range.end,
     )
 
+    if network_region:
+        query = query.bindparams(network_region=network_region)
+
     return query
 
 
@@ -653,12 +775,19 @@ Demand queries
 """
 
 
-def demand_network_region_query(
-    time_series: OpennemExportSeries, network_region: str | None, networks: list[NetworkSchema] | None = None
-) -> TextClause:
-    """Get the network demand energy and market_value"""
+@functools.cache
+def _demand_network_region_template(trunc: str, has_region: bool) -> TextClause:
+    if has_region:
+        network_region_select = "network_region,"
+        network_region_query = "network_region = :network_region and"
+        group_by = ",3"
+    else:
+        network_region_select = "cast(:network_code as text) as network_region,"
+        network_region_query = ""
+        group_by = ""
 
-    ___query = """
+    return text(
+        f"""
         select
             date_trunc('{trunc}', trading_day) as trading_day,
             network_id,
@@ -667,45 +796,37 @@ def demand_network_region_query(
             round(sum(demand_market_value), 4)
         from at_network_demand
         where
-            {network_query}
-            {network_region}
-            trading_day >= '{date_min}' and
-            trading_day <= '{date_max}'
+            network_id = any(:network_ids) and
+            {network_region_query}
+            trading_day >= :date_min and
+            trading_day <= :date_max
         group by 1,2 {group_by}
         order by
             1 asc
     """
+    )
 
-    network_region_query = ""
-    network_region_select = f"'{time_series.network.code}' as network_region,"
-    group_by = ""
 
-    if network_region:
-        network_region_query = f"network_region='{network_region}' and"
-        network_region_select = "network_region,"
-        group_by = ",3"
+def demand_network_region_query(
+    time_series: OpennemExportSeries, network_region: str | None, networks: list[NetworkSchema] | None = None
+) -> TextClause:
+    """Get the network demand energy and market_value"""
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    networks_list = networks_to_in(time_series.network.get_networks_query())
+    query = _demand_network_region_template(trunc=time_series.interval.trunc, has_region=bool(network_region)).bindparams(
+        network_ids=network_codes(time_series.network.get_networks_query()),
+        date_min=time_series_range.start,
+        date_max=time_series_range.end,
+    )
 
-    network_query = f"network_id IN ({networks_list}) and "
+    if network_region:
+        query = query.bindparams(network_region=network_region)
+    else:
+        query = query.bindparams(network_code=time_series.network.code)
 
-    return text(
-        ___query.format(
-            trunc=time_series.interval.trunc,
-            date_min=date_min,
-            date_max=date_max,
-            network_id=time_series.network.code,
-            network_region=network_region_query,
-            network_region_select=network_region_select,
-            group_by=group_by,
-            network_query=network_query,
-        )
-    )
+    return query
 
 
 """
@@ -713,24 +834,15 @@ Energy Queries
 """
 
 
-def energy_network_fueltech_query(
-    time_series: OpennemExportSeries,
-    network_region: str | None = None,
-    networks_query: list[NetworkSchema] | None = None,
-    coalesce_with: int | None = None,
-) -> TextClause:
-    """
-    Get Energy for a network or network + region
-    based on a year
-    """
-
-    if not networks_query:
-        networks_query = [time_series.network]
-
-    if time_series.network not in networks_query:
-        networks_query.append(time_series.network)
+@functools.cache
+def _energy_network_fueltech_template(trunc: str, coalesce_with: str, has_region: bool, wem_apvi: bool) -> TextClause:
+    network_region_query = "t.network_region = :network_region and" if has_region else ""
+    # @NOTE special case for WEM to only include APVI data for that network/region
+    # and not double-count all of AU
+    network_apvi_wem = "or (t.network_id='APVI' and t.network_region in ('WEM'))" if wem_apvi else ""
 
-    __query = """
+    return text(
+        f"""
     select
         date_trunc('{trunc}', t.trading_day) as trading_interval,
         t.fueltech_id,
@@ -747,10 +859,10 @@ def energy_network_fueltech_query(
             coalesce(sum(t.emissions), {coalesce_with}) as fueltech_emissions
         from at_facility_daily t
         where
-            t.trading_day <= '{date_max}'::date and
-            t.trading_day >= '{date_min}'::date and
+            t.trading_day <= cast(:date_max as date) and
+            t.trading_day >= cast(:date_min as date) and
             t.fueltech_id not in ('imports', 'exports', 'interconnector') and
-            {network_query}
+            (t.network_id = any(:network_ids) {network_apvi_wem}) and
             {network_region_query}
             1=1
         group by 1, 2
@@ -758,53 +870,92 @@ def energy_network_fueltech_query(
     group by 1, 2
     order by 1 desc;
     """
+    )
+
+
+def energy_network_fueltech_query(
+    time_series: OpennemExportSeries,
+    network_region: str | None = None,
+    networks_query: list[NetworkSchema] | None = None,
+    coalesce_with: int | None = None,
+) -> TextClause:
+    """
+    Get Energy for a network or network + region
+    based on a year
+    """
 
-    network_region_query = ""
+    if not networks_query:
+        networks_query = [time_series.network]
+
+    if time_series.network not in networks_query:
+        networks_query.append(time_series.network)
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    trunc = time_series_range.interval.trunc
+    wem_apvi = time_series.network in [NetworkWEM, NetworkAU]
 
-    if network_region:
-        network_region_query = f"t.network_region='{network_region}' and"
+    if wem_apvi and NetworkAPVI in networks_query:
+        networks_query.pop(networks_query.index(NetworkAPVI))
 
-    # @NOTE special case for WEM to only include APVI data for that network/region
-    # and not double-count all of AU
-    network_apvi_wem = ""
+    query = _energy_network_fueltech_template(
+        trunc=time_series_range.interval.trunc,
+        coalesce_with=str(coalesce_with or "NULL"),
+        has_region=bool(network_region),
+        wem_apvi=wem_apvi,
+    ).bindparams(
+        network_ids=network_codes(networks_query),
+        # dates are compared in network time
+        date_min=time_series_range.start.date(),
+        date_max=time_series_range.end.date(),
+    )
 
-    if time_series.network in [NetworkWEM, NetworkAU]:
-        network_apvi_wem = "or (t.network_id='APVI' and t.network_region in ('WEM'))"
+    if network_region:
+        query = query.bindparams(network_region=network_region)
 
-        if NetworkAPVI in networks_query:
-            networks_query.pop(networks_query.index(NetworkAPVI))
+    return query
 
-    networks_list = networks_to_in(networks_query)
 
-    network_query = f"(t.network_id IN ({networks_list}) {network_apvi_wem}) and "
+@functools.cache
+def _energy_network_fueltech_clickhouse_template(trunc: str, has_region: bool, wem_apvi: bool) -> str:
+    network_region_query = "t.network_region = {network_region:String} and" if has_region else ""
+    network_apvi_wem = "or (t.network_id = 'APVI' and t.network_region = 'WEM')" if wem_apvi else ""
 
-    return text(
-        __query.format(
-            trunc=trunc,
-            date_min=date_min,
-            date_max=date_max,
-            network_query=network_query,
-            network_region_query=network_region_query,
-            coalesce_with=coalesce_with or "NULL",
-        )
-    )
+    # buckets without energy for a fueltech are filled with nulls as time_bucket_gapfill does in postgres
+    return f"""
+    select
+        toDate(date_trunc('{trunc}', t.trading_day)) as trading_interval,
+        t.fueltech_id,
+        sum(t.energy) / 1000 as fueltech_energy_gwh,
+        sum(t.market_value) as market_value_dollars,
+        sum(t.emissions) as fueltech_emissions_t
+    from at_facility_daily as t final
+    where
+        t.trading_day <= {{date_max:Date}} and
+        t.trading_day >= {{date_min:Date}} and
+        t.fueltech_id not in ('imports', 'exports', 'interconnector') and
+        (has({{network_ids:Array(String)}}, t.network_id) {network_apvi_wem}) and
+        {network_region_query}
+        1=1
+    group by 1, 2
+    order by
+        t.fueltech_id,
+        trading_interval with fill
+            from toDate(date_trunc('{trunc}', {{date_min:Date}}))
+            to {{date_max:Date}} + 1
+            step interval 1 {trunc}
+    settings use_with_fill_by_sorting_prefix = 1
+    """
 
 
-def energy_network_interconnector_emissions_query(
+def energy_network_fueltech_clickhouse_query(
     time_series: OpennemExportSeries,
     network_region: str | None = None,
     networks_query: list[NetworkSchema] | None = None,
-) -> TextClause:
+) -> tuple[str, dict]:
     """
-    Get emissions for a network or network + region
-    based on a year
+    Energy for a network or network + region from the clickhouse mirror of at_facility_daily.
+    Returns the query and its parameters, with rows in the shape of energy_network_fueltech_query
     """
 
     if not networks_query:
@@ -813,7 +964,37 @@ def energy_network_interconnector_emissions_query(
     if time_series.network not in networks_query:
         networks_query.append(time_series.network)
 
-    __query = """
+    time_series_range = time_series.get_range()
+
+    wem_apvi = time_series.network in [NetworkWEM, NetworkAU]
+
+    if wem_apvi and NetworkAPVI in networks_query:
+        networks_query.pop(networks_query.index(NetworkAPVI))
+
+    query = _energy_network_fueltech_clickhouse_template(
+        trunc=time_series_range.interval.trunc,
+        has_region=bool(network_region),
+        wem_apvi=wem_apvi,
+    )
+
+    parameters = {
+        "network_ids": network_codes(networks_query),
+        "date_min": time_series_range.start.date(),
+        "date_max": time_series_range.end.date(),
+    }
+
+    if network_region:
+        parameters["network_region"] = network_region
+
+    return query, parameters
+
+
+@functools.cache
+def _energy_network_interconnector_emissions_template(trunc: str, timezone: str, has_region: bool) -> TextClause:
+    network_region_query = "and t.network_region = :network_region" if has_region else ""
+
+    return text(
+        f"""
     select
         date_trunc('{trunc}', t.trading_interval at time zone '{timezone}') as trading_interval,
         sum(t.imports_energy) / 1000,
@@ -835,37 +1016,47 @@ def energy_network_interconnector_emissions_query(
             coalesce(t.market_value_exports, 0) as market_value_exports
         from at_network_flows t
         where
-            t.trading_interval <= '{date_max}' and
-            t.trading_interval >= '{date_min}' and
-            t.network_id = '{network_id}' and
+            t.trading_interval <= :date_max and
+            t.trading_interval >= :date_min and
+            t.network_id = :network_id
             {network_region_query}
     ) as t
     group by 1
     order by 1 desc
+    """
+    )
+
 
+def energy_network_interconnector_emissions_query(
+    time_series: OpennemExportSeries,
+    network_region: str | None = None,
+    networks_query: list[NetworkSchema] | None = None,
+) -> TextClause:
     """
+    Get emissions for a network or network + region
+    based on a year
+    """
+
+    if not networks_query:
+        networks_query = [time_series.network]
 
-    timezone = time_series.network.timezone_database
-    network_region_query = ""
+    if time_series.network not in networks_query:
+        networks_query.append(time_series.network)
 
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    interval_trunc = time_series_range.interval.trunc
-    date_max = time_series_range.end
-    date_min = time_series_range.start
+
+    query = _energy_network_interconnector_emissions_template(
+        trunc=time_series_range.interval.trunc,
+        timezone=time_series.network.timezone_database,
+        has_region=bool(network_region),
+    ).bindparams(
+        network_id=time_series.network.code,
+        date_min=time_series_range.start,
+        date_max=time_series_range.end,
+    )
 
     if network_region:
-        network_region_query = f"""
-            t.network_region = '{network_region}'
-        """
+        query = query.bindparams(network_region=network_region)
 
-    return text(
-        __query.format(
-            timezone=timezone,
-            trunc=interval_trunc,
-            network_id=time_series.network.code,
-            date_min=date_min,
-            date_max=date_max,
-            network_region_query=network_region_query,
-        )
-    )
+    return query
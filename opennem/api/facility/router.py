@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi_versionizer import api_version
 from sqlalchemy.orm import Session
 from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response
 
+from opennem.api.catalogue import CatalogueName, catalogue_response
 from opennem.db import get_scoped_session
 from opennem.db.models.opennem import Facility
 
@@ -18,12 +21,8 @@ router = APIRouter()
     description="Get facilities",
     response_model=list[FacilityRecord],
 )
-def facilities(
-    session: Session = Depends(get_scoped_session),
-) -> list[FacilityRecord]:
-    facilities = session.query(Facility).all()
-
-    return facilities
+async def facilities(request: Request) -> Response:
+    return await catalogue_response(request, CatalogueName.facilities)
 
 
 @api_version(3)
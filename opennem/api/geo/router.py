@@ -1,21 +1,28 @@
 from fastapi import APIRouter, HTTPException
+from fastapi_versionizer import api_version
 from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response
 
+from opennem.api.catalogue import CatalogueName, catalogue_response, get_facility_catalogue
 from opennem.api.geo.schema import FacilityGeo
-from opennem.api.station.controllers import get_stations
-
-from .controllers import stations_to_geojson
 
 router = APIRouter()
 
 
-@router.get("/facilities", name="Facility Geo", response_model=FacilityGeo, include_in_schema=False)
-async def geo_facilities_api() -> FacilityGeo:
-    stations = await get_stations(only_approved=True)
+@api_version(4)
+@router.get(
+    "/facilities",
+    name="Facility Geo",
+    response_model=FacilityGeo,
+    response_model_exclude_unset=True,
+    include_in_schema=False,
+)
+async def geo_facilities_api(request: Request) -> Response:
+    """GeoJSON of approved stations and their facilities served from the facility catalogue"""
+    snapshot = await get_facility_catalogue().get(CatalogueName.geojson)
 
-    if not stations:
+    if not snapshot.count:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No stations found")
 
-    stations_geo = await stations_to_geojson(stations)
-
-    return stations_geo
+    return await catalogue_response(request, CatalogueName.geojson, media_type="application/geo+json")
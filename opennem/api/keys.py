@@ -6,13 +6,13 @@ import logging
 from collections.abc import Callable, Coroutine
 from typing import Any, TypeVar
 
-import unkey
 from fastapi import Depends, HTTPException
 from fastapi.security import APIKeyHeader
 from unkey import models
 
 from opennem import settings
 from opennem.clients.unkey import OpenNEMUser, unkey_validate
+from opennem.users.ratelimit import get_ratelimit_for_roles, get_ratelimiter
 from opennem.users.schema import OpenNEMRoles
 
 logger = logging.getLogger("opennem.api.keys")
@@ -32,9 +32,6 @@ InvalidKeyHandlerT = Callable[[dict[str, Any], models.ApiKeyVerification | None]
 ExcHandlerT = Callable[[Exception], Any]
 """The type of a callback used to handle exceptions during verification."""
 
-# API Keys
-unkey_client = unkey.Client(api_key=settings.unkey_root_key)
-
 api_key_header = APIKeyHeader(name="X-API-Key")
 
 
@@ -45,10 +42,25 @@ async def verify_api_key(api_key: str = Depends(api_key_header)):
     if not settings.unkey_api_id:
         raise HTTPException(status_code=403, detail="Invalid API key")
 
-    result = await unkey_client.keys.verify_key(api_key, settings.unkey_api_id)
-    if not result.is_ok or not result.unwrap().valid:
+    user = await unkey_validate(api_key=api_key)
+
+    if not user:
         raise HTTPException(status_code=403, detail="Invalid API key")
-    return result.unwrap()
+
+    return user
+
+
+async def apply_api_ratelimit(user: OpenNEMUser) -> None:
+    """Consume a request from the user's rate limit tier, raising a 429 when the bucket is empty"""
+    if not (ratelimiter := get_ratelimiter()):
+        return None
+
+    result = await ratelimiter.consume(user.id, get_ratelimit_for_roles(user.roles))
+
+    user.rate_limit = result.rate_limit
+
+    if not result.allowed:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
 
 def api_protected(
@@ -115,6 +127,8 @@ def api_protected(
                     if not any(r in verification.roles for r in roles):
                         raise HTTPException(status_code=403, detail="Permission denied")
 
+                await apply_api_ratelimit(verification)
+
                 if inspect.iscoroutinefunction(func):
                     value = await func(*args, **kwargs)
                 else:
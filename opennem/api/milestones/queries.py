@@ -1,12 +1,16 @@
+import base64
+import hashlib
+import json
 import logging
 import uuid
 from datetime import datetime
 
-from sqlalchemy import and_, or_, select
+from sqlalchemy import Select, and_, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
 
-from opennem.db import SessionLocal
+from opennem.api.cache import get_response_cache
+from opennem.db import SessionLocal, get_read_session
 from opennem.db.models.opennem import Milestones
 from opennem.recordreactor.schema import MilestoneAggregate, MilestoneMetric, MilestonePeriod
 from opennem.schema.network import NetworkSchema
@@ -14,10 +18,31 @@ from opennem.schema.network import NetworkSchema
 logger = logging.getLogger("opennem.api.milestones.queries")
 
 
-async def get_milestone_records(
-    session: AsyncSession,
-    limit: int | None = 100,
-    page_number: int = 1,
+MILESTONES_CACHE_TAG = "milestones"
+
+# seconds filtered milestone totals are cached for between writes
+MILESTONES_TOTAL_CACHE_TTL = 60 * 60
+
+
+class MilestoneCursorException(Exception):
+    pass
+
+
+def encode_milestone_cursor(interval: datetime, instance_id: uuid.UUID) -> str:
+    """Opaque cursor for the page after the milestone at interval and instance_id"""
+    cursor = json.dumps([interval.isoformat(), str(instance_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(cursor.encode()).decode().rstrip("=")
+
+
+def decode_milestone_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        interval, instance_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(interval), uuid.UUID(instance_id)
+    except Exception as e:
+        raise MilestoneCursorException(f"Invalid cursor: {cursor}") from e
+
+
+def milestone_records_query(
     date_start: datetime | None = None,
     date_end: datetime | None = None,
     significance: int | None = None,
@@ -30,10 +55,8 @@ async def get_milestone_records(
     periods: list[MilestonePeriod] | None = None,
     record_id_filter: str | None = None,
     record_id: str | None = None,
-) -> tuple[list[dict], int]:
-    """Get a list of all milestones ordered by date with a limit, pagination and optional significance filter"""
-    page_number -= 1
-
+) -> Select:
+    """Select milestones matching the filters"""
     select_query = select(Milestones)
 
     if date_start:
@@ -81,22 +104,86 @@ async def get_milestone_records(
         record_id_filter = record_id_filter.replace("*", "%")
         select_query = select_query.where(Milestones.record_id.ilike(f"{record_id_filter}"))
 
+    return select_query
+
+
+async def get_milestone_total(session: AsyncSession, select_query: Select, cache_key: str | None = None) -> int:
+    """Count the milestones matched by select_query. With a cache key the count is cached in the
+    response cache until milestones are next written"""
     total_query = select(func.count()).select_from(select_query.subquery())
-    total_records = await session.scalar(total_query)
+    response_cache = get_response_cache()
 
-    select_query = select_query.order_by(Milestones.interval.desc())
+    if not cache_key or not response_cache:
+        return await session.scalar(total_query) or 0
 
-    offset: int | None = None
+    # cached counts can be refreshed in the background after the request session has closed
+    async def _fetch() -> bytes:
+        async with get_read_session() as read_session:
+            return str(await read_session.scalar(total_query) or 0).encode()
 
-    if limit:
-        offset = page_number * limit
+    entry, _ = await response_cache.get_or_set(
+        f"milestones:total:{cache_key}", _fetch, expire=MILESTONES_TOTAL_CACHE_TTL, tags=[MILESTONES_CACHE_TAG]
+    )
+
+    return int(entry.value)
+
+
+async def get_milestone_records(
+    session: AsyncSession,
+    limit: int | None = 100,
+    page_number: int = 1,
+    date_start: datetime | None = None,
+    date_end: datetime | None = None,
+    significance: int | None = None,
+    fueltech_id: list[str] | None = None,
+    aggregate: MilestoneAggregate | None = None,
+    metric: MilestoneMetric | None = None,
+    networks: list[NetworkSchema] | None = None,
+    network_regions: list[str] | None = None,
+    record_filter: list[str] | None = None,
+    periods: list[MilestonePeriod] | None = None,
+    record_id_filter: str | None = None,
+    record_id: str | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], int]:
+    """Get a list of all milestones ordered by date with a limit, pagination and optional significance filter
+
+    Pages are either by page_number or, for deep pages, by the cursor of the last record on the
+    previous page which seeks on (interval, instance_id). The total matching the filters is cached.
+    """
+    filters = {
+        "date_start": date_start,
+        "date_end": date_end,
+        "significance": significance,
+        "fueltech_id": fueltech_id,
+        "aggregate": aggregate,
+        "metric": metric,
+        "networks": [network.code for network in networks] if networks else None,
+        "network_regions": network_regions,
+        "record_filter": record_filter,
+        "periods": periods,
+        "record_id_filter": record_id_filter,
+        "record_id": record_id,
+    }
+
+    select_query = milestone_records_query(**{**filters, "networks": networks})
+
+    total_cache_key = hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()  # noqa: S324
+    total_records = await get_milestone_total(session, select_query, cache_key=total_cache_key)
+
+    select_query = select_query.order_by(Milestones.interval.desc(), Milestones.instance_id.desc())
+
+    if cursor:
+        cursor_interval, cursor_instance_id = decode_milestone_cursor(cursor)
+        select_query = select_query.where(
+            tuple_(Milestones.interval, Milestones.instance_id) < tuple_(cursor_interval, cursor_instance_id)
+        )
+    elif limit and page_number > 1:
+        select_query = select_query.offset((page_number - 1) * limit)
 
     if limit:
         select_query = select_query.limit(limit)
 
-    if offset and offset > 0:
-        select_query = select_query.offset(offset)
-
     result = await session.execute(select_query)
     results = result.scalars().all()
     records = []
@@ -109,6 +196,14 @@ async def get_milestone_records(
     return records, total_records
 
 
+def milestone_records_next_cursor(records: list[dict], limit: int | None) -> str | None:
+    """Cursor for the page after records, or None if it was the last page"""
+    if not records or not limit or len(records) < limit:
+        return None
+
+    return encode_milestone_cursor(records[-1]["interval"], records[-1]["instance_id"])
+
+
 async def get_milestone_record(
     session: AsyncSession,
     instance_id: uuid.UUID,
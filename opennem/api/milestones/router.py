@@ -20,7 +20,13 @@ from opennem.recordreactor.schema import (
 )
 from opennem.schema.network import NetworkSchema
 
-from .queries import get_milestone_record, get_milestone_records
+from .queries import (
+    MilestoneCursorException,
+    decode_milestone_cursor,
+    get_milestone_record,
+    get_milestone_records,
+    milestone_records_next_cursor,
+)
 
 logger = logging.getLogger("opennem.api.milestones.router")
 
@@ -50,6 +56,7 @@ async def get_milestones(
     significance: int | None = Query(None, description="Significance filter"),
     record_id_filter: str | None = Query(None, description="Filter by record_id - supports wildcards"),
     period: list[MilestonePeriod] | None = Query(None, description="Period filter"),
+    cursor: str | None = Query(None, description="Cursor from next_cursor of the previous page. Takes the place of page"),
     db: AsyncSession = Depends(get_scoped_session),
 ) -> APIV4ResponseSchema:
     """Get a list of milestones"""
@@ -121,6 +128,12 @@ async def get_milestones(
 
         period = [MilestonePeriod[period] for period in period]
 
+    if cursor:
+        try:
+            decode_milestone_cursor(cursor)
+        except MilestoneCursorException:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
     try:
         db_records, total_records = await get_milestone_records(
             db,
@@ -137,6 +150,7 @@ async def get_milestones(
             record_id_filter=record_id_filter,
             significance=significance,
             periods=period,
+            cursor=cursor,
         )
     except Exception as e:
         logger.error(f"Error getting milestone records: {e}")
@@ -151,7 +165,12 @@ async def get_milestones(
         response_schema = APIV4ResponseSchema(success=False, error="Error mapping milestone records")
         return response_schema
 
-    response_schema = APIV4ResponseSchema(success=True, data=milestone_records, total_records=total_records)
+    response_schema = APIV4ResponseSchema(
+        success=True,
+        data=milestone_records,
+        total_records=total_records,
+        next_cursor=milestone_records_next_cursor(db_records, limit),
+    )
 
     return response_schema
 
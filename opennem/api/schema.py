@@ -46,3 +46,4 @@ class APIV4ResponseSchema(ApiBase):
     error: str | None = None
     data: list = []
     total_records: int | None = None
+    next_cursor: str | None = None
@@ -82,7 +82,7 @@ async def get_current_active_user(current_user=Depends(get_current_user)) -> str
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def api_key_auth(api_key: str = Depends(oauth2_scheme)) -> None:
-    user_api_key = unkey_validate(api_key=api_key)
+async def api_key_auth(api_key: str = Depends(oauth2_scheme)) -> None:
+    user_api_key = await unkey_validate(api_key=api_key)
     if not user_api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Forbidden")
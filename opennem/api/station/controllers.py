@@ -1,8 +1,36 @@
-from sqlalchemy import distinct, select
+from sqlalchemy import Select, distinct, select
 from sqlalchemy.orm import selectinload
 
 from opennem.db import SessionLocal
-from opennem.db.models.opennem import Facility, Station
+from opennem.db.models.opennem import Facility, FuelTech, Location, Station
+
+
+def station_records_query(
+    facilities_include: bool | None = True,
+    only_approved: bool | None = False,
+    name: str | None = None,
+    limit: int | None = None,
+) -> Select:
+    """Query for the station records list"""
+    query = select(Station).join(Location)
+
+    if facilities_include:
+        query = query.outerjoin(Facility, Facility.station_id == Station.id).outerjoin(
+            FuelTech, Facility.fueltech_id == FuelTech.code
+        )
+
+    if only_approved:
+        query = query.where(Station.approved == True)  # noqa: E712
+
+    if name:
+        query = query.where(Station.name.like(f"%{name}%"))
+
+    query = query.order_by(Station.name)
+
+    if limit:
+        query = query.limit(limit)
+
+    return query
 
 
 async def get_stations(
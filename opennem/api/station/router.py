@@ -5,15 +5,18 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 from starlette import status
+from starlette.requests import Request
 from starlette.responses import Response
 
 from opennem.api import throttle
+from opennem.api.catalogue import CatalogueName, catalogue_response
 from opennem.api.exceptions import OpennemBaseHttpException
 from opennem.core.dispatch_type import DispatchType
 from opennem.db import get_scoped_session
-from opennem.db.models.opennem import Facility, FuelTech, Location, Network, Station
+from opennem.db.models.opennem import Facility, Location, Network, Station
 from opennem.schema.opennem import StationOutputSchema
 
+from .controllers import station_records_query
 from .schema import StationResponse, StationsResponse
 
 logger = logging.getLogger("opennem.api.station")
@@ -41,6 +44,7 @@ class StationNoFacilities(OpennemBaseHttpException):
     response_model_exclude_none=True,
 )
 async def get_stations(
+    request: Request,
     response: Response,
     session: AsyncSession = Depends(get_scoped_session),
     facilities_include: bool | None = True,
@@ -48,24 +52,12 @@ async def get_stations(
     name: str | None = None,
     limit: int | None = None,
     page: int = 1,
-) -> StationsResponse:
-    query = select(Station).join(Location)
+) -> StationsResponse | Response:
+    # the full list is served from the facility catalogue
+    if facilities_include and not only_approved and not name and not limit:
+        return await catalogue_response(request, CatalogueName.stations)
 
-    if facilities_include:
-        query = query.outerjoin(Facility, Facility.station_id == Station.id).outerjoin(
-            FuelTech, Facility.fueltech_id == FuelTech.code
-        )
-
-    if only_approved:
-        query = query.where(Station.approved == True)  # noqa: E712
-
-    if name:
-        query = query.where(Station.name.like(f"%{name}%"))
-
-    query = query.order_by(Station.name)
-
-    if limit:
-        query = query.limit(limit)
+    query = station_records_query(facilities_include=facilities_include, only_approved=only_approved, name=name, limit=limit)
 
     result = await session.execute(query)
     stations = result.unique().scalars().all()
@@ -1,23 +1,24 @@
 import logging
 from collections import OrderedDict
-from datetime import datetime, timedelta, timezone
-from textwrap import dedent
+from datetime import datetime, timezone
 from typing import Any
 
 from datetime_truncate import truncate as date_trunc
 from sqlalchemy import text as sql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
 
 from opennem import settings
 from opennem.api.time import human_to_interval
+from opennem.core.facility.dimensions import get_facility_dimensions
 from opennem.core.feature_flags import get_list_of_enabled_features
 from opennem.core.normalizers import cast_float_or_none
-from opennem.db import db_connect, get_database_engine
-from opennem.queries.utils import duid_to_case
+from opennem.core.watermarks import get_scada_watermarks
+from opennem.db import get_database_engine
 from opennem.schema.network import NetworkAEMORooftop, NetworkAEMORooftopBackfill, NetworkAPVI, NetworkSchema
 from opennem.schema.time import TimeInterval
 from opennem.schema.units import UnitDefinition
-from opennem.utils.cache import cache_scada_result
-from opennem.utils.dates import get_last_completed_interval_for_network, get_today_for_network
+from opennem.utils.dates import get_last_completed_interval_for_network
 from opennem.utils.numbers import cast_trailing_nulls
 from opennem.utils.timezone import is_aware, make_aware
 from opennem.utils.version import get_version
@@ -27,6 +28,57 @@ from .schema import DataQueryResult, OpennemData, OpennemDataHistory, OpennemDat
 logger = logging.getLogger(__name__)
 
 
+async def stream_query_result_columns(
+    session: AsyncSession,
+    query: Executable,
+    result_columns: list[int],
+    group_by_column: int | None = 2,
+    interval_column: int = 0,
+    partition_size: int | None = None,
+) -> list[list[DataQueryResult]]:
+    """Run a stats query with rows streamed from a server side cursor and converted to
+    DataQueryResults for stats_factory a partition at a time
+
+    Returns a list of results for each of result_columns. Columns are set by position
+    """
+    partition_size = partition_size or settings.api_stream_partition_size
+
+    result = await session.stream(query.execution_options(yield_per=partition_size))
+
+    stats: list[list[DataQueryResult]] = [[] for _ in result_columns]
+
+    async for partition in result.partitions():
+        for row in partition:
+            interval = row[interval_column]
+            group_by = row[group_by_column] if group_by_column is not None else None
+
+            for stats_column, result_column in zip(stats, result_columns, strict=True):
+                stats_column.append(DataQueryResult(interval=interval, result=row[result_column], group_by=group_by))
+
+    return stats
+
+
+async def stream_query_results(
+    session: AsyncSession,
+    query: Executable,
+    result_column: int = 1,
+    group_by_column: int | None = 2,
+    interval_column: int = 0,
+    partition_size: int | None = None,
+) -> list[DataQueryResult]:
+    """Stream a stats query with a single result column. See stream_query_result_columns"""
+    (stats,) = await stream_query_result_columns(
+        session,
+        query,
+        result_columns=[result_column],
+        group_by_column=group_by_column,
+        interval_column=interval_column,
+        partition_size=partition_size,
+    )
+
+    return stats
+
+
 def stats_factory(
     stats: list[DataQueryResult],
     units: UnitDefinition,
@@ -55,23 +107,18 @@ def stats_factory(
     if network:
         timezone = network.get_timezone()
 
-    group_codes = list({i.group_by for i in stats if i.group_by})
+    # group the results in one pass rather than scanning all of them for each group code
+    stats_by_group: dict[str, dict[datetime, Any]] = {}
 
-    stats_grouped = []
-
-    for group_code in group_codes:
-        data_grouped: dict[datetime, Any] = {}
-
-        for stat in stats:
-            if stat.group_by != group_code:
-                continue
+    for stat in stats:
+        if not stat.group_by:
+            continue
 
-            if stat.interval not in data_grouped:
-                data_grouped[stat.interval] = None
+        stats_by_group.setdefault(stat.group_by, {})[stat.interval] = stat.result
 
-            # if stat.result:
-            data_grouped[stat.interval] = stat.result
+    stats_grouped = []
 
+    for group_code, data_grouped in stats_by_group.items():
         data_sorted = OrderedDict(sorted(data_grouped.items()))
 
         data_value = list(data_sorted.values())
@@ -322,7 +369,6 @@ def get_scada_range_optimized(network: NetworkSchema) -> ScadaDateRange:
     return ScadaDateRange(start=data_start, end=data_end, network=network)
 
 
-@cache_scada_result
 async def get_scada_range(
     network: NetworkSchema,
     networks: list[NetworkSchema] | None = None,
@@ -330,31 +376,12 @@ async def get_scada_range(
     facilities: list[str] | None = None,
     energy: bool = False,
 ) -> ScadaDateRange:
-    """Get the start and end dates for a network query. This is more efficient
-    than providing or querying the range at query time
-    """
-    engine = db_connect()
-
-    __query = """
-    select
-        min(f.data_first_seen) at time zone '{timezone}',
-        max(fs.trading_interval)  at time zone '{timezone}'
-    from facility_scada fs
-    left join facility f on fs.facility_code = f.code
-    where
-        fs.trading_interval >= '{date_min}' and
-        {facility_query}
-        {network_query}
-        {network_region_query}
-        f.fueltech_id not in ({excluded_fueltechs})
-        and f.interconnector is FALSE
-        and fs.{field} is not null;
-    """
-
-    network_query = ""
-    timezone = network.timezone_database if network else "UTC"
-    field_name = "generated"
+    """Get the start and end dates for a network query from the facility scada watermarks. This is
+    more efficient than providing or querying the range at query time
 
+    energy is kept for callers. Watermarks don't distinguish energy from power so both have the
+    same range
+    """
     # List of fueltechs to exclude from query
     excluded_fueltechs: list[str] = ["imports", "exports"]
 
@@ -373,57 +400,39 @@ async def get_scada_range(
     if exclude_rooftop:
         excluded_fueltechs.append("solar_rooftop")
 
-    # Only check energy values
-    if energy is True:
-        field_name = "eoi_quantity"
-
-    # Only look back 7 days because the query is more optimized
-    date_min = get_today_for_network(network=network) - timedelta(days=7)
+    network_ids: list[str] | None = None
 
     if network:
-        network_query = f"f.network_id = '{network.code}' and"
+        network_ids = [network.code]
 
     if networks:
-        net_case = networks_to_in(networks)
-        network_query = f"f.network_id IN ({net_case}) and "
-
-    network_region_query = ""
-
-    if network_region:
-        network_region_query = f"f.network_region = '{network_region}' and"
+        network_ids = [n.code for n in networks]
 
-    facility_query = ""
+    watermarks = (await get_scada_watermarks()).select(network_ids=network_ids, facility_codes=facilities)
 
-    if facilities:
-        fac_case = duid_to_case(facilities)
-        facility_query = f"f.code IN ({fac_case}) and "
-
-    scada_range_query = dedent(
-        __query.format(
-            field=field_name,
-            date_min=date_min,
-            facility_query=facility_query,
-            network_query=network_query,
-            network_region_query=network_region_query,
-            timezone=timezone,
-            excluded_fueltechs=", ".join([f"'{i}'" for i in list(excluded_fueltechs)]),
-        )
+    # filter on the facility registry
+    dimensions = await get_facility_dimensions()
+    facility_fields = dimensions.lookup(
+        [w.facility_code for w in watermarks], fields=["network_region", "fueltech_id", "interconnector"]
     )
 
-    async with engine.begin() as conn:
-        logger.debug(scada_range_query)
-        res = await conn.execute(sql(scada_range_query))
-        scada_range_result = res.fetchone()
-
-        logger.debug(scada_range_result)
-        # scada_range_result = list(await conn.execute(sql(scada_range_query)))
-        # scada_range_result = scada_range_result[0]
-
-        if not scada_range_result:
-            raise Exception(f"No scada range results for {network.code}")
-
-        scada_min = scada_range_result[0]
-        scada_max = scada_range_result[1]
+    watermarks = [
+        w
+        for w, region, fueltech_id, interconnector in zip(
+            watermarks,
+            facility_fields["network_region"],
+            facility_fields["fueltech_id"],
+            facility_fields["interconnector"],
+            strict=True,
+        )
+        if fueltech_id is not None
+        and fueltech_id not in excluded_fueltechs
+        and not interconnector
+        and (not network_region or region == network_region)
+    ]
+
+    scada_min = min((w.first_nonzero for w in watermarks if w.first_nonzero), default=None)
+    scada_max = max((w.last_seen for w in watermarks), default=None)
 
     if not scada_min or not scada_max:
         raise Exception(f"No scada range results (min or max dates) for {network.code}")
@@ -0,0 +1,333 @@
+"""
+OpenNEM Stats API response encoders
+
+Stats endpoints build their OpennemDataSet once from query results in stats_factory where each
+series is validated. Returning the model to FastAPI dumps it, validates the dump against the
+response model again and then serializes it, and a cache hit is validated from a dict all over
+again. These encoders write the data set straight to bytes instead: JSON for the default
+response, or an Apache Arrow stream or Parquet file of the series in long format for bulk
+clients that ask for it in the Accept header.
+
+orjson and pyarrow are optional and installed with the `export` extra. Without orjson JSON is
+encoded with the standard library and without pyarrow requests that only accept the binary
+formats are refused with a 406.
+"""
+
+import inspect
+import json
+import logging
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from enum import StrEnum
+from functools import wraps
+from typing import Any
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi_cache.coder import JsonCoder
+from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response
+
+from opennem.utils.interval import get_human_interval
+
+from .schema import OpennemDataHistory, OpennemDataSet
+
+try:
+    import orjson
+
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+
+logger = logging.getLogger("opennem.api.stats.encoders")
+
+
+class DataSetFormat(StrEnum):
+    json = "json"
+    arrow = "arrow"
+    parquet = "parquet"
+
+
+DATASET_MEDIA_TYPES: dict[DataSetFormat, str] = {
+    DataSetFormat.json: "application/json",
+    DataSetFormat.arrow: "application/vnd.apache.arrow.stream",
+    DataSetFormat.parquet: "application/vnd.apache.parquet",
+}
+
+_ACCEPT_FORMATS: dict[str, DataSetFormat] = {
+    "*/*": DataSetFormat.json,
+    "application/*": DataSetFormat.json,
+    "application/json": DataSetFormat.json,
+    "application/vnd.apache.arrow.stream": DataSetFormat.arrow,
+    "application/vnd.apache.parquet": DataSetFormat.parquet,
+    "application/x-parquet": DataSetFormat.parquet,
+}
+
+# alternate content types for the openapi docs of endpoints that return data sets
+DATASET_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {"content": {DATASET_MEDIA_TYPES[f]: {} for f in (DataSetFormat.arrow, DataSetFormat.parquet)}}
+}
+
+
+def negotiate_dataset_format(accept: str | None) -> DataSetFormat:
+    """Pick the data set format from an Accept header by quality. Defaults to JSON for a missing
+    header or one that lists no known types, such as from a browser"""
+    if not accept:
+        return DataSetFormat.json
+
+    candidates: list[tuple[float, DataSetFormat]] = []
+    unavailable = False
+
+    for media_range in accept.split(","):
+        media_type, *params = (i.strip() for i in media_range.split(";"))
+        quality = 1.0
+
+        for param in params:
+            key, _, value = param.partition("=")
+
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+
+        response_format = _ACCEPT_FORMATS.get(media_type.lower())
+
+        if not response_format or quality <= 0:
+            continue
+
+        if response_format != DataSetFormat.json and not HAVE_ARROW:
+            unavailable = True
+            continue
+
+        candidates.append((quality, response_format))
+
+    if candidates:
+        # sort is stable so equal qualities keep the order the client listed them in
+        return sorted(candidates, key=lambda c: c[0], reverse=True)[0][1]
+
+    if unavailable:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Available formats: {DATASET_MEDIA_TYPES[DataSetFormat.json]}",
+        )
+
+    return DataSetFormat.json
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return [None if np.isnan(v) else v for v in value.tolist()]
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode JSON content where series values can be numpy arrays with NaN for missing values"""
+    if HAVE_ORJSON:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(content, separators=(",", ":"), default=_json_default).encode()
+
+
+def decode_json(content: bytes | str) -> Any:
+    if HAVE_ORJSON:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+def _history_to_dict(history: OpennemDataHistory) -> dict[str, Any]:
+    history_dict = history.model_dump(mode="json", exclude_unset=True, exclude={"data"})
+    history_dict["data"] = np.array(history.data, dtype=np.float64) if history.data is not None else None
+
+    return history_dict
+
+
+def dataset_to_dict(stat_set: OpennemDataSet | dict[str, Any]) -> dict[str, Any]:
+    """Build the response content for a data set without revalidating it. Fields follow
+    `response_model_exclude_unset` and series values are numpy arrays. Dicts are a data set
+    already in this form and are returned as is"""
+    if isinstance(stat_set, dict):
+        return stat_set
+
+    content = stat_set.model_dump(mode="json", exclude_unset=True, exclude={"data"})
+    content["data"] = []
+
+    for series in stat_set.data:
+        series_dict = series.model_dump(mode="json", exclude_unset=True, exclude={"history", "forecast"})
+        series_dict["history"] = _history_to_dict(series.history)
+
+        if series.forecast:
+            series_dict["forecast"] = _history_to_dict(series.forecast)
+
+        content["data"].append(series_dict)
+
+    return content
+
+
+def series_intervals(start: datetime | str, count: int, interval: str) -> np.ndarray:
+    """Interval datetimes for a series as datetime64 in UTC"""
+    if isinstance(start, str):
+        start = datetime.fromisoformat(start)
+
+    if start.tzinfo:
+        start = start.astimezone(UTC).replace(tzinfo=None)
+
+    interval_size = get_human_interval(interval)
+
+    if isinstance(interval_size, timedelta):
+        return np.datetime64(start, "ms") + np.arange(count) * np.timedelta64(interval_size).astype("timedelta64[ms]")
+
+    # month, quarter and year intervals aren't a fixed size
+    intervals = np.empty(count, dtype="datetime64[ms]")
+    dt = start
+
+    for i in range(count):
+        intervals[i] = dt
+        dt = dt + interval_size
+
+    return intervals
+
+
+_ARROW_SERIES_COLUMNS = ["id", "type", "network", "region", "code", "fuel_tech", "data_type", "units"]
+
+
+def dataset_to_arrow(stat_set: OpennemDataSet | dict[str, Any]) -> "pa.Table":
+    """Data set as an arrow table with a row per series interval. Data set fields are kept in the
+    schema metadata under `opennem`"""
+    if not HAVE_ARROW:
+        raise Exception("pyarrow is required for arrow output")
+
+    content = dataset_to_dict(stat_set)
+
+    series_fields: dict[str, list[Any]] = {c: [] for c in _ARROW_SERIES_COLUMNS}
+    counts: list[int] = []
+    intervals: list[np.ndarray] = []
+    values: list[np.ndarray] = []
+    forecast: list[bool] = []
+
+    for series in content["data"]:
+        for history_key, is_forecast in (("history", False), ("forecast", True)):
+            history = series.get(history_key)
+
+            if not history or history.get("data") is None:
+                continue
+
+            series_values = np.asarray(history["data"], dtype=np.float64)
+
+            for column in _ARROW_SERIES_COLUMNS:
+                series_fields[column].append(series.get(column))
+
+            counts.append(len(series_values))
+            intervals.append(series_intervals(history["start"], len(series_values), history["interval"]))
+            values.append(series_values)
+            forecast.append(is_forecast)
+
+    # series fields are repeated for each of their rows by taking from the per series values
+    series_index = pa.array(np.repeat(np.arange(len(counts)), counts), type=pa.int64())
+
+    table = pa.table(
+        {
+            **{c: pa.array(v, type=pa.string()).take(series_index).dictionary_encode() for c, v in series_fields.items()},
+            "interval": pa.array(np.concatenate(intervals) if intervals else [], type=pa.timestamp("ms", tz="UTC")),
+            "value": pa.array(np.concatenate(values) if values else [], type=pa.float64(), from_pandas=True),
+            "forecast": pa.array(forecast, type=pa.bool_()).take(series_index),
+        }
+    )
+
+    metadata = {k: v for k, v in content.items() if k != "data"}
+
+    return table.replace_schema_metadata({"opennem": encode_json(metadata)})
+
+
+def encode_dataset(stat_set: OpennemDataSet | dict[str, Any], response_format: DataSetFormat = DataSetFormat.json) -> bytes:
+    if response_format == DataSetFormat.json:
+        return encode_json(dataset_to_dict(stat_set))
+
+    table = dataset_to_arrow(stat_set)
+    sink = pa.BufferOutputStream()
+
+    if response_format == DataSetFormat.arrow:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+
+    return sink.getvalue().to_pybytes()
+
+
+class DataSetCoder(JsonCoder):
+    """API cache coder that stores data sets as the JSON response content"""
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        if isinstance(value, OpennemDataSet):
+            return encode_dataset(value)
+
+        return super().encode(value)
+
+    @classmethod
+    def decode(cls, value: bytes | str) -> Any:
+        return decode_json(value)
+
+
+_REQUEST_PARAM = inspect.Parameter("__opennem_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+_RESPONSE_PARAM = inspect.Parameter("__opennem_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+
+
+def dataset_response(func: Callable) -> Callable:
+    """Encode the data set returned by a stats endpoint in the format the client accepts
+
+    Goes between the router and the cache decorators so that what is cached doesn't depend on the
+    format. Headers set on the endpoint response, such as the cache headers, are carried over and
+    anything that isn't a data set, like a redirect, is returned as is.
+    """
+    signature = inspect.signature(func)
+    parameters = list(signature.parameters.values())
+
+    # FastAPI only injects the request and response into one parameter each so share them with
+    # the endpoint, or the cache decorator, when it already takes them
+    request_param = next((p for p in parameters if p.annotation is Request), None)
+    response_param = next((p for p in parameters if p.annotation is Response), None)
+    injected = [p for p, existing in ((_REQUEST_PARAM, request_param), (_RESPONSE_PARAM, response_param)) if not existing]
+
+    @wraps(func)
+    async def inner(*args: Any, **kwargs: Any) -> Any:
+        request: Request = kwargs[request_param.name] if request_param else kwargs.pop(_REQUEST_PARAM.name)
+        sub_response: Response = kwargs[response_param.name] if response_param else kwargs.pop(_RESPONSE_PARAM.name)
+
+        response_format = negotiate_dataset_format(request.headers.get("accept"))
+
+        result = await func(*args, **kwargs)
+
+        if not isinstance(result, OpennemDataSet | dict):
+            return result
+
+        response = Response(
+            content=encode_dataset(result, response_format),
+            media_type=DATASET_MEDIA_TYPES[response_format],
+            status_code=sub_response.status_code or status.HTTP_200_OK,
+        )
+
+        response.headers.update(sub_response.headers)
+        response.headers["Vary"] = "Accept"
+
+        return response
+
+    variadic = [p for p in parameters if p.kind is inspect.Parameter.VAR_KEYWORD]
+    parameters = [p for p in parameters if p.kind is not inspect.Parameter.VAR_KEYWORD]
+
+    inner.__signature__ = signature.replace(parameters=[*parameters, *injected, *variadic])  # type: ignore
+
+    return inner
@@ -1,15 +1,14 @@
 import logging
 from datetime import date, datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
 from fastapi.responses import RedirectResponse
-from fastapi_cache.decorator import cache
 from fastapi_versionizer import api_version
-from sqlalchemy.engine.base import Engine
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from starlette import status
 
 from opennem import settings
+from opennem.api.cache import cache, network_cache_tags
 from opennem.api.export.controllers import power_week
 from opennem.api.export.queries import interconnector_flow_network_regions_query
 from opennem.api.time import human_to_interval, human_to_period, valid_database_interval
@@ -17,7 +16,7 @@ from opennem.controllers.output.schema import OpennemExportSeries
 from opennem.core.flows import invert_flow_set
 from opennem.core.networks import network_from_network_code
 from opennem.core.units import get_unit
-from opennem.db import get_database_engine, get_scoped_session
+from opennem.db import get_read_session
 from opennem.db.models.opennem import Facility, Station
 from opennem.queries.emissions import get_emission_factor_region_query
 from opennem.queries.price import get_network_region_price_query
@@ -26,9 +25,16 @@ from opennem.schema.time import TimePeriod
 from opennem.utils.dates import get_last_completed_interval_for_network, get_today_nem, is_aware
 from opennem.utils.time import human_to_timedelta
 
-from .controllers import get_scada_range, get_scada_range_optimized, stats_factory
+from .controllers import (
+    get_scada_range,
+    get_scada_range_optimized,
+    stats_factory,
+    stream_query_result_columns,
+    stream_query_results,
+)
+from .encoders import DATASET_RESPONSES, DataSetCoder, dataset_response
 from .queries import energy_facility_query, power_facility_query
-from .schema import DataQueryResult, OpennemDataSet
+from .schema import OpennemDataSet
 
 logger = logging.getLogger(__name__)
 
@@ -40,10 +46,12 @@ router = APIRouter()
     "/power/station/{network_code}/{station_code:path}",
     name="Power by Station",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
     description="Get the power outputs for a station",
 )
-@cache(expire=60 * 5)
+@dataset_response
+@cache(expire=60 * 5, tags=network_cache_tags, coder=DataSetCoder, namespace="dataset")
 async def power_station(
     station_code: str | None = None,
     network_code: str | None = None,
@@ -53,8 +61,6 @@ async def power_station(
     interval_human: str | None = None,
     period_human: str | None = None,
     period: str | None = None,  # type: ignore
-    session: Session = Depends(get_scoped_session),
-    engine: Engine = Depends(get_database_engine),  # type: ignore
 ) -> OpennemDataSet:
     if not network_code:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No network code")
@@ -101,15 +107,17 @@ async def power_station(
     period_obj: TimePeriod = human_to_period(period_human)
     units = get_unit("power")
 
-    station: Station | None = (
-        session.query(Station)
+    station_query = (
+        select(Station)
         .join(Facility)
-        .filter(Station.code == station_code)
-        .filter(Facility.network_id == network.code)
-        .filter(Station.approved.is_(True))
-        .one_or_none()
+        .where(Station.code == station_code)
+        .where(Facility.network_id == network.code)
+        .where(Station.approved.is_(True))
     )
 
+    async with get_read_session() as session:
+        station: Station | None = (await session.execute(station_query)).unique().scalar_one_or_none()
+
     if not station:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Station not found")
 
@@ -134,10 +142,8 @@ async def power_station(
 
     logger.debug(query)
 
-    with engine.connect() as c:
-        results = list(c.execute(query))
-
-    stats = [DataQueryResult(interval=i[0], result=i[1], group_by=i[2] if len(i) > 1 else None) for i in results]
+    async with get_read_session() as session:
+        stats = await stream_query_results(session, query, result_column=1, group_by_column=2)
 
     if not stats:
         raise HTTPException(
@@ -173,12 +179,12 @@ async def power_station(
     "/energy/station/{network_code}/{station_code:path}",
     name="Energy by Station",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
-@cache(expire=60 * 60 * 12)
+@dataset_response
+@cache(expire=60 * 60 * 12, coder=DataSetCoder, namespace="dataset")
 async def energy_station(
-    engine: Engine = Depends(get_database_engine),  # type: ignore
-    session: Session = Depends(get_scoped_session),
     date_min: datetime | None = None,
     date_max: datetime | None = None,
     network_code: str | None = None,
@@ -225,14 +231,13 @@ async def energy_station(
     period_obj = human_to_period(period)
     units = get_unit("energy")
 
-    station: Station | None = (
-        session.query(Station)
-        .join(Station.facilities)
-        .filter(Station.code == station_code)
-        .filter(Facility.network_id == network.code)
-        .one_or_none()
+    station_query = (
+        select(Station).join(Station.facilities).where(Station.code == station_code).where(Facility.network_id == network.code)
     )
 
+    async with get_read_session() as session:
+        station: Station | None = (await session.execute(station_query)).unique().scalar_one_or_none()
+
     if not station:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Station not found")
 
@@ -271,21 +276,11 @@ async def energy_station(
 
     logger.debug(query)
 
-    with engine.connect() as c:
-        row = list(c.execute(query))
-
-    if len(row) < 1:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Station stats not found",
+    async with get_read_session() as session:
+        results_energy, results_market_value, results_emissions = await stream_query_result_columns(
+            session, query, result_columns=[2, 3, 4], group_by_column=1
         )
 
-    results_energy = [DataQueryResult(interval=i[0], group_by=i[1], result=i[2] if len(i) > 1 else None) for i in row]
-
-    results_market_value = [DataQueryResult(interval=i[0], group_by=i[1], result=i[3] if len(i) > 1 else None) for i in row]
-
-    results_emissions = [DataQueryResult(interval=i[0], group_by=i[1], result=i[4] if len(i) > 1 else None) for i in row]
-
     if len(results_energy) < 1:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -345,24 +340,24 @@ Flows endpoints
     "/flow/network/{network_code}/{network_region_code}",
     name="Interconnector Flow Network for network region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
 @router.get(
     "/flow/network/{network_code}",
     name="Interconnector Flow Network",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
-@cache(expire=60 * 15)
+@dataset_response
+@cache(expire=60 * 15, tags=network_cache_tags, coder=DataSetCoder, namespace="dataset")
 async def power_flows_network_week(
     network_code: str,
     network_region_code: str | None = None,
     month: date | None = None,
-    engine: Engine = Depends(get_database_engine),  # type: ignore
 ) -> OpennemDataSet | None:
     """Get the last day of network flow data"""
-    engine = get_database_engine()
-
     network = network_from_network_code(network_code)
 
     if not network:
@@ -396,14 +391,13 @@ async def power_flows_network_week(
 
     query = interconnector_flow_network_regions_query(time_series=time_series, network_region=network_region_code)
 
-    with engine.connect() as c:
-        logger.debug(query)
-        row = list(c.execute(query))
+    logger.debug(query)
 
-    if not row:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No results")
+    async with get_read_session() as session:
+        imports = await stream_query_results(session, query, result_column=4, group_by_column=1)
 
-    imports = [DataQueryResult(interval=i[0], result=i[4], group_by=i[1] if len(i) > 1 else None) for i in row]
+    if not imports:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No results")
 
     result = stats_factory(
         imports,
@@ -441,8 +435,10 @@ async def power_flows_network_week(
     "/power/network/fueltech/{network_code}/{network_region_code}",
     name="Power Network Region by Fueltech",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
+@dataset_response
 async def power_network_region_fueltech(
     network_code: str, network_region_code: str | None = None, month: date | None = None
 ) -> OpennemDataSet | RedirectResponse:
@@ -521,23 +517,23 @@ async def power_network_region_fueltech(
     "/emissionfactor/network/{network_code}",
     name="Emission Factor per Network Region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
 @router.get(
     "/emissionfactor/network/{network_code}/{network_region_code}",
     name="Emission Factor for a Network Region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
-@cache(expire=60 * 5)
+@dataset_response
+@cache(expire=60 * 5, tags=network_cache_tags, coder=DataSetCoder, namespace="dataset")
 async def emission_factor_per_network(  # type: ignore
     network_code: str,
     interval: str = "5m",
     network_region_code: str | None = None,
-    engine=Depends(get_database_engine),  # type: ignore
 ) -> OpennemDataSet | None:
-    engine = get_database_engine()
-
     network = None
 
     try:
@@ -589,18 +585,17 @@ async def emission_factor_per_network(  # type: ignore
         interval=interval_obj,
     )
 
-    with engine.connect() as c:
-        logger.debug(query)
-        row = list(c.execute(query))
+    logger.debug(query)
+
+    async with get_read_session() as session:
+        emission_factors = await stream_query_results(session, query, result_column=4, group_by_column=1)
 
-    if not row:
+    if not emission_factors:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No results",
         )
 
-    emission_factors = [DataQueryResult(interval=i[0], result=i[4], group_by=i[1] if len(i) > 1 else None) for i in row]
-
     result = stats_factory(
         emission_factors,
         network=network,
@@ -629,46 +624,46 @@ async def emission_factor_per_network(  # type: ignore
     "/price/{network_code}/{network_region_code}",
     name="Price history by network and network region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
 @router.get(
     "/price/{network_code}",
     name="Price history by network and network region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
 @router.get(
     "/price/network/{network_code}/{network_region_code}",
     name="Price history by network and network region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
 @router.get(
     "/price/network/{network_code}",
     name="Price history by network and network region",
     response_model=OpennemDataSet,
+    responses=DATASET_RESPONSES,
     response_model_exclude_unset=True,
 )
-@cache(expire=60 * 5)
+@dataset_response
+@cache(expire=60 * 5, tags=network_cache_tags, coder=DataSetCoder, namespace="dataset")
 async def price_network_endpoint(
     network_code: str,
     network_region_code: str | None = None,
     forecasts: bool = False,
-    engine: Engine = Depends(get_database_engine),
 ) -> OpennemDataSet:
     """Returns network and network region price info for interval which defaults to network
     interval size
 
-    Args:
-        engine ([type], optional): Database engine. Defaults to Depends(get_database_engine).
-
     Raises:
         HTTPException: No results
 
     Returns:
         OpennemData: data set
     """
-    engine = get_database_engine()
 
     try:
         network = network_from_network_code(network_code)
@@ -718,18 +713,17 @@ async def price_network_endpoint(
         forecast=forecasts,
     )
 
-    with engine.begin() as c:
-        logger.debug(query)
-        row = list(c.execute(query))
+    logger.debug(query)
 
-    if not row:
+    async with get_read_session() as session:
+        result_set = await stream_query_results(session, query, result_column=3, group_by_column=2)
+
+    if not result_set:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No results",
         )
 
-    result_set = [DataQueryResult(interval=i[0], result=i[3], group_by=i[2] if len(i) > 1 else None) for i in row]
-
     result = stats_factory(
         result_set,
         network=network,
@@ -7,16 +7,24 @@ $ python -m opennem.cli
 
 import asyncio
 import logging
+from datetime import datetime, timedelta
 
 import click
+from rich.table import Table
 
-from opennem import settings
+from opennem import console, settings
+from opennem.core.completeness import CompletenessSource, rebuild_completeness
 from opennem.core.crawlers.cli import cmd_crawl_cli
+from opennem.core.networks import network_from_network_code
+from opennem.core.profiler import ProfileKind, get_task_profile_stats
+from opennem.db.clickhouse_mirror import MIRROR_TABLES, run_mirror_backfill
 from opennem.db.load_fixtures import load_bom_stations_json, load_fixtures, load_fueltechs
+from opennem.db.storage_layout import apply_storage_layout, get_storage_stats, plan_storage_layout
 from opennem.exporter.historic import export_historic_intervals
 from opennem.importer.db import import_all_facilities
 from opennem.importer.db import init as db_init
 from opennem.parsers.aemo.cli import cmd_data_cli
+from opennem.workers.backfill import BackfillJobType, create_backfill_job, get_backfill_jobs, run_backfill_job
 from opennem.workers.daily import all_runner, daily_runner
 from opennem.workers.energy import run_energy_update_archive
 
@@ -44,6 +52,81 @@ def cmd_db_fixtures() -> None:
     logger.info("Fixtures loaded")
 
 
+@click.command()
+@click.option("--start", required=True, type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.option("--end", required=False, type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option("--table", "tables", required=False, multiple=True, type=click.Choice(list(MIRROR_TABLES.keys())))
+@click.option("--concurrency", required=False, type=int, default=None)
+def cmd_db_clickhouse_mirror(start: datetime, end: datetime | None, tables: tuple[str, ...], concurrency: int | None) -> None:
+    """
+    Backfill the clickhouse mirror from postgres for a range of days
+    """
+    asyncio.run(
+        run_mirror_backfill(
+            date_start=start,
+            date_end=end or datetime.now(),
+            tables=[MIRROR_TABLES[t] for t in tables] or None,
+            concurrency=concurrency,
+        )
+    )
+
+
+@click.command()
+@click.option("--network", "network_code", required=True, type=str)
+@click.option("--start", required=True, type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.option("--end", required=False, type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option("--source", "sources", required=False, multiple=True, type=click.Choice([s.value for s in CompletenessSource]))
+def cmd_db_completeness_rebuild(network_code: str, start: datetime, end: datetime | None, sources: tuple[str, ...]) -> None:
+    """
+    Build the interval completeness index from the source tables for a range of days
+    """
+    network = network_from_network_code(network_code)
+
+    async def _rebuild() -> None:
+        for source in [CompletenessSource(s) for s in sources] or list(CompletenessSource):
+            await rebuild_completeness(network, source, start.date(), (end or datetime.now()).date())
+
+    asyncio.run(_rebuild())
+
+
+@click.command()
+@click.option("--apply", "apply_layout", is_flag=True, default=False, help="Run the statements")
+@click.option("--compress-after-days", required=False, type=int, default=None)
+def cmd_db_storage_layout(apply_layout: bool, compress_after_days: int | None) -> None:
+    """
+    Show or apply the statements that bring facility_scada in line with its storage layout
+    """
+    compress_after = timedelta(days=compress_after_days) if compress_after_days is not None else None
+
+    async def _run() -> None:
+        if apply_layout:
+            statements = await apply_storage_layout(compress_after=compress_after)
+        else:
+            statements = await plan_storage_layout(compress_after=compress_after)
+
+        for statement in statements:
+            console.print(statement)
+
+        stats = await get_storage_stats()
+
+        table = Table(title="facility_scada storage")
+
+        for column in ["Chunks", "Compressed", "Before compression", "After compression", "Total size"]:
+            table.add_column(column)
+
+        table.add_row(
+            str(stats.chunks),
+            str(stats.compressed_chunks),
+            str(stats.size_before_compression or ""),
+            str(stats.size_after_compression or ""),
+            str(stats.total_size),
+        )
+
+        console.print(table)
+
+    asyncio.run(_run())
+
+
 @click.group()
 def cmd_import() -> None:
     pass
@@ -115,12 +198,121 @@ def cmd_task_historic(weeks: int | None) -> None:
     export_historic_intervals(limit=weeks)
 
 
+@click.command()
+@click.option("--hours", type=int, default=24)
+@click.option("--kind", required=False, type=click.Choice([k.value for k in ProfileKind]), default=None)
+def cmd_task_profile(hours: int, kind: str | None) -> None:
+    """
+    Show p50, p95 and p99 latency of tasks and crawlers from the flushed profiler stats
+    """
+    stats = asyncio.run(
+        get_task_profile_stats(
+            since=datetime.now().astimezone() - timedelta(hours=hours), kind=ProfileKind(kind) if kind else None
+        )
+    )
+
+    table = Table(title=f"Task latency over the last {hours} hours")
+
+    for column in ["Kind", "Name", "Runs", "Errors", "Mean", "p50", "p95", "p99", "Max"]:
+        table.add_column(column)
+
+    for stat in stats:
+        table.add_row(
+            stat.kind,
+            stat.name,
+            str(stat.count),
+            str(stat.errors),
+            *[f"{value:.3f}s" for value in [stat.mean, stat.p50, stat.p95, stat.p99, stat.max]],
+        )
+
+    console.print(table)
+
+
+@click.group()
+def cmd_backfill() -> None:
+    pass
+
+
+@click.command()
+@click.option("--type", "job_type", required=True, type=click.Choice([t.value for t in BackfillJobType]))
+@click.option("--start", required=True, type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.option("--end", required=False, type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option("--network", "network_code", required=False, type=str, default=None)
+@click.option("--target", required=False, type=str, default=None, help="Crawler name for crawl backfills")
+@click.option("--chunk-days", required=False, type=int, default=None)
+@click.option("--processes", required=False, type=int, default=None)
+def cmd_backfill_run(
+    job_type: str,
+    start: datetime,
+    end: datetime | None,
+    network_code: str | None,
+    target: str | None,
+    chunk_days: int | None,
+    processes: int | None,
+) -> None:
+    """
+    Backfill a job type over a range of days in checkpointed chunks
+    """
+
+    async def _run() -> None:
+        job_id = await create_backfill_job(
+            BackfillJobType(job_type),
+            date_start=start,
+            date_end=end or datetime.now(),
+            network=network_from_network_code(network_code) if network_code else None,
+            target=target,
+            chunk_size=timedelta(days=chunk_days) if chunk_days else None,
+        )
+        console.print(f"Backfill job [bold]{job_id}[/bold]. Resume it with `opennem backfill resume {job_id}`")
+
+        await run_backfill_job(job_id, processes=processes)
+
+    asyncio.run(_run())
+
+
+@click.command()
+@click.argument("job_id", type=str)
+@click.option("--processes", required=False, type=int, default=None)
+def cmd_backfill_resume(job_id: str, processes: int | None) -> None:
+    """
+    Resume a backfill job from its checkpoints, running chunks that didn't complete
+    """
+    asyncio.run(run_backfill_job(job_id, processes=processes))
+
+
+@click.command()
+@click.option("--all", "show_all", is_flag=True, default=False, help="Include completed jobs")
+def cmd_backfill_status(show_all: bool) -> None:
+    """
+    Show backfill jobs and their chunks by status
+    """
+    table = Table(title="Backfill jobs")
+
+    for column in ["Job", "Type", "Network", "Target", "Start", "End", "Chunks", "Completed"]:
+        table.add_column(column)
+
+    for job in asyncio.run(get_backfill_jobs(incomplete=not show_all)):
+        table.add_row(
+            job.job_id,
+            job.job_type,
+            job.network_id or "",
+            job.target or "",
+            str(job.date_start),
+            str(job.date_end),
+            ", ".join(f"{status}: {count}" for status, count in sorted(job.chunks.items())),
+            str(job.completed_at or ""),
+        )
+
+    console.print(table)
+
+
 main.add_command(cmd_data_cli, name="data")
 main.add_command(cmd_crawl_cli, name="crawl")
 main.add_command(cmd_db, name="db")
 main.add_command(cmd_import, name="import")
 main.add_command(cmd_export, name="export")
 main.add_command(cmd_task, name="task")
+main.add_command(cmd_backfill, name="backfill")
 
 cmd_import.add_command(cmd_import_facilities, name="facilities")
 cmd_import.add_command(cmd_import_fueltechs, name="fueltechs")
@@ -129,12 +321,20 @@ cmd_import.add_command(cmd_import_bom_stations, name="bom")
 
 cmd_db.add_command(cmd_db_init, name="init")
 cmd_db.add_command(cmd_db_fixtures, name="fixtures")
+cmd_db.add_command(cmd_db_clickhouse_mirror, name="clickhouse-mirror")
+cmd_db.add_command(cmd_db_completeness_rebuild, name="completeness-rebuild")
+cmd_db.add_command(cmd_db_storage_layout, name="storage-layout")
+
 
+cmd_backfill.add_command(cmd_backfill_run, name="run")
+cmd_backfill.add_command(cmd_backfill_resume, name="resume")
+cmd_backfill.add_command(cmd_backfill_status, name="status")
 
 cmd_task.add_command(cmd_task_energy, name="energy")
 cmd_task.add_command(cmd_task_daily, name="daily")
 cmd_task.add_command(cmd_task_all, name="all")
 cmd_task.add_command(cmd_task_historic, name="historic")
+cmd_task.add_command(cmd_task_profile, name="profile")
 
 if __name__ == "__main__":
     try:
@@ -2,20 +2,24 @@
 
 import logging
 import urllib.parse as urlparse
+from collections.abc import Iterator
+from dataclasses import dataclass
 from datetime import date, datetime
 from json.decoder import JSONDecodeError
 from typing import Any
 from urllib.parse import urlencode
 
-from pydantic import ValidationError, field_validator, validator
+import numpy as np
+from pydantic import field_validator, validator
 
 from opennem import settings
 from opennem.core.normalizers import is_number
 from opennem.importer.rooftop import ROOFTOP_CODE
+from opennem.persistence.schema import SchemaFacilityScada
 from opennem.schema.core import BaseConfig
 from opennem.schema.network import NetworkNEM
 from opennem.utils.dates import get_today_opennem, parse_date
-from opennem.utils.httpx import httpx_factory
+from opennem.utils.httpx import http
 from opennem.utils.version import get_version
 
 logger = logging.getLogger(__name__)
@@ -90,6 +94,17 @@ def get_apvi_uri(date: date | None = None) -> str:
     return urlparse.urlunparse(url_parts)
 
 
+def parse_apvi_interval(value: Any) -> datetime:
+    """Parse an APVI interval timestamp into NEM time"""
+    interval_time = parse_date(value, dayfirst=False, yearfirst=True)
+
+    if not interval_time:
+        raise Exception(f"Invalid APVI forecast interval: {value}")
+
+    # All APVI data is in NEM time
+    return interval_time.astimezone(NetworkNEM.get_timezone())  # type: ignore
+
+
 class APVIForecastInterval(BaseConfig):
     trading_interval: datetime
     network_id: str = APVI_NETWORK_CODE
@@ -103,19 +118,7 @@ class APVIForecastInterval(BaseConfig):
     @field_validator("trading_interval", mode="before")
     @classmethod
     def _validate_trading_interval(cls, value: Any) -> datetime:
-        interval_time = parse_date(
-            value,
-            dayfirst=False,
-            yearfirst=True,
-        )
-
-        if not interval_time:
-            raise Exception(f"Invalid APVI forecast interval: {value}")
-
-        # All APVI data is in NEM time
-        interval_time = interval_time.astimezone(NetworkNEM.get_timezone())  # type: ignore
-
-        return interval_time
+        return parse_apvi_interval(value)
 
     # TODO[pydantic]: We couldn't refactor the `validator`, please replace it by `field_validator` manually.
     # Check https://docs.pydantic.dev/dev-v2/migration/#changes-to-validators for more information.
@@ -166,19 +169,150 @@ class APVIForecastSet(BaseConfig):
     capacities: list[APVIStateRooftopCapacity] | None = None
 
 
-_apvi_request_session = httpx_factory()
+_APVI_REQUEST_HEADERS = {"User-Agent": f"OpenNEM/{get_version()}"}
 
-_apvi_request_session.headers.update({"User-Agent": f"OpenNEM/{get_version()}"})
+_APVI_STATES = list(STATE_POSTCODE_PREFIXES.keys())
 
+# postcode prefix digit -> row in the state indicator matrix
+_APVI_STATE_INDEX = {prefix: _APVI_STATES.index(state) for state, prefix in STATE_POSTCODE_PREFIXES.items()}
+
+
+def get_state_indicator_matrix(postcode_prefixes: list[str]) -> np.ndarray:
+    """Builds a (state x postcode prefix) indicator matrix so that a rollup by state is a single matmul"""
+    indicator = np.zeros((len(_APVI_STATES), len(postcode_prefixes)))
+
+    for column, postcode_prefix in enumerate(postcode_prefixes):
+        state_row = _APVI_STATE_INDEX.get(postcode_prefix[:1])
+
+        if state_row is not None:
+            indicator[state_row, column] = 1
+
+    return indicator
+
+
+@dataclass(slots=True)
+class APVIStateRollup:
+    """Rooftop generation for a day of APVI data rolled up by state
+
+    generated is a (state x interval) matrix in MW with present masking out the
+    state intervals that had no postcode data reported
+    """
+
+    states: list[str]
+    intervals: list[datetime]
+    generated: np.ndarray
+    present: np.ndarray
+    capacities: dict[str, float]
+    installations: dict[str, int] | None = None
+
+    @property
+    def server_latest(self) -> datetime | None:
+        if not self.intervals or not self.present.any():
+            return None
+
+        return max(i for i, has_data in zip(self.intervals, self.present.any(axis=0), strict=True) if has_data)
+
+    def _iter_present(self) -> Iterator[tuple[str, datetime, float]]:
+        for state_row, interval_column in zip(*np.nonzero(self.present), strict=True):
+            yield self.states[state_row], self.intervals[interval_column], float(self.generated[state_row, interval_column])
+
+    def to_facility_scada(self) -> list[SchemaFacilityScada]:
+        """Records ready for the facility_scada bulk writer"""
+        return [
+            SchemaFacilityScada.model_construct(
+                network_id=APVI_NETWORK_CODE,
+                trading_interval=interval,
+                facility_code=f"{ROOFTOP_CODE}_{APVI_NETWORK_CODE}_{state}",
+                generated=generated,
+                eoi_quantity=generated / 4,
+                is_forecast=False,
+                energy_quality_flag=0,
+            )
+            for state, interval, generated in self._iter_present()
+        ]
+
+    def to_capacities(self) -> list[APVIStateRooftopCapacity]:
+        capacity_models = []
+
+        for state, capacity_registered in self.capacities.items():
+            unit_number = None
+
+            if self.installations and state.lower() in self.installations:
+                unit_number = self.installations[state.lower()]
+
+            capacity_models.append(
+                APVIStateRooftopCapacity(state=state, capacity_registered=capacity_registered, unit_number=unit_number)
+            )
+
+        return capacity_models
+
+    def to_forecast_set(self, crawled_at: datetime | None = None) -> APVIForecastSet:
+        intervals = [
+            APVIForecastInterval.model_construct(
+                trading_interval=interval,
+                network_id=APVI_NETWORK_CODE,
+                state=state,
+                facility_code=f"{ROOFTOP_CODE}_{APVI_NETWORK_CODE}_{state}",
+                generated=generated,
+                eoi_quantity=generated / 4,
+            )
+            for state, interval, generated in self._iter_present()
+        ]
+
+        return APVIForecastSet(
+            crawled_at=crawled_at, intervals=intervals, capacities=self.to_capacities(), server_latest=self.server_latest
+        )
 
-async def get_apvi_rooftop_data(day: date | None = None) -> APVIForecastSet | None:
-    """Obtains and parses APVI forecast data"""
+
+def rollup_apvi_response(performance: dict[str, dict[str, float]], capacity: dict[str, float]) -> APVIStateRollup:
+    """Rolls up APVI postcode performance (% of capacity) into state generation
+
+    Performance and capacity are loaded into a (postcode x interval) matrix and a
+    capacity vector and the capacity weighted sum by state is done as a single
+    matrix multiply against the postcode -> state indicator matrix
+    """
+    postcode_prefixes = [p for p in performance if p[:1] in _APVI_STATE_INDEX]
+
+    interval_keys = sorted({interval for p in postcode_prefixes for interval in performance[p]})
+    interval_index = {interval: column for column, interval in enumerate(interval_keys)}
+
+    performance_matrix = np.full((len(postcode_prefixes), len(interval_keys)), np.nan)
+
+    for row, postcode_prefix in enumerate(postcode_prefixes):
+        record = performance[postcode_prefix]
+        performance_matrix[row, [interval_index[i] for i in record]] = list(record.values())
+
+    capacity_vector = np.array([capacity.get(p, 0.0) for p in postcode_prefixes], dtype=float)
+
+    indicator = get_state_indicator_matrix(postcode_prefixes)
+    reported = ~np.isnan(performance_matrix)
+
+    generated = (indicator * capacity_vector) @ (np.nan_to_num(performance_matrix) / 100)
+    present = (indicator @ reported) > 0
+
+    # state capacities are summed across every prefix reported in the capacity map
+    capacity_prefixes = list(capacity.keys())
+    state_capacities = get_state_indicator_matrix(capacity_prefixes) @ np.array(
+        [capacity[p] for p in capacity_prefixes], dtype=float
+    )
+
+    return APVIStateRollup(
+        states=_APVI_STATES,
+        intervals=[parse_apvi_interval(i) for i in interval_keys],
+        generated=generated,
+        present=present,
+        capacities={state: float(state_capacities[row]) for row, state in enumerate(_APVI_STATES)},
+    )
+
+
+async def get_apvi_response(day: date | None = None) -> dict[str, Any] | None:
+    """Fetches and validates the APVI response for a day"""
 
     apvi_endpoint_url = get_apvi_uri(date=day)
 
     logger.info(f"Getting APVI data for day {day} from {apvi_endpoint_url}")
 
-    _resp = await _apvi_request_session.request("GET", apvi_endpoint_url, data={"day": day})
+    _resp = await http.request("GET", apvi_endpoint_url, data={"day": day}, headers=_APVI_REQUEST_HEADERS)
 
     if _resp.is_error:
         logger.error(f"Invalid APVI Return: {_resp.status_code}")
@@ -199,72 +333,31 @@ async def get_apvi_rooftop_data(day: date | None = None) -> APVIForecastSet | No
             logger.error(f"Invalid APVI response: {_req_key} field not found")
             return None
 
-    postcode_gen = _resp_json["performance"]
-    postcode_capacity = _resp_json["capacity"]
-    installations = _resp_json.get("installations", None)
-
-    # brisbane has no DST so its effectively NEM time
-    _run_at = get_today_opennem()
-    _interval_records = []
-
-    grouped_records = {}
-
-    for postcode_prefix, record in postcode_gen.items():
-        state = POSTCODE_STATE_PREFIXES.get(postcode_prefix[:1])
+    return _resp_json
 
-        if state not in grouped_records:
-            grouped_records[state] = {}
 
-        for interval, value in record.items():
-            if interval not in grouped_records[state]:
-                grouped_records[state][interval] = 0
+async def get_apvi_rooftop_rollup(day: date | None = None) -> APVIStateRollup | None:
+    """Obtains APVI data for a day rolled up by state"""
+    _resp_json = await get_apvi_response(day=day)
 
-            grouped_records[state][interval] += value / 100 * postcode_capacity[postcode_prefix]
-
-    for state, record in grouped_records.items():
-        for interval, value in record.items():
-            _interval_records.append(
-                APVIForecastInterval(trading_interval=interval, state=state, generated=value, eoi_quantity=value / 4)
-            )
-
-    _state_capacities = {}
-
-    # Calcualte state capacities
-    for postcode_prefix, capacity_val in postcode_capacity.items():
-        for state, prefix in STATE_POSTCODE_PREFIXES.items():
-            if state not in _state_capacities:
-                _state_capacities[state] = 0
-
-            if postcode_prefix.startswith(prefix):
-                _state_capacities[state] += capacity_val
-
-    # derive state capacity models
-    _state_capacity_models = []
-
-    for state, state_capacity in _state_capacities.items():
-        capacity_registered = state_capacity
-        unit_number = None
-
-        if installations and state.lower() in installations:
-            unit_number = installations[state.lower()]
+    if not _resp_json:
+        return None
 
-        _state_capacity_models.append(
-            APVIStateRooftopCapacity(state=state, capacity_registered=capacity_registered, unit_number=unit_number)
-        )
+    rollup = rollup_apvi_response(_resp_json["performance"], _resp_json["capacity"])
+    rollup.installations = _resp_json.get("installations", None)
 
-    apvi_server_latest: datetime | None = None
+    return rollup
 
-    trading_intervals = list({i.trading_interval for i in _interval_records})
 
-    if trading_intervals:
-        apvi_server_latest = max(trading_intervals)
+async def get_apvi_rooftop_data(day: date | None = None) -> APVIForecastSet | None:
+    """Obtains and parses APVI forecast data"""
+    rollup = await get_apvi_rooftop_rollup(day=day)
 
-    apvi_forecast_set = APVIForecastSet(crawled_at=_run_at, intervals=_interval_records, capacities=_state_capacity_models)
+    if not rollup:
+        return None
 
-    try:
-        apvi_forecast_set.server_latest = apvi_server_latest
-    except ValidationError:
-        logger.error(f"APVI validation error for server_latest: {apvi_server_latest} <{repr(apvi_server_latest)}>")
+    # brisbane has no DST so its effectively NEM time
+    apvi_forecast_set = rollup.to_forecast_set(crawled_at=get_today_opennem())
 
     return apvi_forecast_set
 
@@ -8,7 +8,7 @@ from zoneinfo import ZoneInfo
 from pydantic import BeforeValidator, model_validator
 
 from opennem.schema.core import BaseConfig
-from opennem.utils.httpx import httpx_factory
+from opennem.utils.httpx import get_browser_headers, http
 from opennem.utils.timezone import get_timezone_for_state
 
 logger = logging.getLogger("opennem.clients.bom")
@@ -95,8 +95,7 @@ async def get_bom_observations(observation_url: str, station_code: str) -> BOMOb
 
     logger.info(f"Fetching {observation_url}")
 
-    async with httpx_factory(mimic_browser=True, proxy=False) as http:
-        response = await http.get(observation_url)
+    response = await http.get(observation_url, headers=get_browser_headers())
 
     if response.status_code == 403:
         raise Exception(f"BoM client request exception: {response.status_code} - {response.text}")
@@ -7,7 +7,7 @@ from httpx import HTTPError, Response
 from pydantic import BaseModel
 
 from opennem import settings
-from opennem.utils.httpx import httpx_factory
+from opennem.utils.httpx import http
 
 logger = logging.getLogger("opennem.clients.clerk")
 
@@ -48,12 +48,8 @@ class ClerkClient:
     api_endpoint = "https://api.clerk.dev/v1/"
 
     def __init__(self) -> None:
-        self.session = httpx_factory(base_url=self.api_endpoint)
-
-        # Set headers for session requests
-        headers = {"Accept": "application/json", "Authorization": f"Bearer {settings.clerk_secret_key}"}
-
-        self.session.headers.update(headers)
+        # requests go through the shared client so headers are set per request
+        self.headers = {"Accept": "application/json", "Authorization": f"Bearer {settings.clerk_secret_key}"}
 
     def fix_and_validate_endpoint(self, endpoint: str) -> str:
         if not endpoint.startswith("/"):
@@ -64,11 +60,14 @@ class ClerkClient:
         return self
 
     async def __aexit__(self, *excinfo) -> None:  # type:ignore
-        await self.session.aclose()
+        pass
 
     async def _request(self, method: str, path: str, **kwargs) -> Response:  # type: ignore
+        url = f"{self.api_endpoint}{path.lstrip("/")}"
+        headers = {**self.headers, **kwargs.pop("headers", {})}
+
         try:
-            res = await self.session.request(method=method, url=path, **kwargs)
+            res = await http.request(method=method, url=url, headers=headers, **kwargs)
             res.raise_for_status()
         except HTTPError as e:
             raise ClerkClientException(f"{res.status_code}: {e}") from e
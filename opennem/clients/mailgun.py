@@ -3,9 +3,8 @@
 import asyncio
 import logging
 
-import httpx
-
 from opennem import settings
+from opennem.utils.httpx import http
 
 MAIL_DOMAIN = "mail.opennem.org.au"
 
@@ -25,9 +24,8 @@ async def send_email_mailgun(to_email: str, subject: str, text: str, from_email:
     # Set the request payload
     data = {"from": from_email, "to": to_email, "subject": subject, "text": text}
 
-    async with httpx.AsyncClient() as client:
-        # Send the POST request to the Mailgun API
-        response = await client.post(url, auth=auth, data=data)
+    # Send the POST request to the Mailgun API
+    response = await http.post(url, auth=auth, data=data)
 
     logger.debug(f"Mailgun response: {response.status_code} {response.text}")
 
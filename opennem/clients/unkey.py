@@ -1,93 +1,285 @@
 """unkney client for validating api keys"""
 
 import asyncio
+import hashlib
 import logging
+import weakref
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 
 import unkey
+from cachetools import TTLCache
 from pydantic import ValidationError
 from unkey import ApiKey, ErrorCode
 
 from opennem import settings
-from opennem.users.ratelimit import OPENNEM_RATELIMIT_ADMIN, OPENNEM_RATELIMIT_PRO, OPENNEM_RATELIMIT_USER
+from opennem.users.ratelimit import get_ratelimit_for_roles
 from opennem.users.schema import OpenNEMRoles, OpenNEMUser, OpenNEMUserRateLimit
 
 logger = logging.getLogger("opennem.clients.unkey")
 
 
-# @ttl_cache(maxsize=100, ttl=60 * 5)
-async def unkey_validate(api_key: str) -> None | OpenNEMUser:
-    """Validate a key with unkey"""
+class UnkeyException(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class UnkeyVerifiedKey:
+    """A verified key and the usage it has left, if it is usage limited"""
+
+    user: OpenNEMUser
+    remaining: int | None = None
+
+
+UnkeyVerifier = Callable[[str], Awaitable[UnkeyVerifiedKey | None]]
 
+_UNKEY_CLIENTS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, unkey.Client] = weakref.WeakKeyDictionary()
+
+
+async def get_unkey_client() -> unkey.Client:
+    """Long-lived unkey client for the running event loop"""
     if not settings.unkey_root_key:
-        raise Exception("No unkey root key set")
+        raise UnkeyException("No unkey root key set")
+
+    loop = asyncio.get_running_loop()
+
+    if loop not in _UNKEY_CLIENTS:
+        client = unkey.Client(api_key=settings.unkey_root_key)
+        await client.start()
+        _UNKEY_CLIENTS[loop] = client
 
+    return _UNKEY_CLIENTS[loop]
+
+
+async def close_unkey_client() -> None:
+    """Flush pending usage and close the unkey client for the running event loop"""
+    await unkey_usage.flush()
+
+    if client := _UNKEY_CLIENTS.pop(asyncio.get_running_loop(), None):
+        await client.close()
+
+
+async def unkey_verify_key(api_key: str) -> UnkeyVerifiedKey | None:
+    """Verify a key remotely with unkey. Returns None if the key is not valid and raises if unkey
+    could not be reached so that failures are not cached as invalid keys"""
     if not settings.unkey_api_id:
-        raise Exception("No unkey app id set")
+        raise UnkeyException("No unkey app id set")
+
+    client = await get_unkey_client()
 
-    client = unkey.Client(api_key=settings.unkey_root_key)
-    await client.start()
+    result = await client.keys.verify_key(key=api_key, api_id=settings.unkey_api_id)  # type: ignore
+
+    if result.is_err:
+        err = result.unwrap_err()
+        code = (err.code or unkey.models.ErrorCode.Unknown).value
+        raise UnkeyException(f"Unkey verification failed: {code}")
+
+    data = result.unwrap()
+    logger.debug(f"Unkey response data: {data}")
+
+    # Check if the code is NOT_FOUND and return None if so
+    if data.code == ErrorCode.NotFound:
+        logger.info("API key not found")
+        return None
+
+    if not data.valid:
+        logger.info("API key is not valid")
+        return None
+
+    if data.error:
+        logger.info(f"API key error: {data.error}")
+        return None
+
+    if not data.id:
+        logger.info("API key id is not valid no id")
+        return None
 
     try:
-        async with unkey.client.Client() as c:
-            result = await c.keys.verify_key(key=api_key, api_id=settings.unkey_api_id)  # type: ignore
+        model = OpenNEMUser(id=data.id, valid=data.valid, owner_id=data.owner_id, meta=data.meta, error=data.error)
 
-        if not result.is_ok:
-            logger.warning("Unkey verification failed")
-            return None
+        if data.ratelimit:
+            model.rate_limit = OpenNEMUserRateLimit(
+                limit=data.ratelimit.limit, remaining=data.ratelimit.remaining, reset=data.ratelimit.reset
+            )
 
-        if result.is_err:
-            err = result.unwrap_err()
-            code = (err.code or unkey.models.ErrorCode.Unknown).value
-            logger.info(f"Unkey verification failed: {code}")
-            return None
+        if data.meta:
+            if "roles" in data.meta:
+                for role in data.meta["roles"]:
+                    model.roles.append(OpenNEMRoles(role))
 
-        data = result.unwrap()
-        logger.debug(f"Unkey response data: {data}")
+    except ValidationError as ve:
+        logger.error(f"Pydantic validation error: {ve}")
+        for error in ve.errors():
+            logger.error(f"Field: {error["loc"][0]}, Error: {error["msg"]}")
+        return None
 
-        # Check if the code is NOT_FOUND and return None if so
-        if data.code == ErrorCode.NotFound:
-            logger.info("API key not found")
-            return None
+    return UnkeyVerifiedKey(user=model, remaining=data.remaining)
 
-        if not data.valid:
-            logger.info("API key is not valid")
-            return None
 
-        if data.error:
-            logger.info(f"API key error: {data.error}")
-            return None
+class UnkeyUsageSync:
+    """Counts requests made by usage limited keys served from cache and syncs them to unkey"""
 
-        if not data.id:
-            logger.info("API key id is not valid no id")
-            return None
+    def __init__(self) -> None:
+        self._pending: Counter[str] = Counter()
+
+    def record(self, key_id: str, count: int = 1) -> None:
+        self._pending[key_id] += count
+
+    @property
+    def pending(self) -> dict[str, int]:
+        return dict(self._pending)
+
+    async def flush(self) -> int:
+        """Decrement remaining usage in unkey for every key used since the last flush"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, Counter()
+
+        client = await get_unkey_client()
+        flushed = 0
+
+        for key_id, count in pending.items():
+            try:
+                result = await client.keys.update_remaining(key_id=key_id, value=count, op=unkey.models.UpdateOp.Decrement)
+            except Exception as e:
+                logger.error(f"Unkey usage sync failed for {key_id}: {e}")
+                self._pending[key_id] += count
+                continue
+
+            if result.is_err:
+                logger.error(f"Unkey usage sync failed for {key_id}: {result.unwrap_err()}")
+                self._pending[key_id] += count
+                continue
+
+            flushed += count
+
+        return flushed
+
+    async def run(self, interval: int | None = None) -> None:
+        """Flush usage on an interval until cancelled"""
+        interval = interval or settings.unkey_usage_sync_interval
+
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Unkey usage sync error: {e}")
+
+
+unkey_usage = UnkeyUsageSync()
+
+
+class UnkeyVerificationCache:
+    """TTL and LRU bounded cache of verified keys with negative caching of rejected keys
+
+    Keys are stored by their sha256 digest. Concurrent lookups for a key that is not cached
+    share a single remote verification. Usage limited keys have their remaining usage counted
+    down locally and recorded for sync back to unkey.
+    """
+
+    def __init__(
+        self,
+        verifier: UnkeyVerifier = unkey_verify_key,
+        usage: UnkeyUsageSync | None = None,
+        maxsize: int | None = None,
+        ttl: int | None = None,
+        negative_ttl: int | None = None,
+    ) -> None:
+        self.verifier = verifier
+        self.usage = usage or unkey_usage
+        self._valid: TTLCache[str, UnkeyVerifiedKey] = TTLCache(
+            maxsize=maxsize or settings.unkey_cache_maxsize, ttl=ttl or settings.unkey_cache_ttl
+        )
+        self._invalid: TTLCache[str, bool] = TTLCache(
+            maxsize=maxsize or settings.unkey_cache_maxsize, ttl=negative_ttl or settings.unkey_cache_negative_ttl
+        )
+        self._inflight: dict[str, asyncio.Future[UnkeyVerifiedKey | None]] = {}
+
+    @staticmethod
+    def _cache_key(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    def invalidate(self, api_key: str) -> None:
+        cache_key = self._cache_key(api_key)
+        self._valid.pop(cache_key, None)
+        self._invalid.pop(cache_key, None)
+
+    def clear(self) -> None:
+        self._valid.clear()
+        self._invalid.clear()
+
+    async def _verify(self, cache_key: str, api_key: str) -> UnkeyVerifiedKey | None:
+        if cache_key in self._inflight:
+            return await asyncio.shield(self._inflight[cache_key])
+
+        future: asyncio.Future[UnkeyVerifiedKey | None] = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
 
         try:
-            model = OpenNEMUser(id=data.id, valid=data.valid, owner_id=data.owner_id, meta=data.meta, error=data.error)
-
-            if data.ratelimit:
-                model.rate_limit = OpenNEMUserRateLimit(
-                    limit=data.ratelimit.limit, remaining=data.ratelimit.remaining, reset=data.ratelimit.reset
-                )
-
-            if data.meta:
-                if "roles" in data.meta:
-                    for role in data.meta["roles"]:
-                        model.roles.append(OpenNEMRoles(role))
-
-            return model
-        except ValidationError as ve:
-            logger.error(f"Pydantic validation error: {ve}")
-            for error in ve.errors():
-                logger.error(f"Field: {error["loc"][0]}, Error: {error["msg"]}")
+            verified = await self.verifier(api_key)
+        except Exception as e:
+            future.set_exception(e)
+            # retrieve so an unawaited future doesn't log
+            future.exception()
+            raise
+        else:
+            future.set_result(verified)
+        finally:
+            self._inflight.pop(cache_key, None)
+
+        if verified:
+            self._valid[cache_key] = verified
+        else:
+            self._invalid[cache_key] = True
+
+        return verified
+
+    async def get(self, api_key: str) -> OpenNEMUser | None:
+        """Get the user for a key, verifying it remotely only if it isn't cached"""
+        cache_key = self._cache_key(api_key)
+
+        if cache_key in self._invalid:
             return None
 
+        if verified := self._valid.get(cache_key):
+            if verified.remaining is not None:
+                if verified.remaining <= 0:
+                    return None
+
+                verified.remaining -= 1
+                self.usage.record(verified.user.id)
+        else:
+            # the remote verification counts as a use of the key
+            verified = await self._verify(cache_key, api_key)
+
+        if not verified:
+            return None
+
+        return verified.user.model_copy(deep=True)
+
+
+unkey_cache = UnkeyVerificationCache()
+
+
+async def unkey_validate(api_key: str) -> None | OpenNEMUser:
+    """Validate a key with unkey, served from the local verification cache where possible"""
+
+    if not settings.unkey_root_key:
+        raise Exception("No unkey root key set")
+
+    if not settings.unkey_api_id:
+        raise Exception("No unkey app id set")
+
+    try:
+        return await unkey_cache.get(api_key)
     except Exception as e:
         logger.exception(f"Unexpected error in unkey_validate: {e}")
         return None
 
-    finally:
-        await client.close()
-
 
 async def unkey_create_key(
     email: str, name: str, roles: list[OpenNEMRoles], ratelimit: unkey.Ratelimit | None = None
@@ -107,13 +299,7 @@ async def unkey_create_key(
     meta = {"roles": [role.value for role in roles], "email": email, "name": name}
 
     if not ratelimit:
-        ratelimit = OPENNEM_RATELIMIT_USER
-
-        if "pro" in roles:
-            ratelimit = OPENNEM_RATELIMIT_PRO
-
-        if "admin" in roles:
-            ratelimit = OPENNEM_RATELIMIT_ADMIN
+        ratelimit = get_ratelimit_for_roles(roles)
 
     try:
         async with unkey.client.Client(api_key=settings.unkey_root_key) as c:
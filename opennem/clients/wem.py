@@ -17,13 +17,12 @@ from datetime import datetime, timedelta
 from io import StringIO
 from typing import Any
 
-import requests
 from pydantic import ConfigDict, ValidationError, field_validator, validator
 
-from opennem import settings
 from opennem.schema.core import BaseConfig
 from opennem.schema.network import NetworkWEM
 from opennem.utils.dates import get_date_component, parse_date
+from opennem.utils.httpx import http
 from opennem.utils.random_agent import get_random_agent
 
 logger = logging.getLogger("opennem.client.wem")
@@ -170,16 +169,15 @@ class WEMFacilityIntervalSet(BaseConfig):
         return len(self.intervals)
 
 
-_wem_session = requests.Session()
-_wem_session.headers.update({"User-Agent": get_random_agent()})
+_WEM_REQUEST_HEADERS = {"User-Agent": get_random_agent()}
 
 
 class WEMFileNotFoundException(Exception):
     pass
 
 
-def wem_downloader(url: str, for_date: datetime | None = None, decode_content: bool = True) -> str:
-    """Downloads WEM content using the session"""
+async def wem_downloader(url: str, for_date: datetime | None = None, decode_content: bool = True) -> str:
+    """Downloads WEM content using the shared http client"""
     url_params = {
         "day": get_date_component("%d", dt=for_date),
         "month": get_date_component("%m", dt=for_date),
@@ -190,14 +188,14 @@ def wem_downloader(url: str, for_date: datetime | None = None, decode_content: b
 
     logger.info(f"Fetching {_url_parsed}")
 
-    response = _wem_session.get(_url_parsed, verify=settings.http_verify_ssl)
+    response = await http.get(_url_parsed, headers=_WEM_REQUEST_HEADERS)
 
     # sometimes with the WEM delay the current
     # month isn't up
     if response.status_code == 404:
         raise WEMFileNotFoundException()
 
-    if not response.ok:
+    if response.is_error:
         raise Exception(f"Get WEM facility intervals summary error: {response.status_code}")
 
     # @TODO mime detect and decoding
@@ -264,10 +262,10 @@ def parse_wem_balancing_summary(content: str) -> list[WEMBalancingSummaryInterva
     return _models
 
 
-def get_wem_live_balancing_summary() -> WEMBalancingSummarySet:
+async def get_wem_live_balancing_summary() -> WEMBalancingSummarySet:
     """Obtains WEM live balancing summary from pulse with forecasts
     (price, generation etc.) and returns a summary set model"""
-    resp = wem_downloader(_AEMO_WEM_LIVE_BALANCING_URL)
+    resp = await wem_downloader(_AEMO_WEM_LIVE_BALANCING_URL)
 
     _models = parse_wem_live_balancing_summary(resp)
 
@@ -291,10 +289,10 @@ def get_wem_live_balancing_summary() -> WEMBalancingSummarySet:
     return wem_set
 
 
-def get_wem_balancing_summary() -> WEMBalancingSummarySet:
+async def get_wem_balancing_summary() -> WEMBalancingSummarySet:
     """Obtains WEM balancing summary (price, generation etc.) and returns a
     summary set model"""
-    resp = wem_downloader(_AEMO_WEM_BALANCING_SUMMARY_URL)
+    resp = await wem_downloader(_AEMO_WEM_BALANCING_SUMMARY_URL)
 
     _models = parse_wem_balancing_summary(resp)
 
@@ -370,11 +368,11 @@ def parse_wem_facility_intervals(content: str) -> list[WEMGenerationInterval]:
     return _models
 
 
-def get_wem_live_facility_intervals(
+async def get_wem_live_facility_intervals(
     trim_intervals: bool = False, from_interval: datetime | None = None
 ) -> WEMFacilityIntervalSet:
     """Obtains WEM live facility intervals from infogrphic feeds"""
-    content = wem_downloader(_AEMO_WEM_LIVE_SCADA_URL)
+    content = await wem_downloader(_AEMO_WEM_LIVE_SCADA_URL)
     _models = parse_wem_facility_intervals(content)
 
     server_latest: datetime | None = None
@@ -405,7 +403,7 @@ def get_wem_live_facility_intervals(
     return wem_set
 
 
-def get_wem_facility_intervals(from_date: datetime | None = None) -> WEMFacilityIntervalSet:
+async def get_wem_facility_intervals(from_date: datetime | None = None) -> WEMFacilityIntervalSet:
     """Obtains WEM facility intervals from NEM web. Will default to most recent date
 
     @TODO not yet smart enough to know if it should check current or archive
@@ -413,11 +411,11 @@ def get_wem_facility_intervals(from_date: datetime | None = None) -> WEMFacility
     content: str | None = None
 
     try:
-        content = wem_downloader(_AEMO_WEM_SCADA_URL, from_date)
+        content = await wem_downloader(_AEMO_WEM_SCADA_URL, from_date)
     except WEMFileNotFoundException:
         _now = datetime.now()
         from_date = _now - timedelta(days=30)
-        content = wem_downloader(_AEMO_WEM_SCADA_URL, from_date)
+        content = await wem_downloader(_AEMO_WEM_SCADA_URL, from_date)
 
     if not content:
         raise Exception("No content for wem facility intervals")
@@ -442,9 +440,9 @@ def get_wem_facility_intervals(from_date: datetime | None = None) -> WEMFacility
     return wem_set
 
 
-def get_wem2_live_generation_models() -> list[WEMGenerationInterval]:
+async def get_wem2_live_generation_models() -> list[WEMGenerationInterval]:
     """Gets the latest WEM live generation CSV"""
-    resp = wem_downloader(_AEMO_WEM2_GENERATION_URL, decode_content=True)
+    resp = await wem_downloader(_AEMO_WEM2_GENERATION_URL, decode_content=True)
 
     if not isinstance(resp, str):
         raise Exception("Invalid response from WEM2 generation - not string")
@@ -501,11 +499,11 @@ def get_wem2_live_generation_models() -> list[WEMGenerationInterval]:
     return models
 
 
-def get_wem2_live_facility_intervals(
+async def get_wem2_live_facility_intervals(
     trim_intervals: bool = False, from_interval: datetime | None = None
 ) -> WEMFacilityIntervalSet:
     """Obtains WEM v2 live facility intervals from infogrphic feeds"""
-    _models = get_wem2_live_generation_models()
+    _models = await get_wem2_live_generation_models()
 
     server_latest: datetime | None = None
 
@@ -544,9 +542,10 @@ if __name__ == "__main__":
     # with open("wem.json", "w") as fh:
     #     fh.write(m.json(indent=4))
 
+    import asyncio
     from pprint import pprint
 
-    balancing_set = get_wem_live_balancing_summary()
+    balancing_set = asyncio.run(get_wem_live_balancing_summary())
 
     for model in balancing_set.intervals:
         pprint(dict(model))
@@ -28,9 +28,9 @@ class WEMDEDownloadException(Exception):
     pass
 
 
-def _wemde_download_dataset(url: str) -> dict:
+async def _wemde_download_dataset(url: str) -> dict:
     try:
-        json_dict = download_and_parse_json_zip(url)
+        json_dict = await download_and_parse_json_zip(url)
 
         if "data" not in json_dict:
             raise Exception("No data in JSON")
@@ -43,13 +43,13 @@ def _wemde_download_dataset(url: str) -> dict:
     return json_response
 
 
-def wemde_parse_facilityscada(url: str) -> list[SchemaFacilityScada]:
+async def wemde_parse_facilityscada(url: str) -> list[SchemaFacilityScada]:
     """Parses a WEMDE dataset"""
 
     # key to extract
     key_field = "facilityScadaDispatchIntervals"
 
-    download_json = _wemde_download_dataset(url)
+    download_json = await _wemde_download_dataset(url)
 
     if key_field not in download_json:
         raise Exception(f"No {key_field} in JSON")
@@ -81,13 +81,13 @@ def wemde_parse_facilityscada(url: str) -> list[SchemaFacilityScada]:
     return models
 
 
-def wemde_parse_trading_price(url: str) -> list[SchemaBalancingSummary]:
+async def wemde_parse_trading_price(url: str) -> list[SchemaBalancingSummary]:
     """Parse WEMDE trading price"""
 
     # key to extract
     key_field = "referenceTradingPrices"
 
-    download_json = _wemde_download_dataset(url)
+    download_json = await _wemde_download_dataset(url)
 
     if key_field not in download_json:
         raise Exception(f"No {key_field} in JSON")
@@ -120,10 +120,12 @@ def wemde_parse_trading_price(url: str) -> list[SchemaBalancingSummary]:
 
 # debug entry point
 if __name__ == "__main__":
+    import asyncio
+
     url = (
         "https://data.wa.aemo.com.au/public/market-data/wemde/referenceTradingPrice/current/ReferenceTradingPrice_2024-01-13.json"
     )
-    models = wemde_parse_trading_price(url)
+    models = asyncio.run(wemde_parse_trading_price(url))
     print(len(models))
     # with open("wem-live.json", "w") as fh:
     # fh.write(m.json(indent=4))
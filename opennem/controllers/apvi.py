@@ -10,10 +10,12 @@ from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
 
-from opennem.clients.apvi import APVIForecastSet
+from opennem.clients.apvi import APVIForecastSet, APVIStateRollup
 from opennem.controllers.schema import ControllerReturn
 from opennem.db import SessionLocal, db_connect
+from opennem.db.bulk_insert_csv import index_inserted_records
 from opennem.db.models.opennem import Facility, FacilityScada
+from opennem.persistence.postgres_facility_scada import persist_facility_scada_bulk
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +33,9 @@ async def store_apvi_forecastset(forecast_set: APVIForecastSet) -> ControllerRet
     cr.total_records = len(forecast_set.intervals)
 
     for _rec in forecast_set.intervals:
-        records_to_store.append({**_rec.dict(exclude={"state"}), "is_forecast": False})
+        records_to_store.append(
+            {**_rec.dict(exclude={"state", "trading_interval"}), "interval": _rec.trading_interval, "is_forecast": False}
+        )
         cr.processed_records += 1
 
     if not records_to_store:
@@ -41,7 +45,7 @@ async def store_apvi_forecastset(forecast_set: APVIForecastSet) -> ControllerRet
         stmt = insert(FacilityScada).values(records_to_store)
         stmt.bind = engine
         stmt = stmt.on_conflict_do_update(
-            index_elements=["trading_interval", "network_id", "facility_code", "is_forecast"],
+            index_elements=["interval", "network_id", "facility_code", "is_forecast"],
             set_={
                 "generated": stmt.excluded.generated,
                 "eoi_quantity": stmt.excluded.eoi_quantity,
@@ -50,6 +54,7 @@ async def store_apvi_forecastset(forecast_set: APVIForecastSet) -> ControllerRet
 
         try:
             await session.execute(stmt)
+            await index_inserted_records(session, FacilityScada, records_to_store)
             await session.commit()
             cr.inserted_records = len(records_to_store)
         except Exception as e:
@@ -60,14 +65,39 @@ async def store_apvi_forecastset(forecast_set: APVIForecastSet) -> ControllerRet
     return cr
 
 
-async def update_apvi_facility_capacities(forecast_set: APVIForecastSet) -> None:
+async def store_apvi_rollup(rollup: APVIStateRollup) -> ControllerReturn:
+    """Persist an APVI state rollup straight to facility_scada with the bulk writer"""
+    cr = ControllerReturn()
+
+    records = rollup.to_facility_scada()
+
+    cr.total_records = len(records)
+    cr.processed_records = len(records)
+    cr.server_latest = rollup.server_latest
+
+    if not records:
+        return cr
+
+    try:
+        await persist_facility_scada_bulk(records, update_fields=["generated", "eoi_quantity"])
+        cr.inserted_records = len(records)
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        cr.errors = len(records)
+        cr.error_detail.append(str(e))
+
+    return cr
+
+
+async def update_apvi_facility_capacities(forecast_set: APVIForecastSet | APVIStateRollup) -> None:
     """Updates facility capacities for APVI rooftops"""
+    capacities = forecast_set.to_capacities() if isinstance(forecast_set, APVIStateRollup) else forecast_set.capacities
 
-    if not forecast_set.capacities:
+    if not capacities:
         return None
 
     async with SessionLocal() as session:
-        for state_capacity in forecast_set.capacities:
+        for state_capacity in capacities:
             stmt = (
                 select(Facility)
                 .options(selectinload(Facility.network))  # Add any other relationships you need to load
@@ -87,4 +117,4 @@ async def update_apvi_facility_capacities(forecast_set: APVIForecastSet) -> None
 
         await session.commit()
 
-    logger.info(f"Updated {len(forecast_set.capacities)} facility capacities")
+    logger.info(f"Updated {len(capacities)} facility capacities")
@@ -5,19 +5,23 @@ Parses MMS tables into OpenNEM derived database
 
 import logging
 from collections.abc import Hashable
+from datetime import datetime
 from typing import Any
 
+import numpy as np
 import pandas as pd
 from sqlalchemy.dialects.postgresql import insert
 
 from opennem.controllers.schema import ControllerReturn
+from opennem.core.facility.dimensions import FacilityDimensions, get_facility_dimensions
 from opennem.core.networks import NetworkNEM
 from opennem.core.normalizers import clean_float
 from opennem.core.parsers.aemo.mms import AEMOTableSchema, AEMOTableSet
+from opennem.core.tracing import IngestMetric, IngestStage, ingest_count, ingest_span
 from opennem.db import SessionLocal
-from opennem.db.bulk_insert_csv import bulkinsert_mms_items
+from opennem.db.bulk_insert_csv import bulkinsert_mms_items, index_inserted_records
 from opennem.db.models.opennem import BalancingSummary, FacilityScada
-from opennem.importer.rooftop import rooftop_remap_regionids
+from opennem.importer.rooftop import rooftop_remap_facility_codes
 from opennem.schema.aemo.mms import MMSBaseClass
 from opennem.schema.network import NetworkAEMORooftop, NetworkSchema
 from opennem.utils.dates import parse_date
@@ -47,54 +51,84 @@ def generate_facility_scada(
     power_field: str = "scadavalue",
     energy_field: str | None = None,
     is_forecast: bool = False,
+    dimensions: FacilityDimensions | None = None,
 ) -> list[dict[Hashable, Any]]:
-    """Optimized facility scada generator"""
+    """Optimized facility scada generator
 
-    df = pd.DataFrame().from_records(records)
+    With facility dimensions retired DUIDs are stored against the facility they map to"""
 
-    column_renames = {
-        interval_field: "interval",
-        power_field: "generated",
-        facility_code_field: "facility_code",
-    }
+    with ingest_span(IngestStage.transform, table="facility_scada", network=network.code) as span:
+        df = pd.DataFrame().from_records(records)
 
-    if energy_field:
-        column_renames[energy_field] = "eoi_quantity"
-    else:
-        df["eoi_quantity"] = None
+        column_renames = {
+            interval_field: "interval",
+            power_field: "generated",
+            facility_code_field: "facility_code",
+        }
 
-    df = df.rename(columns=column_renames)
+        if energy_field:
+            column_renames[energy_field] = "eoi_quantity"
+        else:
+            df["eoi_quantity"] = None
 
-    df["network_id"] = network.code
-    df["is_forecast"] = is_forecast
-    df["energy"] = 0
-    df["energy_quality_flag"] = 0
+        df = df.rename(columns=column_renames)
 
-    # cast dates
-    df.interval = pd.to_datetime(df.interval)
+        df["network_id"] = network.code
+        df["is_forecast"] = is_forecast
+        df["energy"] = 0
+        df["energy_quality_flag"] = 0
 
-    df.generated = pd.to_numeric(df.generated)
-    df["generated"] = df["generated"].fillna(0)
+        # cast dates
+        df.interval = pd.to_datetime(df.interval)
 
-    # fill in energies
-    df["eoi_quantity"] = df.generated / (60 / network.interval_size)
+        df.generated = pd.to_numeric(df.generated)
+        df["generated"] = df["generated"].fillna(0)
 
-    df = df[FACILITY_SCADA_COLUMN_NAMES]
+        # fill in energies
+        df["eoi_quantity"] = df.generated / (60 / network.interval_size)
 
-    # set the index
-    df.set_index(["interval", "network_id", "facility_code", "is_forecast"], inplace=True)
+        df = df[FACILITY_SCADA_COLUMN_NAMES]
 
-    # @NOTE optimized way to drop duplicates
-    df = df[~df.index.duplicated(keep="last")]
+        # set the index
+        df.set_index(["interval", "network_id", "facility_code", "is_forecast"], inplace=True)
 
-    # records = df
+        # @NOTE optimized way to drop duplicates
+        df = df[~df.index.duplicated(keep="last")]
 
-    # reorder columns
-    clean_records = df.reset_index(inplace=False)[FACILITY_SCADA_COLUMN_NAMES].to_dict("records")
+        if dimensions is not None:
+            df = _resolve_facility_codes(df, dimensions)
+
+        # records = df
+
+        # reorder columns
+        clean_records = df.reset_index(inplace=False)[FACILITY_SCADA_COLUMN_NAMES].to_dict("records")
+
+        span.set("rows", len(clean_records))
+        ingest_count(IngestMetric.rows_transformed, len(clean_records), table="facility_scada")
 
     return clean_records
 
 
+def _resolve_facility_codes(df: pd.DataFrame, dimensions: FacilityDimensions) -> pd.DataFrame:
+    """Map retired DUIDs to their facility, summing units that now make up one facility"""
+    codes = df.index.get_level_values("facility_code").to_numpy(dtype=str)
+    resolved = dimensions.resolve(codes)
+    aliased = resolved != codes
+
+    if not aliased.any():
+        return df
+
+    df = df.reset_index()
+    df["facility_code"] = np.where(aliased, resolved, df["facility_code"])
+
+    return df.groupby(["interval", "network_id", "facility_code", "is_forecast"]).sum()
+
+
+def ingested_intervals(records: list[dict[Hashable, Any]] | list[dict[str, Any]]) -> list[datetime]:
+    """Distinct intervals of stored records"""
+    return sorted({r["interval"] for r in records if r["interval"]})
+
+
 # Processors
 
 
@@ -146,10 +180,12 @@ async def process_dispatch_interconnectorres(table: AEMOTableSchema) -> Controll
             )
 
             await session.execute(stmt)
+            await index_inserted_records(session, FacilityScada, records_to_store)
             await session.commit()
 
             cr.inserted_records = cr.processed_records
             cr.server_latest = max([r["interval"] for r in records_to_store]) if records_to_store else None
+            cr.intervals = ingested_intervals(records_to_store)
         except Exception as e:
             logger.error("Error inserting dispatch interconnectorres records")
             logger.error(e)
@@ -204,10 +240,12 @@ async def process_nem_price(table: AEMOTableSchema) -> ControllerReturn:
             )
 
             await session.execute(stmt)
+            await index_inserted_records(session, BalancingSummary, records_to_store)
             await session.commit()
 
             cr.inserted_records = cr.processed_records
             cr.server_latest = max([r["interval"] for r in records_to_store]) if records_to_store else None
+            cr.intervals = ingested_intervals(records_to_store)
         except Exception as e:
             logger.error("Error inserting NEM price records")
             logger.error(e)
@@ -266,10 +304,12 @@ async def process_dispatch_regionsum(table: AEMOTableSchema) -> ControllerReturn
             )
 
             await session.execute(stmt)
+            await index_inserted_records(session, BalancingSummary, records_to_store)
             await session.commit()
 
             cr.inserted_records = cr.processed_records
             cr.server_latest = max([r["interval"] for r in records_to_store]) if records_to_store else None
+            cr.intervals = ingested_intervals(records_to_store)
         except Exception as e:
             logger.error("Error inserting dispatch regionsum records")
             logger.error(e)
@@ -345,11 +385,13 @@ async def process_trading_regionsum(table: AEMOTableSchema) -> ControllerReturn:
             )
 
             await session.execute(stmt)
+            await index_inserted_records(session, BalancingSummary, records_to_store)
             await session.commit()
 
             cr.inserted_records = records_processed
             cr.processed_records = records_processed
             cr.server_latest = max([i["interval"] for i in records_to_store]) if records_to_store else None
+            cr.intervals = ingested_intervals(records_to_store)
         except Exception as e:
             logger.error("Error inserting records")
             logger.error(e)
@@ -369,11 +411,13 @@ async def process_unit_scada_optimized(table: AEMOTableSchema) -> ControllerRetu
         interval_field="settlementdate",
         facility_code_field="duid",
         power_field="scadavalue",
+        dimensions=await get_facility_dimensions(),
     )
 
     cr.processed_records = len(records)
     cr.inserted_records = await bulkinsert_mms_items(FacilityScada, records, ["generated", "eoi_quantity"])  # type: ignore
     cr.server_latest = max([i["interval"] for i in records if i["interval"]])
+    cr.intervals = ingested_intervals(records)
 
     return cr
 
@@ -386,11 +430,13 @@ async def process_unit_solution(table: AEMOTableSchema) -> ControllerReturn:
         interval_field="settlementdate",
         facility_code_field="duid",
         power_field="initialmw",
+        dimensions=await get_facility_dimensions(),
     )
 
     cr.processed_records = len(records)
     cr.inserted_records = await bulkinsert_mms_items(FacilityScada, records, ["generated"])
     cr.server_latest = max([i["interval"] for i in records if i["interval"]])
+    cr.intervals = ingested_intervals(records)
 
     return cr
 
@@ -403,11 +449,13 @@ async def process_meter_data_gen_duid(table: AEMOTableSchema) -> ControllerRetur
         interval_field="interval_datetime",
         facility_code_field="duid",
         power_field="mwh_reading",
+        dimensions=await get_facility_dimensions(),
     )
 
     cr.processed_records = len(records)
     cr.inserted_records = await bulkinsert_mms_items(FacilityScada, records, ["generated"])
     cr.server_latest = max([i["interval"] for i in records])
+    cr.intervals = ingested_intervals(records)
 
     return cr
 
@@ -423,12 +471,12 @@ async def process_rooftop_actual(table: AEMOTableSchema) -> ControllerReturn:
         network=NetworkAEMORooftop,
     )
 
-    records = [rooftop_remap_regionids(i) for i in records if i]
-    records = [i for i in records if i]
+    records = rooftop_remap_facility_codes(records, await get_facility_dimensions())
 
     cr.processed_records = len(records)
     cr.inserted_records = await bulkinsert_mms_items(FacilityScada, records, ["generated", "eoi_quantity"])
     cr.server_latest = max([i["interval"] for i in records])
+    cr.intervals = ingested_intervals(records)
 
     return cr
 
@@ -445,8 +493,7 @@ async def process_rooftop_forecast(table: AEMOTableSchema) -> ControllerReturn:
         network=NetworkAEMORooftop,
     )
 
-    records = [rooftop_remap_regionids(i) for i in records if i]  # type: ignore
-    records = [i for i in records if i]
+    records = rooftop_remap_facility_codes(records, await get_facility_dimensions())  # type: ignore
 
     cr.processed_records = len(records)
     cr.inserted_records = await bulkinsert_mms_items(FacilityScada, records, ["generated"])  # type: ignore
@@ -504,5 +551,6 @@ async def store_aemo_tableset(tableset: AEMOTableSet) -> ControllerReturn:
             cr.errors += record_item.errors
             cr.error_detail += record_item.error_detail
             cr.server_latest = record_item.server_latest
+            cr.intervals += record_item.intervals
 
     return cr
@@ -19,3 +19,5 @@ class ControllerReturn(BaseConfig):
     errors: int = 0
     error_detail: list[str | None] = []
     crawls_run: int | None = None
+    # intervals of the actual (not forecast) records stored
+    intervals: list[datetime] = []
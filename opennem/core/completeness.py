@@ -0,0 +1,399 @@
+"""
+OpenNEM interval completeness index
+
+Records which intervals have power, energy and price data per network and source table as one
+bitmap per network day in interval_completeness. Bit n of a day is the nth interval from midnight
+network time.
+
+Bitmaps are OR'd in as records are ingested, by the bulk insert and by `index_inserted_records`
+for writers that insert on a session, so gap detection reads a handful of bitmaps rather than
+scanning facility_scada or balancing_summary. `rebuild_completeness` sets them again from the
+source table for a range, for backfilling the index and after gaps are repaired.
+
+The migration seeds the index for recent days only. History is indexed as a deploy step with
+`opennem db completeness-rebuild` for each network.
+
+Forecast records are not indexed.
+"""
+
+import enum
+import logging
+from collections.abc import Hashable, Iterable, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import asyncpg
+from sqlalchemy import text
+
+from opennem.core.networks import network_from_network_code
+from opennem.db import SessionLocalAsync, get_read_session
+from opennem.schema.network import NetworkSchema
+
+logger = logging.getLogger("opennem.core.completeness")
+
+
+class CompletenessSource(enum.Enum):
+    facility_scada = "facility_scada"
+    balancing_summary = "balancing_summary"
+
+
+class CompletenessMetric(enum.Enum):
+    power = "power"
+    energy = "energy"
+    price = "price"
+
+
+# source column indexed for each metric
+_SOURCE_METRICS: dict[CompletenessSource, dict[CompletenessMetric, str]] = {
+    CompletenessSource.facility_scada: {CompletenessMetric.power: "generated", CompletenessMetric.energy: "energy"},
+    CompletenessSource.balancing_summary: {CompletenessMetric.price: "price"},
+}
+
+# asyncpg as it runs in the bulk insert transaction. bitmaps of a different length are replaced
+# as the network interval size has changed
+_COMPLETENESS_UPSERT_QUERY = """
+    insert into interval_completeness as c (network_id, source_table, metric, day, intervals)
+    select t.network_id, t.source_table, t.metric, t.day, t.intervals::varbit
+    from unnest($1::text[], $2::text[], $3::text[], $4::date[], $5::text[]) as t(network_id, source_table, metric, day, intervals)
+    on conflict (network_id, source_table, metric, day) do update set
+        intervals = case
+            when length(c.intervals) = length(excluded.intervals) then c.intervals | excluded.intervals
+            else excluded.intervals
+        end,
+        updated_at = now()
+    where
+        length(c.intervals) <> length(excluded.intervals)
+        or c.intervals | excluded.intervals <> c.intervals
+"""
+
+_COMPLETENESS_QUERY = text(
+    """
+    select day, intervals::text
+    from interval_completeness
+    where
+        network_id = :network_id
+        and source_table = :source_table
+        and metric = :metric
+        and day >= :date_start
+        and day <= :date_end
+    """
+)
+
+_COMPLETENESS_REPLACE_QUERY = text(
+    """
+    insert into interval_completeness (network_id, source_table, metric, day, intervals)
+    values (:network_id, :source_table, :metric, :day, cast(:intervals as varbit))
+    on conflict (network_id, source_table, metric, day) do update set
+        intervals = excluded.intervals,
+        updated_at = now()
+    """
+)
+
+
+def completeness_interval_size(network: NetworkSchema, source: CompletenessSource) -> int:
+    """Size in minutes of the intervals indexed for a network and source table
+
+    Both tables are stored at the network interval size, including the WEM balancing summary
+    which holds its 30 minute trading interval prices, so bitmaps match the rows in the source"""
+    return network.interval_size
+
+
+@dataclass(slots=True)
+class DayBitmap:
+    """Intervals present in a day. Bit n is the nth interval from midnight"""
+
+    size: int
+    bits: int = 0
+
+    def set(self, index: int) -> None:
+        self.bits |= 1 << index
+
+    def has(self, index: int) -> bool:
+        return bool(self.bits >> index & 1)
+
+    def to_bitstring(self) -> str:
+        return format(self.bits, f"0{self.size}b")[::-1]
+
+    @classmethod
+    def from_bitstring(cls, bitstring: str) -> "DayBitmap":
+        return cls(size=len(bitstring), bits=int(bitstring[::-1], 2) if bitstring else 0)
+
+
+@dataclass(frozen=True, slots=True)
+class CompletenessKey:
+    network_id: str
+    source: CompletenessSource
+    metric: CompletenessMetric
+    day: date
+
+
+def _interval_position(interval: datetime, interval_size: int) -> tuple[date, int]:
+    midnight = interval.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return interval.date(), int((interval - midnight).total_seconds() // 60) // interval_size
+
+
+def completeness_from_records(
+    source: CompletenessSource, records: Iterable[dict[Hashable, Any]]
+) -> dict[CompletenessKey, DayBitmap]:
+    """Bitmaps of the intervals with data in a batch of records"""
+    metrics = _SOURCE_METRICS[source]
+    bitmaps: dict[CompletenessKey, DayBitmap] = {}
+    interval_sizes: dict[str, int | None] = {}
+
+    for record in records:
+        if record.get("is_forecast"):
+            continue
+
+        network_id = record["network_id"]
+
+        if network_id not in interval_sizes:
+            try:
+                interval_sizes[network_id] = completeness_interval_size(network_from_network_code(network_id), source)
+            except Exception:
+                logger.warning(f"No interval size for network {network_id}, not indexing completeness")
+                interval_sizes[network_id] = None
+
+        interval_size = interval_sizes[network_id]
+
+        if not interval_size:
+            continue
+
+        interval = record["interval"]
+
+        if isinstance(interval, str):
+            interval = datetime.fromisoformat(interval)
+
+        day, index = _interval_position(interval, interval_size)
+
+        for metric, column in metrics.items():
+            if record.get(column) is None:
+                continue
+
+            key = CompletenessKey(network_id, source, metric, day)
+
+            if key not in bitmaps:
+                bitmaps[key] = DayBitmap(size=24 * 60 // interval_size)
+
+            bitmaps[key].set(index)
+
+    return bitmaps
+
+
+async def upsert_completeness(conn: asyncpg.Connection, bitmaps: dict[CompletenessKey, DayBitmap]) -> None:
+    """OR the bitmaps for a batch into the index on a bulk insert connection"""
+    if not bitmaps:
+        return None
+
+    await conn.execute(
+        _COMPLETENESS_UPSERT_QUERY,
+        [k.network_id for k in bitmaps],
+        [k.source.value for k in bitmaps],
+        [k.metric.value for k in bitmaps],
+        [k.day for k in bitmaps],
+        [b.to_bitstring() for b in bitmaps.values()],
+    )
+
+
+async def get_completeness(
+    network: NetworkSchema, source: CompletenessSource, metric: CompletenessMetric, date_start: date, date_end: date
+) -> dict[date, DayBitmap]:
+    """Bitmaps for each indexed day in a range. Both dates are inclusive"""
+    async with get_read_session() as session:
+        result = await session.execute(
+            _COMPLETENESS_QUERY,
+            {
+                "network_id": network.code,
+                "source_table": source.value,
+                "metric": metric.value,
+                "date_start": date_start,
+                "date_end": date_end,
+            },
+        )
+        rows = result.fetchall()
+
+    return {day: DayBitmap.from_bitstring(intervals) for day, intervals in rows}
+
+
+def _network_time(dt: datetime, network: NetworkSchema) -> datetime:
+    """Naive network time as stored in the source tables"""
+    if dt.tzinfo:
+        dt = dt.astimezone(network.get_fixed_offset()).replace(tzinfo=None)
+
+    return dt
+
+
+def bitmap_intervals(
+    bitmaps: dict[date, DayBitmap],
+    date_min: datetime,
+    date_max: datetime,
+    interval_size: int,
+    present: bool = True,
+    required: dict[date, DayBitmap] | None = None,
+) -> list[datetime]:
+    """
+    Intervals from date_min (inclusive) to date_max (exclusive) set in the bitmaps, or missing from
+    them if not present. With required only intervals also set in it are returned, such as
+    intervals with power missing energy.
+    """
+    intervals: list[datetime] = []
+    size = 24 * 60 // interval_size
+    day = date_min.date()
+
+    while day <= date_max.date():
+        midnight = datetime.combine(day, datetime.min.time())
+        bitmap = bitmaps.get(day) or DayBitmap(size=size)
+        required_bitmap = (required.get(day) or DayBitmap(size=size)) if required is not None else None
+
+        for index in range(size):
+            if bitmap.has(index) is not present:
+                continue
+
+            if required_bitmap is not None and not required_bitmap.has(index):
+                continue
+
+            interval = midnight + timedelta(minutes=index * interval_size)
+
+            if date_min <= interval < date_max:
+                intervals.append(interval)
+
+        day += timedelta(days=1)
+
+    return intervals
+
+
+async def find_intervals(
+    network: NetworkSchema,
+    source: CompletenessSource,
+    metric: CompletenessMetric,
+    date_min: datetime,
+    date_max: datetime,
+    present: bool = True,
+    required: CompletenessMetric | None = None,
+) -> list[datetime]:
+    """
+    Intervals with a metric for a network from date_min (inclusive) to date_max (exclusive) in
+    naive network time, or without it if not present. With required only intervals that have
+    that metric are returned.
+    """
+    date_min, date_max = _network_time(date_min, network), _network_time(date_max, network)
+
+    bitmaps = await get_completeness(network, source, metric, date_min.date(), date_max.date())
+    required_bitmaps = await get_completeness(network, source, required, date_min.date(), date_max.date()) if required else None
+
+    return bitmap_intervals(
+        bitmaps,
+        date_min,
+        date_max,
+        completeness_interval_size(network, source),
+        present=present,
+        required=required_bitmaps,
+    )
+
+
+async def find_gaps(
+    network: NetworkSchema,
+    source: CompletenessSource,
+    metric: CompletenessMetric,
+    date_min: datetime,
+    date_max: datetime,
+    required: CompletenessMetric | None = None,
+) -> list[datetime]:
+    """Intervals missing a metric. See `find_intervals`"""
+    return await find_intervals(network, source, metric, date_min, date_max, present=False, required=required)
+
+
+def group_contiguous(
+    intervals: Sequence[datetime], interval_size: int, max_span: timedelta | None = None
+) -> list[tuple[datetime, datetime]]:
+    """
+    Group intervals into contiguous ranges of the first and last interval, split so that no range
+    spans more than max_span
+    """
+    ranges: list[tuple[datetime, datetime]] = []
+    step = timedelta(minutes=interval_size)
+
+    for interval in sorted(set(intervals)):
+        if ranges:
+            start, end = ranges[-1]
+
+            if interval - end == step and (max_span is None or interval - start <= max_span):
+                ranges[-1] = (start, interval)
+                continue
+
+        ranges.append((interval, interval))
+
+    return ranges
+
+
+def _completeness_source_query(source: CompletenessSource) -> Any:
+    presence = ", ".join(f"bool_or({column} is not null)" for column in _SOURCE_METRICS[source].values())
+
+    return text(
+        f"""
+        select interval, {presence}
+        from {source.value}
+        where
+            network_id = :network_id
+            and interval >= :date_start
+            and interval < :date_end
+            and is_forecast is false
+        group by interval
+        """
+    )
+
+
+async def rebuild_completeness(network: NetworkSchema, source: CompletenessSource, date_start: date, date_end: date) -> int:
+    """
+    Set the bitmaps for a range of days from the source table. Both dates are inclusive. Returns the
+    number of bitmaps written.
+    """
+    interval_size = completeness_interval_size(network, source)
+    size = 24 * 60 // interval_size
+    metrics = list(_SOURCE_METRICS[source].keys())
+
+    async with SessionLocalAsync() as session:
+        result = await session.execute(
+            _completeness_source_query(source),
+            {
+                "network_id": network.code,
+                "date_start": datetime.combine(date_start, datetime.min.time()),
+                "date_end": datetime.combine(date_end + timedelta(days=1), datetime.min.time()),
+            },
+        )
+
+        bitmaps: dict[tuple[CompletenessMetric, date], DayBitmap] = {}
+        day = date_start
+
+        # days without any rows are written empty so stale bitmaps are cleared
+        while day <= date_end:
+            for metric in metrics:
+                bitmaps[(metric, day)] = DayBitmap(size=size)
+            day += timedelta(days=1)
+
+        for interval, *present in result.fetchall():
+            day, index = _interval_position(interval, interval_size)
+
+            for metric, has_metric in zip(metrics, present, strict=True):
+                if has_metric:
+                    bitmaps[(metric, day)].set(index)
+
+        await session.execute(
+            _COMPLETENESS_REPLACE_QUERY,
+            [
+                {
+                    "network_id": network.code,
+                    "source_table": source.value,
+                    "metric": metric.value,
+                    "day": day,
+                    "intervals": bitmap.to_bitstring(),
+                }
+                for (metric, day), bitmap in bitmaps.items()
+            ],
+        )
+        await session.commit()
+
+    logger.info(f"Rebuilt {len(bitmaps)} {network.code} {source.value} completeness bitmaps from {date_start} to {date_end}")
+
+    return len(bitmaps)
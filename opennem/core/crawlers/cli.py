@@ -9,6 +9,8 @@ from rich.table import Table
 
 from opennem import console
 from opennem.core.crawlers.crawler import crawlers_flush_metadata, crawlers_get_crawl_metadata
+from opennem.core.crawlers.schema import CrawlerDefinition
+from opennem.core.events import event_bus_enabled, get_event_bus
 from opennem.core.parsers.aemo.nemweb import parse_aemo_url_optimized
 from opennem.crawl import get_crawl_set, run_crawl
 from opennem.utils.http import test_proxy
@@ -20,6 +22,14 @@ logger = logging.getLogger("opennem.cli")
 crawler_set = get_crawl_set()
 
 
+async def _run_crawl(crawler: CrawlerDefinition, latest: bool, limit: int | None) -> None:
+    """Run a crawl and wait for the event subscribers it triggers before the command exits"""
+    await run_crawl(crawler, latest=latest, limit=limit)
+
+    if event_bus_enabled():
+        await get_event_bus().drain()
+
+
 @click.group()
 def cmd_crawl_cli() -> None:
     pass
@@ -54,7 +64,7 @@ def crawl_cli_run(name: str, all: bool = False, limit: int | None = None) -> Non
             f"{c.last_processed}\n\tserver_latest: {c.server_latest}"
         )
         try:
-            asyncio.run(run_crawl(c, latest=not all, limit=limit))
+            asyncio.run(_run_crawl(c, latest=not all, limit=limit))
         except Exception as e:
             console.log(f"[red]Error running crawler[/red]: {e}")
 
@@ -3,6 +3,7 @@ from io import BytesIO
 from pathlib import Path
 from zipfile import ZipFile
 
+from opennem.core.tracing import IngestMetric, IngestStage, ingest_count, ingest_span
 from opennem.utils.archive import _handle_zip, chain_streams
 from opennem.utils.httpx import http
 from opennem.utils.mime import mime_from_content, mime_from_url
@@ -15,9 +16,13 @@ async def url_downloader(url: str) -> bytes:
 
     logger.debug(f"Downloading: {url}")
 
-    response = await http.get(url)
+    with ingest_span(IngestStage.download, url=url) as span:
+        response = await http.get(url)
 
-    response.raise_for_status()
+        response.raise_for_status()
+
+        span.set("bytes", len(response.content))
+        ingest_count(IngestMetric.bytes_downloaded, len(response.content), stage=IngestStage.download.value)
 
     content = BytesIO(response.content)
 
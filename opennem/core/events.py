@@ -0,0 +1,319 @@
+"""
+OpenNEM pipeline event bus
+
+Crawlers publish an event when new data for a network interval has been ingested
+and downstream stages (energy, flows, milestones, exports) subscribe to the stages
+they depend on. A subscriber runs once per network interval, as soon as every
+stage it requires has been seen for that interval.
+
+Stage state is kept in redis so that stages published from different worker
+processes can be joined. The bus is disabled unless settings.event_bus_backend is
+set, and the pipelines run their downstream stages inline instead. An in-process
+state is used by tests and single process runs.
+
+Subscribers run on the long-lived worker loop rather than the publisher's loop, so a
+crawl on the critical lane returns as soon as it has published and is not held up by
+the exports and aggregates chained from it.
+
+Events are keyed on the network interval that was ingested, in network time, so the
+same interval from two crawlers is joined whether or not its datetime is aware.
+
+Usage:
+
+    bus = get_event_bus()
+
+    @bus.subscribe("energy", requires={"au.nemweb.current.dispatch_scada"})
+    async def on_scada(event: IntervalEvent) -> None:
+        ...
+
+    await bus.publish(IntervalEvent(network_id="NEM", interval=interval, stage="au.nemweb.current.dispatch_scada"))
+
+"""
+
+import asyncio
+import logging
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Protocol
+
+from redis import asyncio as aioredis
+
+from opennem import settings
+from opennem.core.networks import network_from_network_code
+from opennem.workers.lanes import worker_loop
+
+logger = logging.getLogger("opennem.core.events")
+
+EventHandler = Callable[["IntervalEvent"], Coroutine[Any, Any, Any]]
+
+# derived stages published by subscribers
+STAGE_ENERGY = "energy"
+STAGE_FLOWS = "flows"
+STAGE_MILESTONES = "milestones"
+STAGE_NETWORK_FUELTECH_INTERVALS = "network_fueltech_intervals"
+
+# most recent intervals of a crawl that are published. catchup crawls are left to the scheduled runs
+MAX_EVENT_INTERVALS = 12
+
+
+class EventBusException(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class IntervalEvent:
+    """Data for stage has landed for network_id at interval"""
+
+    network_id: str
+    interval: datetime
+    stage: str
+    inserted_records: int = 0
+
+    @property
+    def key(self) -> str:
+        interval = self.interval
+
+        if interval.tzinfo:
+            interval = interval.astimezone(network_from_network_code(self.network_id).get_fixed_offset()).replace(tzinfo=None)
+
+        return f"{self.network_id}:{interval.isoformat()}"
+
+
+@dataclass(slots=True)
+class Subscription:
+    name: str
+    requires: frozenset[str]
+    handler: EventHandler
+    networks: frozenset[str] | None = None
+
+    def matches(self, event: IntervalEvent, stages_seen: set[str]) -> bool:
+        if event.stage not in self.requires:
+            return False
+
+        if self.networks and event.network_id not in self.networks:
+            return False
+
+        return self.requires.issubset(stages_seen)
+
+
+class EventState(Protocol):
+    """Tracks stages seen and subscribers run per network interval"""
+
+    async def mark(self, key: str, stage: str) -> set[str]: ...
+
+    async def claim(self, key: str, subscription_name: str) -> bool: ...
+
+
+class LocalEventState:
+    """In-process stage state bounded to the most recent intervals"""
+
+    def __init__(self, max_keys: int = 2048) -> None:
+        self.max_keys = max_keys
+        self._stages: OrderedDict[str, set[str]] = OrderedDict()
+        self._claimed: OrderedDict[str, set[str]] = OrderedDict()
+
+    def _get(self, store: OrderedDict[str, set[str]], key: str) -> set[str]:
+        if key not in store:
+            store[key] = set()
+
+            while len(store) > self.max_keys:
+                store.popitem(last=False)
+
+        return store[key]
+
+    async def mark(self, key: str, stage: str) -> set[str]:
+        stages = self._get(self._stages, key)
+        stages.add(stage)
+        return set(stages)
+
+    async def claim(self, key: str, subscription_name: str) -> bool:
+        claimed = self._get(self._claimed, key)
+
+        if subscription_name in claimed:
+            return False
+
+        claimed.add(subscription_name)
+        return True
+
+
+class RedisEventState:
+    """Stage state shared between worker processes in redis"""
+
+    def __init__(self, redis_url: str, ttl: int = 60 * 60 * 6, prefix: str = "opennem:events") -> None:
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.prefix = prefix
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis] = weakref.WeakKeyDictionary()
+
+    def _client(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+
+        if loop not in self._clients:
+            self._clients[loop] = aioredis.from_url(self.redis_url, decode_responses=True)
+
+        return self._clients[loop]
+
+    async def mark(self, key: str, stage: str) -> set[str]:
+        redis_key = f"{self.prefix}:stages:{key}"
+
+        async with self._client().pipeline(transaction=True) as pipe:
+            pipe.sadd(redis_key, stage)
+            pipe.expire(redis_key, self.ttl)
+            pipe.smembers(redis_key)
+            _, _, stages = await pipe.execute()
+
+        return set(stages)
+
+    async def claim(self, key: str, subscription_name: str) -> bool:
+        redis_key = f"{self.prefix}:claimed:{key}"
+
+        async with self._client().pipeline(transaction=True) as pipe:
+            pipe.sadd(redis_key, subscription_name)
+            pipe.expire(redis_key, self.ttl)
+            added, _ = await pipe.execute()
+
+        return bool(added)
+
+
+@dataclass
+class EventBus:
+    state: EventState
+    subscriptions: list[Subscription] = field(default_factory=list)
+    # loop the subscribers run on. None runs them on the publisher's loop
+    subscriber_loop: Callable[[], asyncio.AbstractEventLoop] | None = None
+    _tasks: set[asyncio.Task] = field(default_factory=set)
+
+    def subscribe(
+        self, name: str, requires: set[str], networks: set[str] | None = None
+    ) -> Callable[[EventHandler], EventHandler]:
+        """Decorator that registers a handler to run once the required stages have landed for an interval"""
+
+        def decorator(handler: EventHandler) -> EventHandler:
+            if any(s.name == name for s in self.subscriptions):
+                raise EventBusException(f"Subscription {name} already registered")
+
+            self.subscriptions.append(
+                Subscription(
+                    name=name,
+                    requires=frozenset(requires),
+                    handler=handler,
+                    networks=frozenset(networks) if networks else None,
+                )
+            )
+
+            return handler
+
+        return decorator
+
+    async def _run(self, subscription: Subscription, event: IntervalEvent) -> None:
+        try:
+            await subscription.handler(event)
+        except Exception as e:
+            logger.error(f"Event subscriber {subscription.name} failed for {event.key}: {e}")
+
+    def _subscriber_loop(self) -> asyncio.AbstractEventLoop:
+        return self.subscriber_loop() if self.subscriber_loop else asyncio.get_running_loop()
+
+    def _start(self, subscription: Subscription, event: IntervalEvent) -> None:
+        task = asyncio.get_running_loop().create_task(
+            self._run(subscription, event), name=f"event-{subscription.name}-{event.key}"
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def publish(self, event: IntervalEvent) -> list[str]:
+        """Publish an event and start any subscribers that are now ready. Returns the names of the
+        subscribers started
+
+        Subscribers run as tasks on the subscriber loop, or the current loop without one, so the
+        publisher is not held up. Call `drain` to wait for them
+        """
+        if not self.subscriptions:
+            return []
+
+        stages_seen = await self.state.mark(event.key, event.stage)
+        loop = self._subscriber_loop()
+
+        started = []
+
+        for subscription in self.subscriptions:
+            if not subscription.matches(event, stages_seen):
+                continue
+
+            if not await self.state.claim(event.key, subscription.name):
+                continue
+
+            logger.info(f"Event {event.stage} for {event.key} triggered {subscription.name}")
+
+            if loop is asyncio.get_running_loop():
+                self._start(subscription, event)
+            else:
+                loop.call_soon_threadsafe(self._start, subscription, event)
+
+            started.append(subscription.name)
+
+        return started
+
+    async def _drain_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while tasks := [t for t in list(self._tasks) if t.get_loop() is loop]:
+            await asyncio.gather(*tasks)
+
+    async def drain(self) -> None:
+        """Wait for the running subscribers, including any they trigger"""
+        loop = self._subscriber_loop()
+
+        if loop is asyncio.get_running_loop():
+            await self._drain_loop()
+        else:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._drain_loop(), loop))
+
+
+_EVENT_BUS: EventBus | None = None
+
+
+def get_event_bus() -> EventBus:
+    """Event bus for the process with the state backend set by settings.event_bus_backend"""
+    global _EVENT_BUS
+
+    if not _EVENT_BUS:
+        match settings.event_bus_backend:
+            case "redis":
+                state: EventState = RedisEventState(str(settings.redis_url))
+            case None:
+                # nothing is published while the bus is disabled
+                state = LocalEventState()
+            case _:
+                raise EventBusException(f"Unknown event bus backend: {settings.event_bus_backend}")
+
+        _EVENT_BUS = EventBus(state=state, subscriber_loop=worker_loop.get_loop)
+
+    return _EVENT_BUS
+
+
+def event_bus_enabled() -> bool:
+    """Downstream stages are chained from the bus rather than run inline by the pipelines"""
+    return bool(settings.event_bus_backend)
+
+
+async def publish_interval_event(network_id: str, interval: datetime, stage: str, inserted_records: int = 0) -> list[str]:
+    """Publish to the process event bus. Does nothing when the bus is disabled"""
+    if not event_bus_enabled():
+        return []
+
+    return await get_event_bus().publish(
+        IntervalEvent(network_id=network_id, interval=interval, stage=stage, inserted_records=inserted_records)
+    )
+
+
+async def publish_interval_events(network_id: str, intervals: list[datetime], stage: str, inserted_records: int = 0) -> None:
+    """Publish a stage for each interval ingested. The subscribers it triggers run on the worker loop"""
+    if not event_bus_enabled() or not intervals:
+        return None
+
+    for interval in sorted(set(intervals))[-MAX_EVENT_INTERVALS:]:
+        await publish_interval_event(network_id, interval, stage, inserted_records=inserted_records)
@@ -0,0 +1,256 @@
+"""
+OpenNEM facility dimensions
+
+The facility registry held in process as columns keyed by facility code so ingestion, flow
+solving and aggregation can enrich whole batches of facility records with their network,
+region, fueltech, emission factor and interconnector fields without joining to the facility
+table in SQL.
+
+Codes are held sorted so a batch is looked up with a single `np.searchsorted`. Each column has
+a trailing missing value so codes not in the registry index it with -1. Ingestion resolves
+retired DUIDs and maps AEMO rooftop region codes to their rooftop facility through the same
+arrays.
+
+The registry is loaded again when its change counter moves, checked at most every
+`facility_dimensions_refresh` seconds. The counter is derived from the facility table rather
+than kept separately so registry edits from any source are picked up.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from opennem import settings
+from opennem.core.facility_duid_map import FACILITY_DUID_MAP
+from opennem.db import get_read_session
+from opennem.schema.network import NetworkAEMORooftop
+
+logger = logging.getLogger("opennem.core.facility.dimensions")
+
+# columns and the value for codes that aren't in the registry
+FACILITY_DIMENSION_FIELDS: dict[str, Any] = {
+    "network_id": None,
+    "network_region": None,
+    "fueltech_id": None,
+    "status_id": None,
+    "dispatch_type": None,
+    "emissions_factor_co2": np.nan,
+    "interconnector": False,
+    "interconnector_region_from": None,
+    "interconnector_region_to": None,
+}
+
+_FACILITY_DIMENSIONS_QUERY = text(
+    """
+    select
+        f.code,
+        f.network_id,
+        f.network_region,
+        f.fueltech_id,
+        f.status_id,
+        f.dispatch_type,
+        f.emissions_factor_co2,
+        coalesce(f.interconnector, false) as interconnector,
+        f.interconnector_region_from,
+        f.interconnector_region_to
+    from facility f
+    order by f.code
+    """
+)
+
+_FACILITY_REGISTRY_VERSION_QUERY = text(
+    """
+    select count(*) || ':' || coalesce(extract(epoch from max(coalesce(f.updated_at, f.created_at)))::text, '0')
+    from facility f
+    """
+)
+
+
+def _search(keys: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Positions of codes in the sorted keys with -1 for codes not found"""
+    if not len(keys):
+        return np.full(len(codes), -1, dtype=np.int64)
+
+    positions = np.searchsorted(keys, codes).clip(max=len(keys) - 1)
+
+    return np.where(keys[positions] == codes, positions, -1)
+
+
+def _column(values: Iterable[Any], missing: Any) -> np.ndarray:
+    if isinstance(missing, bool):
+        return np.array([*(bool(v) for v in values), missing], dtype=bool)
+
+    if isinstance(missing, float):
+        return np.array([*(np.nan if v is None else float(v) for v in values), missing], dtype=np.float64)
+
+    return np.array([*values, missing], dtype=object)
+
+
+@dataclass(frozen=True, slots=True)
+class FacilityDimensions:
+    version: str
+    codes: np.ndarray
+    columns: dict[str, np.ndarray]
+    alias_codes: np.ndarray = field(default_factory=lambda: np.array([], dtype=str))
+    alias_targets: np.ndarray = field(default_factory=lambda: np.array([], dtype=str))
+    rooftop_regions: np.ndarray = field(default_factory=lambda: np.array([], dtype=str))
+    rooftop_codes: np.ndarray = field(default_factory=lambda: np.array([None], dtype=object))
+
+    @classmethod
+    def from_records(
+        cls, version: str, records: Sequence[Mapping[str, Any]], aliases: Mapping[str, str] | None = None
+    ) -> "FacilityDimensions":
+        records = sorted(records, key=lambda r: r["code"])
+        codes = {r["code"] for r in records}
+
+        # codes still in the registry are never aliased away
+        aliases = dict(sorted((k, v) for k, v in (aliases or {}).items() if k not in codes))
+
+        # AEMO rooftop is reported by region. reversed so the first code for a region is kept
+        rooftop = {
+            r["network_region"]: r["code"]
+            for r in reversed(records)
+            if r.get("network_id") == NetworkAEMORooftop.code
+            and r.get("fueltech_id") == "solar_rooftop"
+            and r.get("network_region")
+        }
+        rooftop = dict(sorted(rooftop.items()))
+
+        return cls(
+            version=version,
+            codes=np.array([r["code"] for r in records], dtype=str),
+            columns={f: _column((r.get(f) for r in records), missing) for f, missing in FACILITY_DIMENSION_FIELDS.items()},
+            alias_codes=np.array(list(aliases.keys()), dtype=str),
+            alias_targets=np.array(list(aliases.values()), dtype=str),
+            rooftop_regions=np.array(list(rooftop.keys()), dtype=str),
+            rooftop_codes=np.array([*rooftop.values(), None], dtype=object),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def resolve(self, codes: Iterable[str]) -> np.ndarray:
+        """Map retired and alias codes such as old DUIDs to their facility code"""
+        codes = np.asarray(codes if isinstance(codes, np.ndarray) else list(codes), dtype=str)
+
+        if not len(self.alias_codes):
+            return codes
+
+        alias_index = _search(self.alias_codes, codes)
+
+        return np.where(alias_index >= 0, self.alias_targets[alias_index], codes)
+
+    def rooftop_facility_codes(self, regions: Iterable[str]) -> np.ndarray:
+        """AEMO rooftop facility codes for network regions with None for regions without one"""
+        regions = np.asarray(regions if isinstance(regions, np.ndarray) else list(regions), dtype=str)
+
+        return self.rooftop_codes[_search(self.rooftop_regions, regions)]
+
+    def index(self, codes: Iterable[str]) -> np.ndarray:
+        """Registry positions of codes with -1 for those not in the registry"""
+        return _search(self.codes, self.resolve(codes))
+
+    def lookup(self, codes: Iterable[str], fields: Iterable[str] | None = None) -> dict[str, np.ndarray]:
+        """Dimension columns for a batch of facility codes"""
+        index = self.index(codes)
+
+        return {f: self.columns[f][index] for f in fields or self.columns.keys()}
+
+    def enrich(
+        self, records: list[dict[str, Any]], code_field: str = "facility_code", fields: Iterable[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Add dimension fields to a batch of records in place"""
+        if not records:
+            return records
+
+        columns = self.lookup((r[code_field] for r in records), fields)
+
+        for column, values in columns.items():
+            for record, value in zip(records, values.tolist(), strict=True):
+                record[column] = value
+
+        return records
+
+    def enrich_frame(
+        self, df: pd.DataFrame, code_field: str = "facility_code", fields: Iterable[str] | None = None
+    ) -> pd.DataFrame:
+        """Add dimension columns to a data frame in place"""
+        for column, values in self.lookup(df[code_field].to_numpy(dtype=str), fields).items():
+            df[column] = values
+
+        return df
+
+
+class FacilityDimensionStore:
+    """The facility registry in process, loaded again when the registry changes"""
+
+    def __init__(
+        self,
+        refresh: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.refresh = refresh if refresh is not None else settings.facility_dimensions_refresh
+        self.clock = clock
+
+        self._dimensions: FacilityDimensions | None = None
+        self._checked: float = float("-inf")
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+    async def _registry_version(self) -> str:
+        async with get_read_session() as session:
+            return await session.scalar(_FACILITY_REGISTRY_VERSION_QUERY) or "0"
+
+    async def _load(self, version: str) -> FacilityDimensions:
+        async with get_read_session() as session:
+            result = await session.execute(_FACILITY_DIMENSIONS_QUERY)
+            records = [dict(r) for r in result.mappings().all()]
+
+        dimensions = FacilityDimensions.from_records(version, records, aliases=FACILITY_DUID_MAP)
+
+        logger.info(f"Loaded {len(dimensions)} facility dimensions at registry version {version}")
+
+        return dimensions
+
+    def invalidate(self) -> None:
+        """Check the registry on the next get, such as after importing facilities"""
+        self._checked = float("-inf")
+
+    async def get(self) -> FacilityDimensions:
+        if self._dimensions and self.clock() - self._checked < self.refresh:
+            return self._dimensions
+
+        # concurrent callers on a loop share the load
+        lock = self._locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+        async with lock:
+            if self._dimensions and self.clock() - self._checked < self.refresh:
+                return self._dimensions
+
+            version = await self._registry_version()
+
+            if not self._dimensions or self._dimensions.version != version:
+                self._dimensions = await self._load(version)
+
+            self._checked = self.clock()
+
+        return self._dimensions
+
+
+_FACILITY_DIMENSION_STORE = FacilityDimensionStore()
+
+
+async def get_facility_dimensions() -> FacilityDimensions:
+    """Facility dimensions for the process at the current registry version"""
+    return await _FACILITY_DIMENSION_STORE.get()
+
+
+def invalidate_facility_dimensions() -> None:
+    _FACILITY_DIMENSION_STORE.invalidate()
@@ -15,6 +15,7 @@ from pydantic.fields import PrivateAttr
 
 from opennem.core.downloader import url_downloader
 from opennem.core.normalizers import normalize_duid
+from opennem.core.tracing import IngestMetric, IngestStage, ingest_count, ingest_span
 from opennem.schema.aemo.mms import MMSBaseClass, get_mms_schema_for_table
 from opennem.schema.core import BaseConfig
 from opennem.utils.version import get_version
@@ -266,86 +267,99 @@ def parse_aemo_mms_csv(
     if not table_set:
         table_set = AEMOTableSet()
 
-    content_split = content.splitlines()
+    records_before = {table.full_name: len(table.records) for table in table_set.tables}
 
-    # @NOTE more efficient csv parsing
-    datacsv = csv.reader(content_split)
+    with ingest_span(IngestStage.parse, url=url) as span:
+        content_split = content.splitlines()
 
-    # init all the parser vars
-    table_current = None
+        # @NOTE more efficient csv parsing
+        datacsv = csv.reader(content_split)
 
-    for row in datacsv:
-        if not row or type(row) is not list or len(row) < 1:
-            continue
+        # init all the parser vars
+        table_current = None
 
-        record_type = row[0].strip().upper()
+        for row in datacsv:
+            if not row or type(row) is not list or len(row) < 1:
+                continue
 
-        if record_type not in AEMO_ROW_HEADER_TYPES:
-            logger.info(f"Skipping row, invalid type: {record_type}")
-            continue
+            record_type = row[0].strip().upper()
 
-        # new table set
-        # @TODO switch to match
-        match record_type:
-            case "C":
-                # @TODO csv meta stored in table
-                if table_current:
-                    table_set.add_table(table_current, values_only=values_only)
+            if record_type not in AEMO_ROW_HEADER_TYPES:
+                logger.info(f"Skipping row, invalid type: {record_type}")
+                continue
 
-            # new table
-            case "I":
-                if table_current:
-                    table_set.add_table(table_current, values_only=values_only)
+            # new table set
+            # @TODO switch to match
+            match record_type:
+                case "C":
+                    # @TODO csv meta stored in table
+                    if table_current:
+                        table_set.add_table(table_current, values_only=values_only)
 
-                table_namespace = row[1]
-                table_name = row[2]
-                table_fields = [i.lower() for i in row[4:]]
+                # new table
+                case "I":
+                    if table_current:
+                        table_set.add_table(table_current, values_only=values_only)
 
-                if namespace_filter and table_namespace.lower() not in namespace_filter:
-                    table_current = None
-                    continue
+                    table_namespace = row[1]
+                    table_name = row[2]
+                    table_fields = [i.lower() for i in row[4:]]
 
-                table_current = AEMOTableSchema(
-                    name=table_name,
-                    namespace=table_namespace,
-                    fields=table_fields,
-                    fieldnames=table_fields,
-                    url_source=url,
-                )
+                    if namespace_filter and table_namespace.lower() not in namespace_filter:
+                        table_current = None
+                        continue
 
-                # do we have a custom shema for the table?
-                if parse_table_schemas:
-                    table_schema = get_mms_schema_for_table(table_current.full_name)
+                    table_current = AEMOTableSchema(
+                        name=table_name,
+                        namespace=table_namespace,
+                        fields=table_fields,
+                        fieldnames=table_fields,
+                        url_source=url,
+                    )
 
-                    if table_schema:
-                        table_current.set_schema(table_schema)
+                    # do we have a custom shema for the table?
+                    if parse_table_schemas:
+                        table_schema = get_mms_schema_for_table(table_current.full_name)
 
-            # new record
-            case "D":
-                if skip_records:
-                    continue
+                        if table_schema:
+                            table_current.set_schema(table_schema)
 
-                if not table_current:
-                    logger.error("Have a record but not currently in a table")
-                    continue
+                # new record
+                case "D":
+                    if skip_records:
+                        continue
 
-                values = row[4:]
+                    if not table_current:
+                        logger.error("Have a record but not currently in a table")
+                        continue
 
-                if len(values) != len(table_current.fieldnames):
-                    logger.error("Malformed AEMO csv - length mismatch between records and fields")
-                    continue
+                    values = row[4:]
 
-                record = dict(zip(table_current.fieldnames, values, strict=True))
+                    if len(values) != len(table_current.fieldnames):
+                        logger.error("Malformed AEMO csv - length mismatch between records and fields")
+                        continue
 
-                for field, fieldvalue in record.items():
-                    if field in MMS_DUID_FIELDS:
-                        fieldvalue_parsed = normalize_duid(fieldvalue)
-                        record[field] = fieldvalue_parsed
+                    record = dict(zip(table_current.fieldnames, values, strict=True))
 
-                table_current.add_record(record, values_only=values_only)
+                    for field, fieldvalue in record.items():
+                        if field in MMS_DUID_FIELDS:
+                            fieldvalue_parsed = normalize_duid(fieldvalue)
+                            record[field] = fieldvalue_parsed
 
-            case _:
-                logger.error(f"Invalid AEMO record type: {record_type}")
+                    table_current.add_record(record, values_only=values_only)
+
+                case _:
+                    logger.error(f"Invalid AEMO record type: {record_type}")
+
+        rows_parsed = 0
+
+        for table in table_set.tables:
+            table_rows = len(table.records) - records_before.get(table.full_name, 0)
+            ingest_count(IngestMetric.rows_parsed, table_rows, table=table.full_name)
+            rows_parsed += table_rows
+
+        span.set("bytes", len(content))
+        span.set("rows", rows_parsed)
 
     return table_set
 
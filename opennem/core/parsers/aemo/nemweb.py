@@ -16,7 +16,7 @@ async def parse_aemo_url_optimized(
 ) -> ControllerReturn | AEMOTableSet:
     """Optimized version of aemo url parser that stores the files locally in tmp
     and parses them individually to resolve memory pressure"""
-    download_path = download_and_unzip(url)
+    download_path = await download_and_unzip(url)
     cr = ControllerReturn()
 
     download_path_files = [f for f in download_path.iterdir() if f.is_file()]
@@ -37,6 +37,7 @@ async def parse_aemo_url_optimized(
         if persist_to_db:
             controller_returns = await store_aemo_tableset(table_set)
             cr.inserted_records += controller_returns.inserted_records
+            cr.intervals += controller_returns.intervals
 
             if cr.last_modified and controller_returns.last_modified and cr.last_modified < controller_returns.last_modified:
                 cr.last_modified = controller_returns.last_modified
@@ -63,7 +64,7 @@ async def parse_aemo_url_optimized_bulk(
 ) -> ControllerReturn | AEMOTableSet:
     """Optimized version of aemo url parser that stores the files locally in tmp
     and parses them individually to resolve memory pressure"""
-    download_path = download_and_unzip(url)
+    download_path = await download_and_unzip(url)
     cr = ControllerReturn()
 
     download_path_files = [f for f in download_path.iterdir() if f.is_file()]
@@ -82,8 +83,9 @@ async def parse_aemo_url_optimized_bulk(
         if not persist_to_db:
             return ts
 
-    controller_returns = store_aemo_tableset(ts)
+    controller_returns = await store_aemo_tableset(ts)
     cr.inserted_records += controller_returns.inserted_records
+    cr.intervals += controller_returns.intervals
 
     if cr.last_modified and controller_returns.last_modified and cr.last_modified < controller_returns.last_modified:
         cr.last_modified = controller_returns.last_modified
@@ -15,7 +15,7 @@ async def parse_aemo_url_optimized(url: str) -> int:
     """Optimized version of aemo url parser"""
     files_parsed = 0
 
-    d = download_and_unzip(url)
+    d = await download_and_unzip(url)
 
     onlyfiles = [Path(d) / f for f in os.listdir(d) if (Path(d) / f).is_file()]
     logger.debug(f"Got {len(onlyfiles)} files")
@@ -8,11 +8,18 @@ Currently supports:
 
     * IIS default listings and variations
     * Extracing metadata from AEMO filenames
+
+Lines are matched into lightweight `DirlistingLine` records and only become
+`DirlistingEntry` models when they are selected. Lookups by AEMO interval date and
+modified date go through a `DirlistingIndex` which is built once per listing.
 """
 
 import html
 import logging
 import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from operator import attrgetter
@@ -21,10 +28,11 @@ from typing import Annotated, Any
 from urllib.parse import urljoin
 from zoneinfo import ZoneInfo
 
-from pydantic import BaseModel, BeforeValidator, ValidationError, field_validator
+from pydantic import BaseModel, BeforeValidator, PrivateAttr, ValidationError, field_validator
 
 from opennem.core.normalizers import is_number, strip_double_spaces
 from opennem.core.parsers.aemo.filenames import AEMOMMSFilename, parse_aemo_filename
+from opennem.core.tracing import IngestMetric, IngestStage, ingest_count, ingest_span
 from opennem.schema.core import BaseConfig
 from opennem.schema.date_range import CrawlDateRange
 from opennem.utils.httpx import http
@@ -49,8 +57,14 @@ __nemweb_line_match_new = re.compile(
     re.IGNORECASE,
 )
 
+__dirlisting_line_matchers = [__iis_line_match, __nemweb_line_match, __nemweb_line_match_new]
+
+__whitespace_match = re.compile(r"\s{2,}")
+
+_ACCEPTED_FILE_EXTENSIONS = frozenset([".zip", ".csv", ".json"])
+
 
-def parse_dirlisting_datetime(datetime_string: str | datetime) -> str:
+def parse_dirlisting_datetime(datetime_string: str | datetime) -> datetime:
     """Parses dates from directory listings. Primarily used for modified time"""
 
     # sometimes it already parses via pydantic
@@ -70,16 +84,17 @@ def parse_dirlisting_datetime(datetime_string: str | datetime) -> str:
     for _fs in _FORMAT_STRINGS:
         try:
             datetime_parsed = datetime.strptime(datetime_string, _fs)
+            break
         except ValueError:
             pass
 
     if not datetime_parsed:
-        raise ValidationError(f"Error parsing dirlisting datetime string: {datetime_string}")
+        raise ValueError(f"Error parsing dirlisting datetime string: {datetime_string}")
 
-    return str(datetime_parsed)
+    return datetime_parsed
 
 
-DirlistingModifiedDate = Annotated[str, BeforeValidator(parse_dirlisting_datetime)]
+DirlistingModifiedDate = Annotated[datetime, BeforeValidator(parse_dirlisting_datetime)]
 
 
 class DirlistingEntryType(Enum):
@@ -114,76 +129,213 @@ class DirlistingEntry(BaseConfig):
         return DirlistingEntryType.file
 
 
+@dataclass(slots=True)
+class DirlistingLine:
+    """A matched dirlisting line that is materialized into a DirlistingEntry on demand"""
+
+    filename: str
+    link: str
+    modified_date: datetime
+    file_size: int | None = None
+    aemo_interval_date: AEMOMMSFilename | None = None
+    _entry: DirlistingEntry | None = field(default=None, repr=False, compare=False)
+
+    @property
+    def interval_date(self) -> datetime | None:
+        return self.aemo_interval_date.date if self.aemo_interval_date else None
+
+    @property
+    def is_file(self) -> bool:
+        return Path(self.filename).suffix.lower() in _ACCEPTED_FILE_EXTENSIONS
+
+    @property
+    def is_directory(self) -> bool:
+        return not self.file_size or self.link.endswith("/")
+
+    def to_entry(self) -> DirlistingEntry:
+        """Build the entry model for this line. Values are already parsed so validation is skipped"""
+        if not self._entry:
+            self._entry = DirlistingEntry.model_construct(
+                filename=Path(self.filename),
+                link=self.link,
+                modified_date=self.modified_date,
+                aemo_interval_date=self.aemo_interval_date,
+                file_size=self.file_size,
+                entry_type=DirlistingEntryType.directory if self.is_directory else DirlistingEntryType.file,
+            )
+
+        return self._entry
+
+    @classmethod
+    def from_entry(cls, entry: DirlistingEntry) -> "DirlistingLine":
+        return cls(
+            filename=str(entry.filename),
+            link=entry.link,
+            modified_date=entry.modified_date,
+            file_size=entry.file_size,
+            aemo_interval_date=entry.aemo_interval_date,
+            _entry=entry,
+        )
+
+
+class _SortedDateIndex:
+    """Hash and sorted index of datetime keys to line positions"""
+
+    __slots__ = ("by_date", "dates", "positions")
+
+    def __init__(self, keys: Iterable[tuple[datetime | None, int]]) -> None:
+        self.by_date: dict[datetime, list[int]] = {}
+
+        for key, position in keys:
+            if key is None:
+                continue
+
+            self.by_date.setdefault(key, []).append(position)
+
+        self.dates: list[datetime] = sorted(self.by_date.keys())
+        self.positions: list[list[int]] = [self.by_date[i] for i in self.dates]
+
+    def lookup(self, dates: Iterable[datetime]) -> list[int]:
+        found: list[int] = []
+
+        for date in set(dates):
+            found.extend(self.by_date.get(date, []))
+
+        return sorted(found)
+
+    def range(self, start: datetime | None = None, end: datetime | None = None, inclusive: bool = True) -> list[int]:
+        """Positions with keys between start and end. Open ended when either is None"""
+        lo = 0
+        hi = len(self.dates)
+
+        if start is not None:
+            lo = bisect_left(self.dates, start) if inclusive else bisect_right(self.dates, start)
+
+        if end is not None:
+            hi = bisect_right(self.dates, end) if inclusive else bisect_left(self.dates, end)
+
+        found: list[int] = []
+
+        for positions in self.positions[lo:hi]:
+            found.extend(positions)
+
+        return sorted(found)
+
+
+class DirlistingIndex:
+    """Indexes of a directory listing on AEMO interval date and modified date"""
+
+    def __init__(self, lines: list[DirlistingLine]) -> None:
+        self.interval_date = _SortedDateIndex((line.interval_date, pos) for pos, line in enumerate(lines))
+        self.modified_date = _SortedDateIndex((line.modified_date, pos) for pos, line in enumerate(lines))
+
+
 class DirectoryListing(BaseModel):
     url: str
     timezone: str | None = None
-    entries: list[DirlistingEntry] = []
+
+    _lines: list[DirlistingLine] = PrivateAttr(default_factory=list)
+    _index: DirlistingIndex | None = PrivateAttr(default=None)
+
+    @classmethod
+    def from_lines(cls, url: str, lines: list[DirlistingLine], timezone: str | None = None) -> "DirectoryListing":
+        listing = cls(url=url, timezone=timezone)
+        listing._set_lines(lines)
+        return listing
+
+    @property
+    def entries(self) -> list[DirlistingEntry]:
+        return [i.to_entry() for i in self._lines]
+
+    @entries.setter
+    def entries(self, entries: list[DirlistingEntry]) -> None:
+        self._set_lines([DirlistingLine.from_entry(i) for i in entries])
+
+    @property
+    def lines(self) -> list[DirlistingLine]:
+        return self._lines
+
+    @property
+    def index(self) -> DirlistingIndex:
+        if self._index is None:
+            self._index = DirlistingIndex(self._lines)
+
+        return self._index
 
     @property
     def count(self) -> int:
-        return len(self.entries)
+        return len(self._lines)
 
     @property
     def file_count(self) -> int:
-        return len(self.get_files())
+        return len(self._get_file_lines())
 
     @property
     def directory_count(self) -> int:
-        return len(self.get_directories())
+        return len([i for i in self._lines if i.is_directory])
+
+    def _set_lines(self, lines: list[DirlistingLine]) -> None:
+        self._lines = lines
+        self._index = None
+
+    def _get_file_lines(self) -> list[DirlistingLine]:
+        return [i for i in self._lines if i.is_file]
+
+    def _entries_at(self, positions: list[int]) -> list[DirlistingEntry]:
+        return [self._lines[i].to_entry() for i in positions]
 
     def apply_date_range(self, date_range: CrawlDateRange) -> None:
-        self.entries = list(
-            filter(
-                lambda x: x.modified_date and x.modified_date > date_range.start and x.modified_date < date_range.end,
-                self.entries,
-            )
-        )
+        positions = self.index.modified_date.range(date_range.start, date_range.end, inclusive=False)
+        self._set_lines([self._lines[i] for i in positions])
 
     def apply_limit(self, limit: int) -> None:
         """Limit to most recent files"""
-        self.entries = list(reversed(self.get_files()))[:limit]
+        self._set_lines(list(reversed(self._get_file_lines()))[:limit])
 
     def apply_filter(self, pattern: str) -> None:
-        self.entries = list(filter(lambda x: re.match(pattern, x.link), self.entries))
+        matcher = re.compile(pattern)
+        self._set_lines([i for i in self._lines if matcher.match(i.link)])
 
     def get_files(self) -> list[DirlistingEntry]:
-        accepted_extensions = [".zip", ".csv", ".json"]
-
-        return list(
-            filter(
-                lambda x: x.entry_type == DirlistingEntryType.file and x.filename.suffix.lower() in accepted_extensions,
-                self.entries,
-            )
-        )
+        return [i.to_entry() for i in self._get_file_lines()]
 
     def get_directories(self) -> list[DirlistingEntry]:
-        return list(filter(lambda x: x.entry_type == DirlistingEntryType.directory, self.entries))
+        return [i.to_entry() for i in self._lines if i.is_directory]
 
     def get_most_recent_files(self, reverse: bool = True, limit: int | None = None) -> list[DirlistingEntry]:
-        obtained_files = self.get_files()
+        obtained_files = self._get_file_lines()
 
         if not obtained_files:
             return []
 
-        _entries = sorted(obtained_files, key=attrgetter("modified_date"), reverse=reverse)
+        _lines = sorted(obtained_files, key=attrgetter("modified_date"), reverse=reverse)
 
-        if not limit:
-            self.entries = _entries
-            return _entries
+        if limit:
+            _lines = _lines[:limit]
 
-        self.entries = _entries[:limit]
+        self._set_lines(_lines)
 
         return self.entries
 
     def get_files_modified_in(self, intervals: list[datetime]) -> list[DirlistingEntry]:
-        return list(filter(lambda x: x.modified_date in intervals, self.entries))
+        return self._entries_at(self.index.modified_date.lookup(intervals))
 
     def get_files_aemo_intervals(self, intervals: list[datetime]) -> list[DirlistingEntry]:
-        return list(filter(lambda x: x.aemo_interval_date.date in intervals if x.aemo_interval_date else False, self.entries))
+        return self._entries_at(self.index.interval_date.lookup(intervals))
 
-    def get_files_modified_since(self, modified_date: datetime) -> list[DirlistingEntry]:
-        modified_since: list[DirlistingEntry] = []
+    def get_files_modified_between(self, start: datetime | None = None, end: datetime | None = None) -> list[DirlistingEntry]:
+        """Files modified between start and end inclusive"""
+        positions = self.index.modified_date.range(start, end)
+
+        return [self._lines[i].to_entry() for i in positions if self._lines[i].is_file]
 
+    def get_files_aemo_interval_between(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> list[DirlistingEntry]:
+        """Files with an AEMO interval date between start and end inclusive"""
+        return self._entries_at(self.index.interval_date.range(start, end))
+
+    def get_files_modified_since(self, modified_date: datetime) -> list[DirlistingEntry]:
         if self.timezone:
             # sanity check the timezone before filter
             try:
@@ -191,40 +343,55 @@ class DirectoryListing(BaseModel):
             except ValueError:
                 raise Exception(f"Invalid dirlisting timezone: {self.timezone}") from None
 
-            modified_since = list(
-                filter(
-                    lambda x: x.modified_date > modified_date,
-                    self.get_files(),
-                )
-            )
-        else:
-            modified_since = list(filter(lambda x: x.modified_date > modified_date, self.get_files()))
+            # listing modified dates are naive in the listing timezone
+            if modified_date.tzinfo:
+                modified_date = modified_date.astimezone(ZoneInfo(self.timezone)).replace(tzinfo=None)
 
-        return modified_since
+        positions = self.index.modified_date.range(start=modified_date, inclusive=False)
 
+        return [self._lines[i].to_entry() for i in positions if self._lines[i].is_file]
 
-def parse_dirlisting_line(dirlisting_line: str) -> DirlistingEntry | None:
-    """Parses a single line from a dirlisting page"""
-    if not dirlisting_line:
-        return None
 
-    # remove double spaces and newlines
-    dirlisting_line = dirlisting_line.replace("\n", "")
-    # replace any spaces of more than 1 with a single space
-    dirlisting_line = re.sub(r"\s{2,}", " ", dirlisting_line)
+def _match_dirlisting_line(dirlisting_line: str, matchers: list[re.Pattern] | None = None) -> re.Match | None:
+    """Match a dirlisting line against the known formats.
 
-    matches: re.Match | None = None
+    When a list of matchers is passed the one that matches is moved to the front so that
+    subsequent lines from the same listing are matched with a single regex.
+    """
+    _matchers = matchers if matchers is not None else __dirlisting_line_matchers
 
-    for _match in [__iis_line_match, __nemweb_line_match, __nemweb_line_match_new]:
+    for position, _match in enumerate(_matchers):
         matches = _match.search(dirlisting_line)
 
         if not matches:
             continue
 
-        not_empty = len([i for i in matches.groupdict() if i]) == 4
+        if len([i for i in matches.groupdict() if i]) != 4:
+            continue
 
-        if not_empty:
-            break
+        if matchers is not None and position:
+            matchers.insert(0, matchers.pop(position))
+
+        return matches
+
+    return None
+
+
+def _clean_dirlisting_line(dirlisting_line: str) -> str:
+    # remove double spaces and newlines
+    dirlisting_line = dirlisting_line.replace("\n", "")
+    # replace any spaces of more than 1 with a single space
+    return __whitespace_match.sub(" ", dirlisting_line)
+
+
+def parse_dirlisting_line(dirlisting_line: str) -> DirlistingEntry | None:
+    """Parses a single line from a dirlisting page"""
+    if not dirlisting_line:
+        return None
+
+    dirlisting_line = _clean_dirlisting_line(dirlisting_line)
+
+    matches = _match_dirlisting_line(dirlisting_line)
 
     model: DirlistingEntry | None = None
 
@@ -251,29 +418,62 @@ def parse_dirlisting_line(dirlisting_line: str) -> DirlistingEntry | None:
     return model
 
 
-async def get_dirlisting(url: str, timezone: str | None = None) -> DirectoryListing:
-    """Parse a directory listng into a list of DirlistingEntry models"""
-    dirlisting_content = await http.get(url)
+def parse_dirlisting_line_lazy(
+    dirlisting_line: str, base_url: str | None = None, matchers: list[re.Pattern] | None = None
+) -> DirlistingLine | None:
+    """Parses a single line from a dirlisting page into a DirlistingLine without building a model"""
+    if not dirlisting_line:
+        return None
 
-    logger.debug(f"Got dirlisting content of lenght {len(dirlisting_content.text)}")
+    dirlisting_line = _clean_dirlisting_line(dirlisting_line)
 
-    if not dirlisting_content.text:
-        raise Exception("No dirlisting content")
+    matches = _match_dirlisting_line(dirlisting_line, matchers=matchers)
 
-    # resp = pq(dirlisting_content.text, parser="html")
+    if not matches:
+        logger.warning(f"Could not match dirlisting line: {dirlisting_line}")
+        return None
 
-    _dirlisting_models: list[DirlistingEntry] = []
+    filename = matches.group("filename").strip()
+    link = matches.group("link").strip()
+    file_size = matches.group("file_size")
 
-    # pre_area = resp("pre")
+    try:
+        modified_date = parse_dirlisting_datetime(matches.group("modified_date"))
+    except ValueError as e:
+        logger.error(f"Error parsing dirlisting line: {e}")
+        return None
+
+    aemo_interval_date: AEMOMMSFilename | None = None
+
+    try:
+        aemo_interval_date = parse_aemo_filename(filename)
+    except Exception as e:
+        logger.error(f"Error parsing AEMO filename: {e}")
 
+    return DirlistingLine(
+        filename=filename,
+        link=urljoin(base_url, link) if base_url else link,
+        modified_date=modified_date,
+        file_size=int(file_size) if is_number(file_size) else None,
+        aemo_interval_date=aemo_interval_date,
+    )
+
+
+def parse_dirlisting(dirlisting_content: str, url: str, timezone: str | None = None) -> DirectoryListing:
+    """Parse directory listing html into a DirectoryListing of lazily built DirlistingEntry models"""
     # use regex to find the pre area
-    pre_area = re.search(r"<pre>(.*?)</pre>", dirlisting_content.text, re.DOTALL)
+    pre_area = re.search(r"<pre>(.*?)</pre>", dirlisting_content, re.DOTALL)
 
     if not pre_area:
         raise Exception("Invalid directory listing: no pre or bad html")
 
     pre_content = pre_area.group(1)
 
+    _dirlisting_lines: list[DirlistingLine] = []
+
+    # listings are in a single format so the matcher list is reordered as lines match
+    matchers = list(__dirlisting_line_matchers)
+
     for i in pre_content.split("<br>"):
         # it catches the containing block so skip those
         if not i:
@@ -287,21 +487,40 @@ async def get_dirlisting(url: str, timezone: str | None = None) -> DirectoryList
 
         dirlisting_line = html.unescape(i.strip())
 
-        model = parse_dirlisting_line(dirlisting_line)
+        line = parse_dirlisting_line_lazy(dirlisting_line, base_url=url, matchers=matchers)
 
-        if model:
-            # append the base URL to the model link
-            model.link = urljoin(url, model.link)
+        if not line:
+            continue
 
-            _dirlisting_models.append(model)
+        _dirlisting_lines.append(line)
 
-    listing_model = DirectoryListing(url=url, timezone=timezone, entries=_dirlisting_models)
+    listing_model = DirectoryListing.from_lines(url=url, lines=_dirlisting_lines, timezone=timezone)
 
-    logger.debug(f"Got back {len(listing_model.entries)} models")
+    logger.debug(f"Got back {listing_model.count} lines")
 
     return listing_model
 
 
+async def get_dirlisting(url: str, timezone: str | None = None) -> DirectoryListing:
+    """Fetch and parse a directory listing"""
+    with ingest_span(IngestStage.dirlisting, url=url) as span:
+        dirlisting_content = await http.get(url)
+
+        logger.debug(f"Got dirlisting content of lenght {len(dirlisting_content.text)}")
+
+        span.set("bytes", len(dirlisting_content.content))
+        ingest_count(IngestMetric.bytes_downloaded, len(dirlisting_content.content), stage=IngestStage.dirlisting.value)
+
+        if not dirlisting_content.text:
+            raise Exception("No dirlisting content")
+
+        dirlisting = parse_dirlisting(dirlisting_content.text, url=url, timezone=timezone)
+
+        span.set("entries", dirlisting.count)
+
+    return dirlisting
+
+
 # debug entry point
 if __name__ == "__main__":
     import asyncio
@@ -3,15 +3,25 @@
 This will track the tasks that are run and their status and output
 as well as the time taken to run them.
 
-Optionally log to the database or another data persistance option
+Spans are appended to an in-memory ring buffer without taking a lock. They are
+aggregated into a log-linear latency histogram per task and crawler and flushed to
+task_profile_stats in one batch every profiler_flush_interval seconds, so profiling
+is cheap enough to run on every scheduled task.
 """
 
+import asyncio
 import enum
 import functools
 import inspect
+import json
 import logging
+import threading
+import time
 import uuid
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from types import FrameType
 from typing import Any, cast
@@ -21,7 +31,7 @@ from sqlalchemy import text as sql_text
 
 from opennem import settings
 from opennem.clients.slack import slack_message
-from opennem.db import db_connect
+from opennem.db import SessionLocalAsync, db_connect, get_read_session
 from opennem.db.models.opennem import NetworkRegion
 from opennem.schema.network import NetworkSchema
 
@@ -118,6 +128,303 @@ def format_args_into_string(args: tuple[str], kwargs: dict[str, str]) -> str:
     return f"({args_string}{kwargs_string})"
 
 
+class ProfileKind(enum.Enum):
+    task = "task"
+    crawler = "crawler"
+
+
+# sub-buckets per power of two in the latency histograms. 5 bits keeps values within ~3%
+_HISTOGRAM_SUB_BUCKET_BITS = 5
+_HISTOGRAM_SUB_BUCKET_HALF = 1 << (_HISTOGRAM_SUB_BUCKET_BITS - 1)
+
+
+def _histogram_bucket(value: int) -> int:
+    """Log-linear bucket of a value. Values below the sub-bucket count have a bucket each"""
+    if value < 1 << _HISTOGRAM_SUB_BUCKET_BITS:
+        return value
+
+    shift = value.bit_length() - _HISTOGRAM_SUB_BUCKET_BITS
+
+    return shift * _HISTOGRAM_SUB_BUCKET_HALF + (value >> shift)
+
+
+def _histogram_bucket_value(bucket: int) -> int:
+    """Highest value recorded in a bucket"""
+    if bucket < 1 << _HISTOGRAM_SUB_BUCKET_BITS:
+        return bucket
+
+    shift = bucket // _HISTOGRAM_SUB_BUCKET_HALF - 1
+    mantissa = bucket - shift * _HISTOGRAM_SUB_BUCKET_HALF
+
+    return ((mantissa + 1) << shift) - 1
+
+
+@dataclass(slots=True)
+class LatencyHistogram:
+    """HDR style histogram of durations in microseconds with sparse log-linear buckets"""
+
+    buckets: dict[int, int] = field(default_factory=dict)
+    count: int = 0
+    errors: int = 0
+    total: int = 0
+    max: int = 0
+
+    def record(self, value: int, error: bool = False) -> None:
+        bucket = _histogram_bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+        if error:
+            self.errors += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        """Value at a percentile from 0 to 100"""
+        if not self.count:
+            return 0
+
+        rank = max(1, round(percentile / 100 * self.count))
+        seen = 0
+
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+
+            if seen >= rank:
+                return min(_histogram_bucket_value(bucket), self.max)
+
+        return self.max
+
+    def to_json(self) -> str:
+        return json.dumps(self.buckets)
+
+    @classmethod
+    def from_buckets(cls, buckets: dict[Any, int], errors: int = 0, total: int = 0, max: int = 0) -> "LatencyHistogram":
+        histogram = cls(buckets={int(b): c for b, c in buckets.items()}, errors=errors, total=total, max=max)
+        histogram.count = sum(histogram.buckets.values())
+        return histogram
+
+
+@dataclass(slots=True)
+class ProfileStats:
+    """Latency of a task or crawler. Durations are in seconds"""
+
+    kind: str
+    name: str
+    count: int
+    errors: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+    @classmethod
+    def from_histogram(cls, kind: str, name: str, histogram: LatencyHistogram) -> "ProfileStats":
+        return cls(
+            kind=kind,
+            name=name,
+            count=histogram.count,
+            errors=histogram.errors,
+            mean=histogram.total / histogram.count / 1e6 if histogram.count else 0,
+            p50=histogram.percentile(50) / 1e6,
+            p95=histogram.percentile(95) / 1e6,
+            p99=histogram.percentile(99) / 1e6,
+            max=histogram.max / 1e6,
+        )
+
+
+_TASK_PROFILE_STATS_INSERT_QUERY = sql_text(
+    """
+    insert into task_profile_stats
+        (id, kind, name, period_start, period_end, count, errors, total, p50, p95, p99, max, histogram)
+    values (
+        :id, :kind, :name, :period_start, :period_end, :count, :errors, :total, :p50, :p95, :p99, :max,
+        cast(:histogram as jsonb)
+    )
+    """
+)
+
+_TASK_PROFILE_STATS_QUERY = sql_text(
+    """
+    select kind, name, errors, total, max, histogram
+    from task_profile_stats
+    where
+        period_end >= :since
+        and (cast(:kind as text) is null or kind = :kind)
+    """
+)
+
+
+class TaskProfiler:
+    """Records task and crawler spans into a ring buffer and aggregates them into histograms
+
+    Recording a span is an append to a bounded deque, which is atomic, so worker threads never
+    wait on each other. The buffer is drained into the histograms when they are read or flushed.
+    If more than buffer_size spans are recorded between drains the oldest are dropped.
+    """
+
+    def __init__(
+        self, buffer_size: int | None = None, flush_interval: float | None = None, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._buffer: deque[tuple[ProfileKind, str, int, bool]] = deque(maxlen=buffer_size or settings.profiler_buffer_size)
+        self._flush_interval = flush_interval if flush_interval is not None else settings.profiler_flush_interval
+        self._clock = clock
+        self._collect_lock = threading.Lock()
+        self._window: dict[tuple[ProfileKind, str], LatencyHistogram] = {}
+        self._window_start = datetime.now().astimezone()
+        self._totals: dict[tuple[ProfileKind, str], LatencyHistogram] = {}
+        self._last_flush = clock()
+        self._flush_task: asyncio.Task | None = None
+
+    def record(self, kind: ProfileKind, name: str, duration: float, error: bool = False) -> None:
+        """Record a span duration in seconds"""
+        self._buffer.append((kind, name, int(duration * 1e6), error))
+
+    @contextmanager
+    def span(self, kind: ProfileKind, name: str) -> Iterator[None]:
+        """Time a block as a span and flush if one is due"""
+        start = time.perf_counter()
+        error = False
+
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - start, error=error)
+            self.schedule_flush()
+
+    def collect(self) -> None:
+        """Drain the buffer into the window and total histograms"""
+        with self._collect_lock:
+            while self._buffer:
+                kind, name, duration, error = self._buffer.popleft()
+
+                for histograms in (self._window, self._totals):
+                    if (kind, name) not in histograms:
+                        histograms[(kind, name)] = LatencyHistogram()
+
+                    histograms[(kind, name)].record(duration, error=error)
+
+    def stats(self, kind: ProfileKind | None = None) -> list[ProfileStats]:
+        """Latency of every task and crawler recorded by this process"""
+        self.collect()
+
+        return [
+            ProfileStats.from_histogram(k.value, name, histogram)
+            for (k, name), histogram in sorted(self._totals.items(), key=lambda i: (i[0][0].value, i[0][1]))
+            if kind is None or k == kind
+        ]
+
+    def schedule_flush(self) -> None:
+        """Flush on the running loop if the flush interval has passed"""
+        if self._clock() - self._last_flush < self._flush_interval:
+            return None
+
+        if self._flush_task and not self._flush_task.done():
+            return None
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+        self._last_flush = self._clock()
+        self._flush_task = loop.create_task(self.flush())
+
+    def _take_window(self) -> tuple[datetime, dict[tuple[ProfileKind, str], LatencyHistogram]]:
+        with self._collect_lock:
+            window, self._window = self._window, {}
+            window_start, self._window_start = self._window_start, datetime.now().astimezone()
+
+        return window_start, window
+
+    async def flush(self) -> int:
+        """Write the histograms for the window since the last flush in one batch. Returns the rows written"""
+        self.collect()
+        self._last_flush = self._clock()
+
+        window_start, window = self._take_window()
+
+        if not window:
+            return 0
+
+        window_end = datetime.now().astimezone()
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "kind": kind.value,
+                "name": name,
+                "period_start": window_start,
+                "period_end": window_end,
+                "count": histogram.count,
+                "errors": histogram.errors,
+                "total": histogram.total,
+                "p50": histogram.percentile(50),
+                "p95": histogram.percentile(95),
+                "p99": histogram.percentile(99),
+                "max": histogram.max,
+                "histogram": histogram.to_json(),
+            }
+            for (kind, name), histogram in window.items()
+        ]
+
+        try:
+            async with SessionLocalAsync() as session:
+                await session.execute(_TASK_PROFILE_STATS_INSERT_QUERY, rows)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error flushing task profile stats: {e}")
+
+            # kept for the next flush
+            with self._collect_lock:
+                for key, histogram in window.items():
+                    if key not in self._window:
+                        self._window[key] = LatencyHistogram()
+
+                    self._window[key].merge(histogram)
+
+                self._window_start = min(self._window_start, window_start)
+
+            return 0
+
+        return len(rows)
+
+
+task_profiler = TaskProfiler()
+
+
+async def get_task_profile_stats(since: datetime, kind: ProfileKind | None = None) -> list[ProfileStats]:
+    """Latency of every task and crawler across all processes since a time from the flushed histograms"""
+    async with get_read_session() as session:
+        result = await session.execute(_TASK_PROFILE_STATS_QUERY, {"since": since, "kind": kind.value if kind else None})
+        rows = result.fetchall()
+
+    histograms: dict[tuple[str, str], LatencyHistogram] = {}
+
+    for row in rows:
+        histogram = LatencyHistogram.from_buckets(row.histogram, errors=row.errors, total=int(row.total), max=int(row.max))
+
+        if (row.kind, row.name) not in histograms:
+            histograms[(row.kind, row.name)] = LatencyHistogram()
+
+        histograms[(row.kind, row.name)].merge(histogram)
+
+    return [ProfileStats.from_histogram(k, name, histogram) for (k, name), histogram in sorted(histograms.items())]
+
+
 async def cleanup_database_task_profiles_basedon_retention() -> None:
     """This will clean up the database tasks based on their retention period"""
     engine = db_connect()
@@ -195,7 +502,8 @@ def profile_task(
     level: ProfilerLevel = ProfilerLevel.NOISY,
     retention_period: ProfilerRetentionTime = ProfilerRetentionTime.FOREVER,
 ) -> Callable:
-    """Profile a task and log the time taken to run it
+    """Profile a task and log the time taken to run it. Every run is recorded as a span in the task
+    profiler and the level only gates logging and slack
 
     :param send_slack: Send a slack message with the profile
     :param message_fmt: A custom message format string
@@ -204,23 +512,11 @@ def profile_task(
     """
 
     def profile_task_decorator(task: Any, *args: Any, **kwargs: Any) -> Any:
-        @functools.wraps(task)
-        async def _async_task_profile_wrapper(*args: Any, **kwargs: Any) -> Any:
-            """Wrapper for async tasks"""
-            logger.info(f"Running async task: {task.__name__}")
-
-            invokee_method_name = profile_retrieve_caller_name()
-            logger.info(f"Invoked by: {invokee_method_name}")
-
-            dtime_start = get_now()
-
-            run_task_output = await task(*args, **kwargs)
-
-            dtime_end = get_now()
-
+        def _report(dtime_start: datetime, dtime_end: datetime, kwargs: dict[str, Any]) -> None:
+            """Log and optionally send the profile to slack"""
             if level and level.value < PROFILE_LEVEL.value:
-                logger.debug(f"Async task {task.__name__} complete and returning since not level")
-                return run_task_output
+                logger.debug(f"Task {task.__name__} complete and returning since not level")
+                return None
 
             wall_clock_time = chop_delta_microseconds(dtime_end - dtime_start)
             wall_clock_time_seconds = wall_clock_time.total_seconds()
@@ -228,14 +524,6 @@ def profile_task(
                 f"{int(wall_clock_time_seconds)}s" if wall_clock_time_seconds >= 1 else f"{wall_clock_time_seconds:.2f}s"
             )
 
-            await log_task_profile_to_database(
-                task_name=task.__name__,
-                time_start=dtime_start,
-                time_end=dtime_end,
-                retention_period=retention_period,
-                level=level,
-            )
-
             profile_message = f"[{settings.env}] `{task.__name__}` in {wall_clock_human}"
 
             if message_fmt:
@@ -254,12 +542,29 @@ def profile_task(
 
             logger.info(profile_message)
 
+        @functools.wraps(task)
+        async def _async_task_profile_wrapper(*args: Any, **kwargs: Any) -> Any:
+            """Wrapper for async tasks"""
+            dtime_start = get_now()
+
+            with task_profiler.span(ProfileKind.task, task.__name__):
+                run_task_output = await task(*args, **kwargs)
+
+            _report(dtime_start, get_now(), kwargs)
+
             return run_task_output
 
         @functools.wraps(task)
         def _sync_task_profile_wrapper(*args: Any, **kwargs: Any) -> Any:
             """Wrapper for synchronous tasks"""
-            pass
+            dtime_start = get_now()
+
+            with task_profiler.span(ProfileKind.task, task.__name__):
+                run_task_output = task(*args, **kwargs)
+
+            _report(dtime_start, get_now(), kwargs)
+
+            return run_task_output
 
         if inspect.iscoroutinefunction(task):
             return _async_task_profile_wrapper
@@ -0,0 +1,193 @@
+"""
+OpenNEM facility energy at ingest
+
+Energy for a facility interval is the trapezoid of its generation and that of the interval before
+it. Rather than an UPDATE pass over facility_scada after every crawl, energy is calculated on
+the records in the bulk insert batch so every row is written once.
+
+The last generation value seen for each network, facility and forecast flag is held in process.
+The database is only read for facilities the cache can't answer for: on start, after a gap, or
+when a batch is older than what has been seen (late or out of order data).
+
+A late record changes the energy of the row after it. When that row is already stored and isn't
+in the batch it is returned as a repair to be recalculated once the batch is written.
+"""
+
+import logging
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import text
+
+from opennem.core.networks import network_from_network_code
+from opennem.db import SessionLocalAsync
+
+logger = logging.getLogger("opennem.core.scada_energy")
+
+# energy_quality_flag values
+ENERGY_QUALITY_PENDING = 0
+ENERGY_QUALITY_CALCULATED = 1
+
+ScadaKey = tuple[str, str, bool]
+
+_SCADA_GENERATED_QUERY = text(
+    """
+    select facility_code, is_forecast, interval, generated
+    from facility_scada
+    where
+        network_id = :network_id
+        and facility_code = any(:facility_codes)
+        and interval >= :date_start
+        and interval <= :date_end
+    """
+)
+
+
+@dataclass(slots=True)
+class EnergyRepair:
+    """Stored rows of a network whose energy needs recalculating"""
+
+    network_id: str
+    date_start: datetime
+    date_end: datetime
+    facility_codes: set[str] = field(default_factory=set)
+
+    def add(self, facility_code: str, interval: datetime) -> None:
+        self.facility_codes.add(facility_code)
+        self.date_start = min(self.date_start, interval)
+        self.date_end = max(self.date_end, interval)
+
+
+def _energy(generated: float | None, previous: float | None, interval_size: int) -> float | None:
+    if generated is None:
+        return None
+
+    return (generated + (previous or 0)) / 2 / (60 / interval_size)
+
+
+def _float(value: Any) -> float | None:
+    if value is None:
+        return None
+
+    value = float(value)
+
+    # pandas fills missing values with nan
+    return None if value != value else value
+
+
+class ScadaEnergyCache:
+    """Last generation value per network, facility and forecast flag"""
+
+    def __init__(self) -> None:
+        self._last: dict[ScadaKey, tuple[datetime, float | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def get(self, key: ScadaKey) -> tuple[datetime, float | None] | None:
+        return self._last.get(key)
+
+    def update(self, key: ScadaKey, interval: datetime, generated: float | None) -> None:
+        last = self._last.get(key)
+
+        if not last or interval >= last[0]:
+            self._last[key] = (interval, generated)
+
+    def clear(self) -> None:
+        self._last.clear()
+
+    async def _load(
+        self, network_id: str, facility_codes: list[str], date_start: datetime, date_end: datetime
+    ) -> dict[tuple[str, bool, datetime], float | None]:
+        async with SessionLocalAsync() as session:
+            result = await session.execute(
+                _SCADA_GENERATED_QUERY,
+                {"network_id": network_id, "facility_codes": facility_codes, "date_start": date_start, "date_end": date_end},
+            )
+
+            return {(r[0], r[1], r[2]): _float(r[3]) for r in result.fetchall()}
+
+    async def calculate(self, records: list[dict[Hashable, Any]]) -> list[EnergyRepair]:
+        """Set energy and energy_quality_flag on facility scada records in place. Returns the stored
+        rows that need their energy recalculated because of late records in the batch"""
+        networks: dict[str, list[dict]] = {}
+
+        for record in records:
+            networks.setdefault(record["network_id"], []).append(record)
+
+        repairs = []
+
+        for network_id, network_records in networks.items():
+            if repair := await self._calculate_network(network_id, network_records):
+                repairs.append(repair)
+
+        return repairs
+
+    async def _calculate_network(self, network_id: str, records: list[dict]) -> EnergyRepair | None:
+        interval_minutes = network_from_network_code(network_id).interval_size
+        interval_size = timedelta(minutes=interval_minutes)
+
+        batch: dict[tuple[str, bool, datetime], float | None] = {
+            (r["facility_code"], bool(r["is_forecast"]), r["interval"]): _float(r["generated"]) for r in records
+        }
+
+        first_interval: dict[tuple[str, bool], datetime] = {}
+
+        for facility_code, is_forecast, interval in batch:
+            key = (facility_code, is_forecast)
+            first_interval[key] = min(first_interval.get(key, interval), interval)
+
+        # facilities where the cache holds exactly the interval before the batch need no lookup
+        stored: dict[tuple[str, bool, datetime], float | None] = {}
+        lookup: set[str] = set()
+
+        for (facility_code, is_forecast), interval in first_interval.items():
+            last = self.get((network_id, facility_code, is_forecast))
+
+            if last and last[0] == interval - interval_size:
+                stored[(facility_code, is_forecast, last[0])] = last[1]
+            else:
+                lookup.add(facility_code)
+
+        if lookup:
+            intervals = [k[2] for k in batch if k[0] in lookup]
+            stored.update(
+                await self._load(network_id, sorted(lookup), min(intervals) - interval_size, max(intervals) + interval_size)
+            )
+
+        repair: EnergyRepair | None = None
+
+        for record in records:
+            facility_code, is_forecast, interval = record["facility_code"], bool(record["is_forecast"]), record["interval"]
+            previous_key = (facility_code, is_forecast, interval - interval_size)
+            previous = batch[previous_key] if previous_key in batch else stored.get(previous_key)
+
+            generated = batch[(facility_code, is_forecast, interval)]
+
+            record["energy"] = _energy(generated, previous, interval_minutes)
+            record["energy_quality_flag"] = ENERGY_QUALITY_CALCULATED
+
+            self.update((network_id, facility_code, is_forecast), interval, generated)
+
+            # a stored row after this one was calculated without it
+            next_key = (facility_code, is_forecast, interval + interval_size)
+
+            if next_key in stored and next_key not in batch:
+                if not repair:
+                    repair = EnergyRepair(network_id=network_id, date_start=next_key[2], date_end=next_key[2])
+
+                repair.add(facility_code, next_key[2])
+
+        for (facility_code, is_forecast, interval), generated in stored.items():
+            self.update((network_id, facility_code, is_forecast), interval, generated)
+
+        return repair
+
+
+_SCADA_ENERGY_CACHE = ScadaEnergyCache()
+
+
+def get_scada_energy_cache() -> ScadaEnergyCache:
+    return _SCADA_ENERGY_CACHE
@@ -0,0 +1,283 @@
+"""
+OpenNEM ingest pipeline tracing
+
+Each stage of the ingest pipeline (directory listing, download, parse, transform and copy) runs
+in an `ingest_span`, which is an OpenTelemetry span through logfire. Stage durations are
+recorded in a histogram and bytes and row counts in counters. These go to the logfire metrics
+and also to a local registry.
+
+The local registry keeps Prometheus-style cumulative bucket histograms and counters. With
+`ingest_trace_path` set it also keeps the finished spans, and `write_ingest_trace` appends them
+with the metrics as a line of JSON for offline analysis.
+"""
+
+import enum
+import json
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import logfire
+from opentelemetry import trace
+
+from opennem import settings
+
+logger = logging.getLogger("opennem.core.tracing")
+
+
+class IngestStage(enum.Enum):
+    dirlisting = "dirlisting"
+    download = "download"
+    parse = "parse"
+    transform = "transform"
+    copy = "copy"
+
+
+class IngestMetric(enum.Enum):
+    bytes_downloaded = "opennem_ingest_bytes_downloaded_total"
+    rows_parsed = "opennem_ingest_rows_parsed_total"
+    rows_transformed = "opennem_ingest_rows_transformed_total"
+    rows_copied = "opennem_ingest_rows_copied_total"
+    rows_inserted = "opennem_ingest_rows_inserted_total"
+    rows_conflict_updated = "opennem_ingest_rows_conflict_updated_total"
+    rows_conflict_skipped = "opennem_ingest_rows_conflict_skipped_total"
+
+
+STAGE_DURATION_METRIC = "opennem_ingest_stage_duration_seconds"
+
+# prometheus default buckets extended for long downloads and copies
+STAGE_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# finished spans held for the local exporter
+_SPAN_BUFFER_SIZE = 10_000
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: dict[str, str] | None = None) -> str:
+    pairs = [*labels, *(extra or {}).items()]
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+@dataclass(slots=True)
+class BucketHistogram:
+    """Histogram with fixed upper bounds and cumulative bucket counts as prometheus exposes them"""
+
+    bounds: tuple[float, ...] = STAGE_DURATION_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    sum: float = 0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * len(self.bounds)
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "buckets": {str(bound): count for bound, count in zip(self.bounds, self.counts, strict=True)},
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+@dataclass(slots=True)
+class IngestSpanRecord:
+    name: str
+    stage: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start: datetime
+    duration: float
+    attributes: dict[str, Any]
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "stage": self.stage,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start": self.start.isoformat(),
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class IngestMetricsRegistry:
+    """Local counters, stage histograms and finished spans"""
+
+    def __init__(self, span_buffer_size: int = _SPAN_BUFFER_SIZE) -> None:
+        self._lock = threading.Lock()
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.histograms: dict[tuple[str, Labels], BucketHistogram] = {}
+        self.spans: deque[IngestSpanRecord] = deque(maxlen=span_buffer_size)
+
+    def add(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            if (name, labels) not in self.histograms:
+                self.histograms[(name, labels)] = BucketHistogram()
+
+            self.histograms[(name, labels)].observe(value)
+
+    def add_span(self, span: IngestSpanRecord) -> None:
+        self.spans.append(span)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": [{"name": n, "labels": dict(labels), "value": v} for (n, labels), v in self.counters.items()],
+                "histograms": [{"name": n, "labels": dict(labels), **h.to_dict()} for (n, labels), h in self.histograms.items()],
+                "spans": [s.to_dict() for s in self.spans],
+            }
+
+    def to_prometheus(self) -> str:
+        """Metrics in the prometheus text exposition format"""
+        lines: list[str] = []
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                for bound, count in zip(histogram.bounds, histogram.counts, strict=True):
+                    lines.append(f"{name}_bucket{_format_labels(labels, {'le': f'{bound:g}'})} {count}")
+
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.spans.clear()
+
+
+ingest_metrics = IngestMetricsRegistry()
+
+_stage_duration = logfire.metric_histogram(STAGE_DURATION_METRIC, unit="s", description="Duration of ingest pipeline stages")
+_counters = {metric: logfire.metric_counter(metric.value, description=metric.name.replace("_", " ")) for metric in IngestMetric}
+
+
+def ingest_count(metric: IngestMetric, value: float, **labels: Any) -> None:
+    """Add to an ingest counter"""
+    if not value:
+        return None
+
+    _counters[metric].add(value, {k: str(v) for k, v in labels.items()})
+    ingest_metrics.add(metric.value, value, _labels(labels))
+
+
+class IngestSpan:
+    """Attributes set on a stage span while it runs, such as the bytes or rows it handled"""
+
+    def __init__(self, stage: IngestStage, attributes: dict[str, Any]) -> None:
+        self.stage = stage
+        self.attributes = attributes
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+def _span_id(value: int) -> str:
+    return format(value, "016x")
+
+
+@contextmanager
+def ingest_span(stage: IngestStage, **attributes: Any) -> Iterator[IngestSpan]:
+    """Run a pipeline stage in an OpenTelemetry span and record its duration"""
+    span = IngestSpan(stage, attributes)
+    parent = trace.get_current_span().get_span_context()
+    started = datetime.now().astimezone()
+    start = time.perf_counter()
+    error: str | None = None
+
+    with logfire.span("ingest {stage}", stage=stage.value, **attributes) as otel_span:
+        context = trace.get_current_span().get_span_context()
+
+        try:
+            yield span
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+
+            otel_span.set_attributes(span.attributes)
+
+            stage_labels = {"stage": stage.value}
+
+            if table := span.attributes.get("table"):
+                stage_labels["table"] = str(table)
+
+            _stage_duration.record(duration, stage_labels)
+            ingest_metrics.observe(STAGE_DURATION_METRIC, duration, _labels(stage_labels))
+
+            if settings.ingest_trace_path:
+                ingest_metrics.add_span(
+                    IngestSpanRecord(
+                        name=f"ingest {stage.value}",
+                        stage=stage.value,
+                        trace_id=format(context.trace_id, "032x"),
+                        span_id=_span_id(context.span_id),
+                        parent_span_id=_span_id(parent.span_id) if parent.is_valid else None,
+                        start=started,
+                        duration=duration,
+                        attributes=dict(span.attributes),
+                        error=error,
+                    )
+                )
+
+
+def write_ingest_trace(path: str | Path | None = None, reset: bool = True) -> Path | None:
+    """
+    Append the spans and metrics recorded since the last write to a JSON lines file, by default
+    the ingest_trace_path setting
+    """
+    path = path or settings.ingest_trace_path
+
+    if not path:
+        return None
+
+    path = Path(path)
+    snapshot = {"written_at": datetime.now().astimezone().isoformat(), **ingest_metrics.snapshot()}
+
+    with path.open("a") as fh:
+        fh.write(json.dumps(snapshot, default=str) + "\n")
+
+    if reset:
+        ingest_metrics.reset()
+
+    return path
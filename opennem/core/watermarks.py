@@ -0,0 +1,229 @@
+"""
+OpenNEM data watermarks
+
+The first and last interval each facility has been seen in facility_scada, and the first and last
+interval it generated, kept in facility_scada_watermark. Network and facility data ranges are read
+from it rather than aggregated over facility_scada.
+
+Watermarks are raised by the bulk insert with a single LEAST/GREATEST upsert per batch. Each
+process holds a snapshot of the table, loaded again every `scada_watermark_refresh` seconds and
+advanced in place by its own inserts.
+
+Forecast scada doesn't move the watermarks.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from collections.abc import Callable, Hashable, Iterable, Sequence
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any
+
+import asyncpg
+from sqlalchemy import text
+
+from opennem import settings
+from opennem.db import get_read_session
+
+logger = logging.getLogger("opennem.core.watermarks")
+
+# asyncpg as it runs in the bulk insert transaction
+_WATERMARK_UPSERT_QUERY = """
+    insert into facility_scada_watermark as w (network_id, facility_code, first_seen, last_seen, first_nonzero, last_nonzero)
+    select * from unnest($1::text[], $2::text[], $3::timestamp[], $4::timestamp[], $5::timestamp[], $6::timestamp[])
+    on conflict (network_id, facility_code) do update set
+        first_seen = least(w.first_seen, excluded.first_seen),
+        last_seen = greatest(w.last_seen, excluded.last_seen),
+        first_nonzero = least(w.first_nonzero, excluded.first_nonzero),
+        last_nonzero = greatest(w.last_nonzero, excluded.last_nonzero),
+        updated_at = now()
+    where
+        excluded.first_seen < w.first_seen
+        or excluded.last_seen > w.last_seen
+        or excluded.first_nonzero < w.first_nonzero
+        or excluded.last_nonzero > w.last_nonzero
+        or (w.first_nonzero is null and excluded.first_nonzero is not null)
+"""
+
+_WATERMARKS_QUERY = text(
+    """
+    select network_id, facility_code, first_seen, last_seen, first_nonzero, last_nonzero
+    from facility_scada_watermark
+    """
+)
+
+
+def _least(a: datetime | None, b: datetime | None) -> datetime | None:
+    return min(a, b) if a and b else a or b
+
+
+def _greatest(a: datetime | None, b: datetime | None) -> datetime | None:
+    return max(a, b) if a and b else a or b
+
+
+@dataclass(frozen=True, slots=True)
+class FacilityWatermark:
+    network_id: str
+    facility_code: str
+    first_seen: datetime
+    last_seen: datetime
+    first_nonzero: datetime | None = None
+    last_nonzero: datetime | None = None
+
+    def merge(self, other: "FacilityWatermark") -> "FacilityWatermark":
+        return replace(
+            self,
+            first_seen=min(self.first_seen, other.first_seen),
+            last_seen=max(self.last_seen, other.last_seen),
+            first_nonzero=_least(self.first_nonzero, other.first_nonzero),
+            last_nonzero=_greatest(self.last_nonzero, other.last_nonzero),
+        )
+
+
+def watermarks_from_records(records: Iterable[dict[Hashable, Any]]) -> list[FacilityWatermark]:
+    """Watermarks for a batch of facility scada records"""
+    watermarks: dict[tuple[str, str], FacilityWatermark] = {}
+
+    for record in records:
+        if record.get("is_forecast"):
+            continue
+
+        interval = record["interval"]
+        interval = interval.to_pydatetime() if hasattr(interval, "to_pydatetime") else interval
+        generated = record.get("generated")
+        nonzero = interval if generated and generated > 0 else None
+
+        watermark = FacilityWatermark(record["network_id"], record["facility_code"], interval, interval, nonzero, nonzero)
+        key = (watermark.network_id, watermark.facility_code)
+
+        watermarks[key] = watermarks[key].merge(watermark) if key in watermarks else watermark
+
+    return list(watermarks.values())
+
+
+async def upsert_watermarks(conn: asyncpg.Connection, watermarks: Sequence[FacilityWatermark]) -> None:
+    """Raise the stored watermarks for a batch on a bulk insert connection"""
+    if not watermarks:
+        return None
+
+    await conn.execute(
+        _WATERMARK_UPSERT_QUERY,
+        [w.network_id for w in watermarks],
+        [w.facility_code for w in watermarks],
+        [w.first_seen for w in watermarks],
+        [w.last_seen for w in watermarks],
+        [w.first_nonzero for w in watermarks],
+        [w.last_nonzero for w in watermarks],
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class NetworkWatermark:
+    network_id: str
+    first_seen: datetime
+    last_seen: datetime
+
+
+@dataclass(slots=True)
+class ScadaWatermarks:
+    """Snapshot of the watermarks by network and facility code"""
+
+    facilities: dict[tuple[str, str], FacilityWatermark]
+
+    def __len__(self) -> int:
+        return len(self.facilities)
+
+    def facility(self, network_id: str, facility_code: str) -> FacilityWatermark | None:
+        return self.facilities.get((network_id, facility_code))
+
+    def apply(self, watermarks: Iterable[FacilityWatermark]) -> None:
+        for watermark in watermarks:
+            key = (watermark.network_id, watermark.facility_code)
+            self.facilities[key] = self.facilities[key].merge(watermark) if key in self.facilities else watermark
+
+    def select(
+        self, network_ids: Iterable[str] | None = None, facility_codes: Iterable[str] | None = None
+    ) -> list[FacilityWatermark]:
+        """Watermarks for facilities in networks and/or a set of facilities"""
+        watermarks = list(self.facilities.values())
+
+        if network_ids is not None:
+            network_ids = set(network_ids)
+            watermarks = [w for w in watermarks if w.network_id in network_ids]
+
+        if facility_codes is not None:
+            facility_codes = set(facility_codes)
+            watermarks = [w for w in watermarks if w.facility_code in facility_codes]
+
+        return watermarks
+
+    def networks(self) -> list[NetworkWatermark]:
+        networks: dict[str, NetworkWatermark] = {}
+
+        for w in self.facilities.values():
+            current = networks.get(w.network_id)
+
+            networks[w.network_id] = NetworkWatermark(
+                network_id=w.network_id,
+                first_seen=min(current.first_seen, w.first_seen) if current else w.first_seen,
+                last_seen=max(current.last_seen, w.last_seen) if current else w.last_seen,
+            )
+
+        return list(networks.values())
+
+
+class WatermarkRegistry:
+    """Watermarks held in process and loaded again from the database every refresh seconds"""
+
+    def __init__(self, refresh: float | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        self.refresh = refresh if refresh is not None else settings.scada_watermark_refresh
+        self.clock = clock
+
+        self._watermarks: ScadaWatermarks | None = None
+        self._loaded: float = float("-inf")
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+    async def _load(self) -> ScadaWatermarks:
+        async with get_read_session() as session:
+            result = await session.execute(_WATERMARKS_QUERY)
+            rows = result.fetchall()
+
+        return ScadaWatermarks(facilities={(r[0], r[1]): FacilityWatermark(*r) for r in rows})
+
+    async def get(self) -> ScadaWatermarks:
+        if self._watermarks is not None and self.clock() - self._loaded < self.refresh:
+            return self._watermarks
+
+        lock = self._locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+        async with lock:
+            if self._watermarks is not None and self.clock() - self._loaded < self.refresh:
+                return self._watermarks
+
+            self._watermarks = await self._load()
+            self._loaded = self.clock()
+
+            logger.debug(f"Loaded {len(self._watermarks)} facility watermarks")
+
+        return self._watermarks
+
+    def apply(self, watermarks: Iterable[FacilityWatermark]) -> None:
+        """Advance the snapshot with watermarks this process has just written"""
+        if self._watermarks is not None:
+            self._watermarks.apply(watermarks)
+
+    def invalidate(self) -> None:
+        self._loaded = float("-inf")
+
+
+_WATERMARK_REGISTRY = WatermarkRegistry()
+
+
+async def get_scada_watermarks() -> ScadaWatermarks:
+    return await _WATERMARK_REGISTRY.get()
+
+
+def apply_scada_watermarks(watermarks: Iterable[FacilityWatermark]) -> None:
+    _WATERMARK_REGISTRY.apply(watermarks)
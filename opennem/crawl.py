@@ -10,7 +10,10 @@ from opennem import settings
 from opennem.controllers.schema import ControllerReturn
 from opennem.core.crawlers.meta import CrawlStatTypes, crawler_set_meta, crawlers_get_all_meta
 from opennem.core.crawlers.schema import CrawlerDefinition, CrawlerSet
+from opennem.core.events import publish_interval_events
 from opennem.core.parsers.aemo.nemweb import parse_aemo_url_optimized
+from opennem.core.profiler import ProfileKind, task_profiler
+from opennem.core.tracing import write_ingest_trace
 from opennem.crawlers.apvi import (
     APVIRooftopAllCrawler,
     APVIRooftopLatestCrawler,
@@ -158,14 +161,20 @@ async def run_crawl(
 
     cr: ControllerReturn | None = None
 
-    if inspect.iscoroutinefunction(crawler.processor):
-        cr = await crawler.processor(
-            crawler=crawler, last_crawled=last_crawled, limit=limit or crawler.limit, latest=latest, date_range=date_range
-        )
-    else:
-        cr = crawler.processor(
-            crawler=crawler, last_crawled=last_crawled, limit=limit or crawler.limit, latest=latest, date_range=date_range
-        )
+    try:
+        with task_profiler.span(ProfileKind.crawler, crawler.name):
+            if inspect.iscoroutinefunction(crawler.processor):
+                cr = await crawler.processor(
+                    crawler=crawler, last_crawled=last_crawled, limit=limit or crawler.limit, latest=latest, date_range=date_range
+                )
+            else:
+                cr = crawler.processor(
+                    crawler=crawler, last_crawled=last_crawled, limit=limit or crawler.limit, latest=latest, date_range=date_range
+                )
+    finally:
+        # stage spans of the crawl for offline analysis
+        if settings.ingest_trace_path:
+            write_ingest_trace()
 
     if not cr:
         return None
@@ -189,6 +198,16 @@ async def run_crawl(
 
         logger.info(f"Set last_processed to {crawler.last_processed} and server_latest to {cr.server_latest}")
 
+        # let downstream stages know the latest intervals have landed. backfill and catchup crawls
+        # are left to the scheduled and backfill runs
+        if cr.inserted_records and crawler.network and latest and not date_range:
+            await publish_interval_events(
+                network_id=crawler.network.code,
+                intervals=cr.intervals,
+                stage=crawler.name,
+                inserted_records=cr.inserted_records,
+            )
+
     return cr
 
 
@@ -1,10 +1,12 @@
 """APVI Rooftop Data Crawler"""
 
+import asyncio
 import logging
 from datetime import date
 
-from opennem.clients.apvi import APVIForecastSet, get_apvi_rooftop_data
-from opennem.controllers.apvi import store_apvi_forecastset, update_apvi_facility_capacities
+from opennem import settings
+from opennem.clients.apvi import get_apvi_rooftop_rollup
+from opennem.controllers.apvi import store_apvi_rollup, update_apvi_facility_capacities
 from opennem.controllers.schema import ControllerReturn
 from opennem.core.crawlers.schema import CrawlerDefinition, CrawlerPriority, CrawlerSchedule
 from opennem.schema.date_range import CrawlDateRange
@@ -28,72 +30,83 @@ async def crawl_apvi_forecasts(
     date_range: CrawlDateRange | None = None,
 ) -> ControllerReturn:
     """Runs the APVI crawl definition"""
-    apvi_return = ControllerReturn()
-
     if crawler.latest:
         return await run_apvi_crawl()
 
     # run the entire date range
     elif crawler.limit:
-        for day_run in date_series(get_today_nem().date(), length=crawler.limit, reverse=True):
-            apvi_forecast_return = await run_apvi_crawl(day_run)
-
-            if not apvi_forecast_return:
-                raise APVICrawlerException("Bad run_apvi_crawl return none or no server_latest")
-
-            apvi_return.processed_records += apvi_forecast_return.processed_records
-            apvi_return.total_records += apvi_forecast_return.total_records
-            apvi_return.inserted_records += apvi_forecast_return.inserted_records
-            apvi_return.errors += apvi_forecast_return.errors
-
-            if not apvi_forecast_return.server_latest:
-                logger.warn(f"Did not get server_latest from run_apvi_crawl for date {day_run}")
-                continue
-
-            if not apvi_return.server_latest or (apvi_return.server_latest < apvi_forecast_return.server_latest):
-                apvi_return.server_latest = apvi_forecast_return.server_latest
+        days = list(date_series(get_today_nem().date(), length=crawler.limit, reverse=True))
 
     # run all
     else:
         if not NetworkAPVI.data_first_seen:
             raise Exception("Require data_first_seen for network to parse")
 
-        for day_run in date_series(get_today_nem().date(), NetworkAPVI.data_first_seen, reverse=False):
-            apvi_forecast_return = run_apvi_crawl(day_run)
-            apvi_return.processed_records += apvi_forecast_return.processed_records
-            apvi_return.total_records += apvi_forecast_return.total_records
-            apvi_return.inserted_records += apvi_forecast_return.inserted_records
-            apvi_return.errors += apvi_forecast_return.errors
+        days = list(date_series(get_today_nem().date(), NetworkAPVI.data_first_seen, reverse=False))
 
-            if not apvi_forecast_return or not apvi_forecast_return.server_latest:
-                raise APVICrawlerException("Bad run_apvi_crawl return none or no server_latest")
+    apvi_return = await run_apvi_crawl_days(days)
 
-            if not apvi_return.server_latest or apvi_return.server_latest < apvi_forecast_return.server_latest:
-                apvi_return.server_latest = apvi_forecast_return.server_latest
+    if not apvi_return.server_latest:
+        raise APVICrawlerException("Bad run_apvi_crawl return none or no server_latest")
 
     return apvi_return
 
 
-async def run_apvi_crawl(day: date | None = None) -> ControllerReturn:
+async def run_apvi_crawl(day: date | None = None, update_capacities: bool = True) -> ControllerReturn:
     """Run the APVI crawl for a given day"""
 
-    apvi_forecast_set: APVIForecastSet | None = None
-
     logger.info(f"Getting APVI data for day {day}")
-    apvi_forecast_set = await get_apvi_rooftop_data(day=day)
-
-    if not apvi_forecast_set:
-        raise Exception("Could not get APVI forecast set")
+    apvi_rollup = await get_apvi_rooftop_rollup(day=day)
 
-    cr = await store_apvi_forecastset(apvi_forecast_set)
+    if not apvi_rollup:
+        raise APVICrawlerException("Could not get APVI forecast set")
 
-    await update_apvi_facility_capacities(apvi_forecast_set)
+    cr = await store_apvi_rollup(apvi_rollup)
 
-    cr.server_latest = apvi_forecast_set.server_latest
+    if update_capacities:
+        await update_apvi_facility_capacities(apvi_rollup)
 
     return cr
 
 
+async def run_apvi_crawl_days(days: list[date], concurrency: int | None = None) -> ControllerReturn:
+    """Run the APVI crawl for a set of days with a number of days fetched concurrently
+
+    Facility capacities are only updated from the most recent day
+    """
+    apvi_return = ControllerReturn()
+
+    if not days:
+        return apvi_return
+
+    semaphore = asyncio.Semaphore(concurrency or settings.apvi_crawl_concurrency)
+    latest_day = max(days)
+
+    async def _run_day(day: date) -> ControllerReturn:
+        async with semaphore:
+            try:
+                return await run_apvi_crawl(day, update_capacities=day == latest_day)
+            except Exception as e:
+                logger.error(f"Error running APVI crawl for {day}: {e}")
+                return ControllerReturn(errors=1, error_detail=[f"{day}: {e}"])
+
+    for day_run, apvi_forecast_return in zip(days, await asyncio.gather(*[_run_day(d) for d in days]), strict=True):
+        apvi_return.processed_records += apvi_forecast_return.processed_records
+        apvi_return.total_records += apvi_forecast_return.total_records
+        apvi_return.inserted_records += apvi_forecast_return.inserted_records
+        apvi_return.errors += apvi_forecast_return.errors
+        apvi_return.error_detail += apvi_forecast_return.error_detail
+
+        if not apvi_forecast_return.server_latest:
+            logger.warning(f"Did not get server_latest from run_apvi_crawl for date {day_run}")
+            continue
+
+        if not apvi_return.server_latest or apvi_return.server_latest < apvi_forecast_return.server_latest:
+            apvi_return.server_latest = apvi_forecast_return.server_latest
+
+    return apvi_return
+
+
 APVIRooftopTodayCrawler = CrawlerDefinition(
     priority=CrawlerPriority.medium,
     schedule=CrawlerSchedule.frequent,
@@ -137,10 +150,5 @@ APVIRooftopAllCrawler = CrawlerDefinition(
 
 
 if __name__ == "__main__":
-    r = get_apvi_rooftop_data()
-
-    if not r:
-        print("no result")
-    else:
-        cr = store_apvi_forecastset(r)
-        print(cr)
+    cr = asyncio.run(run_apvi_crawl())
+    print(cr)
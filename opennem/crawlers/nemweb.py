@@ -18,7 +18,7 @@ from opennem.schema.network import NetworkAEMORooftop, NetworkNEM
 logger = logging.getLogger("opennem.crawler.nemweb")
 
 
-async def process_nemweb_entry(crawler: CrawlerDefinition, entry: DirlistingEntry, max_date: datetime) -> None:
+async def process_nemweb_entry(crawler: CrawlerDefinition, entry: DirlistingEntry, max_date: datetime) -> ControllerReturn | None:
     try:
         # @NOTE optimization - if we're dealing with a large file unzip
         # to disk and parse rather than in-memory. 100,000kb
@@ -48,9 +48,44 @@ async def process_nemweb_entry(crawler: CrawlerDefinition, entry: DirlistingEntr
             except Exception as e:
                 logger.error(f"Error updating crawl history: {e}")
 
+        return controller_returns
+
     except Exception as e:
         logger.error(f"Processing error: {e}")
 
+    return None
+
+
+def _merge_controller_returns(
+    controller_returns: ControllerReturn | None, entry_returns: list[ControllerReturn | None]
+) -> ControllerReturn | None:
+    """Sum the returns of each entry processed"""
+    for entry_return in entry_returns:
+        if not isinstance(entry_return, ControllerReturn):
+            continue
+
+        if not controller_returns:
+            controller_returns = ControllerReturn()
+
+        controller_returns.total_records += entry_return.total_records
+        controller_returns.processed_records += entry_return.processed_records
+        controller_returns.inserted_records += entry_return.inserted_records
+        controller_returns.errors += entry_return.errors
+        controller_returns.error_detail += entry_return.error_detail
+        controller_returns.intervals += entry_return.intervals
+
+        if entry_return.server_latest and (
+            not controller_returns.server_latest or entry_return.server_latest > controller_returns.server_latest
+        ):
+            controller_returns.server_latest = entry_return.server_latest
+
+        if entry_return.last_modified and (
+            not controller_returns.last_modified or entry_return.last_modified > controller_returns.last_modified
+        ):
+            controller_returns.last_modified = entry_return.last_modified
+
+    return controller_returns
+
 
 async def run_nemweb_aemo_crawl(
     crawler: CrawlerDefinition,
@@ -135,12 +170,12 @@ async def run_nemweb_aemo_crawl(
         tasks.append(process_nemweb_entry(crawler=crawler, entry=entry, max_date=max_date))
 
         if len(tasks) >= 10:
-            await asyncio.gather(*tasks)
+            controller_returns = _merge_controller_returns(controller_returns, await asyncio.gather(*tasks))
             tasks = []
 
     # complete any remaining tasks
     if tasks:
-        await asyncio.gather(*tasks)
+        controller_returns = _merge_controller_returns(controller_returns, await asyncio.gather(*tasks))
 
     if controller_returns:
         controller_returns.crawls_run = len(entries_to_fetch)
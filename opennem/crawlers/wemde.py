@@ -90,7 +90,7 @@ async def run_wemde_crawl(
             latest_aemo_interval_date = entry.aemo_interval_date
 
         try:
-            data += crawler.parser(entry.link)
+            data += await crawler.parser(entry.link)
 
         except Exception as e:
             logger.error(f"Error parsing data: {e}")
@@ -14,10 +14,22 @@ from typing import Any, TypeVar
 
 import asyncpg
 from asyncpg.pool import Pool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.schema import Column, Table
 
 from opennem import settings
+from opennem.aggregates.changed_days import (
+    ChangedDayAggregate,
+    changed_days_from_records,
+    mark_changed_days,
+    mark_priced_changed_days,
+)
+from opennem.core.completeness import CompletenessSource, completeness_from_records, upsert_completeness
+from opennem.core.scada_energy import get_scada_energy_cache
+from opennem.core.tracing import IngestMetric, IngestStage, ingest_count, ingest_span
+from opennem.core.watermarks import apply_scada_watermarks, upsert_watermarks, watermarks_from_records
 from opennem.db.models.opennem import BalancingSummary, FacilityScada
+from opennem.workers.energy import run_energy_repair
 
 logger = logging.getLogger("opennem.db.bulk_insert_csv")
 
@@ -44,6 +56,16 @@ _BULK_INSERT_CONFLICT_UPDATE = """
     ({pk_columns}) DO UPDATE set {update_values}
 """
 
+# xmax is zero for a newly inserted row and set for a row updated on conflict
+_BULK_INSERT_COUNTS_QUERY = """
+    WITH upserted AS (
+        {insert_query}
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted) AS inserted, count(*) AS affected
+    FROM upserted
+"""
+
 
 def build_insert_query(
     table: Table,
@@ -184,6 +206,57 @@ async def get_pool() -> Pool:
     return pool
 
 
+def _records_completeness(table: ORMTableType, records: list[dict]) -> dict:
+    """Completeness bitmaps for a batch of facility_scada or balancing_summary records"""
+    if not records or "interval" not in records[0]:
+        return {}
+
+    if table is FacilityScada:
+        return completeness_from_records(CompletenessSource.facility_scada, records)
+
+    if table is BalancingSummary:
+        return completeness_from_records(CompletenessSource.balancing_summary, records)
+
+    return {}
+
+
+def _records_changed_days(table: ORMTableType, records: list[dict]) -> tuple[set, set]:
+    """Changed days and priced changed days for a batch of facility_scada or balancing_summary records"""
+    if not records or "interval" not in records[0]:
+        return set(), set()
+
+    if table is FacilityScada:
+        return changed_days_from_records(ChangedDayAggregate.facility_daily, records), set()
+
+    if table is BalancingSummary:
+        return (
+            changed_days_from_records(ChangedDayAggregate.network_demand, records),
+            changed_days_from_records(ChangedDayAggregate.facility_daily, records),
+        )
+
+    return set(), set()
+
+
+async def index_inserted_records(session: AsyncSession, table: ORMTableType, records: list[dict]) -> None:
+    """
+    Update the completeness index and mark the changed days for records written with an insert on a
+    session rather than the bulk insert. Runs on the session connection so it commits or rolls back
+    with the insert.
+    """
+    completeness = _records_completeness(table, records)
+    changed_days, priced_changed_days = _records_changed_days(table, records)
+
+    if not completeness and not changed_days:
+        return None
+
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+
+    await upsert_completeness(raw_connection.driver_connection, completeness)
+    await mark_changed_days(raw_connection.driver_connection, changed_days)
+    await mark_priced_changed_days(raw_connection.driver_connection, priced_changed_days)
+
+
 async def bulkinsert_mms_items(
     table: ORMTableType,
     records: list[dict],
@@ -192,69 +265,120 @@ async def bulkinsert_mms_items(
     if not records:
         return 0
 
+    energy_repairs = []
+    watermarks = []
+    completeness = _records_completeness(table, records)
+    changed_days, priced_changed_days = _records_changed_days(table, records)
+
+    if table is FacilityScada and "interval" in records[0]:
+        watermarks = watermarks_from_records(records)
+
+        # facility energy is calculated on the batch so rows are written once
+        if settings.energy_at_ingest:
+            energy_repairs = await get_scada_energy_cache().calculate(records)
+
+            if update_fields:
+                update_fields = [*update_fields, "energy", "energy_quality_flag"]
+
     tmp_table_name, sql_queries = build_insert_query(table=table, update_cols=update_fields)
+    table_name = table.__table__.name
 
     pool = await get_pool()
     async with pool.acquire() as conn:
         async with conn.transaction():
             try:
-                # Execute CREATE TEMP TABLE
-                logger.debug(sql_queries[0])
-                await conn.execute(sql_queries[0])
-
-                # Get column names and types from the temporary table
-                table_info = await conn.fetch(f"""
-                    SELECT column_name, data_type
-                    FROM information_schema.columns
-                    WHERE table_name = '{tmp_table_name.split(".")[-1]}'
-                """)
-
-                # Prepare records
-                columns = [col["column_name"] for col in table_info]
-                column_types = {col["column_name"]: col["data_type"] for col in table_info}
-
-                records_to_insert = []
-                for record in records:
-                    record_values = []
-                    for col in columns:
-                        value = record.get(col)
-                        if value is None:
-                            record_values.append(None)
-                        elif column_types[col] == "timestamp without time zone":
-                            # Convert string to datetime object if it's not already
-                            record_values.append(value if isinstance(value, datetime) else datetime.fromisoformat(str(value)))
-                        elif column_types[col] == "numeric":
-                            # Ensure numeric values are passed as float or Decimal
-                            record_values.append(float(value) if value is not None else None)
-                        elif column_types[col] == "boolean":
-                            # Convert string to boolean
-                            value = str(value).lower()
-                            record_values.append(value in ("true", "t", "yes", "y", "1"))
-                        else:
-                            record_values.append(str(value))
-                    records_to_insert.append(record_values)
-
-                # Use copy_records_to_table to bulk insert the records
-                logger.debug("Copy records to table")
-                result = await conn.copy_records_to_table(
-                    tmp_table_name.split(".")[-1],  # Remove schema if present
-                    records=records_to_insert,
-                    columns=columns,
-                )
-                logger.debug(f"Copy result: {result}")
-
-                # Execute the INSERT ... ON CONFLICT query
-                insert_result = await conn.execute(sql_queries[2])
+                with ingest_span(IngestStage.copy, table=table_name) as span:
+                    # Execute CREATE TEMP TABLE
+                    logger.debug(sql_queries[0])
+                    await conn.execute(sql_queries[0])
+
+                    # Get column names and types from the temporary table
+                    table_info = await conn.fetch(f"""
+                        SELECT column_name, data_type
+                        FROM information_schema.columns
+                        WHERE table_name = '{tmp_table_name.split(".")[-1]}'
+                    """)
+
+                    # Prepare records
+                    columns = [col["column_name"] for col in table_info]
+                    column_types = {col["column_name"]: col["data_type"] for col in table_info}
+
+                    records_to_insert = []
+                    for record in records:
+                        record_values = []
+                        for col in columns:
+                            value = record.get(col)
+                            if value is None:
+                                record_values.append(None)
+                            elif column_types[col] == "timestamp without time zone":
+                                # Convert string to datetime object if it's not already
+                                record_values.append(value if isinstance(value, datetime) else datetime.fromisoformat(str(value)))
+                            elif column_types[col] == "numeric":
+                                # Ensure numeric values are passed as float or Decimal
+                                record_values.append(float(value) if value is not None else None)
+                            elif column_types[col] == "boolean":
+                                # Convert string to boolean
+                                value = str(value).lower()
+                                record_values.append(value in ("true", "t", "yes", "y", "1"))
+                            else:
+                                record_values.append(str(value))
+                        records_to_insert.append(record_values)
+
+                    # Use copy_records_to_table to bulk insert the records
+                    logger.debug("Copy records to table")
+                    result = await conn.copy_records_to_table(
+                        tmp_table_name.split(".")[-1],  # Remove schema if present
+                        records=records_to_insert,
+                        columns=columns,
+                    )
+                    logger.debug(f"Copy result: {result}")
+
+                    # Execute the INSERT ... ON CONFLICT query counting inserted and conflicting rows
+                    insert_counts = await conn.fetchrow(_BULK_INSERT_COUNTS_QUERY.format(insert_query=sql_queries[2].strip()))
+
+                    rows_copied = len(records_to_insert)
+                    rows_inserted = insert_counts["inserted"]
+                    rows_updated = insert_counts["affected"] - rows_inserted
+                    rows_skipped = rows_copied - insert_counts["affected"]
+
+                    span.set("rows", rows_copied)
+                    span.set("rows_inserted", rows_inserted)
+                    span.set("rows_conflict_updated", rows_updated)
+                    span.set("rows_conflict_skipped", rows_skipped)
+
+                    ingest_count(IngestMetric.rows_copied, rows_copied, table=table_name)
+                    ingest_count(IngestMetric.rows_inserted, rows_inserted, table=table_name)
+                    ingest_count(IngestMetric.rows_conflict_updated, rows_updated, table=table_name)
+                    ingest_count(IngestMetric.rows_conflict_skipped, rows_skipped, table=table_name)
+
+                await upsert_watermarks(conn, watermarks)
+                await upsert_completeness(conn, completeness)
+                await mark_changed_days(conn, changed_days)
+                await mark_priced_changed_days(conn, priced_changed_days)
 
                 num_records = len(records)
-                logger.info(f"Bulk inserted {num_records} records: {insert_result}")
-
-                return num_records
+                logger.info(
+                    f"Bulk inserted {num_records} records into {table_name}: {rows_inserted} inserted, "
+                    f"{rows_updated} updated and {rows_skipped} skipped on conflict"
+                )
 
             except Exception as generic_error:
                 logger.error(f"Error during bulk insert: {generic_error}")
                 raise generic_error
 
+    apply_scada_watermarks(watermarks)
+
+    # rows stored after late records are recalculated once the batch is committed
+    for repair in energy_repairs:
+        await run_energy_repair(
+            network_id=repair.network_id,
+            date_start=repair.date_start,
+            date_end=repair.date_end,
+            facility_codes=sorted(repair.facility_codes),
+        )
+
+    return num_records
+
 
 def generate_csv_from_records(
     table: Table | FacilityScada | BalancingSummary,
@@ -1,4 +1,5 @@
 import logging
+from functools import cache
 
 import clickhouse_connect
 
@@ -10,9 +11,6 @@ from opennem import settings
 
 logger = logging.getLogger("opennem.db.clickhouse")
 
-if not settings.clickhouse_url:
-    raise ValueError("Clickhouse URL not set")
-
 
 def clickhouse_client_factory(host_url: AnyUrl) -> ClickhouseClient:
     params_dict = {}
@@ -32,12 +30,20 @@ def clickhouse_client_factory(host_url: AnyUrl) -> ClickhouseClient:
     if host_url.path:
         params_dict["database"] = host_url.path[1:]
 
-    ch_client = clickhouse_connect.get_client(**params_dict)
+    # without a session the client can be shared by inserts running in threads
+    ch_client = clickhouse_connect.get_client(**params_dict, autogenerate_session_id=False)
 
     return ch_client
 
 
-ch_client = clickhouse_client_factory(settings.clickhouse_url)
+@cache
+def get_clickhouse_client() -> ClickhouseClient:
+    """Clickhouse client for the process, connected on first use"""
+    if not settings.clickhouse_url:
+        raise ValueError("Clickhouse URL not set")
+
+    return clickhouse_client_factory(settings.clickhouse_url)
+
 
 if __name__ == "__main__":
-    print(ch_client.ping())
+    print(get_clickhouse_client().ping())
@@ -0,0 +1,304 @@
+"""
+OpenNEM ClickHouse mirror
+
+Keeps copies of facility_scada, balancing_summary and the aggregate tables in ClickHouse so that
+heavy historical queries and yearly exports can run against a columnar store instead of
+Postgres.
+
+Rows are streamed from Postgres in batches of `clickhouse_mirror_batch_size` and inserted into
+ReplacingMergeTree tables ordered by their primary keys. Each row carries the time it was
+mirrored, so mirroring a range again replaces the rows rather than duplicating them.
+
+New intervals are mirrored as they land by the event pipeline. Historical ranges are backfilled
+in chunks that run in parallel, up to `clickhouse_mirror_backfill_concurrency` at a time.
+
+Queries are routed to ClickHouse with `use_clickhouse` when `clickhouse_query_routing` is on and
+the range is at least `clickhouse_query_min_days` long.
+
+Intervals are naive network time in Postgres, so they are stored as DateTime('UTC') and read back
+as the same wall clock times.
+"""
+
+import asyncio
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from decimal import Decimal
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+from opennem import settings
+from opennem.db import get_read_session
+from opennem.schema.network import NetworkSchema
+
+if TYPE_CHECKING:
+    from clickhouse_connect.driver.client import Client as ClickhouseClient
+
+logger = logging.getLogger("opennem.db.clickhouse_mirror")
+
+
+class ClickhouseMirrorException(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class MirrorColumn:
+    name: str
+    type: str
+    # select expression in postgres when it isn't the column itself
+    source: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class MirrorTable:
+    name: str
+    interval_column: str
+    columns: tuple[MirrorColumn, ...]
+    order_by: tuple[str, ...]
+    partition_by: str
+
+    @property
+    def column_names(self) -> list[str]:
+        return [c.name for c in self.columns]
+
+    def create_table_sql(self) -> str:
+        columns = ",\n".join(f"    {c.name} {c.type}" for c in self.columns)
+
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self.name} (\n{columns},\n    _mirrored_at DateTime64(3) DEFAULT now64(3)\n)\n"
+            f"ENGINE = ReplacingMergeTree(_mirrored_at)\n"
+            f"PARTITION BY {self.partition_by}\n"
+            f"ORDER BY ({', '.join(self.order_by)})"
+        )
+
+    @cache  # noqa: B019
+    def source_query(self, has_network: bool) -> TextClause:
+        """Rows to mirror for a range of intervals with end exclusive"""
+        columns = ",\n".join(f"        {c.source or c.name} as {c.name}" for c in self.columns)
+        network_query = "and network_id = :network_id" if has_network else ""
+
+        return text(
+            f"""
+    select
+{columns}
+    from {self.name}
+    where
+        {self.interval_column} >= :date_start
+        and {self.interval_column} < :date_end
+        {network_query}
+    """
+        )
+
+    def to_clickhouse_rows(self, rows: Sequence[Sequence[Any]]) -> list[list[Any]]:
+        """Postgres rows as values the clickhouse client inserts. Numerics become floats and naive
+        datetimes are marked UTC so the wall clock time is stored as is"""
+        return [[_to_clickhouse(v) for v in row] for row in rows]
+
+
+def _to_clickhouse(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+
+    if isinstance(value, datetime) and not value.tzinfo:
+        return value.replace(tzinfo=UTC)
+
+    return value
+
+
+MIRROR_FACILITY_SCADA = MirrorTable(
+    name="facility_scada",
+    interval_column="interval",
+    columns=(
+        MirrorColumn("interval", "DateTime('UTC')"),
+        MirrorColumn("network_id", "LowCardinality(String)"),
+        MirrorColumn("facility_code", "LowCardinality(String)"),
+        MirrorColumn("is_forecast", "Bool"),
+        MirrorColumn("generated", "Nullable(Float64)"),
+        MirrorColumn("eoi_quantity", "Nullable(Float64)"),
+        MirrorColumn("energy", "Nullable(Float64)"),
+        MirrorColumn("energy_quality_flag", "Float64"),
+    ),
+    order_by=("network_id", "facility_code", "is_forecast", "interval"),
+    partition_by="toYYYYMM(interval)",
+)
+
+MIRROR_BALANCING_SUMMARY = MirrorTable(
+    name="balancing_summary",
+    interval_column="interval",
+    columns=(
+        MirrorColumn("interval", "DateTime('UTC')"),
+        MirrorColumn("network_id", "LowCardinality(String)"),
+        MirrorColumn("network_region", "LowCardinality(String)"),
+        MirrorColumn("is_forecast", "Bool", source="coalesce(is_forecast, false)"),
+        MirrorColumn("forecast_load", "Nullable(Float64)"),
+        MirrorColumn("generation_scheduled", "Nullable(Float64)"),
+        MirrorColumn("generation_non_scheduled", "Nullable(Float64)"),
+        MirrorColumn("generation_total", "Nullable(Float64)"),
+        MirrorColumn("net_interchange", "Nullable(Float64)"),
+        MirrorColumn("demand", "Nullable(Float64)"),
+        MirrorColumn("demand_total", "Nullable(Float64)"),
+        MirrorColumn("price", "Nullable(Float64)"),
+        MirrorColumn("price_dispatch", "Nullable(Float64)"),
+        MirrorColumn("net_interchange_trading", "Nullable(Float64)"),
+    ),
+    order_by=("network_id", "network_region", "interval"),
+    partition_by="toYYYYMM(interval)",
+)
+
+MIRROR_NETWORK_FUELTECH_INTERVALS = MirrorTable(
+    name="at_network_fueltech_intervals",
+    interval_column="interval",
+    columns=(
+        MirrorColumn("interval", "DateTime('UTC')"),
+        MirrorColumn("network_id", "LowCardinality(String)"),
+        MirrorColumn("network_region", "LowCardinality(String)"),
+        MirrorColumn("fueltech_id", "LowCardinality(String)"),
+        MirrorColumn("is_forecast", "Bool"),
+        MirrorColumn("generated", "Nullable(Float64)"),
+        MirrorColumn("energy", "Nullable(Float64)"),
+        MirrorColumn("emissions", "Nullable(Float64)"),
+        MirrorColumn("market_value", "Nullable(Float64)"),
+    ),
+    order_by=("network_id", "network_region", "fueltech_id", "is_forecast", "interval"),
+    partition_by="toYYYYMM(interval)",
+)
+
+# trading days are compared as dates in postgres so they are mirrored as dates
+MIRROR_FACILITY_DAILY = MirrorTable(
+    name="at_facility_daily",
+    interval_column="trading_day",
+    columns=(
+        MirrorColumn("trading_day", "Date", source="cast(trading_day as date)"),
+        MirrorColumn("network_id", "LowCardinality(String)"),
+        MirrorColumn("network_region", "LowCardinality(String)"),
+        MirrorColumn("facility_code", "LowCardinality(String)"),
+        MirrorColumn("fueltech_id", "LowCardinality(Nullable(String))"),
+        MirrorColumn("energy", "Nullable(Float64)"),
+        MirrorColumn("market_value", "Nullable(Float64)"),
+        MirrorColumn("emissions", "Nullable(Float64)"),
+    ),
+    order_by=("network_id", "network_region", "facility_code", "trading_day"),
+    partition_by="toYear(trading_day)",
+)
+
+MIRROR_TABLES: dict[str, MirrorTable] = {
+    t.name: t for t in (MIRROR_FACILITY_SCADA, MIRROR_BALANCING_SUMMARY, MIRROR_NETWORK_FUELTECH_INTERVALS, MIRROR_FACILITY_DAILY)
+}
+
+
+def _client() -> "ClickhouseClient":
+    # imported here so clickhouse_connect is only loaded when mirroring or routing to clickhouse
+    from opennem.db.clickhouse import get_clickhouse_client
+
+    return get_clickhouse_client()
+
+
+async def ensure_mirror_tables(tables: Sequence[MirrorTable] | None = None) -> None:
+    """Create the mirror tables that don't exist"""
+    client = _client()
+
+    for table in tables or MIRROR_TABLES.values():
+        await asyncio.to_thread(client.command, table.create_table_sql())
+
+
+async def mirror_table_range(
+    table: MirrorTable, date_start: datetime | date, date_end: datetime | date, network: NetworkSchema | None = None
+) -> int:
+    """Mirror rows of table for a range with end exclusive. Returns the number of rows mirrored"""
+    if date_end <= date_start:
+        raise ClickhouseMirrorException(f"mirror_table_range: date_end ({date_end}) not after date_start ({date_start})")
+
+    if settings.dry_run:
+        logger.debug(f"Dry run: Skipping mirror of {table.name} {date_start} => {date_end}")
+        return 0
+
+    client = _client()
+    query = table.source_query(has_network=bool(network)).bindparams(date_start=date_start, date_end=date_end)
+
+    if network:
+        query = query.bindparams(network_id=network.code)
+
+    mirrored = 0
+
+    async with get_read_session() as session:
+        result = await session.stream(query.execution_options(yield_per=settings.clickhouse_mirror_batch_size))
+
+        async for partition in result.partitions(settings.clickhouse_mirror_batch_size):
+            rows = table.to_clickhouse_rows(partition)
+            await asyncio.to_thread(client.insert, table.name, rows, column_names=table.column_names)
+            mirrored += len(rows)
+
+    logger.info(f"Mirrored {mirrored} rows of {table.name} for {date_start} => {date_end}")
+
+    return mirrored
+
+
+async def mirror_interval(table: MirrorTable, network: NetworkSchema, interval: datetime) -> int:
+    """Mirror a just-ingested network interval"""
+    return await mirror_table_range(
+        table, date_start=interval, date_end=interval + timedelta(minutes=network.interval_size), network=network
+    )
+
+
+def mirror_date_chunks(date_start: datetime, date_end: datetime, chunk_size: timedelta) -> list[tuple[datetime, datetime]]:
+    """Split a range into chunks with end exclusive, most recent first"""
+    chunks = []
+    chunk_end = date_end
+
+    while chunk_end > date_start:
+        chunk_start = max(chunk_end - chunk_size, date_start)
+        chunks.append((chunk_start, chunk_end))
+        chunk_end = chunk_start
+
+    return chunks
+
+
+async def run_mirror_backfill(
+    date_start: datetime,
+    date_end: datetime,
+    tables: Sequence[MirrorTable] | None = None,
+    chunk_size: timedelta = timedelta(days=7),
+    concurrency: int | None = None,
+) -> int:
+    """Mirror a historical range of each table in chunks run in parallel"""
+    tables = tables or list(MIRROR_TABLES.values())
+    semaphore = asyncio.Semaphore(concurrency or settings.clickhouse_mirror_backfill_concurrency)
+
+    await ensure_mirror_tables(tables)
+
+    async def _mirror_chunk(table: MirrorTable, chunk_start: datetime, chunk_end: datetime) -> int:
+        async with semaphore:
+            return await mirror_table_range(table, date_start=chunk_start, date_end=chunk_end)
+
+    results = await asyncio.gather(
+        *[
+            _mirror_chunk(table, chunk_start, chunk_end)
+            for table in tables
+            for chunk_start, chunk_end in mirror_date_chunks(date_start, date_end, chunk_size)
+        ]
+    )
+
+    logger.info(f"Backfilled {sum(results)} rows into {len(tables)} mirror tables for {date_start} => {date_end}")
+
+    return sum(results)
+
+
+def use_clickhouse(date_start: datetime | date, date_end: datetime | date) -> bool:
+    """Whether a query over the range should run against the mirror"""
+    if not settings.clickhouse_query_routing:
+        return False
+
+    return date_end - date_start >= timedelta(days=settings.clickhouse_query_min_days)
+
+
+async def clickhouse_query(query: str, parameters: dict[str, Any] | None = None) -> list[tuple]:
+    """Run a query against the mirror and return its rows"""
+    client = _client()
+
+    result = await asyncio.to_thread(client.query, query, parameters=parameters)
+
+    return [tuple(row) for row in result.result_rows]
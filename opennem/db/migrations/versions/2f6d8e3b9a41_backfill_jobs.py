@@ -0,0 +1,53 @@
+# pylint: disable=no-member
+"""
+backfill jobs and chunk checkpoints
+
+Revision ID: 2f6d8e3b9a41
+Revises: 9c4e1b7a2d53
+Create Date: 2024-09-02 14:06:51.920417
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2f6d8e3b9a41"
+down_revision = "9c4e1b7a2d53"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "backfill_job",
+        sa.Column("id", sa.Text(), nullable=False),
+        sa.Column("job_type", sa.Text(), nullable=False),
+        sa.Column("network_id", sa.Text(), nullable=True),
+        sa.Column("target", sa.Text(), nullable=True),
+        sa.Column("date_start", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("date_end", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "backfill_chunk",
+        sa.Column("job_id", sa.Text(), nullable=False),
+        sa.Column("chunk_start", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("chunk_end", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("duration", sa.Numeric(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["job_id"], ["backfill_job.id"], name="fk_backfill_chunk_job_id", ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("job_id", "chunk_start"),
+    )
+    op.create_index(op.f("ix_backfill_chunk_status"), "backfill_chunk", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_backfill_chunk_status"), table_name="backfill_chunk")
+    op.drop_table("backfill_chunk")
+    op.drop_table("backfill_job")
@@ -0,0 +1,45 @@
+# pylint: disable=no-member
+"""
+task profile stats
+
+Revision ID: 3b7d5e9f1c28
+Revises: 8e1f4b6c2a97
+Create Date: 2024-09-12 10:03:44.871265
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "3b7d5e9f1c28"
+down_revision = "8e1f4b6c2a97"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_profile_stats",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("kind", sa.Text(), nullable=False),
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("errors", sa.Integer(), nullable=False),
+        sa.Column("total", sa.BigInteger(), nullable=False),
+        sa.Column("p50", sa.BigInteger(), nullable=False),
+        sa.Column("p95", sa.BigInteger(), nullable=False),
+        sa.Column("p99", sa.BigInteger(), nullable=False),
+        sa.Column("max", sa.BigInteger(), nullable=False),
+        sa.Column("histogram", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_task_profile_stats_period_end"), "task_profile_stats", ["period_end"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_task_profile_stats_period_end"), table_name="task_profile_stats")
+    op.drop_table("task_profile_stats")
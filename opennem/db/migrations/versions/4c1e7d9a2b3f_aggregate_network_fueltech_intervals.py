@@ -0,0 +1,57 @@
+# pylint: disable=no-member
+"""
+aggregate network fueltech intervals
+
+Revision ID: 4c1e7d9a2b3f
+Revises: a97b307f2b64
+Create Date: 2024-08-20 10:12:41.381204
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import text
+
+# revision identifiers, used by Alembic.
+revision = "4c1e7d9a2b3f"
+down_revision = "a97b307f2b64"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "at_network_fueltech_intervals",
+        sa.Column("interval", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("network_id", sa.Text(), nullable=False),
+        sa.Column("network_region", sa.Text(), nullable=False),
+        sa.Column("fueltech_id", sa.Text(), nullable=False),
+        sa.Column("is_forecast", sa.Boolean(), nullable=False),
+        sa.Column("generated", sa.Numeric(), nullable=True),
+        sa.Column("energy", sa.Numeric(), nullable=True),
+        sa.Column("emissions", sa.Numeric(), nullable=True),
+        sa.Column("market_value", sa.Numeric(), nullable=True),
+        sa.PrimaryKeyConstraint("interval", "network_id", "network_region", "fueltech_id", "is_forecast"),
+    )
+
+    op.execute(
+        text("SELECT create_hypertable('at_network_fueltech_intervals', 'interval', chunk_time_interval => INTERVAL '30 days')")
+    )
+
+    op.create_index(
+        "idx_at_network_fueltech_intervals_network_interval",
+        "at_network_fueltech_intervals",
+        ["network_id", sa.text("interval DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "idx_at_network_fueltech_intervals_network_region_interval",
+        "at_network_fueltech_intervals",
+        ["network_id", "network_region", sa.text("interval DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_at_network_fueltech_intervals_network_region_interval", table_name="at_network_fueltech_intervals")
+    op.drop_index("idx_at_network_fueltech_intervals_network_interval", table_name="at_network_fueltech_intervals")
+    op.drop_table("at_network_fueltech_intervals")
@@ -0,0 +1,53 @@
+# pylint: disable=no-member
+"""
+facility scada watermark
+
+Revision ID: 5d8a3f2e6c17
+Revises: 7b2e5f1c9d84
+Create Date: 2024-08-27 11:18:42.540193
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d8a3f2e6c17"
+down_revision = "7b2e5f1c9d84"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "facility_scada_watermark",
+        sa.Column("network_id", sa.Text(), nullable=False),
+        sa.Column("facility_code", sa.Text(), nullable=False),
+        sa.Column("first_seen", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("last_seen", sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column("first_nonzero", sa.TIMESTAMP(timezone=False), nullable=True),
+        sa.Column("last_nonzero", sa.TIMESTAMP(timezone=False), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("network_id", "facility_code"),
+    )
+
+    # one off scan to seed the watermarks from existing scada
+    op.execute(
+        """
+        insert into facility_scada_watermark (network_id, facility_code, first_seen, last_seen, first_nonzero, last_nonzero)
+        select
+            fs.network_id,
+            fs.facility_code,
+            min(fs.interval),
+            max(fs.interval),
+            min(fs.interval) filter (where fs.generated > 0),
+            max(fs.interval) filter (where fs.generated > 0)
+        from facility_scada fs
+        where fs.is_forecast is false
+        group by 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("facility_scada_watermark")
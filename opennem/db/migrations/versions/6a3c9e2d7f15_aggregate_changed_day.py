@@ -0,0 +1,33 @@
+# pylint: disable=no-member
+"""
+aggregate changed days
+
+Revision ID: 6a3c9e2d7f15
+Revises: 2f6d8e3b9a41
+Create Date: 2024-09-05 11:22:37.604182
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "6a3c9e2d7f15"
+down_revision = "2f6d8e3b9a41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "aggregate_changed_day",
+        sa.Column("aggregate", sa.Text(), nullable=False),
+        sa.Column("network_id", sa.Text(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("marked_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("aggregate", "network_id", "day"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("aggregate_changed_day")
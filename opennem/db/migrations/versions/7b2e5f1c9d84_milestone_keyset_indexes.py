@@ -0,0 +1,51 @@
+# pylint: disable=no-member
+"""
+milestone keyset indexes
+
+Revision ID: 7b2e5f1c9d84
+Revises: 4c1e7d9a2b3f
+Create Date: 2024-08-22 09:41:17.206533
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7b2e5f1c9d84"
+down_revision = "4c1e7d9a2b3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_milestone_interval_instance_id",
+        "milestones",
+        [sa.text("interval DESC"), sa.text("instance_id DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "idx_milestone_network_region_interval",
+        "milestones",
+        ["network_id", "network_region", sa.text("interval DESC"), sa.text("instance_id DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "idx_milestone_network_period_metric_interval",
+        "milestones",
+        ["network_id", "period", "metric", "significance", sa.text("interval DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "idx_milestone_significance_interval",
+        "milestones",
+        ["significance", sa.text("interval DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_milestone_significance_interval", table_name="milestones")
+    op.drop_index("idx_milestone_network_period_metric_interval", table_name="milestones")
+    op.drop_index("idx_milestone_network_region_interval", table_name="milestones")
+    op.drop_index("idx_milestone_interval_instance_id", table_name="milestones")
@@ -0,0 +1,68 @@
+# pylint: disable=no-member
+"""
+facility_scada storage layout
+
+Drops the facility_scada indexes covered by the primary key, facility code and time indexes, sets
+the chunk interval and enables compression segmented by network, facility and forecast flag.
+Chunks older than `scada_compress_after_days` are compressed when it is set. It is unset by default
+as backfills, energy repairs, gap fill and archive imports still update rows in old chunks. The
+compression age is changed with `opennem db storage-layout`.
+
+Revision ID: 8e1f4b6c2a97
+Revises: 6a3c9e2d7f15
+Create Date: 2024-09-09 15:48:03.215774
+
+"""
+
+from alembic import op
+
+from opennem import settings
+
+# revision identifiers, used by Alembic.
+revision = "8e1f4b6c2a97"
+down_revision = "6a3c9e2d7f15"
+branch_labels = None
+depends_on = None
+
+REDUNDANT_INDEXES = {
+    "idx_facility_scada_network_id": "network_id",
+    "idx_facility_scada_interval_facility_code": "interval, facility_code",
+    "idx_facility_scada_is_forecast_interval": "is_forecast, interval",
+    "idx_facility_scada_network_interval": "network_id, interval, is_forecast",
+    "idx_facility_scada_network_facility_interval": "network_id, facility_code, interval",
+    "idx_facility_scada_interval_network": "interval DESC, network_id",
+}
+
+
+def upgrade() -> None:
+    for index_name in [*REDUNDANT_INDEXES.keys(), "ix_facility_scada_interval", "ix_facility_scada_facility_code"]:
+        op.execute(f"drop index if exists {index_name}")
+
+    op.execute("create index if not exists idx_facility_scada_facility_code_interval on facility_scada (facility_code, interval)")
+    op.execute("create index if not exists facility_scada_new_interval_idx on facility_scada (interval DESC)")
+
+    op.execute("select set_chunk_time_interval('facility_scada', interval '7 days')")
+    op.execute(
+        """
+        alter table facility_scada set (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'network_id, facility_code, is_forecast',
+            timescaledb.compress_orderby = 'interval DESC'
+        )
+        """
+    )
+
+    if settings.scada_compress_after_days is not None:
+        op.execute(
+            "select add_compression_policy('facility_scada', "
+            f"compress_after => interval '{settings.scada_compress_after_days} days', if_not_exists => true)"
+        )
+
+
+def downgrade() -> None:
+    op.execute("select remove_compression_policy('facility_scada', if_exists => true)")
+    op.execute("select decompress_chunk(c, true) from show_chunks('facility_scada') c")
+    op.execute("alter table facility_scada set (timescaledb.compress = false)")
+
+    for index_name, columns in REDUNDANT_INDEXES.items():
+        op.execute(f"create index if not exists {index_name} on facility_scada ({columns})")
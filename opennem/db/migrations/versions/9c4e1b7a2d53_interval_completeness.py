@@ -0,0 +1,79 @@
+# pylint: disable=no-member
+"""
+interval completeness index
+
+Revision ID: 9c4e1b7a2d53
+Revises: 5d8a3f2e6c17
+Create Date: 2024-08-29 09:41:15.318604
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "9c4e1b7a2d53"
+down_revision = "5d8a3f2e6c17"
+branch_labels = None
+depends_on = None
+
+# days seeded from the source tables so gap fill, which looks back a week, works straight away.
+# older days are built with `opennem db completeness-rebuild` as a deploy step
+SEED_DAYS = 14
+
+# (source table, metric, column) for each bitmap
+SEED_METRICS = [
+    ("facility_scada", "power", "generated"),
+    ("facility_scada", "energy", "energy"),
+    ("balancing_summary", "price", "price"),
+]
+
+# bit n of a day is the nth interval from midnight at the network interval size
+SEED_QUERY = """
+    insert into interval_completeness (network_id, source_table, metric, day, intervals)
+    select
+        p.network_id,
+        '{source_table}',
+        '{metric}',
+        p.day,
+        (
+            select string_agg(case when i = any(p.positions) then '1' else '0' end, '' order by i)
+            from generate_series(0, 24 * 60 / p.interval_size - 1) as i
+        )::varbit
+    from (
+        select
+            s.network_id,
+            s.interval::date as day,
+            n.interval_size,
+            array_agg(distinct (extract(epoch from s.interval - date_trunc('day', s.interval)) / 60)::int / n.interval_size) as positions
+        from {source_table} s
+        join network n on n.code = s.network_id
+        where
+            s.interval >= current_date - {seed_days}
+            and s.is_forecast is false
+            and s.{column} is not null
+        group by 1, 2, 3
+    ) as p
+    on conflict (network_id, source_table, metric, day) do nothing
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "interval_completeness",
+        sa.Column("network_id", sa.Text(), nullable=False),
+        sa.Column("source_table", sa.Text(), nullable=False),
+        sa.Column("metric", sa.Text(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("intervals", postgresql.BIT(varying=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("network_id", "source_table", "metric", "day"),
+    )
+
+    for source_table, metric, column in SEED_METRICS:
+        op.execute(SEED_QUERY.format(source_table=source_table, metric=metric, column=column, seed_days=SEED_DAYS))
+
+
+def downgrade() -> None:
+    op.drop_table("interval_completeness")
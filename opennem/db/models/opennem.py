@@ -10,6 +10,7 @@ from decimal import Decimal
 from geoalchemy2 import Geometry
 from shapely import wkb
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     Date,
@@ -26,7 +27,7 @@ from sqlalchemy import (
     false,
     func,
 )
-from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP, UUID
+from sqlalchemy.dialects.postgresql import BIT, JSONB, TIMESTAMP, UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.mutable import MutableDict
@@ -122,6 +123,27 @@ class TaskProfile(Base):
     invokee_name = Column(Text, nullable=True, index=True)
 
 
+class TaskProfileStats(Base):
+    """Latency histogram of a task or crawler over a flush window of one process. Durations are in
+    microseconds and histogram is the log-linear bucket counts"""
+
+    __tablename__ = "task_profile_stats"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(Text, nullable=False)
+    name = Column(Text, nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False, index=True)
+    count = Column(Integer, nullable=False)
+    errors = Column(Integer, nullable=False, default=0)
+    total = Column(BigInteger, nullable=False)
+    p50 = Column(BigInteger, nullable=False)
+    p95 = Column(BigInteger, nullable=False)
+    p99 = Column(BigInteger, nullable=False)
+    max = Column(BigInteger, nullable=False)
+    histogram = Column(JSONB, nullable=False)
+
+
 class FuelTechGroup(Base, BaseModel):
     __tablename__ = "fueltech_group"
 
@@ -421,23 +443,18 @@ class FacilityScada(Base):
     __tablename__ = "facility_scada"
 
     network_id = Column(Text, primary_key=True, nullable=False)
-    interval = Column(TIMESTAMP(timezone=False), index=True, primary_key=True, nullable=False)
-    facility_code = Column(Text, nullable=False, primary_key=True, index=True)
+    interval = Column(TIMESTAMP(timezone=False), primary_key=True, nullable=False)
+    facility_code = Column(Text, nullable=False, primary_key=True)
     generated = Column(Numeric, nullable=True)
     is_forecast = Column(Boolean, default=False, primary_key=True)
     eoi_quantity = Column(Numeric, nullable=True)
     energy: Mapped[float] = mapped_column(Numeric, nullable=True)
     energy_quality_flag = Column(Numeric, nullable=False, default=0)
 
+    # storage layout is managed in opennem.db.storage_layout
     __table_args__ = (
         Index("idx_facility_scada_facility_code_interval", "facility_code", "interval", postgresql_using="btree"),
-        Index("idx_facility_scada_network_id", "network_id"),
-        Index("idx_facility_scada_interval_facility_code", "interval", "facility_code"),
-        Index("idx_facility_scada_is_forecast_interval", "is_forecast", "interval"),
-        Index("idx_facility_scada_network_interval", "network_id", "interval", "is_forecast"),
-        Index("idx_facility_scada_network_facility_interval", "network_id", "facility_code", "interval"),
         Index("facility_scada_new_interval_idx", "interval", unique=False, postgresql_ops={"interval": "DESC"}),
-        Index("idx_facility_scada_interval_network", "interval", "network_id", postgresql_ops={"interval": "DESC"}),
     )
 
     def __str__(self) -> str:
@@ -447,6 +464,24 @@ class FacilityScada(Base):
         return f"{self.__class__}: {self.trading_interval} {self.network_id} {self.facility_code}"
 
 
+class FacilityScadaWatermark(Base):
+    """First and last intervals each facility has been seen in facility_scada, kept up to date as
+    scada is inserted so data ranges are read without scanning facility_scada"""
+
+    __tablename__ = "facility_scada_watermark"
+
+    network_id = Column(Text, primary_key=True, nullable=False)
+    facility_code = Column(Text, primary_key=True, nullable=False)
+    first_seen = Column(TIMESTAMP(timezone=False), nullable=False)
+    last_seen = Column(TIMESTAMP(timezone=False), nullable=False)
+    first_nonzero = Column(TIMESTAMP(timezone=False), nullable=True)
+    last_nonzero = Column(TIMESTAMP(timezone=False), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__}: {self.network_id} {self.facility_code} {self.first_seen} {self.last_seen}"
+
+
 class BalancingSummary(Base):
     __tablename__ = "balancing_summary"
 
@@ -477,6 +512,76 @@ class BalancingSummary(Base):
     )
 
 
+class IntervalCompleteness(Base):
+    """Bitmap per network day of the intervals with power, energy or price data in a source table,
+    maintained as data is inserted so gaps are found without scanning the source table"""
+
+    __tablename__ = "interval_completeness"
+
+    network_id = Column(Text, primary_key=True, nullable=False)
+    source_table = Column(Text, primary_key=True, nullable=False)
+    metric = Column(Text, primary_key=True, nullable=False)
+    day = Column(Date, primary_key=True, nullable=False)
+    intervals = Column(BIT(varying=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__}: {self.network_id} {self.source_table} {self.metric} {self.day}"
+
+
+class AggregateChangedDay(Base):
+    """Network days with facility or balancing data inserted since the daily aggregate was last
+    calculated for them"""
+
+    __tablename__ = "aggregate_changed_day"
+
+    aggregate = Column(Text, primary_key=True, nullable=False)
+    network_id = Column(Text, primary_key=True, nullable=False)
+    day = Column(Date, primary_key=True, nullable=False)
+    marked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__}: {self.aggregate} {self.network_id} {self.day}"
+
+
+class BackfillJob(Base):
+    """A historical backfill split into chunks that are checkpointed as they complete"""
+
+    __tablename__ = "backfill_job"
+
+    id = Column(Text, primary_key=True)
+    job_type = Column(Text, nullable=False)
+    network_id = Column(Text, nullable=True)
+    target = Column(Text, nullable=True)
+    date_start = Column(TIMESTAMP(timezone=False), nullable=False)
+    date_end = Column(TIMESTAMP(timezone=False), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    chunks: Mapped[list["BackfillChunk"]] = relationship("BackfillChunk", back_populates="job", cascade="all, delete-orphan")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__}: {self.id} {self.job_type} {self.network_id} {self.date_start} {self.date_end}"
+
+
+class BackfillChunk(Base):
+    __tablename__ = "backfill_chunk"
+
+    job_id = Column(Text, ForeignKey("backfill_job.id", name="fk_backfill_chunk_job_id", ondelete="CASCADE"), primary_key=True)
+    chunk_start = Column(TIMESTAMP(timezone=False), primary_key=True)
+    chunk_end = Column(TIMESTAMP(timezone=False), nullable=False)
+    status = Column(Text, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    duration = Column(Numeric, nullable=True)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    job: Mapped["BackfillJob"] = relationship("BackfillJob", back_populates="chunks")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__}: {self.job_id} {self.chunk_start} {self.chunk_end} {self.status}"
+
+
 class AEMOFacilityData(Base):
     __tablename__ = "aemo_facility_data"
 
@@ -585,6 +690,36 @@ class AggregateNetworkDemand(Base):
     )
 
 
+class AggregateNetworkFueltechIntervals(Base):
+    __tablename__ = "at_network_fueltech_intervals"
+
+    interval: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=False), primary_key=True, nullable=False)
+    network_id = Column(Text, primary_key=True, nullable=False)
+    network_region = Column(Text, primary_key=True, nullable=False)
+    fueltech_id = Column(Text, primary_key=True, nullable=False)
+    is_forecast = Column(Boolean, primary_key=True, default=False, nullable=False)
+    generated = Column(Numeric, nullable=True)
+    energy = Column(Numeric, nullable=True)
+    emissions = Column(Numeric, nullable=True)
+    market_value = Column(Numeric, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "idx_at_network_fueltech_intervals_network_interval",
+            "network_id",
+            "interval",
+            postgresql_ops={"interval": "DESC"},
+        ),
+        Index(
+            "idx_at_network_fueltech_intervals_network_region_interval",
+            "network_id",
+            "network_region",
+            "interval",
+            postgresql_ops={"interval": "DESC"},
+        ),
+    )
+
+
 class Milestones(Base):
     __tablename__ = "milestones"
 
@@ -608,4 +743,34 @@ class Milestones(Base):
         UniqueConstraint("record_id", "interval", name="excl_milestone_record_id_interval"),
         Index("idx_milestone_network_id", "network_id", postgresql_using="btree"),
         Index("idx_milestone_fueltech_id", "fueltech_id", postgresql_using="btree"),
+        # keyset pagination on (interval, instance_id) for the milestones api and the common filters
+        Index(
+            "idx_milestone_interval_instance_id",
+            "interval",
+            "instance_id",
+            postgresql_ops={"interval": "DESC", "instance_id": "DESC"},
+        ),
+        Index(
+            "idx_milestone_network_region_interval",
+            "network_id",
+            "network_region",
+            "interval",
+            "instance_id",
+            postgresql_ops={"interval": "DESC", "instance_id": "DESC"},
+        ),
+        Index(
+            "idx_milestone_network_period_metric_interval",
+            "network_id",
+            "period",
+            "metric",
+            "significance",
+            "interval",
+            postgresql_ops={"interval": "DESC"},
+        ),
+        Index(
+            "idx_milestone_significance_interval",
+            "significance",
+            "interval",
+            postgresql_ops={"interval": "DESC"},
+        ),
     )
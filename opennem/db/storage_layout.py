@@ -0,0 +1,218 @@
+"""
+OpenNEM storage layout
+
+Managed layout of the facility_scada hypertable:
+
+ * time partitioned chunks of a fixed interval
+ * only the indexes the readers use. The primary key serves network and interval ranges, the
+   facility code index serves facility history and the time index serves interval ranges
+ * chunks older than the compress after days are compressed. Compressed chunks are segmented by
+   network, facility and forecast flag so actual and forecast data are stored apart and reads of
+   actuals don't decompress forecasts. Without compress after days there is no compression policy
+   as backfills, energy repairs, gap fill and archive imports update rows in old chunks
+
+The layout is applied by migration. `plan_storage_layout` compares a database against it and
+`apply_storage_layout` brings it into line, which is also how the compression age is changed.
+"""
+
+import logging
+from dataclasses import dataclass, field, replace
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from opennem import settings
+from opennem.db import SessionLocalAsync, get_read_session
+
+logger = logging.getLogger("opennem.db.storage_layout")
+
+
+@dataclass(frozen=True)
+class StorageIndex:
+    name: str
+    columns: str
+
+
+@dataclass(frozen=True)
+class StorageLayout:
+    table: str
+    time_column: str
+    chunk_interval: timedelta
+    segment_by: list[str]
+    order_by: str
+    indexes: list[StorageIndex] = field(default_factory=list)
+    redundant_indexes: list[str] = field(default_factory=list)
+
+    def for_table(self, table: str) -> "StorageLayout":
+        """The same layout on another table such as a benchmark copy. Index names take the table name"""
+        return replace(
+            self,
+            table=table,
+            indexes=[StorageIndex(i.name.replace(self.table, table), i.columns) for i in self.indexes],
+            redundant_indexes=[i.replace(self.table, table) for i in self.redundant_indexes],
+        )
+
+
+FACILITY_SCADA_LAYOUT = StorageLayout(
+    table="facility_scada",
+    time_column="interval",
+    chunk_interval=timedelta(days=7),
+    segment_by=["network_id", "facility_code", "is_forecast"],
+    order_by="interval DESC",
+    indexes=[
+        StorageIndex("idx_facility_scada_facility_code_interval", "facility_code, interval"),
+        # time index created with the hypertable
+        StorageIndex("facility_scada_new_interval_idx", "interval DESC"),
+    ],
+    redundant_indexes=[
+        "idx_facility_scada_network_id",
+        "idx_facility_scada_interval_facility_code",
+        "idx_facility_scada_is_forecast_interval",
+        "idx_facility_scada_network_interval",
+        "idx_facility_scada_network_facility_interval",
+        "idx_facility_scada_interval_network",
+        "ix_facility_scada_interval",
+        "ix_facility_scada_facility_code",
+    ],
+)
+
+
+@dataclass
+class StorageState:
+    indexes: set[str]
+    compression_enabled: bool
+
+
+@dataclass
+class StorageStats:
+    chunks: int
+    compressed_chunks: int
+    size_before_compression: int | None
+    size_after_compression: int | None
+    total_size: int
+
+
+_INDEXES_QUERY = text("select indexname from pg_indexes where tablename = :table")
+
+_COMPRESSION_ENABLED_QUERY = text(
+    "select compression_enabled from timescaledb_information.hypertables where hypertable_name = :table"
+)
+
+
+def _interval(value: timedelta) -> str:
+    return f"interval '{int(value.total_seconds())} seconds'"
+
+
+def layout_statements(layout: StorageLayout, compress_after: timedelta | None, state: StorageState | None = None) -> list[str]:
+    """
+    Statements that apply a layout. With the current state statements for what is already in place
+    are left out. Compression settings can't be changed once chunks are compressed so they are only
+    set when compression isn't enabled. Without compress after the compression policy is removed.
+    """
+    statements: list[str] = []
+
+    for index_name in layout.redundant_indexes:
+        if state is None or index_name in state.indexes:
+            statements.append(f"drop index if exists {index_name}")
+
+    for index in layout.indexes:
+        if state is None or index.name not in state.indexes:
+            statements.append(f"create index if not exists {index.name} on {layout.table} ({index.columns})")
+
+    statements.append(f"select set_chunk_time_interval('{layout.table}', {_interval(layout.chunk_interval)})")
+
+    if state is None or not state.compression_enabled:
+        statements.append(
+            f"alter table {layout.table} set ("
+            "timescaledb.compress, "
+            f"timescaledb.compress_segmentby = '{', '.join(layout.segment_by)}', "
+            f"timescaledb.compress_orderby = '{layout.order_by}')"
+        )
+
+    # replaced so a change to the compression age applies
+    statements.append(f"select remove_compression_policy('{layout.table}', if_exists => true)")
+
+    if compress_after is not None:
+        statements.append(f"select add_compression_policy('{layout.table}', compress_after => {_interval(compress_after)})")
+
+    return statements
+
+
+def _compress_after(compress_after: timedelta | None) -> timedelta | None:
+    if compress_after is not None:
+        return compress_after
+
+    if settings.scada_compress_after_days is not None:
+        return timedelta(days=settings.scada_compress_after_days)
+
+    return None
+
+
+async def get_storage_state(layout: StorageLayout = FACILITY_SCADA_LAYOUT) -> StorageState:
+    """Indexes and compression of a hypertable"""
+    async with get_read_session() as session:
+        indexes = (await session.execute(_INDEXES_QUERY, {"table": layout.table})).scalars().all()
+        compression_enabled = (await session.execute(_COMPRESSION_ENABLED_QUERY, {"table": layout.table})).scalar()
+
+    return StorageState(indexes=set(indexes), compression_enabled=bool(compression_enabled))
+
+
+async def plan_storage_layout(
+    layout: StorageLayout = FACILITY_SCADA_LAYOUT, compress_after: timedelta | None = None
+) -> list[str]:
+    """Statements that bring a hypertable in line with its layout"""
+    state = await get_storage_state(layout)
+
+    return layout_statements(layout, _compress_after(compress_after), state=state)
+
+
+async def apply_storage_layout(
+    layout: StorageLayout = FACILITY_SCADA_LAYOUT, compress_after: timedelta | None = None
+) -> list[str]:
+    """Bring a hypertable in line with its layout. Returns the statements run"""
+    statements = await plan_storage_layout(layout, compress_after=compress_after)
+
+    if settings.dry_run:
+        return statements
+
+    async with SessionLocalAsync() as session:
+        for statement in statements:
+            logger.info(statement)
+            await session.execute(text(statement))
+
+        await session.commit()
+
+    return statements
+
+
+async def get_storage_stats(layout: StorageLayout = FACILITY_SCADA_LAYOUT) -> StorageStats:
+    """Chunk counts and sizes of a hypertable"""
+    async with get_read_session() as session:
+        chunks = (
+            await session.execute(
+                text(
+                    "select count(*), count(*) filter (where is_compressed) "
+                    "from timescaledb_information.chunks where hypertable_name = :table"
+                ),
+                {"table": layout.table},
+            )
+        ).one()
+
+        compression = (
+            await session.execute(
+                text(
+                    "select sum(before_compression_total_bytes), sum(after_compression_total_bytes) "
+                    f"from hypertable_compression_stats('{layout.table}')"
+                )
+            )
+        ).one()
+
+        total_size = (await session.execute(text(f"select hypertable_size('{layout.table}')"))).scalar()
+
+    return StorageStats(
+        chunks=chunks[0],
+        compressed_chunks=chunks[1],
+        size_before_compression=compression[0],
+        size_after_compression=compression[1],
+        total_size=total_size or 0,
+    )
@@ -1,25 +1,23 @@
 import asyncio
 import logging
 
-from opennem.api.geo.controllers import stations_to_geojson
-from opennem.api.station.controllers import get_stations
+from opennem.api.catalogue import CatalogueName, refresh_facility_catalogue
 from opennem.exporter.aws import write_to_s3
 
 logger = logging.getLogger("opennem.exporter.geojson")
 
 
 async def export_facility_geojson() -> None:
-    """Get the GeoJSON for facilities and write it to S3"""
-    stations = await get_stations()
+    """Rebuild the facility catalogue and write its GeoJSON to S3"""
+    snapshots = await refresh_facility_catalogue()
+    stations_geo = snapshots[CatalogueName.geojson]
 
-    logger.info(f"Found {len(stations)} stations")
+    logger.info(f"Found {stations_geo.count} stations")
 
-    if not stations:
+    if not stations_geo.count:
         raise Exception("No stations found")
 
-    stations_geo = await stations_to_geojson(stations)
-
-    write_to_s3(stations_geo.model_dump_json(exclude_unset=True), "/v3/geo/au_facilities.json")
+    write_to_s3(stations_geo.content.decode(), "/v3/geo/au_facilities.json")
 
 
 if __name__ == "__main__":
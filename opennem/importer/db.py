@@ -2,6 +2,8 @@
 
 import logging
 
+from opennem.api.catalogue import refresh_facility_catalogue
+from opennem.core.facility.dimensions import invalidate_facility_dimensions
 from opennem.core.stats.store import init_stats
 from opennem.db.load_fixtures import load_fixtures
 from opennem.importer.facilities import import_facilities
@@ -22,6 +24,11 @@ async def import_all_facilities() -> None:
     import_nem_interconnects()
     logger.info("Interconnectors initialized")
 
+    invalidate_facility_dimensions()
+
+    await refresh_facility_catalogue()
+    logger.info("Facility catalogue built")
+
 
 async def init() -> None:
     """
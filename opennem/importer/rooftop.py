@@ -3,11 +3,15 @@ import logging
 from sqlalchemy.future import select
 
 from opennem.core.dispatch_type import DispatchType
+from opennem.core.facility.dimensions import FacilityDimensions
 from opennem.db import SessionLocal
 from opennem.db.models.opennem import Facility, Location, Station
 
 logger = logging.getLogger(__name__)
 
+# NEM market regions that each have a rooftop facility
+NEM_ROOFTOP_REGIONS = ["NSW1", "QLD1", "VIC1", "TAS1", "SA1"]
+
 ROOFTOP_CODE = "ROOFTOP"
 
 
@@ -112,7 +116,7 @@ def rooftop_remap_regionids(rooftop_record: dict | None) -> dict | None:
 
     fac_code = rooftop_record["facility_code"]
 
-    if fac_code not in ["NSW1", "QLD1", "VIC1", "TAS1", "SA1"]:
+    if fac_code not in NEM_ROOFTOP_REGIONS:
         return None
 
     rooftop_fac_code = "{}_{}_{}".format(ROOFTOP_CODE, "NEM", fac_code.rstrip("1"))
@@ -121,6 +125,32 @@ def rooftop_remap_regionids(rooftop_record: dict | None) -> dict | None:
     return rooftop_record
 
 
+def rooftop_remap_facility_codes(records: list[dict], dimensions: FacilityDimensions) -> list[dict]:
+    """Map the AEMO region codes of a batch of rooftop records to the rooftop facilities in the
+    registry in place, dropping records for regions without one. Sub-regions are expected to be
+    dropped, market regions without a rooftop facility are warned about"""
+    records = [r for r in records if r and r.get("facility_code")]
+    remapped = []
+    unresolved: dict[str, int] = {}
+
+    for record, rooftop_fac_code in zip(
+        records, dimensions.rooftop_facility_codes(r["facility_code"] for r in records).tolist(), strict=True
+    ):
+        if not rooftop_fac_code:
+            if record["facility_code"] in NEM_ROOFTOP_REGIONS:
+                unresolved[record["facility_code"]] = unresolved.get(record["facility_code"], 0) + 1
+
+            continue
+
+        record["facility_code"] = rooftop_fac_code
+        remapped.append(record)
+
+    for region, dropped in sorted(unresolved.items()):
+        logger.warning(f"No rooftop facility in the registry for region {region}. Dropped {dropped} rooftop records")
+
+    return remapped
+
+
 # debug entry point
 if __name__ == "__main__":
     import asyncio
@@ -54,10 +54,11 @@ async def persist_facility_scada_bulk(
 ) -> None:
     """Takes a lits of records and persists them to the database"""
 
-    records_to_store = [dict(i) for i in records]
+    # the schemas still call the interval trading_interval
+    records_to_store = [{("interval" if k == "trading_interval" else k): v for k, v in dict(i).items()} for i in records]
 
     if not update_fields:
-        update_fields = ["trading_interval", "network_id", "facility_code", "is_forecast"]
+        update_fields = ["interval", "network_id", "facility_code", "is_forecast"]
 
     table = FacilityScada
 
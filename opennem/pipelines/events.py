@@ -0,0 +1,150 @@
+"""
+Event driven pipeline stages
+
+Chains crawl completion through to aggregates and exports using the event bus
+in opennem.core.events. Each stage runs once per network interval, as soon as
+its inputs have landed:
+
+    dispatch_scada -> energy -----+-> network fueltech intervals --\\
+                                   |                                +-> live power exports
+    dispatch_is ------------------+-> flows -> milestones ---------/
+
+API responses cached for a network are invalidated as its energy and flows land, and when
+`clickhouse_mirror_enabled` is set facility scada, balancing summary and network fueltech
+intervals are mirrored into clickhouse as each lands.
+
+Importing this module registers the subscribers on the process event bus.
+"""
+
+import asyncio
+import logging
+
+from opennem import settings
+from opennem.aggregates.network_flows import run_flow_update_for_interval
+from opennem.aggregates.network_flows_v3 import run_aggregate_flow_for_interval_v3
+from opennem.aggregates.network_fueltech_intervals import run_network_fueltech_intervals_for_interval
+from opennem.api.cache import invalidate_cache_tags, network_cache_tag
+from opennem.core.events import (
+    STAGE_ENERGY,
+    STAGE_FLOWS,
+    STAGE_MILESTONES,
+    STAGE_NETWORK_FUELTECH_INTERVALS,
+    IntervalEvent,
+    get_event_bus,
+    publish_interval_event,
+)
+from opennem.core.networks import network_from_network_code
+from opennem.crawlers.nemweb import AEMONemwebDispatchIS, AEMONemwebRooftop, AEMONNemwebDispatchScada
+from opennem.db.clickhouse_mirror import (
+    MIRROR_BALANCING_SUMMARY,
+    MIRROR_FACILITY_SCADA,
+    MIRROR_NETWORK_FUELTECH_INTERVALS,
+    MirrorTable,
+    mirror_interval,
+)
+from opennem.pipelines.export import run_export_power_latest_for_network
+from opennem.recordreactor.engine import run_milestone_engine
+from opennem.schema.network import NetworkAEMORooftop, NetworkAU, NetworkNEM
+from opennem.workers.energy import run_energy_calculation_for_interval
+
+logger = logging.getLogger("opennem.pipelines.events")
+
+bus = get_event_bus()
+
+
+@bus.subscribe("energy", requires={AEMONNemwebDispatchScada.name}, networks={NetworkNEM.code})
+async def energy_on_dispatch_scada(event: IntervalEvent) -> None:
+    """Calculate energy once facility scada has landed for the interval. When energy is calculated as
+    scada is inserted this only marks the stage"""
+    if settings.energy_at_ingest:
+        updated = event.inserted_records
+    else:
+        updated = await run_energy_calculation_for_interval(interval=event.interval)
+
+    await publish_interval_event(event.network_id, event.interval, STAGE_ENERGY, inserted_records=updated)
+
+
+@bus.subscribe("flows", requires={STAGE_ENERGY, AEMONemwebDispatchIS.name}, networks={NetworkNEM.code})
+async def flows_on_energy_and_interconnectors(event: IntervalEvent) -> None:
+    """Solve flows and emissions once energy and interconnector data are both in for the interval"""
+    network = network_from_network_code(event.network_id)
+
+    if settings.flows_and_emissions_v3:
+        inserted = await asyncio.to_thread(
+            run_aggregate_flow_for_interval_v3, network=network, interval_start=event.interval, validate_results=False
+        )
+    else:
+        inserted = await asyncio.to_thread(run_flow_update_for_interval, interval=event.interval, network=network)
+
+    await publish_interval_event(event.network_id, event.interval, STAGE_FLOWS, inserted_records=inserted or 0)
+
+
+@bus.subscribe("network_fueltech_intervals", requires={STAGE_ENERGY})
+async def network_fueltech_intervals_on_energy(event: IntervalEvent) -> None:
+    """Roll up the interval by network, region and fueltech once energy is calculated"""
+    network = network_from_network_code(event.network_id)
+
+    inserted = await run_network_fueltech_intervals_for_interval(network=network, interval=event.interval)
+
+    await publish_interval_event(event.network_id, event.interval, STAGE_NETWORK_FUELTECH_INTERVALS, inserted_records=inserted)
+
+
+@bus.subscribe("network_fueltech_intervals_rooftop", requires={AEMONemwebRooftop.name}, networks={NetworkAEMORooftop.code})
+async def network_fueltech_intervals_on_rooftop(event: IntervalEvent) -> None:
+    """Roll up rooftop intervals as they land"""
+    await run_network_fueltech_intervals_for_interval(network=NetworkAEMORooftop, interval=event.interval)
+
+
+@bus.subscribe("milestones", requires={STAGE_FLOWS})
+async def milestones_on_flows(event: IntervalEvent) -> None:
+    """Check for milestones for the interval"""
+    network = network_from_network_code(event.network_id)
+
+    await run_milestone_engine(start_interval=event.interval, end_interval=event.interval, networks=[network])
+
+    await publish_interval_event(event.network_id, event.interval, STAGE_MILESTONES)
+
+
+@bus.subscribe("export_power_latest", requires={STAGE_FLOWS, STAGE_NETWORK_FUELTECH_INTERVALS}, networks={NetworkNEM.code})
+async def export_power_latest_on_flows(event: IntervalEvent) -> None:
+    """Live power exports once the interval is complete"""
+    await asyncio.gather(
+        run_export_power_latest_for_network(network=NetworkNEM), run_export_power_latest_for_network(network=NetworkAU)
+    )
+
+
+@bus.subscribe("api_cache_energy", requires={STAGE_ENERGY})
+async def invalidate_api_cache_on_energy(event: IntervalEvent) -> None:
+    """Cached API responses for the network are stale once energy for a new interval is in"""
+    await invalidate_cache_tags(network_cache_tag(event.network_id))
+
+
+@bus.subscribe("api_cache_flows", requires={STAGE_FLOWS})
+async def invalidate_api_cache_on_flows(event: IntervalEvent) -> None:
+    """Flow and emission factor responses are stale once flows for a new interval are in"""
+    await invalidate_cache_tags(network_cache_tag(event.network_id))
+
+
+async def _mirror_interval(table: MirrorTable, event: IntervalEvent) -> None:
+    if not settings.clickhouse_mirror_enabled:
+        return None
+
+    await mirror_interval(table, network=network_from_network_code(event.network_id), interval=event.interval)
+
+
+@bus.subscribe("clickhouse_facility_scada", requires={STAGE_ENERGY})
+async def mirror_facility_scada_on_energy(event: IntervalEvent) -> None:
+    """Mirror facility scada once energy has been calculated for the interval"""
+    await _mirror_interval(MIRROR_FACILITY_SCADA, event)
+
+
+@bus.subscribe("clickhouse_balancing_summary", requires={AEMONemwebDispatchIS.name}, networks={NetworkNEM.code})
+async def mirror_balancing_summary_on_dispatch_is(event: IntervalEvent) -> None:
+    """Mirror balancing summary once prices and demand have landed for the interval"""
+    await _mirror_interval(MIRROR_BALANCING_SUMMARY, event)
+
+
+@bus.subscribe("clickhouse_network_fueltech_intervals", requires={STAGE_NETWORK_FUELTECH_INTERVALS})
+async def mirror_network_fueltech_intervals(event: IntervalEvent) -> None:
+    """Mirror the network fueltech roll up for the interval"""
+    await _mirror_interval(MIRROR_NETWORK_FUELTECH_INTERVALS, event)
@@ -13,6 +13,7 @@ from opennem import settings
 from opennem.aggregates.network_flows import run_flow_update_for_interval
 from opennem.aggregates.network_flows_v3 import run_flows_for_last_intervals
 from opennem.controllers.schema import ControllerReturn
+from opennem.core.events import event_bus_enabled
 from opennem.crawl import run_crawl
 from opennem.crawlers.nemweb import (
     AEMONEMDispatchActualGEN,
@@ -45,6 +46,10 @@ async def nem_dispatch_is_crawl() -> None:
     if not dispatch_is or not dispatch_is.inserted_records:
         raise RetryTask("No new dispatch is data")
 
+    # flows are chained from the event bus once energy has also landed
+    if event_bus_enabled():
+        return None
+
     if dispatch_is and dispatch_is.crawls_run:
         # switch between v3 and v2 for flows here
         if settings.flows_and_emissions_v3:
@@ -69,6 +74,10 @@ async def nem_dispatch_scada_crawl() -> ControllerReturn:
     if not dispatch_scada or not dispatch_scada.inserted_records:
         raise RetryTask("No new dispatch scada data")
 
+    # exports are chained from the event bus once flows have run for the interval
+    if event_bus_enabled():
+        return dispatch_scada
+
     await asyncio.gather(
         run_export_power_latest_for_network(network=NetworkNEM), run_export_power_latest_for_network(network=NetworkAU)
     )
@@ -1,11 +1,14 @@
-"""OpenNEM Price Queries"""
+"""OpenNEM Emission Queries"""
 
+import functools
 from datetime import datetime
 from textwrap import dedent
 
 from sqlalchemy import text as sql
 from sqlalchemy.sql.expression import TextClause
 
+from opennem import settings
+from opennem.queries.utils import network_time
 from opennem.schema.network import NetworkSchema
 from opennem.schema.time import TimeInterval
 from opennem.utils.dates import num_intervals_between_datetimes
@@ -13,6 +16,93 @@ from opennem.utils.dates import num_intervals_between_datetimes
 from .exceptions import TooManyIntervals
 
 
+@functools.cache
+def _emission_factor_region_template(timezone: str, trunc: str, intervals_per_hour: float, has_region: bool) -> TextClause:
+    """Emission factors by region from the at_network_fueltech_intervals aggregate"""
+    network_regions_query = "fi.network_region = :network_region and" if has_region else ""
+
+    return sql(
+        dedent(
+            f"""
+            select
+                t.trading_interval at time zone '{timezone}',
+                t.network_region,
+                t.generated,
+                t.emissions,
+                t.emissions_factor
+            from
+            (
+                select
+                    time_bucket_gapfill('{trunc}', fi.interval) as trading_interval,
+                    fi.network_region,
+                    coalesce(sum(fi.generated), 0) as generated,
+                    coalesce(sum(fi.emissions), 0) * {intervals_per_hour} as emissions,
+                    case when sum(fi.energy) > 0 then
+                        sum(fi.emissions) / sum(fi.energy)
+                    else 0
+                    end as emissions_factor
+                from at_network_fueltech_intervals fi
+                where
+                    fi.is_forecast is False and
+                    fi.fueltech_id not in ('exports', 'imports', 'interconnector') and
+                    fi.network_id = :network_id and
+                    fi.generated > 0 and
+                    {network_regions_query}
+                    fi.interval >= :date_min and
+                    fi.interval <= :date_max
+                group by 1, 2
+            ) as t
+            order by 1 asc, 2;
+            """
+        )
+    )
+
+
+@functools.cache
+def _emission_factor_region_scada_template(timezone: str, trunc: str, intervals_per_hour: float, has_region: bool) -> TextClause:
+    """Emission factors by region aggregated from facility_scada"""
+    network_regions_query = "f.network_region = :network_region and" if has_region else ""
+
+    return sql(
+        dedent(
+            f"""
+            select
+                t.trading_interval at time zone '{timezone}',
+                t.network_region,
+                coalesce(sum(t.power), 0) as generated,
+                coalesce(sum(t.emissions), 0) as emissions,
+                case when sum(t.power) > 0 then
+                    sum(t.emissions) / sum(t.power)
+                else 0
+                end as emissions_factor
+            from
+            (
+                select
+                    time_bucket_gapfill('{trunc}', fs.trading_interval) as trading_interval,
+                    f.network_region as network_region,
+                    coalesce(sum(fs.generated), 0) as power,
+                    coalesce(sum(fs.generated) * max(f.emissions_factor_co2), 0) as emissions
+                from facility_scada fs
+                left join facility f on fs.facility_code = f.code
+                left join network n on f.network_id = n.code
+                where
+                    fs.is_forecast is False and
+                    f.interconnector = False and
+                    f.network_id = :network_id and
+                    fs.generated > 0 and
+                    {network_regions_query}
+                    fs.trading_interval >= :date_min and
+                    fs.trading_interval <= :date_max
+                group by
+                    1, f.code, 2
+            ) as t
+            group by 1, 2
+            order by 1 asc, 2;
+            """
+        )
+    )
+
+
 def get_emission_factor_region_query(
     date_min: datetime,
     date_max: datetime,
@@ -22,61 +112,29 @@ def get_emission_factor_region_query(
 ) -> TextClause:
     """Gets emission query"""
 
-    __query = """
-        select
-            t.trading_interval at time zone '{timezone}',
-            t.network_region,
-            coalesce(sum(t.power), 0) as generated,
-            coalesce(sum(t.emissions), 0) as emissions,
-            case when sum(t.power) > 0 then
-                sum(t.emissions) / sum(t.power)
-            else 0
-            end as emissions_factor
-        from
-        (
-            select
-                time_bucket_gapfill('{trunc}', fs.trading_interval) as trading_interval,
-                f.network_region as network_region,
-                coalesce(sum(fs.generated), 0) as power,
-                coalesce(sum(fs.generated) * max(f.emissions_factor_co2), 0) as emissions
-            from facility_scada fs
-            left join facility f on fs.facility_code = f.code
-            left join network n on f.network_id = n.code
-            where
-                fs.is_forecast is False and
-                f.interconnector = False and
-                f.network_id = '{network_id}' and
-                fs.generated > 0 and
-                {network_regions_query}
-                fs.trading_interval >= '{date_min}' and
-                fs.trading_interval <= '{date_max}'
-            group by
-                1, f.code, 2
-        ) as t
-        group by 1, 2
-        order by 1 asc, 2;
-    """
-
-    # regions clause
-    network_regions_query = ""
-
-    if network_region_code:
-        network_regions_query = f"f.network_region = '{network_region_code.upper()}' and"
-
     num_intervals = num_intervals_between_datetimes(interval.get_timedelta(), date_min, date_max)
 
     if num_intervals > 1000:
         raise TooManyIntervals("Too many intervals: {num_intervals}. Try reducing date range or interval size")
 
-    return sql(
-        dedent(
-            __query.format(
-                network_id=network.code,
-                trunc=interval.interval_human,
-                date_max=date_max,
-                date_min=date_min,
-                network_regions_query=network_regions_query,
-                timezone=network.timezone_database,
-            )
-        )
+    template = (
+        _emission_factor_region_template
+        if settings.network_fueltech_intervals_queries
+        else _emission_factor_region_scada_template
+    )
+
+    query = template(
+        timezone=network.timezone_database,
+        trunc=interval.interval_human,
+        intervals_per_hour=network.intervals_per_hour,
+        has_region=bool(network_region_code),
+    ).bindparams(
+        network_id=network.code,
+        date_min=network_time(date_min),
+        date_max=network_time(date_max),
     )
+
+    if network_region_code:
+        query = query.bindparams(network_region=network_region_code.upper())
+
+    return query
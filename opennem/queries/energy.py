@@ -1,19 +1,61 @@
 """ """
 
+import functools
 import logging
 from datetime import datetime
 from textwrap import dedent
 from typing import Any
 
 from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 
 from opennem.controllers.output.schema import OpennemExportSeries
 from opennem.db import get_read_session
-from opennem.queries.utils import networks_to_sql_in
+from opennem.queries.utils import network_codes
 from opennem.schema.network import NetworkAPVI, NetworkAU, NetworkNEM, NetworkSchema, NetworkWEM, NetworkWEMDE
 
 logger = logging.getLogger("opennem.queries.energy")
 
+# networks queried for generation milestones and the regions filtered for WEM
+_NEM_ENERGY_NETWORKS = ["NEM", "AEMO_ROOFTOP", "AEMO_ROOFTOP_BACKFILL"]
+_WEM_ENERGY_NETWORKS = ["WEM", "WEMDE", "APVI"]
+_WEM_ENERGY_REGIONS = ["WEM", "WEMDE"]
+
+
+@functools.cache
+def _energy_network_fueltech_template(coalesce_with: str, trunc: str, has_region: bool, wem_apvi: bool) -> TextClause:
+    network_region_query = "f.network_region = :network_region and" if has_region else ""
+    # @NOTE special case for WEM to only include APVI data for that network/region
+    # and not double-count all of AU
+    network_apvi_wem = "or (t.network_id='APVI' and f.network_region in ('WEM'))" if wem_apvi else ""
+
+    return text(
+        dedent(
+            f"""
+            select
+                date_trunc('{trunc}', t.trading_day) as trading_day,
+                t.network_id,
+                t.network_region,
+                t.fueltech_id,
+                coalesce(sum(t.energy) / 1000, {coalesce_with}) as fueltech_energy_gwh,
+                coalesce(sum(t.market_value), {coalesce_with}) as fueltech_market_value_dollars,
+                coalesce(sum(t.emissions), {coalesce_with}) as fueltech_emissions_factor
+            from at_facility_daily t
+            left join facility f on t.facility_code = f.code
+            where
+                t.trading_day <= cast(:date_max as date) and
+                t.trading_day >= cast(:date_min as date) and
+                t.fueltech_id not in ('imports', 'exports', 'interconnector') and
+                (t.network_id = any(:network_ids) {network_apvi_wem}) and
+                {network_region_query}
+                1=1
+            group by 1, 2, 3, 4
+            order by
+                1 desc, 2;
+            """
+        )
+    )
+
 
 def energy_network_fueltech_query(
     network: NetworkSchema,
@@ -21,7 +63,7 @@ def energy_network_fueltech_query(
     network_region: str | None = None,
     networks_query: list[NetworkSchema] | None = None,
     coalesce_with: int | None = None,
-) -> str:
+) -> TextClause:
     """
     Get Energy for a network or network + region
     based on a year
@@ -36,86 +78,47 @@ def energy_network_fueltech_query(
     if not networks_query:
         networks_query = [time_series.network]
 
-    __query = """
-    select
-        date_trunc('{trunc}', t.trading_day) as trading_day,
-        t.network_id,
-        t.network_region,
-        t.fueltech_id,
-        coalesce(sum(t.energy) / 1000, {coalesce_with}) as fueltech_energy_gwh,
-        coalesce(sum(t.market_value), {coalesce_with}) as fueltech_market_value_dollars,
-        coalesce(sum(t.emissions), {coalesce_with}) as fueltech_emissions_factor
-    from at_facility_daily t
-    left join facility f on t.facility_code = f.code
-    where
-        t.trading_day <= '{date_max}'::date and
-        t.trading_day >= '{date_min}'::date and
-        t.fueltech_id not in ('imports', 'exports', 'interconnector') and
-        {network_query}
-        {network_region_query}
-        1=1
-    group by 1, 2, 3, 4
-    order by
-        1 desc, 2;
-
-    """
-
-    network_region_query = ""
-
     # Get the time range using either the old way or the new v4 way
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    trunc = time_series_range.interval.trunc
+    wem_apvi = network in [NetworkWEM, NetworkAU]
+
+    if wem_apvi and NetworkAPVI in networks_query:
+        networks_query.pop(networks_query.index(NetworkAPVI))
+
+    query = _energy_network_fueltech_template(
+        coalesce_with=str(coalesce_with or "NULL"),
+        trunc=time_series_range.interval.trunc,
+        has_region=bool(network_region),
+        wem_apvi=wem_apvi,
+    ).bindparams(
+        network_ids=network_codes(networks_query),
+        # dates are compared in network time
+        date_min=time_series_range.start.date(),
+        date_max=time_series_range.end.date(),
+    )
 
     if network_region:
-        network_region_query = f"f.network_region='{network_region}' and"
+        query = query.bindparams(network_region=network_region)
 
-    # @NOTE special case for WEM to only include APVI data for that network/region
-    # and not double-count all of AU
-    network_apvi_wem = ""
-
-    if network in [NetworkWEM, NetworkAU]:
-        network_apvi_wem = "or (t.network_id='APVI' and f.network_region in ('WEM'))"
+    return query
 
-        if NetworkAPVI in networks_query:
-            networks_query.pop(networks_query.index(NetworkAPVI))
 
-    networks_list = networks_to_sql_in(networks_query)
+def _energy_networks(network: NetworkSchema) -> tuple[list[str], list[str] | None]:
+    """Networks and the regions to filter, if any, for the generation milestone queries"""
+    if network == NetworkNEM:
+        return _NEM_ENERGY_NETWORKS, None
 
-    network_query = f"(t.network_id IN ({networks_list}) {network_apvi_wem}) and "
+    return _WEM_ENERGY_NETWORKS, _WEM_ENERGY_REGIONS if network in [NetworkWEM, NetworkWEMDE] else None
 
-    return dedent(
-        __query.format(
-            trunc=trunc,
-            date_min=date_min,
-            date_max=date_max,
-            network_query=network_query,
-            network_region_query=network_region_query,
-            coalesce_with=coalesce_with or "NULL",
-        )
-    )
-
-
-async def get_fueltech_interval_energy_emissions(
-    network: NetworkSchema, interval: str, date_start: datetime, date_end: datetime, region_group: bool = False
-) -> Any:
-    """
-    Get the total generated energy emissions for a network
-    based an interval size
-
-    :param network: The network to query
-    :param date_start: The start date
-    :param date_end: The end date
-    """
 
+@functools.cache
+def _fueltech_interval_energy_emissions_template(interval: str, region_group: bool, has_region_filter: bool) -> TextClause:
     network_region_query = "f.network_region as network_region," if region_group else ""
     group_by = "1,2,3,4" if region_group else "1,2,3"
-    network_query = "'NEM','AEMO_ROOFTOP','AEMO_ROOFTOP_BACKFILL'" if network == NetworkNEM else "'WEM', 'WEMDE', 'APVI'"
-    network_region_filter_query = "f.network_region IN ('WEM', 'WEMDE') and " if network in [NetworkWEM, NetworkWEMDE] else ""
+    network_region_filter_query = "f.network_region = any(:network_regions) and" if has_region_filter else ""
 
-    query = text(
+    return text(
         f"""
         SELECT
             time_bucket_gapfill('{interval}', interval) AS interval,
@@ -141,7 +144,7 @@ async def get_fueltech_interval_energy_emissions(
             fs.is_forecast IS FALSE AND
             f.fueltech_id IS NOT NULL AND
             f.fueltech_id NOT IN ('imports', 'exports', 'interconnector') AND
-            f.network_id IN ({network_query}) AND
+            f.network_id = any(:network_ids) AND
             {network_region_filter_query}
             fs.interval >= :date_start AND
             fs.interval < :date_end
@@ -152,31 +155,52 @@ async def get_fueltech_interval_energy_emissions(
     """
     )
 
-    async with get_read_session() as session:
-        result = await session.execute(query, {"date_start": date_start, "date_end": date_end})
-        rows = result.fetchall()
 
-    return rows
+def fueltech_interval_energy_emissions_query(
+    network: NetworkSchema, interval: str, date_start: datetime, date_end: datetime, region_group: bool = False
+) -> TextClause:
+    """Generated energy and emissions for a network by fueltech bucketed by an interval size"""
+    network_ids, network_regions = _energy_networks(network)
 
+    query = _fueltech_interval_energy_emissions_template(
+        interval=interval, region_group=region_group, has_region_filter=bool(network_regions)
+    ).bindparams(network_ids=network_ids, date_start=date_start, date_end=date_end)
 
-async def get_fueltech_generated_energy_emissions(
+    if network_regions:
+        query = query.bindparams(network_regions=network_regions)
+
+    return query
+
+
+async def get_fueltech_interval_energy_emissions(
     network: NetworkSchema, interval: str, date_start: datetime, date_end: datetime, region_group: bool = False
 ) -> Any:
     """
     Get the total generated energy emissions for a network
-    based on a year
+    based an interval size
 
     :param network: The network to query
     :param date_start: The start date
     :param date_end: The end date
     """
+    query = fueltech_interval_energy_emissions_query(
+        network=network, interval=interval, date_start=date_start, date_end=date_end, region_group=region_group
+    )
 
+    async with get_read_session() as session:
+        result = await session.execute(query)
+        rows = result.fetchall()
+
+    return rows
+
+
+@functools.cache
+def _fueltech_generated_energy_emissions_template(interval: str, region_group: bool, has_region_filter: bool) -> TextClause:
     network_region_query = "fs.network_region as network_region," if region_group else ""
     group_by = "1,2,3,4" if region_group else "1,2,3"
-    network_query = "'NEM','AEMO_ROOFTOP','AEMO_ROOFTOP_BACKFILL'" if network == NetworkNEM else "'WEM', 'WEMDE', 'APVI'"
-    network_region_filter_query = "fs.network_region IN ('WEM', 'WEMDE') and " if network in [NetworkWEM, NetworkWEMDE] else ""
+    network_region_filter_query = "fs.network_region = any(:network_regions) and" if has_region_filter else ""
 
-    query = text(
+    return text(
         f"""
             SELECT
                 {interval} AS interval,
@@ -191,7 +215,7 @@ async def get_fueltech_generated_energy_emissions(
                 JOIN fueltech ft ON fs.fueltech_code = ft.code
                 JOIN fueltech_group ftg on ftg.code = ft.fueltech_group_id
             WHERE
-                fs.network_id IN ({network_query}) AND
+                fs.network_id = any(:network_ids) AND
                 {network_region_filter_query}
                 fs.trading_day >= :date_start AND
                 fs.trading_day < :date_end
@@ -202,8 +226,40 @@ async def get_fueltech_generated_energy_emissions(
         """
     )
 
+
+def fueltech_generated_energy_emissions_query(
+    network: NetworkSchema, interval: str, date_start: datetime, date_end: datetime, region_group: bool = False
+) -> TextClause:
+    """Generated energy and emissions for a network by fueltech from the daily fueltech view"""
+    network_ids, network_regions = _energy_networks(network)
+
+    query = _fueltech_generated_energy_emissions_template(
+        interval=interval, region_group=region_group, has_region_filter=bool(network_regions)
+    ).bindparams(network_ids=network_ids, date_start=date_start, date_end=date_end)
+
+    if network_regions:
+        query = query.bindparams(network_regions=network_regions)
+
+    return query
+
+
+async def get_fueltech_generated_energy_emissions(
+    network: NetworkSchema, interval: str, date_start: datetime, date_end: datetime, region_group: bool = False
+) -> Any:
+    """
+    Get the total generated energy emissions for a network
+    based on a year
+
+    :param network: The network to query
+    :param date_start: The start date
+    :param date_end: The end date
+    """
+    query = fueltech_generated_energy_emissions_query(
+        network=network, interval=interval, date_start=date_start, date_end=date_end, region_group=region_group
+    )
+
     async with get_read_session() as session:
-        result = await session.execute(query, {"date_start": date_start, "date_end": date_end})
+        result = await session.execute(query)
         rows = result.fetchall()
 
     return rows
@@ -1,5 +1,6 @@
 """Flow queries"""
 
+import functools
 import logging
 from datetime import datetime
 
@@ -7,14 +8,14 @@ from sqlalchemy import text
 from sqlalchemy.sql.elements import TextClause
 
 from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.queries.utils import network_time
 from opennem.schema.network import NetworkSchema
 
 logger = logging.getLogger("opennem.queries.flows")
 
 
-def get_interconnector_intervals_query(date_start: datetime, date_end: datetime, network: NetworkSchema) -> TextClause:
-    """Load interconenctor intervals v1"""
-    query = f"""
+_INTERCONNECTOR_INTERVALS_QUERY = text(
+    """
         select
             time_bucket_gapfill('5min', fs.trading_interval) as trading_interval,
             f.interconnector_region_from,
@@ -24,25 +25,28 @@ def get_interconnector_intervals_query(date_start: datetime, date_end: datetime,
         left join facility f
             on fs.facility_code = f.code
         where
-            fs.trading_interval >= '{date_start}'
-            and fs.trading_interval < '{date_end}'
+            fs.trading_interval >= :date_start
+            and fs.trading_interval < :date_end
             and f.interconnector is True
-            and f.network_id = '{network.code}'
+            and f.network_id = :network_id
         group by 1, 2, 3
         order by
             1 asc;
-
     """
+)
 
-    logger.debug(query)
-
-    return text(query)
 
+def get_interconnector_intervals_query(date_start: datetime, date_end: datetime, network: NetworkSchema) -> TextClause:
+    """Load interconenctor intervals v1"""
+    return _INTERCONNECTOR_INTERVALS_QUERY.bindparams(
+        date_start=network_time(date_start), date_end=network_time(date_end), network_id=network.code
+    )
 
-def power_network_flow_query(time_series: OpennemExportSeries, network_region: str) -> TextClause:
-    """Get interconnector region flows using the aggregate tables"""
 
-    ___query = """
+@functools.cache
+def _power_network_flow_template(interval: str, unit_scale: int, unit_scale_emissions: int) -> TextClause:
+    return text(
+        f"""
     select
         time_bucket_gapfill('{interval}', nf.trading_interval) as trading_interval,
         nf.network_id,
@@ -65,45 +69,38 @@ def power_network_flow_query(time_series: OpennemExportSeries, network_region: s
         end as intensity_exports
     from at_network_flows nf
     where
-        nf.network_id = '{network_id}' and
-        nf.network_region= '{network_region}' and
-        nf.trading_interval <= '{date_end}' and
-        nf.trading_interval >= '{date_start}'
+        nf.network_id = :network_id and
+        nf.network_region = :network_region and
+        nf.trading_interval <= :date_end and
+        nf.trading_interval >= :date_start
     group by 1, 2, 3
     order by 1 desc;
+    """
+    )
 
 
-    """
+def power_network_flow_query(time_series: OpennemExportSeries, network_region: str) -> TextClause:
+    """Get interconnector region flows using the aggregate tables"""
 
     time_series_range = time_series.get_range()
-    date_max = time_series_range.end
-    date_min = time_series_range.start
 
-    query = ___query.format(
-        interval=time_series.interval.interval_sql,
+    # @NOTE since at_network_flows is calculated as an energy we need to multiple it back out
+    return _power_network_flow_template(
+        interval=time_series.interval.interval_sql, unit_scale=12, unit_scale_emissions=1
+    ).bindparams(
         network_id=time_series.network.code,
         network_region=network_region,
-        date_start=date_min,
-        date_end=date_max,
-        # @NOTE since at_network_flows is calculated as an energy we need to multiple it back out
-        unit_scale=12,
-        unit_scale_emissions=1,
+        date_start=time_series_range.start,
+        date_end=time_series_range.end,
     )
 
-    return text(query)
-
-
-def get_network_flows_emissions_market_value_query(
-    time_series: OpennemExportSeries, network_region_code: str | None = None
-) -> TextClause:
-    """Gets the flow energy (in GWh) and the market value (in $) and emissions
-    for a given network and network region
-
-    Used in export task controllers and the API
 
-    @TODO abstract scale per opennem.units"""
+@functools.cache
+def _network_flows_emissions_market_value_template(trunc: str, timezone: str, has_region: bool) -> TextClause:
+    network_region_query = "and t.network_region = :network_region" if has_region else ""
 
-    __query = """
+    return text(
+        f"""
         select
             date_trunc('{trunc}', t.trading_interval at time zone '{timezone}') as trading_interval,
             t.network_id,
@@ -133,67 +130,41 @@ def get_network_flows_emissions_market_value_query(
                 coalesce(sum(t.market_value_exports), 0) as market_value_exports
             from at_network_flows t
             where
-                t.trading_interval < '{date_max}' and
-                t.trading_interval >= '{date_min}' and
-                t.network_id = '{network_id}' and
+                t.trading_interval < :date_max and
+                t.trading_interval >= :date_min and
+                t.network_id = :network_id
                 {network_region_query}
             group by 1, 2, 3
         ) as t
         group by 1, 2, 3
         order by 1 desc
     """
+    )
 
-    #
-    __query_optimized = """
-        select
-            date_trunc('{trunc}', t.trading_interval at time zone '{timezone}') as trading_interval,
-            t.network_id,
-            t.network_region,
-            coalesce(sum(t.energy_imports), 0) / 1000 as imports_energy,
-            coalesce(sum(t.energy_exports), 0) / 1000 as exports_energy,
-            coalesce(abs(sum(t.emissions_imports)), 0) as emissions_imports,
-            coalesce(abs(sum(t.emissions_exports)), 0) as emissions_exports,
-            coalesce(sum(t.market_value_imports), 0) as market_value_imports,
-            coalesce(sum(t.market_value_exports), 0) as market_value_exports,
-            case when abs(sum(t.energy_imports)) > 0 then
-                sum(t.emissions_imports) / abs(sum(t.energy_imports))
-            else 0 end as imports_market_value_rrp,
-            case when abs(sum(t.energy_exports)) > 0 then
-                sum(t.emissions_exports) / sum(t.energy_exports)
-            else 0 end as export_emission_factor
-        from at_network_flows t
-        where
-            t.trading_interval < '{date_max}' and
-            t.trading_interval >= '{date_min}' and
-            t.network_id = '{network_id}' and
-            {network_region_query}
-        group by 1, 2, 3
-        order by 1 desc, 2 asc
-    """
 
-    network_region_query = ""
+def get_network_flows_emissions_market_value_query(
+    time_series: OpennemExportSeries, network_region_code: str | None = None
+) -> TextClause:
+    """Gets the flow energy (in GWh) and the market value (in $) and emissions
+    for a given network and network region
 
-    if network_region_code:
-        network_region_query = f"""
-            t.network_region = '{network_region_code}'
-        """
+    Used in export task controllers and the API
+
+    @TODO abstract scale per opennem.units"""
 
     date_range = time_series.get_range()
 
-    # if we're bucketing by hour or day then we can use the optimized query
-    # @NOTE you can do >= int value here against interval.interval but this is more legible.
-    run_optimized = False
+    query = _network_flows_emissions_market_value_template(
+        trunc=date_range.interval.trunc,
+        timezone=time_series.network.timezone_database,
+        has_region=bool(network_region_code),
+    ).bindparams(
+        network_id=time_series.network.code,
+        date_min=date_range.start,
+        date_max=date_range.end,
+    )
 
-    if run_optimized and date_range.interval.trunc.lower() in ["hour", "day", "month", "year"]:
-        __query = __query_optimized
+    if network_region_code:
+        query = query.bindparams(network_region=network_region_code)
 
-    return text(
-        __query.format(
-            timezone=time_series.network.timezone_database,
-            trunc=date_range.interval.trunc,
-            network_id=time_series.network.code,
-            date_min=date_range.start,
-            date_max=date_range.end,
-            network_region_query=network_region_query,
-        )
-    )
+    return query
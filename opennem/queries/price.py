@@ -1,11 +1,13 @@
 """OpenNEM Price Queries"""
 
+import functools
 from datetime import datetime
 from textwrap import dedent
 
 from sqlalchemy import text as sql
 from sqlalchemy.sql.expression import TextClause
 
+from opennem.queries.utils import network_time
 from opennem.schema.network import NetworkSchema
 from opennem.schema.time import TimeInterval
 from opennem.utils.dates import num_intervals_between_datetimes
@@ -13,6 +15,32 @@ from opennem.utils.dates import num_intervals_between_datetimes
 from .exceptions import TooManyIntervals
 
 
+@functools.cache
+def _network_region_price_template(trunc: str, has_region: bool, forecast: bool) -> TextClause:
+    network_regions_query = "and bs.network_region = :network_region" if has_region else ""
+    forecast_clause = "and bs.forecast = true" if forecast else ""
+
+    return sql(
+        dedent(
+            f"""
+            select
+                time_bucket_gapfill('{trunc}', bs.trading_interval) as trading_interval,
+                bs.network_id,
+                bs.network_region,
+                coalesce(avg(bs.price), avg(bs.price_dispatch)) as price
+            from balancing_summary bs
+            where
+                bs.trading_interval >= :date_min
+                and bs.trading_interval <= :date_max
+                and bs.network_id = :network_id
+                {forecast_clause}
+                {network_regions_query}
+            group by 1, 2, 3;
+            """
+        )
+    )
+
+
 def get_network_region_price_query(
     network: NetworkSchema,
     date_min: datetime,
@@ -23,37 +51,10 @@ def get_network_region_price_query(
 ) -> TextClause:
     """Gets a price query"""
 
-    __query = """
-        select
-            time_bucket_gapfill('{trunc}', bs.trading_interval) as trading_interval,
-            bs.network_id,
-            bs.network_region,
-            coalesce(avg(bs.price), avg(bs.price_dispatch)) as price
-        from balancing_summary bs
-        where
-            bs.trading_interval >= '{date_min}'
-            and bs.trading_interval <= '{date_max}'
-            and bs.network_id = '{network_id}'
-            {forecast_clause}
-            {network_regions_query}
-        group by 1, 2, 3;
-    """
     # if only a single interval with date_min set date_max
     if not date_max:
         date_max = date_min
 
-    # regions clause
-    network_regions_query = ""
-
-    if network_region_code:
-        network_regions_query = f"and bs.network_region = '{network_region_code.upper()}'"
-
-    # forecast clause
-    forecast_clause = ""
-
-    if forecast:
-        forecast_clause = "and bs.forecast = true"
-
     # if not interval provided get the default from the network
     if not interval:
         interval = network.get_interval()
@@ -63,15 +64,15 @@ def get_network_region_price_query(
     if num_intervals > 1000:
         raise TooManyIntervals("Too many intervals: {num_intervals}. Try reducing date range or interval size")
 
-    return sql(
-        dedent(
-            __query.format(
-                network_id=network.code,
-                trunc=interval.interval_human,
-                date_max=date_max,
-                date_min=date_min,
-                network_regions_query=network_regions_query,
-                forecast_clause=forecast_clause,
-            )
-        )
+    query = _network_region_price_template(
+        trunc=interval.interval_human, has_region=bool(network_region_code), forecast=forecast
+    ).bindparams(
+        network_id=network.code,
+        date_min=network_time(date_min),
+        date_max=network_time(date_max),
     )
+
+    if network_region_code:
+        query = query.bindparams(network_region=network_region_code.upper())
+
+    return query
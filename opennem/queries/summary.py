@@ -3,20 +3,27 @@ Daily summary - fueltechs as proportion of demand
 and other stats per network query
 """
 
+import functools
 import logging
 from datetime import datetime, timedelta
 from textwrap import dedent
 
 from datetime_truncate import truncate as date_trunc
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 
-from opennem.queries.utils import list_to_case
+from opennem.queries.utils import network_time
 from opennem.schema.network import NetworkSchema
 from opennem.utils.timezone import is_aware
 
 logger = logging.getLogger("opennem.workers.daily_summary")
 
 
-__daily_summary_fueltech_query = """
+@functools.cache
+def _daily_fueltech_summary_template(tz: str) -> TextClause:
+    return text(
+        dedent(
+            f"""
 with
 
 dt as (select
@@ -25,9 +32,9 @@ dt as (select
     sum(bs.demand_total) as demand_total
 from balancing_summary bs
 where
-    bs.trading_interval >= '{date_min}'
-    and bs.trading_interval < '{date_max}'
-    and bs.network_id='{network_id}'
+    bs.trading_interval >= :date_min
+    and bs.trading_interval < :date_max
+    and bs.network_id = :network_id
 group by 1, 2
 order by 1 desc),
 
@@ -37,9 +44,9 @@ ftt as (select
 from facility_scada fs
 left join facility f on f.code = fs.facility_code
 where
-    fs.trading_interval >= '{date_min}'
-    and fs.trading_interval < '{date_max}'
-    and fs.network_id IN ('{network_id}', 'AEMO_ROOFTOP')
+    fs.trading_interval >= :date_min
+    and fs.trading_interval < :date_max
+    and fs.network_id = any(:network_ids)
     and f.fueltech_id not in ('imports', 'exports', 'interconnector', 'battery_discharging')
     and f.dispatch_type = 'GENERATOR'
 group by 1
@@ -62,16 +69,20 @@ join fueltech_group ftg on ft.fueltech_group_id = ftg.code
 left join dt on dt.trading_day = fs.trading_day
 left join ftt on ftt.trading_day = fs.trading_day
 where
-    fs.trading_day >= '{date_min}'
-    and fs.trading_day < '{date_max}'
-    and fs.network_id IN ('{network_id}', 'AEMO_ROOFTOP')
-    and f.fueltech_id not in ({fueltechs_excluded})
+    fs.trading_day >= :day_min
+    and fs.trading_day < :day_max
+    and fs.network_id = any(:network_ids)
+    and f.fueltech_id <> all(:fueltechs_excluded)
     and f.dispatch_type = 'GENERATOR'
 group by 1, 2, 3, 4, 5;
 """
+        )
+    )
 
 
-def get_daily_fueltech_summary_query(day: datetime, network: NetworkSchema, fueltechs_excluded: list[str] = None) -> str:
+def get_daily_fueltech_summary_query(
+    day: datetime, network: NetworkSchema, fueltechs_excluded: list[str] | None = None
+) -> TextClause:
     """Get the fueltech summary query for a day and for a network"""
 
     # default list of excluded fueltechs
@@ -86,12 +97,13 @@ def get_daily_fueltech_summary_query(day: datetime, network: NetworkSchema, fuel
     date_min = date_trunc(day, truncate_to="day")
     date_max = date_min + timedelta(days=1)
 
-    query = __daily_summary_fueltech_query.format(
-        date_min=date_min,
-        date_max=date_max,
-        tz=network.timezone_database,
+    return _daily_fueltech_summary_template(tz=network.timezone_database).bindparams(
+        # scada and balancing summary intervals are in network time, aggregate days are aware
+        date_min=network_time(date_min),
+        date_max=network_time(date_max),
+        day_min=date_min,
+        day_max=date_max,
         network_id=network.code,
-        fueltechs_excluded=list_to_case(fueltechs_excluded),
+        network_ids=[network.code, "AEMO_ROOFTOP"],
+        fueltechs_excluded=list(fueltechs_excluded),
     )
-
-    return dedent(query)
@@ -3,21 +3,28 @@ Daily summary - fueltechs as proportion of demand
 and other stats per network
 """
 
+import functools
 import logging
 from datetime import datetime, timedelta
 from textwrap import dedent
 
 from datetime_truncate import truncate as date_trunc
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 
 from opennem import settings  # noqa: F401
-from opennem.queries.utils import duid_to_case, list_to_sql_in_condition
+from opennem.queries.utils import network_codes, network_time
 from opennem.schema.network import NetworkNEM, NetworkSchema
 from opennem.utils.dates import DATE_YESTERDAY
 
 logger = logging.getLogger("opennem.queries.tod")
 
 
-__daily_summary_fueltech_query = """
+@functools.cache
+def _time_of_day_template(tz: str) -> TextClause:
+    return text(
+        dedent(
+            f"""
 with
 
 demand_per_interval as (select
@@ -26,9 +33,9 @@ demand_per_interval as (select
     sum(bs.demand_total) as demand_total
 from balancing_summary bs
 where
-    bs.trading_interval >= '{date_min}'
-    and bs.trading_interval < '{date_max}'
-    and bs.network_id IN ({networks})
+    bs.trading_interval >= :date_min
+    and bs.trading_interval < :date_max
+    and bs.network_id = any(:network_ids)
 group by 1, 2
 order by 1 desc),
 
@@ -38,10 +45,10 @@ generated_per_interval as (select
 from facility_scada fs
 left join facility f on f.code = fs.facility_code
 where
-    fs.trading_interval >= '{date_min}'
-    and fs.trading_interval < '{date_max}'
-    and fs.network_id IN ({networks})
-    and f.fueltech_id not in ({fueltechs_excluded})
+    fs.trading_interval >= :date_min
+    and fs.trading_interval < :date_max
+    and fs.network_id = any(:network_ids)
+    and f.fueltech_id <> all(:fueltechs_excluded)
     and f.dispatch_type = 'GENERATOR'
 group by 1
 order by 1 desc)
@@ -63,17 +70,19 @@ join fueltech_group ftg on ft.fueltech_group_id = ftg.code
 left join demand_per_interval on demand_per_interval.trading_interval = fs.trading_interval at time zone '{tz}'
 left join generated_per_interval on generated_per_interval.trading_interval = fs.trading_interval at time zone '{tz}'
 where
-    fs.trading_interval >= '{date_min}'
-    and fs.trading_interval < '{date_max}'
-    and fs.network_id IN ({networks})
-    and f.fueltech_id not in ({fueltechs_excluded})
+    fs.trading_interval >= :date_min
+    and fs.trading_interval < :date_max
+    and fs.network_id = any(:network_ids)
+    and f.fueltech_id <> all(:fueltechs_excluded)
     and f.dispatch_type = 'GENERATOR'
 group by 1, 2, 3, 4, 5
 order by 1 desc;
 """
+        )
+    )
 
 
-def get_time_of_day_query(day: datetime = DATE_YESTERDAY, network: NetworkSchema = NetworkNEM) -> str:
+def get_time_of_day_query(day: datetime = DATE_YESTERDAY, network: NetworkSchema = NetworkNEM) -> TextClause:
     EXCLUDE_FUELTECHS = ["imports", "exports", "interconnector", "battery_discharging"]
 
     day_date = day.replace(tzinfo=network.get_fixed_offset())
@@ -81,16 +90,13 @@ def get_time_of_day_query(day: datetime = DATE_YESTERDAY, network: NetworkSchema
     date_min = date_trunc(day_date, truncate_to="day")
     date_max = date_min + timedelta(days=1)
 
-    query = __daily_summary_fueltech_query.format(
-        date_min=date_min,
-        date_max=date_max,
-        tz=network.timezone_database,
-        networks=list_to_sql_in_condition([i.code for i in network.get_networks_query()]),
-        fueltechs_excluded=duid_to_case(EXCLUDE_FUELTECHS),
+    return _time_of_day_template(tz=network.timezone_database).bindparams(
+        date_min=network_time(date_min),
+        date_max=network_time(date_max),
+        network_ids=network_codes(network.get_networks_query()),
+        fueltechs_excluded=EXCLUDE_FUELTECHS,
     )
 
-    return dedent(query)
-
 
 if __name__ == "__main__":
     print(get_time_of_day_query())
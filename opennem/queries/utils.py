@@ -1,5 +1,7 @@
 """Query utilities"""
 
+from datetime import datetime
+
 from opennem.core.normalizers import normalize_duid
 from opennem.schema.network import NetworkSchema
 
@@ -23,3 +25,16 @@ def list_to_case(list_: list[str]) -> str:
 def list_to_sql_in_condition(codes: list[str]) -> str:
     """Convert a list of strings to a case statement"""
     return ",".join([f"'{i}'" for i in codes])
+
+
+def network_time(dt: datetime) -> datetime:
+    """Bind value for a timestamp without time zone column, which holds network time
+
+    Keeps the wall time and drops the offset, which is how postgres reads a literal
+    with an offset into these columns"""
+    return dt.replace(tzinfo=None)
+
+
+def network_codes(networks: list[NetworkSchema]) -> list[str]:
+    """Network codes to bind as an array for `network_id = any(:network_ids)`"""
+    return [n.code for n in networks]
@@ -6,6 +6,8 @@ import logging
 
 from sqlalchemy.exc import IntegrityError
 
+from opennem.api.cache import invalidate_cache_tags
+from opennem.api.milestones.queries import MILESTONES_CACHE_TAG
 from opennem.db import get_write_session
 from opennem.db.models.opennem import Milestones
 from opennem.recordreactor.schema import MilestoneRecordOutputSchema, MilestoneRecordSchema
@@ -77,3 +79,6 @@ async def persist_milestones(
                     logger.warning(f"Milestone already exists: {record.record_id} for interval {record.interval}")
 
         await session.commit()
+
+    # cached milestone totals are counted again on their next request
+    await invalidate_cache_tags(MILESTONES_CACHE_TAG)
@@ -65,6 +65,8 @@ class OpennemSettings(BaseSettings):
 
     # APVI
     apvi_token: str | None = None
+    # number of days fetched concurrently on multi-day crawls and backfills
+    apvi_crawl_concurrency: int = 4
 
     export_local: bool = False
 
@@ -80,8 +82,12 @@ class OpennemSettings(BaseSettings):
     # show database debug
     db_debug: bool = False
 
-    # cache scada values for
-    cache_scada_values_ttl_sec: int = 60 * 5
+    # seconds each process holds the facility scada watermarks before loading them again
+    scada_watermark_refresh: float = 60
+
+    # days after which facility_scada chunks are compressed. unset leaves the compression policy
+    # off as backfills, energy repairs, gap fill and archive imports still update old rows
+    scada_compress_after_days: int | None = None
 
     # asgi server settings
     server_host: str = "0.0.0.0"
@@ -101,6 +107,41 @@ class OpennemSettings(BaseSettings):
     http_verify_ssl: bool = True
     http_proxy_url: str | None = None  # @note don't let it confict with env HTTP_PROXY
 
+    # shared async http client pool
+    # see opennem.utils.httpx
+    http_http2: bool = True
+    http_max_connections: int = 100
+    http_max_connections_per_host: int = 10
+
+    # proportion of requests that can be retried across the process
+    http_retry_budget_ratio: float = 0.2
+
+    # on-disk response cache keyed on url and etag. disabled if not set
+    http_cache_dir: str | None = None
+
+    # scheduler - run tasks on a long-lived loop per worker process in priority lanes
+    scheduler_task_lanes: bool = True
+    scheduler_lane_crawl_concurrency: int = 4
+    scheduler_lane_aggregate_concurrency: int = 2
+    scheduler_lane_export_concurrency: int = 1
+
+    # seconds before a task deferred by a full lane is retried
+    scheduler_lane_retry_delay: int = 15
+
+    # times a task is deferred by a full lane before it is dropped until its next run
+    scheduler_lane_max_deferrals: int = 8
+
+    # read the power and emission factor exports from at_network_fueltech_intervals rather than
+    # facility_scada. only turn on once run_network_fueltech_intervals_backfill has been run
+    network_fueltech_intervals_queries: bool = False
+
+    # hours behind the latest interval recomputed by the scheduled network fueltech intervals catchup
+    network_fueltech_intervals_catchup_hours: int = 6
+
+    # pipeline event bus state backend: redis or None to disable. stages land in different
+    # worker processes so their state has to be shared to be joined
+    event_bus_backend: str | None = None
+
     _static_folder_path: str = "opennem/static/"
 
     # output schema options
@@ -145,6 +186,12 @@ class OpennemSettings(BaseSettings):
 
     # profiler options
     profiler_level: str = "NOISY"
+    # spans held in memory between flushes and seconds between flushes of the task latency histograms
+    profiler_buffer_size: int = 10_000
+    profiler_flush_interval: float = 60
+
+    # json lines file the ingest pipeline spans and metrics are written to after each crawl
+    ingest_trace_path: str | None = None
 
     # clerk API key
     clerk_secret_key: str | None = None
@@ -154,6 +201,17 @@ class OpennemSettings(BaseSettings):
     unkey_root_key: str | None = None
     unkey_api_id: str | None = None
 
+    # seconds verified keys and rejected keys are cached for
+    unkey_cache_ttl: int = 60 * 5
+    unkey_cache_negative_ttl: int = 60
+    unkey_cache_maxsize: int = 10_000
+
+    # seconds between syncing locally counted key usage to unkey
+    unkey_usage_sync_interval: int = 30
+
+    # api key rate limit backend: local, redis or None to disable
+    api_ratelimit_backend: str | None = "local"
+
     # openai
     openai_api_key: str | None = None
 
@@ -171,6 +229,48 @@ class OpennemSettings(BaseSettings):
     # throttle rate of api
     api_throttle_rate: float = 0
 
+    # rows fetched per round trip when streaming api query results
+    api_stream_partition_size: int = 5_000
+
+    # api response cache backend: local, redis or None to disable
+    api_cache_backend: str | None = "redis"
+    # bytes of responses each process holds in front of redis
+    api_cache_local_max_bytes: int = 64 * 1024 * 1024
+    # seconds expired responses are served for while they are refreshed
+    api_cache_stale_ttl: int = 60 * 5
+    # seconds a process holds the lock to fill a response while others wait for it
+    api_cache_lock_timeout: int = 30
+    # seconds cache tag versions are held in process before being read from redis again
+    api_cache_tag_refresh: float = 1
+    # seconds a process serves its facility catalogue before checking redis for a newer version
+    api_catalogue_refresh: float = 5
+    # max-age for clients caching facility catalogue responses
+    api_catalogue_max_age: int = 60 * 5
+
+    # seconds the facility registry is held in process before checking it for changes
+    facility_dimensions_refresh: float = 60
+
+    # calculate facility energy as scada is bulk inserted rather than in an update pass after
+    energy_at_ingest: bool = True
+
+    # contiguous gap ranges repaired at once by the gap fill
+    gapfill_concurrency: int = 4
+
+    # processes backfill chunks run across and attempts at each chunk per run
+    backfill_processes: int = 4
+    backfill_chunk_retries: int = 3
+
+    # mirror facility_scada, balancing_summary and aggregates into clickhouse as they are ingested
+    clickhouse_mirror_enabled: bool = False
+    # rows streamed from postgres per clickhouse insert
+    clickhouse_mirror_batch_size: int = 50_000
+    # backfill chunks mirrored at once
+    clickhouse_mirror_backfill_concurrency: int = 4
+    # run long historical queries and exports against the clickhouse mirror
+    clickhouse_query_routing: bool = False
+    # days a query range spans before it is routed to clickhouse
+    clickhouse_query_min_days: int = 90
+
     # API Dev key
     api_dev_key: str | None = None
 
@@ -193,6 +293,14 @@ class OpennemSettings(BaseSettings):
 
         return _log_value
 
+    @field_validator("event_bus_backend")
+    @classmethod
+    def validate_event_bus_backend(cls, backend: str | None) -> str | None:
+        if backend and backend != "redis":
+            raise SettingsException(f"Invalid event bus backend: {backend}. Only redis can join stages across workers")
+
+        return backend
+
     @property
     def static_folder_path(self) -> str:
         static_path: Path = Path(self._static_folder_path)
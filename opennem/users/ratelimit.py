@@ -1,4 +1,27 @@
+"""
+API key rate limits
+
+Tier limits are token buckets in unkey terms: a bucket holds up to `limit` requests
+and is topped up by `refill_rate` every `refill_interval` milliseconds. They are
+enforced locally by the API, either in process or shared between API processes in
+redis, so that a rate limit check is not a network round trip to unkey.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Protocol
+
 import unkey
+from cachetools import LRUCache
+from redis import asyncio as aioredis
+
+from opennem import settings
+from opennem.users.schema import OpenNEMRoles, OpenNEMUserRateLimit
+
+logger = logging.getLogger("opennem.users.ratelimit")
 
 # 10 requests a second
 OPENNEM_RATELIMIT_ADMIN = unkey.Ratelimit(
@@ -31,3 +54,180 @@ OPENNEM_RATELIMIT_USER = unkey.Ratelimit(
     refill_rate=100,
     refill_interval=1000 * 60 * 60 * 24,
 )
+
+
+class RateLimitException(Exception):
+    pass
+
+
+def get_ratelimit_for_roles(roles: list[OpenNEMRoles]) -> unkey.Ratelimit:
+    """Rate limit tier for a set of user roles, highest tier wins"""
+    if OpenNEMRoles.admin in roles:
+        return OPENNEM_RATELIMIT_ADMIN
+
+    if OpenNEMRoles.pro in roles:
+        return OPENNEM_RATELIMIT_PRO
+
+    if OpenNEMRoles.acedemic in roles:
+        return OPENNEM_RATELIMIT_ACADEMIC
+
+    return OPENNEM_RATELIMIT_USER
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+@dataclass(slots=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # unix timestamp in ms of the next refill
+    reset: int
+
+    @property
+    def rate_limit(self) -> OpenNEMUserRateLimit:
+        return OpenNEMUserRateLimit(limit=self.limit, remaining=self.remaining, reset=self.reset)
+
+
+class RateLimiter(Protocol):
+    async def consume(
+        self, identifier: str, ratelimit: unkey.Ratelimit, cost: int = 1, now: int | None = None
+    ) -> RateLimitResult: ...
+
+
+@dataclass(slots=True)
+class _TokenBucket:
+    tokens: int
+    last_refill: int
+
+
+class LocalRateLimiter:
+    """In-process token buckets per key, bounded to the most recently used keys"""
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self._buckets: LRUCache[str, _TokenBucket] = LRUCache(maxsize=maxsize)
+
+    async def consume(
+        self, identifier: str, ratelimit: unkey.Ratelimit, cost: int = 1, now: int | None = None
+    ) -> RateLimitResult:
+        now = now if now is not None else _now_ms()
+        bucket = self._buckets.get(identifier)
+
+        if not bucket:
+            bucket = _TokenBucket(tokens=ratelimit.limit, last_refill=now)
+            self._buckets[identifier] = bucket
+
+        refills = (now - bucket.last_refill) // ratelimit.refill_interval
+
+        if refills > 0:
+            bucket.tokens = min(ratelimit.limit, bucket.tokens + refills * ratelimit.refill_rate)
+            bucket.last_refill += refills * ratelimit.refill_interval
+
+        allowed = bucket.tokens >= cost
+
+        if allowed:
+            bucket.tokens -= cost
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=ratelimit.limit,
+            remaining=bucket.tokens,
+            reset=bucket.last_refill + ratelimit.refill_interval,
+        )
+
+
+# KEYS[1] bucket; ARGV limit, refill_rate, refill_interval, cost, now
+_REDIS_TOKEN_BUCKET_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local refill_interval = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local now = tonumber(ARGV[5])
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "last_refill")
+local tokens = tonumber(bucket[1])
+local last_refill = tonumber(bucket[2])
+
+if tokens == nil then
+    tokens = limit
+    last_refill = now
+end
+
+local refills = math.floor((now - last_refill) / refill_interval)
+
+if refills > 0 then
+    tokens = math.min(limit, tokens + refills * refill_rate)
+    last_refill = last_refill + refills * refill_interval
+end
+
+local allowed = 0
+
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens, "last_refill", last_refill)
+redis.call("PEXPIRE", KEYS[1], refill_interval * math.ceil(limit / refill_rate))
+
+return {allowed, tokens, last_refill + refill_interval}
+"""
+
+
+class RedisRateLimiter:
+    """Token buckets shared between API processes in redis"""
+
+    def __init__(self, redis_url: str, prefix: str = "opennem:ratelimit") -> None:
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis] = weakref.WeakKeyDictionary()
+
+    def _client(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+
+        if loop not in self._clients:
+            self._clients[loop] = aioredis.from_url(self.redis_url, decode_responses=True)
+
+        return self._clients[loop]
+
+    async def consume(
+        self, identifier: str, ratelimit: unkey.Ratelimit, cost: int = 1, now: int | None = None
+    ) -> RateLimitResult:
+        now = now if now is not None else _now_ms()
+
+        allowed, remaining, reset = await self._client().eval(
+            _REDIS_TOKEN_BUCKET_SCRIPT,
+            1,
+            f"{self.prefix}:{identifier}",
+            ratelimit.limit,
+            ratelimit.refill_rate,
+            ratelimit.refill_interval,
+            cost,
+            now,
+        )  # type: ignore
+
+        return RateLimitResult(allowed=bool(allowed), limit=ratelimit.limit, remaining=int(remaining), reset=int(reset))
+
+
+_RATELIMITER: RateLimiter | None = None
+
+
+def get_ratelimiter() -> RateLimiter | None:
+    """Rate limiter for the process set by settings.api_ratelimit_backend. None when disabled"""
+    global _RATELIMITER
+
+    if not settings.api_ratelimit_backend:
+        return None
+
+    if not _RATELIMITER:
+        match settings.api_ratelimit_backend:
+            case "redis":
+                _RATELIMITER = RedisRateLimiter(str(settings.redis_url))
+            case "local":
+                _RATELIMITER = LocalRateLimiter(maxsize=settings.unkey_cache_maxsize)
+            case _:
+                raise RateLimitException(f"Unknown rate limit backend: {settings.api_ratelimit_backend}")
+
+    return _RATELIMITER
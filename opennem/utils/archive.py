@@ -16,7 +16,8 @@ from typing import IO, Any
 from zipfile import ZipFile
 
 from opennem import settings
-from opennem.utils.http import http
+from opennem.core.tracing import IngestMetric, IngestStage, ingest_count, ingest_span
+from opennem.utils.httpx import http
 from opennem.utils.url import get_filename_from_url
 
 logger = logging.getLogger("opennem.archive.utils")
@@ -176,7 +177,7 @@ def stream_zip_contents(file_obj: IO[bytes], mode: str = "w"):  # type: ignore
         return chain_streams(c)
 
 
-def download_and_unzip(url: str) -> Path:
+async def download_and_unzip(url: str) -> Path:
     """Download and unzip a multi-zip file into a temporary directory"""
 
     dest_dir = Path(mkdtemp(prefix=f"{settings.tmp_file_prefix}"))
@@ -185,13 +186,18 @@ def download_and_unzip(url: str) -> Path:
 
     filename = get_filename_from_url(url)
 
-    try:
-        response = http.get(url)
-    except Exception as e:
-        logger.error(e)
+    with ingest_span(IngestStage.download, url=url) as span:
+        try:
+            response = await http.get(url)
+        except Exception as e:
+            logger.error(e)
+            raise
 
-    if not response.ok:
-        raise Exception(f"Failed to download file: Status code {response.status_code}")
+        if response.is_error:
+            raise Exception(f"Failed to download file: Status code {response.status_code}")
+
+        span.set("bytes", len(response.content))
+        ingest_count(IngestMetric.bytes_downloaded, len(response.content), stage=IngestStage.download.value)
 
     content_type = response.headers.get("Content-Type", None)
 
@@ -226,7 +232,7 @@ def download_and_unzip(url: str) -> Path:
     return dest_dir
 
 
-def download_and_parse_json_zip(url: str, indent: int | None = None) -> Any:
+async def download_and_parse_json_zip(url: str, indent: int | None = None) -> Any:
     """
     Downloads a file from the given URL. If the file is a ZIP archive, it is unzipped.
     The function then attempts to parse the contained or downloaded file as JSON.
@@ -246,8 +252,8 @@ def download_and_parse_json_zip(url: str, indent: int | None = None) -> Any:
 
     try:
         # Download the file
-        response = http.get(url)
-        if not response.ok:
+        response = await http.get(url)
+        if response.is_error:
             raise Exception(f"Failed to download file: Status code {response.status_code}")
 
         # Check the content type of the downloaded file
@@ -284,5 +290,7 @@ if __name__ == "__main__":
     # d = download_and_unzip(u)
     # print(d)
     # Usage example
+    import asyncio
+
     url = "https://data.wa.aemo.com.au/public/market-data/wemde/tradingReport/tradingDayReport/previous/TradingDayReport_20231004.zip"
-    json_data = download_and_parse_json_zip(url)
+    json_data = asyncio.run(download_and_parse_json_zip(url))
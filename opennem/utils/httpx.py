@@ -1,6 +1,27 @@
-""" " httpx async client for async http requests"""
+""" " httpx async client for async http requests
 
+All crawlers and clients share a pooled client per event loop (see `get_http_client` and the
+`http` module variable) with:
+
+ * per-host connection limits
+ * HTTP/2 where the server supports it (requires the `h2` package)
+ * a global retry budget with jittered exponential backoff
+ * an optional on-disk response cache keyed on URL + ETag (settings.http_cache_dir)
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import json
 import logging
+import random
+import threading
+import time
+import weakref
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
 
 import chardet
 import httpx
@@ -37,24 +58,333 @@ DEFAULT_BROWSER_HEADERS = {
     # "upgrade-insecure-requests": "1",
 }
 
+# status codes and methods that are retried
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+# backoff base and cap in seconds
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 30.0
+
+HAVE_HTTP2 = importlib.util.find_spec("h2") is not None
+
 
 def autodetect_encoding(content) -> str | None:
     return chardet.detect(content).get("encoding")
 
 
+def get_browser_headers() -> dict[str, str]:
+    """Request headers that mimic a browser with a random user agent"""
+    return {"user-agent": get_random_agent(), **DEFAULT_BROWSER_HEADERS}
+
+
 # debug loggers and interceptors
-def debug_log_request(request) -> None:
+async def debug_log_request(request) -> None:
     logger.debug(f"{request.method} {request.url}")
 
 
-def debug_log_response(response) -> None:
+async def debug_log_response(response) -> None:
     request = response.request
     logger.debug(f"Response event hook: {request.method} {request.url} - Status {response.status_code}")
 
 
+class RetryBudget:
+    """Retry budget shared across all requests in the process
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so retries are capped at
+    a proportion of overall traffic. A minimum number of retries per second is always allowed so
+    that low traffic crawlers can still retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 100.0) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take a retry from the budget. Returns False if the budget is exhausted"""
+        with self._lock:
+            self._refill()
+
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            return True
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+retry_budget = RetryBudget(ratio=settings.http_retry_budget_ratio)
+
+
+def get_retry_backoff(attempt: int, base: float = RETRY_BACKOFF_BASE, cap: float = RETRY_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def _get_retry_after(response: httpx.Response) -> float | None:
+    """Seconds to wait from a Retry-After header if present"""
+    retry_after = response.headers.get("retry-after")
+
+    if not retry_after:
+        return None
+
+    if retry_after.isdigit():
+        return float(retry_after)
+
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    etag: str
+
+
+class HTTPResponseCache:
+    """On-disk cache of GET responses keyed on URL and ETag
+
+    The latest ETag for a URL is kept in an index file and the body is stored under a key of
+    URL + ETag. Requests for a cached URL are sent with If-None-Match and a 304 is served from disk.
+    """
+
+    def __init__(self, cache_dir: str | Path) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def _meta_path(self, url: str) -> Path:
+        return self.cache_dir / f"{self._key(url)}.json"
+
+    def _body_path(self, url: str, etag: str) -> Path:
+        return self.cache_dir / f"{self._key(url, etag)}.body"
+
+    def get(self, url: str) -> CachedResponse | None:
+        meta_path = self._meta_path(url)
+
+        if not meta_path.is_file():
+            return None
+
+        try:
+            meta = json.loads(meta_path.read_text())
+            body_path = self._body_path(url, meta["etag"])
+            content = body_path.read_bytes()
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"HTTP cache miss on bad entry for {url}: {e}")
+            return None
+
+        return CachedResponse(
+            status_code=meta["status_code"],
+            headers=[tuple(i) for i in meta["headers"]],  # type: ignore
+            content=content,
+            etag=meta["etag"],
+        )
+
+    def set(self, url: str, cached: CachedResponse) -> None:
+        previous = self.get(url)
+
+        try:
+            self._body_path(url, cached.etag).write_bytes(cached.content)
+            self._meta_path(url).write_text(
+                json.dumps({"status_code": cached.status_code, "headers": cached.headers, "etag": cached.etag})
+            )
+        except OSError as e:
+            logger.error(f"Could not write HTTP cache entry for {url}: {e}")
+            return None
+
+        if previous and previous.etag != cached.etag:
+            self._body_path(url, previous.etag).unlink(missing_ok=True)
+
+
+class _HostLimitedStream(httpx.AsyncByteStream):
+    """Response stream that releases the per-host slot once the body is closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, semaphore: asyncio.Semaphore) -> None:
+        self._stream = stream
+        self._semaphore = semaphore
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._semaphore.release()
+
+
 class OpenNEMHTTPTransport(AsyncHTTPTransport):
-    def __init__(self, *args, **kwargs):
+    """Pooled transport with per-host limits, budgeted retries and an optional ETag cache"""
+
+    def __init__(
+        self,
+        *args,
+        max_connections_per_host: int | None = None,
+        budget: RetryBudget | None = None,
+        max_retries: int | None = None,
+        cache: HTTPResponseCache | None = None,
+        **kwargs,
+    ) -> None:
         super().__init__(*args, **kwargs)
+        self._max_connections_per_host = max_connections_per_host
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._budget = budget
+        self._max_retries = max_retries if max_retries is not None else settings.http_retries
+        self._cache = cache
+
+    def _get_host_semaphore(self, host: str) -> asyncio.Semaphore | None:
+        if not self._max_connections_per_host:
+            return None
+
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self._max_connections_per_host)
+
+        return self._host_semaphores[host]
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._get_host_semaphore(request.url.host)
+
+        if not semaphore:
+            return await super().handle_async_request(request)
+
+        await semaphore.acquire()
+
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        response.stream = _HostLimitedStream(response.stream, semaphore)  # type: ignore
+
+        return response
+
+    def _can_retry(self, request: httpx.Request, attempt: int) -> bool:
+        if request.method not in RETRY_METHODS or attempt >= self._max_retries:
+            return False
+
+        if self._budget and not self._budget.withdraw():
+            logger.warning(f"Retry budget exhausted, not retrying {request.method} {request.url}")
+            return False
+
+        return True
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        cache_url = str(request.url)
+        cached: CachedResponse | None = None
+
+        if self._cache and request.method == "GET":
+            cached = self._cache.get(cache_url)
+
+            if cached:
+                request.headers["If-None-Match"] = cached.etag
+
+        if self._budget:
+            self._budget.deposit()
+
+        attempt = 0
+
+        while True:
+            try:
+                response = await self._send(request)
+            except RETRY_EXCEPTIONS as e:
+                if not self._can_retry(request, attempt):
+                    raise
+
+                delay = get_retry_backoff(attempt)
+                logger.info(f"Retrying {request.method} {request.url} in {delay:.2f}s after {type(e).__name__}")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or not self._can_retry(request, attempt):
+                    break
+
+                delay = _get_retry_after(response) or get_retry_backoff(attempt)
+                delay = min(delay, RETRY_BACKOFF_MAX)
+
+                await response.aclose()
+
+                logger.info(f"Retrying {request.method} {request.url} in {delay:.2f}s after status {response.status_code}")
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+        if not self._cache or request.method != "GET":
+            return response
+
+        if cached and response.status_code == 304:
+            await response.aclose()
+            logger.debug(f"HTTP cache hit for {cache_url}")
+            return httpx.Response(status_code=cached.status_code, headers=cached.headers, content=cached.content)
+
+        etag = response.headers.get("etag")
+
+        if response.status_code != 200 or not etag:
+            return response
+
+        # read the raw (still encoded) body so the client decodes it as normal
+        content = b"".join([chunk async for chunk in response.stream])
+        await response.aclose()
+
+        cached = CachedResponse(
+            status_code=response.status_code, headers=response.headers.multi_items(), content=content, etag=etag
+        )
+        self._cache.set(cache_url, cached)
+
+        return httpx.Response(
+            status_code=response.status_code, headers=response.headers, content=content, extensions=response.extensions
+        )
+
+
+def _get_response_cache() -> HTTPResponseCache | None:
+    if not settings.http_cache_dir:
+        return None
+
+    return HTTPResponseCache(settings.http_cache_dir)
+
+
+def get_transport(proxy: str | None = None) -> OpenNEMHTTPTransport:
+    """Transport with the default pool settings"""
+    return OpenNEMHTTPTransport(
+        http2=settings.http_http2 and HAVE_HTTP2,
+        verify=settings.http_verify_ssl,
+        proxy=proxy,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections, max_keepalive_connections=settings.http_max_connections
+        ),
+        max_connections_per_host=settings.http_max_connections_per_host,
+        budget=retry_budget,
+        cache=_get_response_cache(),
+    )
 
 
 def httpx_factory(mimic_browser: bool = False, debug: bool = True, proxy: bool = False, *args, **kwargs) -> AsyncClient:
@@ -75,17 +405,14 @@ def httpx_factory(mimic_browser: bool = False, debug: bool = True, proxy: bool =
     if not kwargs.get("timeout"):
         kwargs["timeout"] = settings.http_timeout
 
-    # set default verify
-    if not kwargs.get("verify"):
-        kwargs["verify"] = settings.http_verify_ssl
+    # crawlers were moved from requests, which follows redirects by default
+    kwargs.setdefault("follow_redirects", True)
+
+    transport = get_transport()
 
     if not kwargs.get("proxy") and proxy and settings.http_proxy_url:
         logger.debug(f"Setting proxy: {settings.http_proxy_url}")
-        proxy_mounts = {
-            "http://": httpx.AsyncHTTPTransport(proxy=settings.http_proxy_url),
-            "https://": httpx.AsyncHTTPTransport(proxy=settings.http_proxy_url),
-        }
-        kwargs["mounts"] = proxy_mounts
+        transport = get_transport(proxy=settings.http_proxy_url)
 
     # set event hooks
     event_hooks = kwargs.get("event_hooks", None)
@@ -97,21 +424,60 @@ def httpx_factory(mimic_browser: bool = False, debug: bool = True, proxy: bool =
         else:
             event_hooks["request"] = [debug_log_request]
 
+        kwargs["event_hooks"] = event_hooks
+
     return httpx.AsyncClient(
         *args,
         **kwargs,
-        transport=OpenNEMHTTPTransport(retries=settings.http_retries),
+        transport=transport,
         default_encoding=autodetect_encoding,  # type: ignore
     )
 
 
-http = httpx_factory(debug=settings.is_dev, timeout=settings.http_timeout)
+# shared clients, one per event loop since connections can't cross loops
+_loop_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient] = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> AsyncClient:
+    """Get the shared pooled client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get(loop)
+
+    if not client or client.is_closed:
+        client = httpx_factory(debug=settings.is_dev, timeout=settings.http_timeout)
+        _loop_clients[loop] = client
+
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the shared client for the running event loop"""
+    client = _loop_clients.pop(asyncio.get_running_loop(), None)
+
+    if client:
+        await client.aclose()
+
+
+class _SharedHTTPClient:
+    """Proxies attribute access to the shared client for the running loop so `http.get` etc. work anywhere"""
+
+    def __getattr__(self, name: str):
+        return getattr(get_http_client(), name)
+
+
+http: AsyncClient = _SharedHTTPClient()  # type: ignore
+
+
+async def get_http(*args, **kwargs) -> AsyncIterator[AsyncClient]:
+    """Used in api. Yields the shared client for the running loop, which is left open as other callers
+    on the loop are using it. A client built with options is dedicated to the caller and closed after"""
+    if not args and not kwargs:
+        yield get_http_client()
+        return
 
+    client = httpx_factory(*args, **kwargs)
 
-async def get_http(*args, **kwargs) -> AsyncClient:
-    """Used in api"""
-    http = httpx_factory(*args, **kwargs)
     try:
-        yield http
+        yield client
     finally:
-        http.aclose()
+        await client.aclose()
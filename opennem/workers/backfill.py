@@ -0,0 +1,426 @@
+"""
+OpenNEM historical backfill orchestrator
+
+Backfills a job type (crawl archive, energy, flows, aggregates, milestones or exports) over a date
+range. The range is split into chunks that run across a process pool. Each chunk is checkpointed
+in backfill_chunk as it completes so an interrupted job is resumed from where it stopped.
+
+Chunk ranges are naive network time with the end exclusive.
+
+    job_id = await create_backfill_job(BackfillJobType.energy, date_start, date_end, network=NetworkNEM)
+    await run_backfill_job(job_id)
+
+    # after an interruption
+    await run_backfill_job(job_id)
+"""
+
+import asyncio
+import enum
+import logging
+import multiprocessing
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import tqdm
+from sqlalchemy import func, select, update
+
+from opennem import settings
+from opennem.aggregates.facility_daily import run_aggregates_facility_daily_range
+from opennem.aggregates.network_flows_v3 import run_aggregate_flow_for_interval_v3
+from opennem.aggregates.network_fueltech_intervals import run_network_fueltech_intervals
+from opennem.aggregates.utils import get_aggregate_date_chunks
+from opennem.api.export.map import PriorityType, StatType, get_export_map
+from opennem.api.export.tasks import export_energy
+from opennem.core.networks import network_from_network_code
+from opennem.crawl import load_crawlers, run_crawl
+from opennem.db import SessionLocalAsync
+from opennem.db.models.opennem import BackfillChunk, BackfillJob
+from opennem.recordreactor.engine import run_milestone_engine
+from opennem.schema.date_range import CrawlDateRange
+from opennem.schema.network import NetworkSchema
+from opennem.workers.energy import run_energy_repair
+
+logger = logging.getLogger("opennem.workers.backfill")
+
+
+class BackfillException(Exception):
+    pass
+
+
+class BackfillJobType(enum.Enum):
+    crawl = "crawl"
+    energy = "energy"
+    flows = "flows"
+    aggregates = "aggregates"
+    milestones = "milestones"
+    exports = "exports"
+
+
+class BackfillChunkStatus(enum.Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+# chunk size for each job type. exports are always chunked by calendar year
+BACKFILL_CHUNK_SIZES: dict[BackfillJobType, timedelta] = {
+    BackfillJobType.crawl: timedelta(days=1),
+    BackfillJobType.energy: timedelta(days=7),
+    BackfillJobType.flows: timedelta(days=1),
+    BackfillJobType.aggregates: timedelta(days=7),
+    BackfillJobType.milestones: timedelta(days=7),
+}
+
+# job types that run for a single network
+_NETWORK_JOB_TYPES = {
+    BackfillJobType.energy,
+    BackfillJobType.flows,
+    BackfillJobType.aggregates,
+    BackfillJobType.milestones,
+    BackfillJobType.exports,
+}
+
+
+# Job handlers. These run in the pool processes for a single chunk
+
+
+async def _backfill_crawl(network: NetworkSchema | None, date_start: datetime, date_end: datetime, target: str | None) -> None:
+    if not target:
+        raise BackfillException("Crawl backfill requires a crawler name as target")
+
+    crawler = (await load_crawlers()).get_crawler(target)
+    network = network or crawler.network
+
+    if network:
+        date_start = date_start.replace(tzinfo=network.get_fixed_offset())
+        date_end = date_end.replace(tzinfo=network.get_fixed_offset())
+
+    await run_crawl(crawler, last_crawled=False, latest=False, date_range=CrawlDateRange(start=date_start, end=date_end))
+
+
+async def _backfill_energy(network: NetworkSchema, date_start: datetime, date_end: datetime, target: str | None) -> None:
+    # energy ranges are end inclusive
+    await run_energy_repair(network_id=network.code, date_start=date_start, date_end=date_end - timedelta(seconds=1))
+
+
+async def _backfill_flows(network: NetworkSchema, date_start: datetime, date_end: datetime, target: str | None) -> None:
+    if settings.dry_run:
+        return None
+
+    run_aggregate_flow_for_interval_v3(
+        network=network,
+        interval_start=date_start.replace(tzinfo=network.get_fixed_offset()),
+        interval_end=date_end.replace(tzinfo=network.get_fixed_offset()),
+    )
+
+
+async def _backfill_aggregates(network: NetworkSchema, date_start: datetime, date_end: datetime, target: str | None) -> None:
+    await run_network_fueltech_intervals(network=network, date_start=date_start, date_end=date_end)
+    await run_aggregates_facility_daily_range(network=network, date_start=date_start, date_end=date_end)
+
+
+async def _backfill_milestones(network: NetworkSchema, date_start: datetime, date_end: datetime, target: str | None) -> None:
+    await run_milestone_engine(
+        start_interval=date_start, end_interval=date_end - timedelta(minutes=network.interval_size), networks=[network]
+    )
+
+
+async def _backfill_exports(network: NetworkSchema, date_start: datetime, date_end: datetime, target: str | None) -> None:
+    energy_exports = (
+        get_export_map()
+        .get_by_stat_type(StatType.energy)
+        .get_by_priority(PriorityType.daily)
+        .get_by_network_id(network.code)
+        .get_by_year(date_start.year)
+    )
+
+    await export_energy(energy_exports.resources)
+
+
+BackfillHandler = Callable[[NetworkSchema | None, datetime, datetime, str | None], Awaitable[None]]
+
+BACKFILL_HANDLERS: dict[BackfillJobType, BackfillHandler] = {
+    BackfillJobType.crawl: _backfill_crawl,
+    BackfillJobType.energy: _backfill_energy,
+    BackfillJobType.flows: _backfill_flows,
+    BackfillJobType.aggregates: _backfill_aggregates,
+    BackfillJobType.milestones: _backfill_milestones,
+    BackfillJobType.exports: _backfill_exports,
+}
+
+
+# each pool process keeps one loop so its database connections stay on the loop they were made on
+_PROCESS_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def _run_chunk_in_process(
+    job_type: str, network_code: str | None, target: str | None, date_start: datetime, date_end: datetime
+) -> float:
+    """Runs a chunk in a pool process and returns how long it took"""
+    global _PROCESS_LOOP
+
+    if _PROCESS_LOOP is None:
+        _PROCESS_LOOP = asyncio.new_event_loop()
+
+    network = network_from_network_code(network_code) if network_code else None
+    handler = BACKFILL_HANDLERS[BackfillJobType(job_type)]
+
+    started = time.monotonic()
+    _PROCESS_LOOP.run_until_complete(handler(network, date_start, date_end, target))
+
+    return time.monotonic() - started
+
+
+def get_backfill_chunks(
+    job_type: BackfillJobType, date_start: datetime, date_end: datetime, chunk_size: timedelta | None = None
+) -> list[tuple[datetime, datetime]]:
+    """Split a backfill range into chunks with the end exclusive, most recent first"""
+    if date_end <= date_start:
+        raise BackfillException(f"Backfill date_end ({date_end}) is before or equal to date_start ({date_start})")
+
+    if job_type == BackfillJobType.exports:
+        chunks = []
+
+        for year in range(date_start.year, date_end.year + 1):
+            chunk_start, chunk_end = max(datetime(year, 1, 1), date_start), min(datetime(year + 1, 1, 1), date_end)
+
+            if chunk_start < chunk_end:
+                chunks.append((chunk_start, chunk_end))
+
+        return list(reversed(chunks))
+
+    return get_aggregate_date_chunks(date_start, date_end, chunk_size or BACKFILL_CHUNK_SIZES[job_type], reverse=True)
+
+
+async def create_backfill_job(
+    job_type: BackfillJobType,
+    date_start: datetime,
+    date_end: datetime,
+    network: NetworkSchema | None = None,
+    target: str | None = None,
+    chunk_size: timedelta | None = None,
+) -> str:
+    """Create a backfill job and its pending chunks. Returns the job id"""
+    if job_type in _NETWORK_JOB_TYPES and not network:
+        raise BackfillException(f"Backfill job {job_type.value} requires a network")
+
+    if network:
+        date_start = date_start.astimezone(network.get_fixed_offset()).replace(tzinfo=None) if date_start.tzinfo else date_start
+        date_end = date_end.astimezone(network.get_fixed_offset()).replace(tzinfo=None) if date_end.tzinfo else date_end
+
+    chunks = get_backfill_chunks(job_type, date_start, date_end, chunk_size)
+    job_id = uuid.uuid4().hex[:12]
+
+    async with SessionLocalAsync() as session:
+        session.add(
+            BackfillJob(
+                id=job_id,
+                job_type=job_type.value,
+                network_id=network.code if network else None,
+                target=target,
+                date_start=date_start,
+                date_end=date_end,
+                chunks=[
+                    BackfillChunk(
+                        chunk_start=chunk_start, chunk_end=chunk_end, status=BackfillChunkStatus.pending.value, attempts=0
+                    )
+                    for chunk_start, chunk_end in chunks
+                ],
+            )
+        )
+        await session.commit()
+
+    logger.info(f"Created {job_type.value} backfill job {job_id} with {len(chunks)} chunks from {date_start} to {date_end}")
+
+    return job_id
+
+
+@dataclass
+class BackfillProgress:
+    """Live chunk throughput for a backfill run"""
+
+    job_id: str
+    total: int
+    done: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.monotonic)
+    chunk_seconds: float = 0
+
+    @property
+    def chunks_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed * 60 if elapsed > 0 else 0
+
+    @property
+    def remaining(self) -> timedelta | None:
+        if not self.chunks_per_minute:
+            return None
+
+        return timedelta(minutes=(self.total - self.done - self.failed) / self.chunks_per_minute)
+
+    def __str__(self) -> str:
+        remaining = str(self.remaining).split(".")[0] if self.remaining is not None else "-"
+        mean_chunk = self.chunk_seconds / self.done if self.done else 0
+
+        return (
+            f"backfill {self.job_id}: {self.done}/{self.total} chunks ({self.failed} failed) "
+            f"{self.chunks_per_minute:.1f} chunks/min, {mean_chunk:.1f}s per chunk, {remaining} remaining"
+        )
+
+
+async def _set_chunk(job_id: str, chunk_start: datetime, **values) -> None:
+    async with SessionLocalAsync() as session:
+        await session.execute(
+            update(BackfillChunk).where(BackfillChunk.job_id == job_id, BackfillChunk.chunk_start == chunk_start).values(**values)
+        )
+        await session.commit()
+
+
+async def run_backfill_job(job_id: str, processes: int | None = None, retries: int | None = None) -> BackfillProgress:
+    """
+    Run the chunks of a backfill job that haven't completed across a process pool. Chunks left
+    running by an interrupted run and failed chunks are run again. Each chunk is attempted up to
+    retries times in a run.
+    """
+    processes = processes or settings.backfill_processes
+    retries = retries or settings.backfill_chunk_retries
+
+    async with SessionLocalAsync() as session:
+        job = await session.get(BackfillJob, job_id)
+
+        if not job:
+            raise BackfillException(f"No backfill job {job_id}")
+
+        result = await session.execute(
+            select(BackfillChunk)
+            .where(BackfillChunk.job_id == job_id, BackfillChunk.status != BackfillChunkStatus.done.value)
+            .order_by(BackfillChunk.chunk_start.desc())
+        )
+        chunks = [(c.chunk_start, c.chunk_end, c.attempts) for c in result.scalars().all()]
+        job_type, network_id, target = job.job_type, job.network_id, job.target
+
+    progress = BackfillProgress(job_id=job_id, total=len(chunks))
+
+    logger.info(f"Running {len(chunks)} {job_type} backfill chunks for job {job_id} across {processes} processes")
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(processes)
+
+    # spawned so pool processes don't inherit the parent's database connections
+    with (
+        ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool,
+        tqdm.tqdm(total=len(chunks), unit="chunk", desc=f"{job_type} {network_id or target or ''}".strip()) as progress_bar,
+    ):
+
+        async def _run_chunk(chunk_start: datetime, chunk_end: datetime, attempts: int) -> None:
+            async with semaphore:
+                for attempt in range(1, retries + 1):
+                    await _set_chunk(job_id, chunk_start, status=BackfillChunkStatus.running.value, attempts=attempts + attempt)
+
+                    try:
+                        duration = await loop.run_in_executor(
+                            pool, _run_chunk_in_process, job_type, network_id, target, chunk_start, chunk_end
+                        )
+                    except Exception as e:
+                        logger.warning(f"Backfill {job_id} chunk {chunk_start} => {chunk_end} attempt {attempt} failed: {e}")
+
+                        if attempt < retries:
+                            continue
+
+                        await _set_chunk(job_id, chunk_start, status=BackfillChunkStatus.failed.value, error=str(e))
+                        progress.failed += 1
+                    else:
+                        await _set_chunk(
+                            job_id, chunk_start, status=BackfillChunkStatus.done.value, duration=duration, error=None
+                        )
+                        progress.done += 1
+                        progress.chunk_seconds += duration
+
+                    break
+
+                progress_bar.update(1)
+                progress_bar.set_postfix(failed=progress.failed, per_min=f"{progress.chunks_per_minute:.1f}")
+                logger.info(str(progress))
+
+        await asyncio.gather(*[_run_chunk(*chunk) for chunk in chunks])
+
+    if not progress.failed:
+        async with SessionLocalAsync() as session:
+            await session.execute(
+                update(BackfillJob).where(BackfillJob.id == job_id).values(completed_at=datetime.now().astimezone())
+            )
+            await session.commit()
+
+        logger.info(f"Completed backfill job {job_id}")
+    else:
+        logger.error(f"Backfill job {job_id} has {progress.failed} failed chunks. Resume it to retry them")
+
+    return progress
+
+
+async def run_backfill(
+    job_type: BackfillJobType,
+    date_start: datetime,
+    date_end: datetime,
+    network: NetworkSchema | None = None,
+    target: str | None = None,
+    chunk_size: timedelta | None = None,
+    processes: int | None = None,
+) -> BackfillProgress:
+    """Create a backfill job and run it"""
+    job_id = await create_backfill_job(job_type, date_start, date_end, network=network, target=target, chunk_size=chunk_size)
+
+    return await run_backfill_job(job_id, processes=processes)
+
+
+@dataclass
+class BackfillJobStatus:
+    job_id: str
+    job_type: str
+    network_id: str | None
+    target: str | None
+    date_start: datetime
+    date_end: datetime
+    completed_at: datetime | None
+    chunks: dict[str, int]
+
+
+async def get_backfill_jobs(incomplete: bool = False) -> list[BackfillJobStatus]:
+    """Backfill jobs with a count of their chunks by status"""
+    async with SessionLocalAsync() as session:
+        query = select(BackfillJob).order_by(BackfillJob.created_at.desc())
+
+        if incomplete:
+            query = query.where(BackfillJob.completed_at.is_(None))
+
+        jobs = (await session.execute(query)).scalars().all()
+
+        result = await session.execute(
+            select(BackfillChunk.job_id, BackfillChunk.status, func.count())
+            .where(BackfillChunk.job_id.in_([j.id for j in jobs]))
+            .group_by(BackfillChunk.job_id, BackfillChunk.status)
+        )
+
+        chunks: dict[str, dict[str, int]] = {}
+
+        for job_id, status, count in result.fetchall():
+            chunks.setdefault(job_id, {})[status] = count
+
+    return [
+        BackfillJobStatus(
+            job_id=job.id,
+            job_type=job.job_type,
+            network_id=job.network_id,
+            target=job.target,
+            date_start=job.date_start,
+            date_end=job.date_end,
+            completed_at=job.completed_at,
+            chunks=chunks.get(job.id, {}),
+        )
+        for job in jobs
+    ]
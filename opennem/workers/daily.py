@@ -7,19 +7,20 @@ import logging
 from datetime import datetime, timedelta
 
 from opennem import settings
-from opennem.aggregates.facility_daily import run_aggregate_facility_all_by_year, run_aggregates_facility_year
-from opennem.aggregates.network_demand import run_aggregates_demand_network
+from opennem.aggregates.facility_daily import run_aggregates_facility_changed_days
+from opennem.aggregates.network_demand import run_aggregates_demand_changed_days
 from opennem.aggregates.network_flows import (
     run_emission_update_day,
-    run_flow_updates_all_for_network,
     run_flow_updates_all_per_year,
 )
 from opennem.aggregates.network_flows_v3 import run_aggregate_flow_for_interval_v3
 from opennem.api.export.map import PriorityType, StatType, get_export_map
 from opennem.api.export.tasks import export_all_daily, export_all_monthly, export_energy, export_power
+from opennem.db.clickhouse_mirror import MIRROR_FACILITY_DAILY, mirror_table_range
 from opennem.exporter.historic import export_historic_intervals
 from opennem.schema.network import NetworkAEMORooftop, NetworkAPVI, NetworkNEM, NetworkOpenNEMRooftopBackfill, NetworkWEM
 from opennem.utils.dates import get_last_completed_interval_for_network
+from opennem.workers.backfill import BackfillJobType, run_backfill
 
 logger = logging.getLogger("opennem.worker.daily")
 
@@ -37,6 +38,22 @@ async def run_export_for_year(year: int, network_region_code: str | None = None)
     await export_energy(energy_exports.resources)
 
 
+async def run_changed_day_aggregates() -> None:
+    """Recalculate the facility daily and demand aggregates for days with data inserted since they were last run.
+    The facility days recalculated are mirrored into clickhouse"""
+    for network in [NetworkNEM, NetworkWEM, NetworkAEMORooftop, NetworkAPVI]:
+        days = await run_aggregates_facility_changed_days(network=network)
+
+        if not settings.clickhouse_mirror_enabled:
+            continue
+
+        for day in days:
+            await mirror_table_range(MIRROR_FACILITY_DAILY, date_start=day, date_end=day + timedelta(days=1), network=network)
+
+    for network in [NetworkNEM, NetworkWEM]:
+        await run_aggregates_demand_changed_days(network=network)
+
+
 # The actual daily runners
 
 
@@ -62,13 +79,9 @@ async def daily_catchup_runner(days: int = 2) -> None:
     else:
         run_flow_updates_all_per_year(current_year, 1)
 
-    # 2. facilities
-    for network in [NetworkNEM, NetworkWEM, NetworkAEMORooftop, NetworkAPVI]:
-        run_aggregates_facility_year(year=current_year, network=network)
-        run_aggregates_facility_year(year=current_year - 1, network=network)
+    # 2. facilities and 3. network demand for the days that have changed
+    await run_changed_day_aggregates()
 
-    # 3. network demand
-    run_aggregates_demand_network()
     #  flows and flow emissions
     if not settings.flows_and_emissions_v3:
         run_emission_update_day(days=days)
@@ -115,12 +128,8 @@ async def daily_runner(days: int = 2) -> None:
     else:
         run_flow_updates_all_per_year(current_year, 1)
 
-    # 2. facilities
-    for network in [NetworkNEM, NetworkWEM, NetworkAEMORooftop, NetworkAPVI]:
-        run_aggregates_facility_year(year=current_year, network=network)
-
-    # 3. network demand
-    run_aggregates_demand_network()
+    # 2. facilities and 3. network demand for the days that have changed
+    await run_changed_day_aggregates()
 
     #  flows and flow emissions
     if not settings.flows_and_emissions_v3:
@@ -149,11 +158,21 @@ async def daily_runner(days: int = 2) -> None:
 async def all_runner() -> None:
     """Like the daily runner but refreshes all tasks"""
 
-    # populates the aggregate tables
-    run_flow_updates_all_for_network(network=NetworkNEM)
+    # populates the aggregate tables as checkpointed backfills
+    await run_backfill(
+        BackfillJobType.flows,
+        date_start=NetworkNEM.interconnector_first_seen,
+        date_end=get_last_completed_interval_for_network(network=NetworkNEM),
+        network=NetworkNEM,
+    )
 
     for network in [NetworkNEM, NetworkAEMORooftop, NetworkAPVI, NetworkWEM, NetworkOpenNEMRooftopBackfill]:
-        run_aggregate_facility_all_by_year(network=network)
+        await run_backfill(
+            BackfillJobType.aggregates,
+            date_start=network.data_first_seen,
+            date_end=get_last_completed_interval_for_network(network=network),
+            network=network,
+        )
 
     # run the exports for all
     await export_power(latest=False)
@@ -1,24 +1,31 @@
 import asyncio
+import functools
 import logging
 import multiprocessing
+from collections.abc import Sequence
 from datetime import datetime, timedelta
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
 
 from opennem import settings
+from opennem.aggregates.changed_days import ChangedDayAggregate
+from opennem.core.scada_energy import ENERGY_QUALITY_CALCULATED, ENERGY_QUALITY_PENDING
 from opennem.db import SessionLocalAsync
 from opennem.utils.dates import get_today_opennem
 
 logger = logging.getLogger("opennem.workers.energy")
 
 
-async def _calculate_energy_for_interval(session: AsyncSession, start_time: datetime, end_time: datetime) -> int:
-    """
-    Calculate energy for a an interval range and update the energy column in the facility_scada table.
-    """
+@functools.cache
+def _energy_calculation_template(has_network: bool, has_facilities: bool) -> TextClause:
+    network_query = "AND network_id = :network_id" if has_network else ""
+    facility_query = "AND facility_code = ANY(:facility_codes)" if has_facilities else ""
 
-    query = text("""
+    # rows from the hour before the range are read so the first interval has its previous value.
+    # the days of updated rows are marked for the facility daily aggregate as energy has changed
+    return text(f"""
     WITH
     network_data AS (
         SELECT
@@ -31,34 +38,67 @@ async def _calculate_energy_for_interval(session: AsyncSession, start_time: date
         SELECT
             network_id,
             facility_code,
+            is_forecast,
             interval,
             generated,
             LAG(generated, 1) OVER (
-                PARTITION BY network_id, facility_code
+                PARTITION BY network_id, facility_code, is_forecast
                 ORDER BY interval
-            ) AS prev_generated,
-            ROW_NUMBER() OVER (
-                PARTITION BY network_id, facility_code, (interval::date)
-                ORDER BY interval
-            ) AS rn
+            ) AS prev_generated
         FROM facility_scada
-        WHERE interval BETWEEN :start_time AND :end_time
+        WHERE interval BETWEEN CAST(:start_time AS timestamp) - INTERVAL '1 hour' AND :end_time
+            {network_query}
+            {facility_query}
+    ),
+    updated AS (
+        UPDATE facility_scada fs
+        SET
+            energy = (rs.generated + COALESCE(rs.prev_generated, 0)) / 2 / nd.intervals_per_hour,
+            energy_quality_flag = {ENERGY_QUALITY_CALCULATED}
+        FROM ranked_scada rs
+        JOIN network_data nd ON nd.code = rs.network_id
+        WHERE fs.network_id = rs.network_id
+          AND fs.facility_code = rs.facility_code
+          AND fs.is_forecast = rs.is_forecast
+          AND fs.interval = rs.interval
+          AND fs.interval BETWEEN :start_time AND :end_time
+        RETURNING fs.network_id, fs.interval
+    ),
+    marked AS (
+        INSERT INTO aggregate_changed_day (aggregate, network_id, day)
+        SELECT DISTINCT '{ChangedDayAggregate.facility_daily.value}', network_id, interval::date
+        FROM updated
+        ON CONFLICT (aggregate, network_id, day) DO UPDATE SET
+            marked_at = now()
     )
-    UPDATE facility_scada fs
-    SET
-        energy = (rs.generated + COALESCE(rs.prev_generated, 0)) / 2 / nd.intervals_per_hour,
-        energy_quality_flag = 1
-    FROM ranked_scada rs
-    JOIN network_data nd ON nd.code = rs.network_id
-    WHERE fs.network_id = rs.network_id
-      AND fs.facility_code = rs.facility_code
-      AND fs.interval = rs.interval
-      AND fs.interval BETWEEN :start_time AND :end_time
+    SELECT count(*) FROM updated
     """)
 
-    result = await session.execute(query, {"start_time": start_time, "end_time": end_time})
+
+async def _calculate_energy_for_interval(
+    session: AsyncSession,
+    start_time: datetime,
+    end_time: datetime,
+    network_id: str | None = None,
+    facility_codes: list[str] | None = None,
+) -> int:
+    """
+    Calculate energy for a an interval range and update the energy column in the facility_scada table.
+    Optionally limited to a network and a set of facilities.
+    """
+    query = _energy_calculation_template(has_network=bool(network_id), has_facilities=bool(facility_codes))
+    params: dict = {"start_time": start_time, "end_time": end_time}
+
+    if network_id:
+        params["network_id"] = network_id
+
+    if facility_codes:
+        params["facility_codes"] = facility_codes
+
+    result = await session.execute(query, params)
+    updated = result.scalar() or 0
     await session.commit()
-    return result.rowcount
+    return updated
 
 
 async def run_energy_calculation_for_interval(interval: datetime) -> int:
@@ -77,6 +117,72 @@ async def run_energy_calculation_for_interval(interval: datetime) -> int:
         return await _calculate_energy_for_interval(session, start_time, end_time)
 
 
+async def run_energy_repair(
+    network_id: str, date_start: datetime, date_end: datetime, facility_codes: list[str] | None = None
+) -> int:
+    """
+    Recalculate energy for facilities over a range, for rows stored before data for an earlier
+    interval arrived late or out of order.
+    """
+    if settings.dry_run:
+        logger.debug(f"Dry run: Skipping energy repair for {network_id} {date_start} to {date_end}")
+        return 0
+
+    async with SessionLocalAsync() as session:
+        updated = await _calculate_energy_for_interval(
+            session, date_start, date_end, network_id=network_id, facility_codes=facility_codes
+        )
+
+    logger.info(f"Repaired energy for {updated} {network_id} rows from {date_start} to {date_end}")
+
+    return updated
+
+
+_PENDING_ENERGY_QUERY = text(
+    f"""
+    SELECT network_id, facility_code, MIN(interval), MAX(interval)
+    FROM facility_scada
+    WHERE interval >= :since AND energy_quality_flag = {ENERGY_QUALITY_PENDING}
+    GROUP BY network_id, facility_code
+    """
+)
+
+
+def _group_pending_energy(
+    pending: Sequence[tuple[str, str, datetime, datetime]],
+) -> dict[tuple[str, datetime, datetime], list[str]]:
+    """Group facilities with rows pending energy by network and pending range. Facilities written in
+    the same batch share a range so they are repaired together"""
+    groups: dict[tuple[str, datetime, datetime], list[str]] = {}
+
+    for network_id, facility_code, date_start, date_end in pending:
+        groups.setdefault((network_id, date_start, date_end), []).append(facility_code)
+
+    return groups
+
+
+async def run_energy_repair_pending(lookback: timedelta = timedelta(days=1)) -> int:
+    """
+    Calculate energy for recent rows written without it, such as by insert paths that don't go
+    through the bulk insert. Only the facilities with pending rows are recalculated, over the
+    intervals they are pending for.
+    """
+    since = get_today_opennem().replace(tzinfo=None) - lookback
+
+    async with SessionLocalAsync() as session:
+        result = await session.execute(_PENDING_ENERGY_QUERY, {"since": since})
+        pending = result.fetchall()
+
+    updated = 0
+
+    for (network_id, date_start, date_end), facility_codes in _group_pending_energy(pending).items():
+        updated += await run_energy_repair(
+            network_id=network_id, date_start=date_start, date_end=date_end, facility_codes=facility_codes
+        )
+
+    return updated
+
+
 async def process_energy_from_now(interval: timedelta = timedelta(hours=2)) -> None:
     """
     Process energy calculations from now.
@@ -1,5 +1,5 @@
 """
-For each facility calculate the first and last data seen dates from facility_scada
+For each facility set the first and last data seen dates from the facility_scada watermarks
 
 The min dates are run less regularly since data is less likely to grow in that direction
 for most recent this is the last active date
@@ -7,60 +7,51 @@ for most recent this is the last active date
 @TODO move the utility functions into core/facility use this as only the worker
 """
 
+import functools
 import logging
-from datetime import datetime, timedelta
-from textwrap import dedent
+from datetime import datetime
 
 from sqlalchemy import TextClause, text
 
-from opennem.db import db_connect, get_database_engine
-from opennem.queries.utils import duid_to_case
+from opennem.core.watermarks import get_scada_watermarks
+from opennem.db import db_connect
 from opennem.schema.core import BaseConfig
-from opennem.utils.dates import get_today_nem
 
 logger = logging.getLogger("opennem.workers.facility_data_ranges")
 
 
-def get_update_seen_query(
-    include_first_seen: bool = False,
-    facility_codes: list[str] | None = None,
-    interval_window_days: int | None = 7,
-) -> TextClause:
-    date_min: datetime | None = None
+@functools.cache
+def _update_seen_template(include_first_seen: bool, has_facilities: bool) -> TextClause:
+    first_seen_query = "data_first_seen = w.first_nonzero," if include_first_seen else ""
+    first_seen_changed = "or f.data_first_seen is distinct from w.first_nonzero" if include_first_seen else ""
+    facility_codes_query = "and f.code = any(:facility_codes)" if has_facilities else ""
 
-    if interval_window_days:
-        date_min = get_today_nem() - timedelta(days=interval_window_days)
-
-    __query = """
+    return text(
+        f"""
     update facility f set
-        {fs}data_first_seen = seen_query.data_first_seen,
-        data_last_seen = seen_query.data_last_seen
-    from (
-        select
-            fs.facility_code as code,
-            {fs}min(fs.trading_interval) as data_first_seen,
-            max(fs.trading_interval) as data_last_seen
-        from facility_scada fs
-        where
-            fs.generated > 0
-            {facility_codes_query}
-            {trading_interval_window}
-        group by 1
-    ) as seen_query
-    where f.code = seen_query.code;
+        {first_seen_query}
+        data_last_seen = w.last_nonzero
+    from facility_scada_watermark w
+    where
+        f.code = w.facility_code
+        and w.last_nonzero is not null
+        and (f.data_last_seen is distinct from w.last_nonzero {first_seen_changed})
+        {facility_codes_query}
     """
+    )
 
-    fs = "" if include_first_seen else "--"
-    facility_codes_query = f"and f.code in ({duid_to_case(facility_codes)})" if facility_codes else ""
-
-    trading_interval_window = ""
 
-    if not include_first_seen:
-        trading_interval_window = f"and fs.trading_interval > '{date_min}'"
+def get_update_seen_query(
+    include_first_seen: bool = False,
+    facility_codes: list[str] | None = None,
+) -> TextClause:
+    """Update facility seen dates from the facility scada watermarks"""
+    query = _update_seen_template(include_first_seen=include_first_seen, has_facilities=bool(facility_codes))
 
-    query = __query.format(fs=fs, facility_codes_query=facility_codes_query, trading_interval_window=trading_interval_window)
+    if facility_codes:
+        query = query.bindparams(facility_codes=facility_codes)
 
-    return text(dedent(query))
+    return query
 
 
 # @profile_task(send_slack=True)
@@ -95,7 +86,7 @@ class FacilitySeenRange(BaseConfig):
     date_max: datetime | None = None
 
 
-def get_facility_seen_range(facility_codes: list[str]) -> FacilitySeenRange:
+async def get_facility_seen_range(facility_codes: list[str]) -> FacilitySeenRange:
     """Gets the date range that a facility or list of facilities was seen in SCADA data.
 
 
@@ -105,35 +96,14 @@ def get_facility_seen_range(facility_codes: list[str]) -> FacilitySeenRange:
     Returns:
         FacilitySeenRange: Schema defining the date range
     """
+    watermarks = [w for w in (await get_scada_watermarks()).select(facility_codes=facility_codes) if w.last_nonzero]
 
-    __query = """
-        select
-            min(data_first_seen) as first_seen,
-            max(data_last_seen) as last_seen
-        from facility
-        where code in ({facilities});
-    """
-
-    engine = get_database_engine()
-    result = []
-
-    query = __query.format(facilities=duid_to_case(facility_codes))
-
-    with engine.begin() as c:
-        logger.debug(query)
-        result = list(c.execute(query))
-
-    if not result:
+    if not watermarks:
         raise Exception("Could not get facility seen range: No results")
 
-    _record = result.pop()
-
-    if len(_record) != 2:
-        raise Exception("Coult not get facility seen range: Invalid result or unknown")
-
     schema = FacilitySeenRange(
-        date_min=_record[0],
-        date_max=_record[1],
+        date_min=min(w.first_nonzero for w in watermarks if w.first_nonzero),
+        date_max=max(w.last_nonzero for w in watermarks if w.last_nonzero),
     )
 
     return schema
@@ -1,22 +1,29 @@
 """OpenNEM Gapfill"""
 
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from textwrap import dedent
 
 from datetime_truncate import truncate as date_trunc
 
 from opennem import settings
-from opennem.core.networks import network_from_network_code
-from opennem.db import get_database_engine
+from opennem.core.completeness import (
+    CompletenessMetric,
+    CompletenessSource,
+    find_intervals,
+    group_contiguous,
+    rebuild_completeness,
+)
 from opennem.schema.core import BaseConfig
 from opennem.schema.network import NetworkAEMORooftop, NetworkAPVI, NetworkNEM, NetworkSchema, NetworkWEM
 from opennem.utils.dates import get_last_complete_day_for_network, get_today_nem
-from opennem.utils.timezone import is_aware
-from opennem.workers.energy import run_energy_calc
+from opennem.workers.energy import run_energy_repair
 
 logger = logging.getLogger("opennem.workers.gap_fill")
 
+# longest run of intervals repaired in one energy calculation
+ENERGY_GAP_MAX_SPAN = timedelta(days=1)
+
 
 class GapFillEnergyException(Exception):
     pass
@@ -31,101 +38,74 @@ class EnergyGap(BaseConfig):
     total_energy: float | None = None
 
 
-def query_energy_gaps(date_min: datetime, date_max: datetime, network: NetworkSchema = NetworkNEM) -> list[EnergyGap]:
-    """Query gaps in energy and power. Minimum date is inclusive, maximum date is exclusive"""
-
-    engine = get_database_engine()
-
-    __query = """
-
-        select
-            t.interval at time zone '{tz}' as interval,
-            t.network_id,
-            t.has_power,
-            t.has_energy,
-            t.total_generated,
-            t.total_energy
-        from (
-            select
-                time_bucket_gapfill('1 hour', fs.trading_interval ) as interval,
-                fs.network_id,
-                case when sum(fs.generated) is NULL then FALSE else TRUE end as has_power,
-                case when sum(fs.eoi_quantity) IS NULL then FALSE else TRUE end as has_energy,
-                sum(fs.generated) as total_generated,
-                sum(fs.eoi_quantity) as total_energy
-            from facility_scada fs
-            join facility f on fs.facility_code = f.code
-            where
-                fs.trading_interval >= '{date_min}'
-                and fs.trading_interval < '{date_max}'
-                and fs.network_id='{network_id}'
-            group by 1, fs.network_id
-        ) as t
-        where
-            t.has_power is TRUE
-            order by t.interval desc;
-
+async def query_energy_gaps(
+    date_min: datetime, date_max: datetime, network: NetworkSchema = NetworkNEM, fill_all: bool = False
+) -> list[EnergyGap]:
     """
+    Intervals with power and no energy read from the completeness index, or every interval with
+    power if fill all. Minimum date is inclusive, maximum date is exclusive
+    """
+    source = CompletenessSource.facility_scada
 
-    results = []
-
-    # Set the timezone on dates if they haven't been already
-    for dt in {date_min, date_max}:
-        if not is_aware(dt):
-            dt = dt.replace(tzinfo=network.get_fixed_offset())
-
-    # Truncate dates down to each hour
-    # @NOTE we can make this a parm and adjust both the bucket size and the trunc
-    for dt in {date_min, date_max}:
-        dt = date_trunc(dt, "hour")
-
-    query = __query.format(tz=network.timezone_database, date_min=date_min, date_max=date_max, network_id=network.code)
+    without_energy = await find_intervals(
+        network, source, CompletenessMetric.energy, date_min, date_max, present=False, required=CompletenessMetric.power
+    )
 
-    logger.debug(dedent(query))
+    if not fill_all:
+        return [EnergyGap(interval=i, network_id=network.code, has_power=True, has_energy=False) for i in without_energy]
 
-    with engine.begin() as c:
-        results = c.execute(query)
+    with_power = await find_intervals(network, source, CompletenessMetric.power, date_min, date_max)
+    missing_energy = set(without_energy)
 
-    return [EnergyGap(**i) for i in results]
+    return [
+        EnergyGap(interval=i, network_id=network.code, has_power=True, has_energy=i not in missing_energy) for i in with_power
+    ]
 
 
-def run_energy_gapfill(
-    date_min: datetime, date_max: datetime, network: NetworkSchema, fill_all: bool = False, fill_gaps: bool = True
+async def run_energy_gapfill(
+    date_min: datetime,
+    date_max: datetime,
+    network: NetworkSchema,
+    fill_all: bool = False,
+    fill_gaps: bool = True,
+    concurrency: int | None = None,
 ) -> list[EnergyGap]:
-    """ """
-    energy_gaps = query_energy_gaps(date_min=date_min, date_max=date_max, network=network)
+    """
+    Find energy gaps and recalculate energy for them. Gaps are grouped into contiguous ranges that
+    are repaired in parallel up to concurrency at a time
+    """
+    energy_gaps = await query_energy_gaps(date_min=date_min, date_max=date_max, network=network, fill_all=fill_all)
 
-    energy_gaps_filtered = list(filter(lambda x: x.has_power is True and x.has_energy is False, energy_gaps))
+    logger.info(f"Found {len(energy_gaps)} {network.code} energy gap intervals")
 
-    if fill_all:
-        energy_gaps_filtered = energy_gaps
+    if not fill_gaps or not energy_gaps:
+        return energy_gaps
+
+    gap_ranges = group_contiguous([i.interval for i in energy_gaps], network.interval_size, max_span=ENERGY_GAP_MAX_SPAN)
 
-    logger.info(f"Found {len(energy_gaps_filtered)} energy gaps interval hours")
+    logger.info(f"Repairing {len(gap_ranges)} {network.code} energy gap ranges")
 
-    if not fill_gaps:
+    if settings.dry_run:
         return energy_gaps
 
-    for gap in energy_gaps_filtered:
-        logger.info(
-            f"{gap.network_id} Running for interval {gap.interval} with power: {gap.has_power} \
-                energy: {gap.has_energy} energy_value: {gap.total_energy}"
-        )
+    semaphore = asyncio.Semaphore(concurrency or settings.gapfill_concurrency)
 
-        if settings.dry_run:
-            continue
+    async def _repair_range(dmin: datetime, dmax: datetime) -> None:
+        async with semaphore:
+            try:
+                await run_energy_repair(network_id=network.code, date_start=dmin, date_end=dmax)
 
-        dmin = gap.interval
-        dmax = dmin + timedelta(hours=1)
+                # set the repaired energy in the index
+                await rebuild_completeness(network, CompletenessSource.facility_scada, dmin.date(), dmax.date())
+            except Exception as e:
+                logger.error(f"Error running {network.code} energy gapfill for {dmin} => {dmax}: {e}")
 
-        try:
-            run_energy_calc(dmin, dmax, network=network_from_network_code(gap.network_id))
-        except Exception:
-            logger.error(f"Error running {gap.network_id} energy gapfill for {dmin} => {dmax}")
+    await asyncio.gather(*[_repair_range(dmin, dmax) for dmin, dmax in gap_ranges])
 
-    return energy_gaps_filtered
+    return energy_gaps
 
 
-def run_energy_gapfill_for_network_by_days(
+async def run_energy_gapfill_for_network_by_days(
     network: NetworkSchema = NetworkNEM, days: int = 7, fill_all: bool = False, fill_gaps: bool = True
 ) -> None:
     """Run energy gapfilling. If fill all it will ignore if it has energy. If fill gaps it will only fill gaps"""
@@ -134,10 +114,10 @@ def run_energy_gapfill_for_network_by_days(
     date_max = get_last_complete_day_for_network(network)
     date_min = date_max - timedelta(days=days)
 
-    run_energy_gapfill(date_min, date_max=date_max, network=network, fill_all=fill_all, fill_gaps=fill_gaps)
+    await run_energy_gapfill(date_min, date_max=date_max, network=network, fill_all=fill_all, fill_gaps=fill_gaps)
 
 
-def run_energy_gapfill_for_network(network: NetworkSchema) -> None:
+async def run_energy_gapfill_for_network(network: NetworkSchema) -> None:
     """Run energy gapfille for a network by year"""
 
     if not network or not network.data_first_seen:
@@ -157,10 +137,12 @@ def run_energy_gapfill_for_network(network: NetworkSchema) -> None:
 
         logging.info(f"Running for {date_start} => {date_end}")
 
-        run_energy_gapfill(date_min=date_start, date_max=date_end, network=network, fill_all=False, fill_gaps=True)
+        await run_energy_gapfill(date_min=date_start, date_max=date_end, network=network, fill_all=False, fill_gaps=True)
 
 
-def run_energy_gapfill_previous_days(days: int = 14, networks: list[NetworkSchema] = None, run_all: bool = False) -> None:
+async def run_energy_gapfill_previous_days(
+    days: int = 14, networks: list[NetworkSchema] | None = None, run_all: bool = False
+) -> None:
     """Run gapfill of energy values - will find gaps in energy values and run energy_sum"""
     if networks is None:
         networks = [NetworkNEM, NetworkWEM, NetworkAPVI, NetworkAEMORooftop]
@@ -169,35 +151,20 @@ def run_energy_gapfill_previous_days(days: int = 14, networks: list[NetworkSchem
         logger.info(f"Running energy gapfill for {network.code}")
 
         try:
-            run_energy_gapfill_for_network_by_days(network, days=days, fill_all=run_all)
+            await run_energy_gapfill_for_network_by_days(network, days=days, fill_all=run_all)
         except Exception as e:
             logger.error(f"gap_fill run error: {e}")
 
 
-def run_energy_gapfill_for_last_hour(network: NetworkSchema) -> None:
+async def run_energy_gapfill_for_last_hour(network: NetworkSchema) -> None:
     """Run energy gapfill for the last hour"""
 
     date_max = date_trunc(get_today_nem(), "hour")
     date_min = date_max - timedelta(hours=1)
 
-    run_energy_gapfill(date_min, date_max=date_max, network=network, fill_all=False, fill_gaps=True)
+    await run_energy_gapfill(date_min, date_max=date_max, network=network, fill_all=False, fill_gaps=True)
 
 
 # debug entry point
 if __name__ == "__main__":
-    # run_energy_gapfill(days=365/2)
-    # dmin = datetime.fromisoformat("2022-02-28T00:00:00+10:00")
-    # dmax = dmin + timedelta(days=3)
-    # run_energy_calc(dmin, dmax, network=network_from_network_code("NEM"))
-
-    # energy_intervals = query_energy_gaps(network=network_from_network_code("NEM"), days=301)
-    # energy_gaps = list(filter(lambda x: x.has_energy is False, energy_intervals))
-
-    run_energy_gapfill_for_network(NetworkNEM)
-
-    # energy_gaps = run_energy_gapfill_for_network_by_days(network=NetworkNEM, fill_gaps=False)
-
-    # print(f"{len(energy_gaps)} gaps")
-
-    # for i in energy_gaps:
-    #     print(i.interval, i.has_power, i.has_energy, i.total_energy)
+    asyncio.run(run_energy_gapfill_for_network(NetworkNEM))
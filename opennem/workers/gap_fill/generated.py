@@ -1,15 +1,22 @@
 """OpenNEM Gapfill for all intervals"""
 
+import asyncio
 import enum
 import logging
-from datetime import datetime
-from textwrap import dedent
+from datetime import datetime, timedelta
 
 from opennem import settings
 from opennem.clients.slack import slack_message
-from opennem.db import get_database_engine
+from opennem.core.completeness import (
+    CompletenessMetric,
+    CompletenessSource,
+    completeness_interval_size,
+    find_gaps,
+    group_contiguous,
+)
 from opennem.schema.core import BaseConfig
 from opennem.schema.network import NetworkAEMORooftop, NetworkAPVI, NetworkNEM, NetworkSchema, NetworkWEM
+from opennem.utils.dates import get_today_for_network
 
 logger = logging.getLogger("opennem.workers.gap_fill")
 
@@ -24,103 +31,74 @@ class GeneratedGap(BaseConfig):
 class GapfillType(enum.Enum):
     generated = "generated"
     rooftop = "rooftop"
-    flows = "flows"
+    price = "price"
 
 
-def query_generated_gaps(
-    network: NetworkSchema = NetworkNEM, days: int = 7, gap_type: GapfillType = GapfillType.generated
-) -> list[GeneratedGap]:
-    """Check for data gaps"""
-    engine = get_database_engine()
-
-    query = """
-
-        select
-            t.interval at time zone '{tz}' as interval,
-            t.network_id,
-            t.has_power,
-            t.total_generated
-        from (
-            select
-                time_bucket_gapfill('{interval_size} min', fs.trading_interval ) as interval,
-                fs.network_id,
-                case when sum(fs.generated) is NULL then FALSE else TRUE end as has_power,
-                sum(fs.generated) as total_generated
-            from facility_scada fs
-            join facility f on fs.facility_code = f.code
-            where
-                fs.trading_interval >= now() - interval '{days} days 2 hours'
-                and fs.trading_interval < now() - interval '2 hours'
-                and fs.network_id='{network_id}'
-                {gapfill_type_filter}
-            group by 1, fs.network_id
-        ) as t
-        where
-            t.has_power is FALSE
-            order by t.interval desc;
-
-    """
-
-    _results = []
-
-    gapfill_type_filter = ""
+# the network rooftop data is stored under
+_ROOFTOP_NETWORKS: dict[str, NetworkSchema] = {
+    NetworkNEM.code: NetworkAEMORooftop,
+    NetworkWEM.code: NetworkAPVI,
+}
 
+
+def _gap_index(network: NetworkSchema, gap_type: GapfillType) -> tuple[NetworkSchema, CompletenessSource, CompletenessMetric]:
+    """The network, source table and metric a gap type is checked against"""
     if gap_type == GapfillType.generated:
-        gapfill_type_filter = "and f.fueltech_id not in ('imports', 'exports', 'solar_rooftop')"
-    elif gap_type == GapfillType.rooftop:
-        gapfill_type_filter = "and f.fueltech_id in ('solar_rooftop')"
-    elif gap_type == GapfillType.flows:
-        gapfill_type_filter = "and f.fueltech_id in ('imports', 'exports')"
-    else:
-        raise Exception(f"Invalid gap fill type: {gap_type}")
+        return network, CompletenessSource.facility_scada, CompletenessMetric.power
+
+    if gap_type == GapfillType.rooftop:
+        return _ROOFTOP_NETWORKS.get(network.code, network), CompletenessSource.facility_scada, CompletenessMetric.power
 
-    # for case of WEM and rooftop check the APVI network
-    if network == NetworkWEM and gap_type == GapfillType.rooftop:
-        network = NetworkAPVI
+    if gap_type == GapfillType.price:
+        return network, CompletenessSource.balancing_summary, CompletenessMetric.price
 
-    _query = query.format(
-        tz=network.timezone_database,
-        network_id=network.code,
-        days=days,
-        interval_size=network.interval_size,
-        gapfill_type_filter=gapfill_type_filter,
-    )
+    raise Exception(f"Invalid gap fill type: {gap_type}")
+
+
+async def query_generated_gaps(
+    network: NetworkSchema = NetworkNEM, days: int = 7, gap_type: GapfillType = GapfillType.generated
+) -> list[GeneratedGap]:
+    """Check for data gaps in the completeness index"""
+    # only networks with their own price have balancing summary
+    if gap_type == GapfillType.price and not network.interval_size_price:
+        return []
 
-    logger.debug(dedent(_query))
+    network, source, metric = _gap_index(network, gap_type)
 
-    with engine.connect() as c:
-        _results = c.execute(_query)
+    # leave time for the latest intervals to arrive
+    date_max = get_today_for_network(network) - timedelta(hours=2)
+    date_min = date_max - timedelta(days=days)
 
-    _result_models = [GeneratedGap(**i) for i in _results]
+    intervals = await find_gaps(network, source, metric, date_min, date_max)
 
-    return _result_models
+    return [GeneratedGap(interval=i, network_id=network.code, has_power=False) for i in intervals]
 
 
-def run_generated_gapfill_for_network(
+async def run_generated_gapfill_for_network(
     gap_type: GapfillType,
     network: NetworkSchema = NetworkNEM,
     days: int = 7,
 ) -> list[GeneratedGap]:
     """Find gaps for network and gap type"""
-    generated_gaps = query_generated_gaps(network, days=days, gap_type=gap_type)
+    generated_gaps = await query_generated_gaps(network, days=days, gap_type=gap_type)
 
     logger.info(f"Found {len(generated_gaps)} generated gaps")
 
-    for gap in generated_gaps:
-        logger.info(f"{gap.network_id} Running for interval {gap.interval} with power: {gap.has_power}")
+    gap_network, source, _ = _gap_index(network, gap_type)
+    interval_size = completeness_interval_size(gap_network, source)
 
-        if settings.dry_run:
-            continue
+    for gap_start, gap_end in group_contiguous([i.interval for i in generated_gaps], interval_size):
+        logger.info(f"{gap_network.code} {gap_type.value} gap from {gap_start} to {gap_end}")
 
     return generated_gaps
 
 
-def check_generated_gaps(days: int = 3) -> None:
+async def check_generated_gaps(days: int = 3) -> None:
     """Process for checking how many generation gaps there might be"""
 
     for network in [NetworkNEM, NetworkWEM, NetworkAPVI, NetworkAEMORooftop]:
         for _, gap_type in enumerate(GapfillType):
-            gaps = run_generated_gapfill_for_network(days=days, network=network, gap_type=gap_type)
+            gaps = await run_generated_gapfill_for_network(days=days, network=network, gap_type=gap_type)
 
             if gaps:
                 slack_message(
@@ -133,5 +111,4 @@ def check_generated_gaps(days: int = 3) -> None:
 
 # debug entry point
 if __name__ == "__main__":
-    check_generated_gaps(days=30)
-    # run_generated_gapfill_for_network(days=365)
+    asyncio.run(check_generated_gaps(days=30))
@@ -0,0 +1,208 @@
+"""
+Scheduler task lanes
+
+Crawl, aggregate and export tasks run as coroutines on a long-lived event loop
+per worker process instead of a loop spun up per worker thread. Each task is
+assigned a lane which sets its huey priority and a concurrency cap. When a lane
+is at capacity the task is handed back to huey to retry after a delay so that
+it does not hold a worker thread that a latency critical task could be using.
+A task is deferred at most scheduler_lane_max_deferrals times before it is
+dropped until its next scheduled run.
+
+The critical lane is uncapped and has its own loop thread, so dispatch_scada
+never queues behind exports or waits on synchronous work in an aggregate.
+
+Every task run is recorded as a span in the task profiler.
+
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from collections.abc import Callable, Coroutine
+from enum import Enum
+from typing import Any
+
+from huey.api import Task
+from huey.exceptions import CancelExecution, RetryTask
+
+from opennem import settings
+from opennem.core.profiler import ProfileKind, task_profiler
+from opennem.utils.sync import run_async_task_reusable
+
+logger = logging.getLogger("opennem.workers.lanes")
+
+
+class TaskLane(Enum):
+    critical = "critical"
+    crawl = "crawl"
+    aggregate = "aggregate"
+    export = "export"
+
+    @property
+    def priority(self) -> int:
+        """Huey priority for tasks in this lane - higher runs first"""
+        return _LANE_PRIORITIES[self]
+
+    @property
+    def concurrency(self) -> int | None:
+        """Number of tasks in the lane that can run at once. None is uncapped"""
+        match self:
+            case TaskLane.crawl:
+                return settings.scheduler_lane_crawl_concurrency
+            case TaskLane.aggregate:
+                return settings.scheduler_lane_aggregate_concurrency
+            case TaskLane.export:
+                return settings.scheduler_lane_export_concurrency
+
+        return None
+
+
+_LANE_PRIORITIES = {
+    TaskLane.critical: 100,
+    TaskLane.crawl: 50,
+    TaskLane.aggregate: 30,
+    TaskLane.export: 10,
+}
+
+
+class LaneLimiter:
+    """Non-blocking per lane concurrency caps shared by the worker threads in a process"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._running: dict[TaskLane, int] = {lane: 0 for lane in TaskLane}
+
+    def try_acquire(self, lane: TaskLane) -> bool:
+        with self._lock:
+            limit = lane.concurrency
+
+            if limit is not None and self._running[lane] >= limit:
+                return False
+
+            self._running[lane] += 1
+
+        return True
+
+    def release(self, lane: TaskLane) -> None:
+        with self._lock:
+            self._running[lane] = max(self._running[lane] - 1, 0)
+
+    def running(self, lane: TaskLane) -> int:
+        return self._running[lane]
+
+
+class WorkerEventLoop:
+    """A long-lived event loop running in a daemon thread, one per process
+
+    Shared clients and pools (http, database) bind to a loop so keeping a single
+    loop for the life of the worker lets them be reused across tasks. The loop is
+    recreated after a fork.
+    """
+
+    def __init__(self, name: str = "opennem-worker-loop") -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    @staticmethod
+    def _run_forever(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if not self._loop or not self._thread or self._pid != os.getpid() or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_forever, args=(self._loop,), name=self.name, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+                logger.debug(f"Started worker event loop {self.name} in process {self._pid}")
+
+            return self._loop
+
+    def run[R](self, coroutine: Coroutine[Any, Any, R]) -> R:
+        """Run a coroutine on the worker loop and block the calling thread for the result"""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.get_loop())
+
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+
+worker_loop = WorkerEventLoop()
+
+# the critical lane is kept off the shared loop so blocking work in other lanes can't stall it
+critical_worker_loop = WorkerEventLoop(name="opennem-worker-loop-critical")
+
+lane_limiter = LaneLimiter()
+
+# kwarg carried on a deferred task with the number of times it has been deferred
+_DEFERRALS_KWARG = "_lane_deferrals"
+
+_current = threading.local()
+
+
+def get_worker_loop(lane: TaskLane) -> WorkerEventLoop:
+    return critical_worker_loop if lane == TaskLane.critical else worker_loop
+
+
+def set_current_task(task: Task) -> None:
+    """huey pre-execute hook that lets a lane task count its deferrals on the task it runs in"""
+    _current.task = task
+
+
+def _profiled[**P, R](coroutine: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:
+    @functools.wraps(coroutine)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with task_profiler.span(ProfileKind.task, coroutine.__name__):
+            return await coroutine(*args, **kwargs)
+
+    return wrapper
+
+
+def lane_task[**P, R](lane: TaskLane) -> Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, R]]:
+    """Decorator that runs a coroutine task on the worker loop within a lane
+
+    With scheduler_task_lanes disabled this falls back to run_async_task_reusable
+    """
+
+    def decorator(coroutine: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, R]:
+        coroutine = _profiled(coroutine)
+
+        if not settings.scheduler_task_lanes:
+            return run_async_task_reusable(coroutine)
+
+        @functools.wraps(coroutine)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            deferrals: int = kwargs.pop(_DEFERRALS_KWARG, 0)  # type: ignore
+
+            if not lane_limiter.try_acquire(lane):
+                if deferrals >= settings.scheduler_lane_max_deferrals:
+                    logger.warning(f"Lane {lane.value} at capacity, dropping {coroutine.__name__} after {deferrals} deferrals")
+                    raise CancelExecution(retry=False)
+
+                task: Task | None = getattr(_current, "task", None)
+
+                if task:
+                    task.kwargs[_DEFERRALS_KWARG] = deferrals + 1
+
+                raise RetryTask(
+                    f"Lane {lane.value} at capacity for {coroutine.__name__}", delay=settings.scheduler_lane_retry_delay
+                )
+
+            try:
+                return get_worker_loop(lane).run(coroutine(*args, **kwargs))
+            finally:
+                lane_limiter.release(lane)
+
+        return wrapper
+
+    return decorator
@@ -2,13 +2,11 @@
 
 import logging
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from sqlalchemy import text as sql
-
-from opennem.db import SessionLocal, get_database_engine
+from opennem.core.watermarks import get_scada_watermarks
+from opennem.db import SessionLocalAsync
 from opennem.db.models.opennem import Network
-from opennem.utils.dates import get_today_nem
 
 logger = logging.getLogger("opennem.workers.network_data_range")
 
@@ -20,60 +18,29 @@ class NetworkDataDateRanges:
     data_max: datetime | None
 
 
-def get_network_data_ranges(query_min: bool = False, days_back: int = 7) -> list[NetworkDataDateRanges]:
-    """Runs a query to get the network data ranges"""
-    engine = get_database_engine()
-
-    date_min: datetime = get_today_nem() - timedelta(days=days_back)
-
-    stmt = sql(
-        """
-            select
-                fs.network_id,
-                null as scada_min,
-                max(fs.trading_interval) as scada_max
-            from facility_scada fs
-            where
-                fs.is_forecast is FALSE and
-                fs.trading_interval > :date_min
-            group by fs.network_id;
-        """
-    )
-
-    if query_min:
-        stmt = sql(
-            """
-            select
-                fs.network_id,
-                min(f.data_first_seen) as scada_min,
-                max(fs.trading_interval) as scada_max
-            from facility_scada fs
-            left join facility f on fs.facility_code = f.code
-            where
-                fs.is_forecast is FALSE and
-                fs.trading_interval > :date_min
-            group by fs.network_id;
-        """
-        )
-
-    with engine.begin() as c:
-        logger.debug(stmt)
-        results = list(c.execute(stmt, {"date_min": date_min}))
+async def get_network_data_ranges(query_min: bool = False) -> list[NetworkDataDateRanges]:
+    """Gets the network data ranges from the facility scada watermarks"""
+    watermarks = await get_scada_watermarks()
+
+    results = watermarks.networks()
 
     if not results:
         raise Exception("No results for data range query in update_network_data_ranges")
 
-    models = [NetworkDataDateRanges(network=i[0], data_min=i[1], data_max=i[2]) for i in results]
+    models = [
+        NetworkDataDateRanges(network=i.network_id, data_min=i.first_seen if query_min else None, data_max=i.last_seen)
+        for i in results
+    ]
 
     return models
 
 
-def update_network_data_ranges(data_ranges: list[NetworkDataDateRanges]) -> None:
+async def update_network_data_ranges(data_ranges: list[NetworkDataDateRanges]) -> None:
     """Updates the data ranges in the network"""
 
-    with SessionLocal() as sess:
+    async with SessionLocalAsync() as sess:
         for date_range in data_ranges:
-            network = sess.get(Network, date_range.network)
+            network = await sess.get(Network, date_range.network)
 
             if not network:
                 raise Exception(f"Could not find network {date_range.network}")
@@ -86,19 +53,21 @@ def update_network_data_ranges(data_ranges: list[NetworkDataDateRanges]) -> None
 
             sess.add(network)
 
-        sess.commit()
+        await sess.commit()
 
 
-def run_network_data_range_update(debug: bool = False) -> None:
+async def run_network_data_range_update(debug: bool = False) -> None:
     """Runs the network data range update"""
-    data_ranges = get_network_data_ranges()
+    data_ranges = await get_network_data_ranges()
 
     if debug:
         for data_range in data_ranges:
             logger.debug(f"{data_range.network} {data_range.data_min} {data_range.data_max}")
 
-    update_network_data_ranges(data_ranges)
+    await update_network_data_ranges(data_ranges)
 
 
 if __name__ == "__main__":
-    run_network_data_range_update(debug=True)
+    import asyncio
+
+    asyncio.run(run_network_data_range_update(debug=True))
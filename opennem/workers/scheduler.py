@@ -13,6 +13,8 @@ from huey import PriorityRedisHuey, crontab
 from huey.serializer import Serializer
 
 from opennem import settings
+from opennem.aggregates.network_fueltech_intervals import run_network_fueltech_intervals_catchup
+from opennem.api.catalogue import refresh_facility_catalogue
 from opennem.api.export.map import PriorityType
 from opennem.api.export.tasks import export_electricitymap, export_flows, export_power
 from opennem.core.startup import worker_startup_alert
@@ -20,6 +22,7 @@ from opennem.crawl import run_crawl
 from opennem.crawlers.bom import BOMCapitals
 from opennem.exporter.geojson import export_facility_geojson
 from opennem.monitors.facility_seen import facility_first_seen_check
+from opennem.pipelines import events  # noqa: F401 registers event bus subscribers
 from opennem.pipelines.crontab import network_interval_crontab
 from opennem.pipelines.nem import (
     nem_dispatch_is_crawl,
@@ -29,13 +32,15 @@ from opennem.pipelines.nem import (
     nem_trading_is_crawl,
 )
 from opennem.schema.network import NetworkAEMORooftop, NetworkNEM
-from opennem.utils.sync import run_async_task_reusable
-from opennem.workers.daily import daily_catchup_runner
+from opennem.workers.daily import daily_catchup_runner, run_changed_day_aggregates
+from opennem.workers.energy import run_energy_repair_pending
 from opennem.workers.facility_data_ranges import update_facility_seen_range
+from opennem.workers.lanes import TaskLane, lane_task, set_current_task
 from opennem.workers.network_data_range import run_network_data_range_update
 from opennem.workers.system import clean_tmp_dir
 
 huey = PriorityRedisHuey("opennem.scheduler", url=str(settings.redis_url), serializer=Serializer())
+huey.pre_execute(name="lane_task")(set_current_task)
 
 logger = logging.getLogger("openenm.scheduler")
 
@@ -46,33 +51,41 @@ worker_startup_alert()
 # crawler tasks live per interval for each network
 @huey.periodic_task(
     network_interval_crontab(network=NetworkNEM),
-    priority=50,
+    priority=TaskLane.critical.priority,
     retries=2,
     retry_delay=10,
     name="crawler_run_nem_dispatch_scada_crawl",
 )
 @huey.lock_task("crawler_run_nem_dispatch_scada_crawl")
-@run_async_task_reusable
+@lane_task(TaskLane.critical)
 async def crawler_run_nem_dispatch_scada_crawl() -> None:
     """dispatch_scada for NEM crawl"""
     await nem_dispatch_scada_crawl()
 
 
 @huey.periodic_task(
-    network_interval_crontab(network=NetworkNEM), priority=50, retries=2, retry_delay=10, name="crawler_run_nem_dispatch_is_crawl"
+    network_interval_crontab(network=NetworkNEM),
+    priority=TaskLane.crawl.priority,
+    retries=2,
+    retry_delay=10,
+    name="crawler_run_nem_dispatch_is_crawl",
 )
 @huey.lock_task("crawler_run_nem_dispatch_is_crawl")
-@run_async_task_reusable
+@lane_task(TaskLane.crawl)
 async def crawler_run_nem_dispatch_is_crawl() -> None:
     """dispatch_is for NEM crawl"""
     await nem_dispatch_is_crawl()
 
 
 @huey.periodic_task(
-    network_interval_crontab(network=NetworkNEM), priority=50, retries=2, retry_delay=10, name="crawler_run_nem_trading_is_crawl"
+    network_interval_crontab(network=NetworkNEM),
+    priority=TaskLane.crawl.priority,
+    retries=2,
+    retry_delay=10,
+    name="crawler_run_nem_trading_is_crawl",
 )
 @huey.lock_task("crawler_run_nem_trading_is_crawl")
-@run_async_task_reusable
+@lane_task(TaskLane.crawl)
 async def crawler_run_nem_trading_is_crawl() -> None:
     """dispatch_is for NEM crawl"""
     await nem_trading_is_crawl()
@@ -80,66 +93,76 @@ async def crawler_run_nem_trading_is_crawl() -> None:
 
 @huey.periodic_task(
     network_interval_crontab(network=NetworkAEMORooftop, number_minutes=1),
-    priority=50,
+    priority=TaskLane.crawl.priority,
     retries=2,
     retry_delay=15,
     name="crawler_run_nem_rooftop_per_interval",
 )
 @huey.lock_task("crawler_run_nem_rooftop_per_interval")
-@run_async_task_reusable
+@lane_task(TaskLane.crawl)
 async def crawler_run_nem_rooftop_per_interval() -> None:
     await nem_rooftop_crawl()
 
 
-@huey.periodic_task(crontab(hour="*/1"), priority=50, retries=5, retry_delay=15, name="crawler_run_wem_per_interval")
+@huey.periodic_task(
+    crontab(hour="*/1"), priority=TaskLane.crawl.priority, retries=5, retry_delay=15, name="crawler_run_wem_per_interval"
+)
 @huey.lock_task("crawler_run_wem_per_interval")
-@run_async_task_reusable
+@lane_task(TaskLane.crawl)
 async def crawler_run_wem_per_interval() -> None:
     # await wem_per_interval_check()
     pass
 
 
-@huey.periodic_task(crontab(minute="*/10"), priority=1, name="crawler_run_bom_capitals")
+@huey.periodic_task(crontab(minute="*/10"), priority=TaskLane.crawl.priority, name="crawler_run_bom_capitals")
 @huey.lock_task("crawler_run_bom_capitals")
-@run_async_task_reusable
+@lane_task(TaskLane.crawl)
 async def crawler_run_bom_capitals() -> None:
     await run_crawl(BOMCapitals)
 
 
 # Checks for the overnights from aemo and then runs the daily runner
-@huey.periodic_task(crontab(hour="4", minute="20"), name="nem_overnight_check_always")
+@huey.periodic_task(crontab(hour="4", minute="20"), priority=TaskLane.aggregate.priority, name="nem_overnight_check_always")
 @huey.lock_task("nem_overnight_check_always")
-@run_async_task_reusable
+@lane_task(TaskLane.aggregate)
 async def nem_overnight_check_always() -> None:
     await nem_per_day_check(always_run=True)
 
 
-@huey.periodic_task(crontab(hour="8", minute="20"), retries=10, retry_delay=60, priority=50, name="nem_overnight_check")
+@huey.periodic_task(
+    crontab(hour="8", minute="20"), retries=10, retry_delay=60, priority=TaskLane.aggregate.priority, name="nem_overnight_check"
+)
 @huey.lock_task("nem_overnight_check")
-@run_async_task_reusable
+@lane_task(TaskLane.aggregate)
 async def nem_overnight_check() -> None:
     await nem_per_day_check()
 
 
-@huey.periodic_task(crontab(hour="10", minute="20"), retries=10, retry_delay=60, priority=50, name="daily_catchup_runner_worker")
+@huey.periodic_task(
+    crontab(hour="10", minute="20"),
+    retries=10,
+    retry_delay=60,
+    priority=TaskLane.aggregate.priority,
+    name="daily_catchup_runner_worker",
+)
 @huey.lock_task("daily_catchup_runner_worker")
-@run_async_task_reusable
+@lane_task(TaskLane.aggregate)
 async def daily_catchup_runner_worker() -> None:
     await daily_catchup_runner()
 
 
 # export tasks
-@huey.periodic_task(crontab(minute="*/15"), priority=90, name="schedule_custom_tasks")
+@huey.periodic_task(crontab(minute="*/15"), priority=TaskLane.export.priority, name="schedule_custom_tasks")
 @huey.lock_task("schedule_custom_tasks")
-@run_async_task_reusable
+@lane_task(TaskLane.export)
 async def schedule_custom_tasks() -> None:
     await export_electricitymap()
     await export_flows()
 
 
-@huey.periodic_task(crontab(hour="2", minute="19"), name="schedule_power_weeklies")
+@huey.periodic_task(crontab(hour="2", minute="19"), priority=TaskLane.export.priority, name="schedule_power_weeklies")
 @huey.lock_task("schedule_power_weeklies")
-@run_async_task_reusable
+@lane_task(TaskLane.export)
 async def schedule_power_weeklies() -> None:
     """
     Run weekly power outputs
@@ -148,41 +171,64 @@ async def schedule_power_weeklies() -> None:
 
 
 # geojson maps
-@huey.periodic_task(crontab(minute="*/30"), priority=50, name="schedule_export_geojson")
+@huey.periodic_task(crontab(minute="*/30"), priority=TaskLane.export.priority, name="schedule_export_geojson")
 @huey.lock_task("schedule_export_geojson")
-@run_async_task_reusable
+@lane_task(TaskLane.export)
 async def schedule_export_geojson() -> None:
     await export_facility_geojson()
 
 
 # worker tasks
-@huey.periodic_task(crontab(hour="*/1", minute="15"), name="run_energy_calculation_for_interval")
-@huey.lock_task("run_energy_calculation_for_interval")
-@run_async_task_reusable
-async def run_energy_calculation_for_interval() -> None:
+@huey.periodic_task(crontab(hour="*/1", minute="15"), priority=TaskLane.aggregate.priority, name="run_energy_repair_pending")
+@huey.lock_task("run_energy_repair_pending")
+@lane_task(TaskLane.aggregate)
+async def schedule_energy_repair_pending() -> None:
     """
-    Run energy calculation for a single interval.
-    This method is intended to be called by a cron job every 5 minutes.
+    Calculate energy for recent facility scada written without it. Bulk inserted scada has its
+    energy calculated as it is inserted so this only picks up other insert paths.
     """
-    await run_energy_calculation_for_interval()
+    await run_energy_repair_pending()
+
+
+@huey.periodic_task(crontab(hour="*/1", minute="25"), priority=TaskLane.aggregate.priority, name="run_changed_day_aggregates")
+@huey.lock_task("run_changed_day_aggregates")
+@lane_task(TaskLane.aggregate)
+async def schedule_changed_day_aggregates() -> None:
+    """Recalculate the daily facility and demand aggregates for days with data inserted since they were last run"""
+    await run_changed_day_aggregates()
+
+
+@huey.periodic_task(crontab(minute="*/10"), priority=TaskLane.aggregate.priority, name="run_network_fueltech_intervals_catchup")
+@huey.lock_task("run_network_fueltech_intervals_catchup")
+@lane_task(TaskLane.aggregate)
+async def schedule_network_fueltech_intervals_catchup() -> None:
+    """Recompute the recent network fueltech intervals for every network including those not updated from events"""
+    await run_network_fueltech_intervals_catchup()
 
 
-@huey.periodic_task(crontab(hour="20", minute="45"), name="schedule_facility_first_seen_check")
+@huey.periodic_task(
+    crontab(hour="20", minute="45"), priority=TaskLane.aggregate.priority, name="schedule_facility_first_seen_check"
+)
 @huey.lock_task("schedule_facility_first_seen_check")
-@run_async_task_reusable
+@lane_task(TaskLane.aggregate)
 async def schedule_facility_first_seen_check() -> None:
     """Check for new DUIDS"""
     await facility_first_seen_check()
 
 
-@huey.periodic_task(crontab(hour="*/1", minute="15"), name="run_run_network_data_range_update")
+@huey.periodic_task(
+    crontab(hour="*/1", minute="15"), priority=TaskLane.aggregate.priority, name="run_run_network_data_range_update"
+)
 @huey.lock_task("run_run_network_data_range_update")
-@run_async_task_reusable
+@lane_task(TaskLane.aggregate)
 async def run_run_network_data_range_update() -> None:
     """Updates network data_range"""
-    run_network_data_range_update()
+    await run_network_data_range_update()
     await update_facility_seen_range()
 
+    # seen ranges are part of the facility geojson
+    await refresh_facility_catalogue()
+
 
 # system tasks
 @huey.periodic_task(crontab(hour="*/1", minute="55"), name="run_clean_tmp_dir")
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from opennem.aggregates.network_fueltech_intervals import _to_network_time
+from opennem.aggregates.utils import get_aggregate_date_chunks
+from opennem.api.export.queries import power_network_fueltech_query, power_network_rooftop_query
+from opennem.api.time import human_to_interval, human_to_period
+from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.schema.network import NetworkNEM
+
+
+def test_aggregate_date_chunks() -> None:
+    date_start = datetime.fromisoformat("2024-01-01T00:00:00")
+    date_end = datetime.fromisoformat("2024-01-10T00:00:00")
+
+    chunks = get_aggregate_date_chunks(date_start, date_end, timedelta(days=4))
+
+    assert chunks == [
+        (datetime.fromisoformat("2024-01-01T00:00:00"), datetime.fromisoformat("2024-01-05T00:00:00")),
+        (datetime.fromisoformat("2024-01-05T00:00:00"), datetime.fromisoformat("2024-01-09T00:00:00")),
+        (datetime.fromisoformat("2024-01-09T00:00:00"), datetime.fromisoformat("2024-01-10T00:00:00")),
+    ]
+
+    assert get_aggregate_date_chunks(date_start, date_end, timedelta(days=4), reverse=True)[0][1] == date_end
+
+
+def test_to_network_time_strips_timezone() -> None:
+    interval = _to_network_time(datetime.fromisoformat("2024-01-01T00:00:00+00:00"), NetworkNEM)
+
+    assert interval == datetime.fromisoformat("2024-01-01T10:00:00")
+
+
+def _time_series() -> OpennemExportSeries:
+    return OpennemExportSeries(
+        start=datetime.fromisoformat("2024-01-01T00:00:00+10:00"),
+        end=datetime.fromisoformat("2024-01-08T00:00:00+10:00"),
+        network=NetworkNEM,
+        interval=human_to_interval("5m"),
+        period=human_to_period("7d"),
+    )
+
+
+@pytest.mark.parametrize("query_builder", [power_network_fueltech_query, power_network_rooftop_query])
+def test_power_queries_read_aggregate(query_builder, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("opennem.settings.network_fueltech_intervals_queries", True)
+
+    query = query_builder(time_series=_time_series(), network_region="NSW1")
+    query_sql = str(query)
+
+    assert "from at_network_fueltech_intervals fi" in query_sql
+    assert "facility_scada" not in query_sql
+    assert "fi.network_region = :network_region" in query_sql
+    assert query.compile().params["network_region"] == "NSW1"
+
+
+@pytest.mark.parametrize("query_builder", [power_network_fueltech_query, power_network_rooftop_query])
+def test_power_queries_read_scada_until_backfilled(query_builder, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("opennem.settings.network_fueltech_intervals_queries", False)
+
+    query_sql = str(query_builder(time_series=_time_series(), network_region="NSW1"))
+
+    assert "from facility_scada fs" in query_sql
+    assert "at_network_fueltech_intervals" not in query_sql
+
+
+def test_rooftop_query_keeps_network_timezone(monkeypatch: pytest.MonkeyPatch) -> None:
+    for enabled in [True, False]:
+        monkeypatch.setattr("opennem.settings.network_fueltech_intervals_queries", enabled)
+
+        query_sql = str(power_network_rooftop_query(time_series=_time_series()))
+
+        assert f"at time zone '{NetworkNEM.timezone_database}'" in query_sql
@@ -0,0 +1,153 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from opennem.api.cache import CacheEntry, ResponseCache, cache, init_response_cache, network_cache_tag, network_cache_tags
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Fetch:
+    """Endpoint stand in that counts calls and returns the call number"""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return str(self.calls).encode()
+
+
+def test_cache_entry_round_trip() -> None:
+    entry = CacheEntry(value=b'{"a":\n1}', stored_at=1.0, fresh_until=2.0, stale_until=3.0, tags={"network:NEM": 4})
+
+    assert CacheEntry.loads(entry.dumps()) == entry
+
+
+def test_concurrent_misses_coalesce() -> None:
+    response_cache = ResponseCache(stale=60)
+    fetch = _Fetch(delay=0.05)
+
+    async def _run() -> list[tuple[CacheEntry, str]]:
+        return await asyncio.gather(*[response_cache.get_or_set("key", fetch, expire=60) for _ in range(20)])
+
+    results = asyncio.run(_run())
+
+    assert fetch.calls == 1
+    assert {entry.value for entry, _ in results} == {b"1"}
+    assert {status for _, status in results} == {"MISS"}
+
+
+def test_stale_while_revalidate() -> None:
+    clock = _Clock()
+    response_cache = ResponseCache(stale=60, clock=clock)
+    fetch = _Fetch()
+
+    async def _run() -> None:
+        entry, status = await response_cache.get_or_set("key", fetch, expire=10)
+        assert (entry.value, status) == (b"1", "MISS")
+
+        clock.now += 5
+        entry, status = await response_cache.get_or_set("key", fetch, expire=10)
+        assert (entry.value, status) == (b"1", "HIT")
+
+        # expired but within the stale period is served while refreshed in the background
+        clock.now += 10
+        entry, status = await response_cache.get_or_set("key", fetch, expire=10)
+        assert (entry.value, status) == (b"1", "STALE")
+
+        await asyncio.sleep(0.01)
+        entry, status = await response_cache.get_or_set("key", fetch, expire=10)
+        assert (entry.value, status) == (b"2", "HIT")
+
+        # past the stale period waits for the fill
+        clock.now += 100
+        entry, status = await response_cache.get_or_set("key", fetch, expire=10)
+        assert (entry.value, status) == (b"3", "MISS")
+
+    asyncio.run(_run())
+
+
+def test_invalidate_tags_marks_stale() -> None:
+    response_cache = ResponseCache(stale=60)
+    fetch = _Fetch()
+    tags = [network_cache_tag("nem")]
+
+    async def _run() -> None:
+        await response_cache.get_or_set("nem", fetch, expire=60, tags=tags)
+        await response_cache.get_or_set("wem", fetch, expire=60, tags=[network_cache_tag("WEM")])
+
+        await response_cache.invalidate(tags)
+
+        assert (await response_cache.get_or_set("wem", fetch, expire=60))[1] == "HIT"
+
+        entry, status = await response_cache.get_or_set("nem", fetch, expire=60, tags=tags)
+        assert (entry.value, status) == (b"1", "STALE")
+
+        await asyncio.sleep(0.01)
+        entry, status = await response_cache.get_or_set("nem", fetch, expire=60, tags=tags)
+        assert (entry.value, status) == (b"3", "HIT")
+
+    asyncio.run(_run())
+
+
+def test_fill_errors_are_not_cached() -> None:
+    response_cache = ResponseCache(stale=60)
+
+    async def _fail() -> bytes:
+        raise ValueError("no results")
+
+    async def _run() -> None:
+        for _ in range(2):
+            try:
+                await response_cache.get_or_set("key", _fail, expire=60)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("expected the fill error")
+
+        assert await response_cache.get("key") is None
+
+    asyncio.run(_run())
+
+
+def test_network_cache_tags() -> None:
+    assert network_cache_tags(network_code="nem", interval="5m") == ["network:NEM"]
+    assert network_cache_tags() == []
+
+
+def test_cache_decorator() -> None:
+    init_response_cache("local")
+    calls: list[str] = []
+
+    app = FastAPI()
+
+    @app.get("/value/{network_code}")
+    @cache(expire=60, tags=network_cache_tags)
+    async def value_endpoint(network_code: str) -> dict:
+        calls.append(network_code)
+        return {"network": network_code, "calls": len(calls)}
+
+    client = TestClient(app)
+
+    miss = client.get("/value/NEM")
+    hit = client.get("/value/NEM")
+    not_modified = client.get("/value/NEM", headers={"If-None-Match": hit.headers["etag"]})
+    no_store = client.get("/value/NEM", headers={"Cache-Control": "no-store"})
+
+    assert miss.headers["x-fastapi-cache"] == "MISS"
+    assert hit.headers["x-fastapi-cache"] == "HIT"
+    assert hit.json() == miss.json() == {"network": "NEM", "calls": 1}
+    assert not_modified.status_code == 304
+    assert no_store.json() == {"network": "NEM", "calls": 2}
+
+    init_response_cache(None)
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import opennem.api.catalogue as catalogue
+from opennem.api.catalogue import CatalogueName, CatalogueSnapshot, FacilityCatalogue, catalogue_response
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Store:
+    """In memory stand in for the redis catalogue store"""
+
+    def __init__(self) -> None:
+        self.snapshots: dict[str, bytes] = {}
+        self.versions: dict[str, str] = {}
+
+    async def version(self, name: str) -> str | None:
+        return self.versions.get(name)
+
+    async def get(self, name: str) -> CatalogueSnapshot | None:
+        return CatalogueSnapshot.loads(self.snapshots[name]) if name in self.snapshots else None
+
+    async def put(self, snapshot: CatalogueSnapshot) -> None:
+        self.snapshots[snapshot.name] = snapshot.dumps()
+        self.versions[snapshot.name] = snapshot.version
+
+
+class _Builder:
+    def __init__(self, name: CatalogueName) -> None:
+        self.name = name
+        self.calls = 0
+        self.content = b'[{"code": "BAYSW"}]'
+
+    async def __call__(self) -> CatalogueSnapshot:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return CatalogueSnapshot.from_content(self.name, self.content, count=1)
+
+
+def test_catalogue_snapshot_round_trip() -> None:
+    snapshot = CatalogueSnapshot.from_content(CatalogueName.stations, b'{"data": []}', count=0, built_at=1.0)
+
+    assert CatalogueSnapshot.loads(snapshot.dumps()) == snapshot
+    assert gzip.decompress(snapshot.compressed) == snapshot.content
+    assert CatalogueSnapshot.from_content(CatalogueName.stations, b'{"data": []}', count=0).compressed == snapshot.compressed
+
+
+def test_catalogue_concurrent_gets_build_once() -> None:
+    builder = _Builder(CatalogueName.facilities)
+    facility_catalogue = FacilityCatalogue(builders={CatalogueName.facilities: builder})
+
+    async def _run() -> list[CatalogueSnapshot]:
+        return await asyncio.gather(*[facility_catalogue.get(CatalogueName.facilities) for _ in range(10)])
+
+    snapshots = asyncio.run(_run())
+
+    assert builder.calls == 1
+    assert len({s.version for s in snapshots}) == 1
+
+
+def test_catalogue_picks_up_remote_versions() -> None:
+    clock = _Clock()
+    store = _Store()
+    builder = _Builder(CatalogueName.facilities)
+    builders = {CatalogueName.facilities: builder}
+
+    worker = FacilityCatalogue(remote=store, refresh=5, builders=builders, clock=clock)
+    api = FacilityCatalogue(remote=store, refresh=5, builders=builders, clock=clock)
+
+    async def _run() -> None:
+        await worker.rebuild()
+        first = await api.get(CatalogueName.facilities)
+
+        # built by the worker so the api process loads it rather than building
+        assert builder.calls == 1
+
+        builder.content = b'[{"code": "ERARING"}]'
+        await worker.rebuild()
+
+        assert (await api.get(CatalogueName.facilities)).version == first.version
+
+        clock.now += 5
+        assert (await api.get(CatalogueName.facilities)).content == builder.content
+
+    asyncio.run(_run())
+
+
+def test_catalogue_response(monkeypatch) -> None:
+    facility_catalogue = FacilityCatalogue(builders={CatalogueName.facilities: _Builder(CatalogueName.facilities)})
+    monkeypatch.setattr(catalogue, "_FACILITY_CATALOGUE", facility_catalogue)
+
+    app = FastAPI()
+
+    @app.get("/facilities")
+    async def facilities_endpoint(request: Request):
+        return await catalogue_response(request, CatalogueName.facilities)
+
+    client = TestClient(app)
+
+    response = client.get("/facilities")
+    plain = client.get("/facilities", headers={"Accept-Encoding": "identity"})
+    not_modified = client.get("/facilities", headers={"If-None-Match": response.headers["etag"]})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == plain.json() == [{"code": "BAYSW"}]
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["x-total-count"] == "1"
+    assert not_modified.status_code == 304
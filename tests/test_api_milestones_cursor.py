@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from opennem.api.milestones.queries import (
+    MilestoneCursorException,
+    decode_milestone_cursor,
+    encode_milestone_cursor,
+    milestone_records_next_cursor,
+    milestone_records_query,
+)
+from opennem.recordreactor.schema import MilestonePeriod
+from opennem.schema.network import NetworkNEM
+
+
+def test_milestone_cursor_round_trip() -> None:
+    interval = datetime(2024, 8, 1, 10, 5)
+    instance_id = uuid.uuid4()
+
+    cursor = encode_milestone_cursor(interval, instance_id)
+
+    assert "=" not in cursor
+    assert decode_milestone_cursor(cursor) == (interval, instance_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_milestone_cursor(datetime(2024, 1, 1), uuid.uuid4())[:-4]])
+def test_milestone_cursor_invalid(cursor: str) -> None:
+    with pytest.raises(MilestoneCursorException):
+        decode_milestone_cursor(cursor)
+
+
+def test_milestone_records_next_cursor() -> None:
+    records = [{"interval": datetime(2024, 8, 1, 10, i), "instance_id": uuid.uuid4()} for i in range(3)]
+
+    assert milestone_records_next_cursor(records, limit=5) is None
+    assert milestone_records_next_cursor([], limit=5) is None
+    assert decode_milestone_cursor(milestone_records_next_cursor(records, limit=3)) == (
+        records[-1]["interval"],
+        records[-1]["instance_id"],
+    )
+
+
+def test_milestone_records_query_filters() -> None:
+    query = milestone_records_query(networks=[NetworkNEM], periods=[MilestonePeriod.day], significance=5)
+
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "milestones.network_id IN" in sql
+    assert "milestones.period IN" in sql
+    assert "milestones.significance >=" in sql
+    assert "milestones.network_region IS NULL" in sql
@@ -0,0 +1,212 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import RedirectResponse
+from fastapi.testclient import TestClient
+
+from opennem.api.cache import cache, init_response_cache
+from opennem.api.stats.controllers import stats_factory
+from opennem.api.stats.encoders import (
+    HAVE_ARROW,
+    DataSetCoder,
+    DataSetFormat,
+    dataset_response,
+    dataset_to_dict,
+    encode_dataset,
+    negotiate_dataset_format,
+    series_intervals,
+)
+from opennem.api.stats.schema import DataQueryResult, OpennemDataSet
+from opennem.api.time import human_to_interval
+from opennem.core.units import get_unit
+from opennem.schema.network import NetworkNEM
+
+
+def _stat_set() -> OpennemDataSet:
+    start = datetime(2024, 1, 1, 0, 0)
+    stats = [
+        DataQueryResult(interval=start + timedelta(minutes=5 * i), result=value, group_by=code)
+        for code, values in (("BAYSW1", [100.0, None, 120.5]), ("BAYSW2", [1.5, 2.5, 3.5]))
+        for i, value in enumerate(values)
+    ]
+
+    return stats_factory(
+        stats,
+        code="BAYSW",
+        network=NetworkNEM,
+        interval=human_to_interval("5m"),
+        units=get_unit("power"),
+        include_group_code=True,
+    )
+
+
+@pytest.mark.parametrize(
+    ["accept", "expected"],
+    [
+        (None, DataSetFormat.json),
+        ("text/html,application/xhtml+xml", DataSetFormat.json),
+        ("*/*", DataSetFormat.json),
+        ("application/json", DataSetFormat.json),
+    ],
+)
+def test_negotiate_dataset_format_json(accept: str | None, expected: DataSetFormat) -> None:
+    assert negotiate_dataset_format(accept) == expected
+
+
+@pytest.mark.skipif(not HAVE_ARROW, reason="pyarrow not installed")
+def test_negotiate_dataset_format_quality() -> None:
+    assert negotiate_dataset_format("application/vnd.apache.arrow.stream") == DataSetFormat.arrow
+    assert negotiate_dataset_format("application/json;q=0.5, application/vnd.apache.parquet") == DataSetFormat.parquet
+    assert negotiate_dataset_format("application/vnd.apache.parquet;q=0, application/json") == DataSetFormat.json
+
+
+def test_dataset_to_dict_matches_response_model() -> None:
+    stat_set = _stat_set()
+
+    content = json.loads(encode_dataset(stat_set))
+
+    assert content == json.loads(stat_set.model_dump_json(exclude_unset=True))
+    assert dataset_to_dict(content) is content
+
+
+def test_dataset_coder_round_trip() -> None:
+    stat_set = _stat_set()
+
+    cached = DataSetCoder.decode(DataSetCoder.encode(stat_set))
+
+    assert encode_dataset(cached) == encode_dataset(stat_set)
+
+
+def test_series_intervals() -> None:
+    start = datetime.fromisoformat("2024-01-01T10:00:00+10:00")
+
+    assert [str(i) for i in series_intervals(start, 3, "5m")] == [
+        "2024-01-01T00:00:00.000",
+        "2024-01-01T00:05:00.000",
+        "2024-01-01T00:10:00.000",
+    ]
+    assert [str(i)[:10] for i in series_intervals("2024-01-01T00:00:00", 3, "1M")] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+
+
+@pytest.mark.skipif(not HAVE_ARROW, reason="pyarrow not installed")
+def test_dataset_to_arrow() -> None:
+    import pyarrow as pa
+
+    content = encode_dataset(_stat_set(), DataSetFormat.arrow)
+    table = pa.ipc.open_stream(content).read_all()
+
+    assert table.num_rows == 6
+    assert table.column("value").null_count == 1
+    assert b"opennem" in table.schema.metadata
+
+
+def test_dataset_to_parquet() -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    pa = pytest.importorskip("pyarrow")
+
+    table = pq.read_table(pa.BufferReader(encode_dataset(_stat_set(), DataSetFormat.parquet)))
+
+    assert table.num_rows == 6
+    assert table.column("value").to_pylist() == [100.0, None, 120.5, 1.5, 2.5, 3.5]
+    assert table.column("interval").to_pylist()[:2] == [
+        datetime.fromisoformat("2024-01-01T00:00:00+10:00"),
+        datetime.fromisoformat("2024-01-01T00:05:00+10:00"),
+    ]
+    assert set(table.column("code").to_pylist()) == {"BAYSW1", "BAYSW2"}
+    assert json.loads(table.schema.metadata[b"opennem"])["network"] == "nem"
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    # built once so created_at is the same across requests and the expected response
+    stat_set = _stat_set()
+    app.state.stat_set = stat_set
+
+    @app.get("/dataset", response_model=OpennemDataSet, response_model_exclude_unset=True)
+    @dataset_response
+    async def dataset_endpoint(redirect: bool = False) -> OpennemDataSet | RedirectResponse:
+        if redirect:
+            return RedirectResponse(url="https://opennem.org.au", status_code=302)
+
+        return stat_set
+
+    @app.get("/dataset/cached", response_model=OpennemDataSet, response_model_exclude_unset=True)
+    @dataset_response
+    @cache(expire=60, coder=DataSetCoder, namespace="dataset")
+    async def dataset_cached_endpoint() -> OpennemDataSet:
+        return stat_set
+
+    return app
+
+
+def test_dataset_response_json() -> None:
+    app = _app()
+    client = TestClient(app)
+
+    response = client.get("/dataset", headers={"Accept": "application/json"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["vary"] == "Accept"
+    assert response.json() == json.loads(app.state.stat_set.model_dump_json(exclude_unset=True))
+
+
+def test_dataset_response_cached() -> None:
+    init_response_cache("local")
+    client = TestClient(_app())
+
+    miss = client.get("/dataset/cached")
+    hit = client.get("/dataset/cached")
+
+    assert miss.headers["x-fastapi-cache"] == "MISS"
+    assert hit.headers["x-fastapi-cache"] == "HIT"
+    assert hit.headers["cache-control"].startswith("max-age=")
+    assert hit.content == miss.content
+
+    init_response_cache(None)
+
+
+def test_dataset_response_passes_through_responses() -> None:
+    client = TestClient(_app())
+
+    response = client.get("/dataset", params={"redirect": True}, follow_redirects=False)
+
+    assert response.status_code == 302
+
+
+@pytest.mark.parametrize(
+    ["accept", "media_type"],
+    [
+        ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.stream"),
+        ("application/vnd.apache.parquet", "application/vnd.apache.parquet"),
+    ],
+)
+def test_dataset_response_arrow(accept: str, media_type: str) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    client = TestClient(_app())
+
+    response = client.get("/dataset", headers={"Accept": accept})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+
+    if media_type == "application/vnd.apache.parquet":
+        table = pq.read_table(pa.BufferReader(response.content))
+    else:
+        table = pa.ipc.open_stream(response.content).read_all()
+
+    assert table.num_rows == 6
+
+
+@pytest.mark.skipif(HAVE_ARROW, reason="pyarrow installed")
+def test_dataset_response_not_acceptable() -> None:
+    client = TestClient(_app())
+
+    response = client.get("/dataset", headers={"Accept": "application/vnd.apache.arrow.stream"})
+
+    assert response.status_code == 406
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import text
+
+from opennem.api.stats.controllers import stream_query_result_columns, stream_query_results
+
+
+class _StubStreamResult:
+    def __init__(self, rows: list[tuple], partition_size: int) -> None:
+        self.rows = rows
+        self.partition_size = partition_size
+
+    async def partitions(self):
+        for i in range(0, len(self.rows), self.partition_size):
+            yield self.rows[i : i + self.partition_size]
+
+
+class _StubSession:
+    """Async session that streams canned rows"""
+
+    def __init__(self, rows: list[tuple]) -> None:
+        self.rows = rows
+        self.execution_options: dict = {}
+
+    async def stream(self, query):
+        self.execution_options = query.get_execution_options()
+        return _StubStreamResult(self.rows, partition_size=self.execution_options["yield_per"])
+
+
+_ROWS = [
+    (datetime(2024, 1, 1, 0, 0), "BAYSW1", 100.0, 5000.0, 90.0),
+    (datetime(2024, 1, 1, 0, 5), "BAYSW1", 110.0, 5500.0, 99.0),
+    (datetime(2024, 1, 1, 0, 5), "BAYSW2", None, None, None),
+]
+
+
+def test_stream_query_results_partitions() -> None:
+    session = _StubSession(_ROWS)
+
+    stats = asyncio.run(stream_query_results(session, text("select 1"), result_column=2, group_by_column=1, partition_size=2))  # type: ignore
+
+    assert session.execution_options["yield_per"] == 2
+    assert [(s.interval, s.group_by, s.result) for s in stats] == [(r[0], r[1], r[2]) for r in _ROWS]
+
+
+def test_stream_query_result_columns() -> None:
+    session = _StubSession(_ROWS)
+
+    energy, market_value, emissions = asyncio.run(
+        stream_query_result_columns(session, text("select 1"), result_columns=[2, 3, 4], group_by_column=1)  # type: ignore
+    )
+
+    assert [s.result for s in energy] == [100.0, 110.0, None]
+    assert [s.result for s in market_value] == [5000.0, 5500.0, None]
+    assert [s.result for s in emissions] == [90.0, 99.0, None]
+    assert all(s.group_by == "BAYSW2" for s in (energy[2], market_value[2], emissions[2]))
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from opennem.aggregates.facility_daily import _FACILITY_DAILY_RANGE_QUERY
+from opennem.schema.network import NetworkNEM
+from opennem.workers.backfill import (
+    BACKFILL_HANDLERS,
+    BackfillException,
+    BackfillJobType,
+    BackfillProgress,
+    create_backfill_job,
+    get_backfill_chunks,
+)
+
+
+def test_backfill_chunks_most_recent_first() -> None:
+    chunks = get_backfill_chunks(BackfillJobType.energy, datetime(2024, 1, 1), datetime(2024, 1, 20))
+
+    assert chunks == [
+        (datetime(2024, 1, 15), datetime(2024, 1, 20)),
+        (datetime(2024, 1, 8), datetime(2024, 1, 15)),
+        (datetime(2024, 1, 1), datetime(2024, 1, 8)),
+    ]
+
+    assert len(get_backfill_chunks(BackfillJobType.flows, datetime(2024, 1, 1), datetime(2024, 1, 3))) == 2
+    assert len(get_backfill_chunks(BackfillJobType.flows, datetime(2024, 1, 1), datetime(2024, 1, 3), timedelta(hours=6))) == 8
+
+
+def test_backfill_export_chunks_by_year() -> None:
+    chunks = get_backfill_chunks(BackfillJobType.exports, datetime(2022, 6, 1), datetime(2024, 1, 1))
+
+    assert chunks == [
+        (datetime(2023, 1, 1), datetime(2024, 1, 1)),
+        (datetime(2022, 6, 1), datetime(2023, 1, 1)),
+    ]
+
+
+def test_backfill_invalid_jobs() -> None:
+    with pytest.raises(BackfillException):
+        get_backfill_chunks(BackfillJobType.energy, datetime(2024, 1, 2), datetime(2024, 1, 1))
+
+    with pytest.raises(BackfillException, match="requires a network"):
+        asyncio.run(create_backfill_job(BackfillJobType.energy, datetime(2024, 1, 1), datetime(2024, 1, 2)))
+
+
+def test_backfill_progress() -> None:
+    progress = BackfillProgress(job_id="abc", total=10, done=4, failed=1, chunk_seconds=20)
+    progress.started -= 120
+
+    assert progress.chunks_per_minute == pytest.approx(2, rel=0.01)
+    assert progress.remaining == pytest.approx(timedelta(minutes=2.5), abs=timedelta(seconds=5))
+    assert str(progress).startswith("backfill abc: 4/10 chunks (1 failed) 2.0 chunks/min, 5.0s per chunk")
+
+
+class _Session:
+    """Async session that records the statements executed on it"""
+
+    def __init__(self) -> None:
+        self.executed: list[tuple[Any, dict[str, Any]]] = []
+        self.committed = False
+
+    async def __aenter__(self) -> "_Session":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+    async def execute(self, query: Any, params: dict[str, Any] | None = None) -> SimpleNamespace:
+        self.executed.append((query, params or {}))
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: []))
+
+    async def commit(self) -> None:
+        self.committed = True
+
+
+def test_backfill_aggregates_handler(monkeypatch: pytest.MonkeyPatch) -> None:
+    session = _Session()
+    fueltech_intervals: list[tuple[datetime, datetime]] = []
+
+    async def _run_network_fueltech_intervals(network: Any, date_start: datetime, date_end: datetime) -> int:
+        fueltech_intervals.append((date_start, date_end))
+        return 0
+
+    monkeypatch.setattr("opennem.settings.dry_run", False)
+    monkeypatch.setattr("opennem.aggregates.facility_daily.SessionLocalAsync", lambda: session)
+    monkeypatch.setattr("opennem.workers.backfill.run_network_fueltech_intervals", _run_network_fueltech_intervals)
+
+    date_start, date_end = datetime(2024, 1, 1), datetime(2024, 1, 8)
+    asyncio.run(BACKFILL_HANDLERS[BackfillJobType.aggregates](NetworkNEM, date_start, date_end, None))
+
+    assert fueltech_intervals == [(date_start, date_end)]
+    assert session.committed
+
+    # the chunk days are recalculated from the interval and energy columns
+    query, params = session.executed[0]
+    assert query is _FACILITY_DAILY_RANGE_QUERY
+    assert params == {"network_id": "NEM", "date_start": date_start, "date_end": date_end}
+    assert "fs.energy" in str(query) and "fs.interval" in str(query)
+    assert "eoi_quantity" not in str(query) and "trading_interval" not in str(query)
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import pytest
+
+from opennem.aggregates.changed_days import ChangedDay, ChangedDayAggregate, changed_days_from_records
+from opennem.aggregates.facility_daily import _FACILITY_DAILY_CHANGED_DAYS_QUERY, _FACILITY_DAILY_RANGE_QUERY
+from opennem.aggregates.network_demand import _network_demand_changed_days_template
+from opennem.schema.network import NetworkNEM, NetworkSchema
+from opennem.workers.daily import run_changed_day_aggregates
+
+DAY = date(2024, 1, 1)
+MIDNIGHT = datetime(2024, 1, 1)
+
+
+def _at(minutes: int) -> datetime:
+    return MIDNIGHT + timedelta(minutes=minutes)
+
+
+def test_changed_days_from_scada_records() -> None:
+    records = [
+        {"network_id": "NEM", "interval": _at(0), "generated": 10.0},
+        {"network_id": "NEM", "interval": _at(5), "generated": 10.0},
+        {"network_id": "NEM", "interval": _at(60 * 24).isoformat(), "generated": 10.0},
+        {"network_id": "WEM", "interval": _at(30), "generated": 10.0},
+    ]
+
+    changed = changed_days_from_records(ChangedDayAggregate.facility_daily, records)
+
+    assert changed == {
+        ChangedDay(ChangedDayAggregate.facility_daily, "NEM", DAY),
+        ChangedDay(ChangedDayAggregate.facility_daily, "NEM", DAY + timedelta(days=1)),
+        ChangedDay(ChangedDayAggregate.facility_daily, "WEM", DAY),
+    }
+
+
+def test_changed_days_demand_interval_shift() -> None:
+    # the NEM interval ending at midnight is part of the previous day for demand
+    records = [
+        {"network_id": "NEM", "interval": _at(0), "demand": 100.0},
+        {"network_id": "NEM", "interval": _at(5), "demand": 100.0},
+    ]
+
+    changed = changed_days_from_records(ChangedDayAggregate.network_demand, records)
+
+    assert changed == {
+        ChangedDay(ChangedDayAggregate.network_demand, "NEM", DAY - timedelta(days=1)),
+        ChangedDay(ChangedDayAggregate.network_demand, "NEM", DAY),
+    }
+
+
+def test_changed_days_unknown_network() -> None:
+    records = [{"network_id": "INVALID", "interval": _at(0), "generated": 10.0}]
+
+    assert changed_days_from_records(ChangedDayAggregate.facility_daily, records) == set()
+
+
+def test_changed_days_claim_skips_locked_days() -> None:
+    # days locked by an ingest that hasn't committed are left for the next run
+    for query in [_FACILITY_DAILY_CHANGED_DAYS_QUERY, _network_demand_changed_days_template(12000, 5)]:
+        assert "for update skip locked" in str(query)
+        assert "using claimed" in str(query)
+
+
+def test_changed_day_aggregates_mirror_claimed_days(monkeypatch: pytest.MonkeyPatch) -> None:
+    mirrored: list[tuple[str, str, date, date]] = []
+
+    async def _facility_changed_days(network: NetworkSchema) -> list[date]:
+        return [DAY, DAY + timedelta(days=3)] if network == NetworkNEM else []
+
+    async def _demand_changed_days(network: NetworkSchema) -> int:
+        return 0
+
+    async def _mirror_table_range(table: Any, date_start: date, date_end: date, network: NetworkSchema) -> int:
+        mirrored.append((table.name, network.code, date_start, date_end))
+        return 1
+
+    monkeypatch.setattr("opennem.settings.clickhouse_mirror_enabled", True)
+    monkeypatch.setattr("opennem.workers.daily.run_aggregates_facility_changed_days", _facility_changed_days)
+    monkeypatch.setattr("opennem.workers.daily.run_aggregates_demand_changed_days", _demand_changed_days)
+    monkeypatch.setattr("opennem.workers.daily.mirror_table_range", _mirror_table_range)
+
+    asyncio.run(run_changed_day_aggregates())
+
+    # only the days the aggregate claimed are mirrored
+    assert mirrored == [
+        ("at_facility_daily", "NEM", DAY, DAY + timedelta(days=1)),
+        ("at_facility_daily", "NEM", DAY + timedelta(days=3), DAY + timedelta(days=4)),
+    ]
+
+
+def test_facility_daily_statements_return_days() -> None:
+    for query in [_FACILITY_DAILY_CHANGED_DAYS_QUERY, _FACILITY_DAILY_RANGE_QUERY]:
+        assert str(query).rstrip().endswith("select c.day from changed c order by 1")
@@ -0,0 +1,169 @@
+import os
+import shutil
+import subprocess
+from datetime import UTC, date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from opennem import settings
+from opennem.api.export.queries import energy_network_fueltech_clickhouse_query
+from opennem.api.time import human_to_interval
+from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.db.clickhouse_mirror import (
+    MIRROR_FACILITY_DAILY,
+    MIRROR_FACILITY_SCADA,
+    MIRROR_TABLES,
+    mirror_date_chunks,
+    use_clickhouse,
+)
+from opennem.schema.network import NetworkNEM
+
+CLICKHOUSE_LOCAL = shutil.which("clickhouse")
+
+
+def test_create_table_sql() -> None:
+    ddl = MIRROR_FACILITY_SCADA.create_table_sql()
+
+    assert ddl.startswith("CREATE TABLE IF NOT EXISTS facility_scada (")
+    assert "ENGINE = ReplacingMergeTree(_mirrored_at)" in ddl
+    assert "PARTITION BY toYYYYMM(interval)" in ddl
+    assert ddl.endswith("ORDER BY (network_id, facility_code, is_forecast, interval)")
+
+
+def test_mirror_tables_order_by_columns() -> None:
+    for table in MIRROR_TABLES.values():
+        assert set(table.order_by) <= set(table.column_names)
+        assert table.interval_column in table.column_names
+
+
+def test_source_query() -> None:
+    query = str(MIRROR_FACILITY_DAILY.source_query(has_network=True))
+
+    assert "cast(trading_day as date) as trading_day" in query
+    assert "trading_day < :date_end" in query
+    assert "network_id = :network_id" in query
+    assert "network_id" not in str(MIRROR_FACILITY_DAILY.source_query(has_network=False)).split("where")[1]
+
+
+def test_to_clickhouse_rows() -> None:
+    rows = MIRROR_FACILITY_SCADA.to_clickhouse_rows(
+        [(datetime(2024, 1, 1, 10, 5), "NEM", "BAYSW1", False, Decimal("100.5"), None, 8.375, 0)]
+    )
+
+    assert rows == [[datetime(2024, 1, 1, 10, 5, tzinfo=UTC), "NEM", "BAYSW1", False, 100.5, None, 8.375, 0]]
+    assert isinstance(rows[0][4], float)
+
+
+def test_mirror_date_chunks() -> None:
+    chunks = mirror_date_chunks(datetime(2024, 1, 1), datetime(2024, 1, 20), timedelta(days=7))
+
+    assert chunks == [
+        (datetime(2024, 1, 13), datetime(2024, 1, 20)),
+        (datetime(2024, 1, 6), datetime(2024, 1, 13)),
+        (datetime(2024, 1, 1), datetime(2024, 1, 6)),
+    ]
+
+
+def test_use_clickhouse(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "clickhouse_query_min_days", 90)
+
+    monkeypatch.setattr(settings, "clickhouse_query_routing", False)
+    assert not use_clickhouse(date(2023, 1, 1), date(2024, 1, 1))
+
+    monkeypatch.setattr(settings, "clickhouse_query_routing", True)
+    assert use_clickhouse(date(2023, 1, 1), date(2024, 1, 1))
+    assert not use_clickhouse(datetime(2024, 1, 1), datetime(2024, 2, 1))
+
+
+def _year_series() -> OpennemExportSeries:
+    return OpennemExportSeries(
+        start=datetime(2024, 1, 1, tzinfo=NetworkNEM.get_fixed_offset()),
+        end=datetime(2024, 3, 31, tzinfo=NetworkNEM.get_fixed_offset()),
+        network=NetworkNEM,
+        interval=human_to_interval("1M"),
+    )
+
+
+def test_energy_network_fueltech_clickhouse_query() -> None:
+    query, parameters = energy_network_fueltech_clickhouse_query(_year_series(), network_region="NSW1")
+
+    assert "from at_facility_daily as t final" in query
+    assert "step interval 1 month" in query
+    assert parameters == {
+        "network_ids": ["NEM"],
+        "date_min": date(2024, 1, 1),
+        "date_max": date(2024, 3, 31),
+        "network_region": "NSW1",
+    }
+
+
+def _clickhouse_local(query: str, parameters: dict[str, str] | None = None) -> str:
+    args = [CLICKHOUSE_LOCAL, "local", "--multiquery", "--query", query]
+    args += [f"--param_{k}={v}" for k, v in (parameters or {}).items()]
+
+    return subprocess.run(args, capture_output=True, check=True, text=True).stdout
+
+
+@pytest.mark.skipif(not CLICKHOUSE_LOCAL, reason="clickhouse-local not installed")
+def test_energy_query_against_clickhouse_local() -> None:
+    query, parameters = energy_network_fueltech_clickhouse_query(_year_series())
+
+    rows = f"""
+        insert into at_facility_daily ({", ".join(MIRROR_FACILITY_DAILY.column_names)})
+        values ('2024-01-05', 'NEM', 'NSW1', 'BAYSW1', 'coal_black', 1000, 50, 900),
+               ('2024-01-05', 'NEM', 'NSW1', 'BAYSW1', 'coal_black', 2000, 100, 1800),
+               ('2024-03-02', 'NEM', 'NSW1', 'BAYSW1', 'coal_black', 3000, 150, 2700),
+               ('2024-02-10', 'WEM', 'WEM', 'MUJA1', 'coal_black', 5000, 0, 0)
+    """
+
+    output = _clickhouse_local(
+        f"{MIRROR_FACILITY_DAILY.create_table_sql()}; {rows}; {query} format TSV",
+        {
+            "network_ids": str(parameters["network_ids"]),
+            "date_min": str(parameters["date_min"]),
+            "date_max": str(parameters["date_max"]),
+        },
+    )
+
+    # the later insert replaces the first for the same key and february is filled with nulls
+    assert [line.split("\t")[:3] for line in output.strip().splitlines()] == [
+        ["2024-01-01", "coal_black", "2"],
+        ["2024-02-01", "coal_black", "\\N"],
+        ["2024-03-01", "coal_black", "3"],
+    ]
+
+
+@pytest.mark.skipif(not os.environ.get("CLICKHOUSE_TEST_URL"), reason="CLICKHOUSE_TEST_URL not set")
+def test_mirror_tables_against_server() -> None:
+    from pydantic import AnyUrl
+
+    from opennem.db.clickhouse import clickhouse_client_factory
+
+    client = clickhouse_client_factory(AnyUrl(os.environ["CLICKHOUSE_TEST_URL"]))
+
+    for table in MIRROR_TABLES.values():
+        client.command(table.create_table_sql())
+        client.insert(
+            table.name,
+            table.to_clickhouse_rows([[_sample_value(c.type) for c in table.columns]]),
+            column_names=table.column_names,
+        )
+
+        assert client.command(f"select count() from {table.name} final") >= 1
+
+
+def _sample_value(column_type: str) -> object:
+    if column_type.startswith("DateTime"):
+        return datetime(2024, 1, 1, 10, 5)
+
+    if column_type == "Date":
+        return date(2024, 1, 1)
+
+    if column_type == "Bool":
+        return False
+
+    if "Float" in column_type:
+        return Decimal("1.5")
+
+    return "TEST"
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+import pytest
+
+from opennem.clients.apvi import POSTCODE_STATE_PREFIXES, parse_apvi_interval, rollup_apvi_response
+
+_PERFORMANCE = {
+    "20": {"2024-01-01T10:00:00Z": 50.0, "2024-01-01T10:05:00Z": 20.0},
+    "26": {"2024-01-01T10:00:00Z": 25.0, "2024-01-01T10:05:00Z": 0.0},
+    "30": {"2024-01-01T10:00:00Z": 10.0},
+    "60": {"2024-01-01T10:05:00Z": 100.0},
+}
+
+_CAPACITY = {"20": 100.0, "26": 40.0, "30": 200.0, "60": 50.0, "70": 12.0}
+
+
+def _rollup_loop(performance: dict, capacity: dict) -> dict[tuple[str, str], float]:
+    """Reference nested loop rollup"""
+    grouped: dict[tuple[str, str], float] = defaultdict(float)
+
+    for postcode_prefix, record in performance.items():
+        state = POSTCODE_STATE_PREFIXES[postcode_prefix[:1]]
+
+        for interval, value in record.items():
+            grouped[(state, interval)] += value / 100 * capacity[postcode_prefix]
+
+    return grouped
+
+
+def test_rollup_matches_loop() -> None:
+    rollup = rollup_apvi_response(_PERFORMANCE, _CAPACITY)
+    expected = _rollup_loop(_PERFORMANCE, _CAPACITY)
+
+    records = rollup.to_facility_scada()
+
+    assert len(records) == len(expected), "Only state intervals with data are emitted"
+
+    for (state, interval), generated in expected.items():
+        record = next(
+            r
+            for r in records
+            if r.facility_code == f"ROOFTOP_APVI_{state}" and r.trading_interval == parse_apvi_interval(interval)
+        )
+
+        assert record.generated == pytest.approx(generated)
+        assert record.eoi_quantity == pytest.approx(generated / 4)
+
+
+def test_rollup_state_capacities() -> None:
+    rollup = rollup_apvi_response(_PERFORMANCE, _CAPACITY)
+
+    assert rollup.capacities["NSW"] == 140.0
+    assert rollup.capacities["TAS"] == 12.0, "Capacity counted without performance data"
+    assert rollup.capacities["QLD"] == 0.0
+
+
+def test_rollup_server_latest() -> None:
+    rollup = rollup_apvi_response(_PERFORMANCE, _CAPACITY)
+
+    assert rollup.server_latest == parse_apvi_interval("2024-01-01T10:05:00Z")
+
+    forecast_set = rollup.to_forecast_set()
+
+    assert forecast_set.server_latest == rollup.server_latest
+    assert {i.state for i in forecast_set.intervals} == {"NSW", "VIC", "WA"}
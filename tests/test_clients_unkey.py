@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from opennem.clients.unkey import UnkeyUsageSync, UnkeyVerificationCache, UnkeyVerifiedKey
+from opennem.users.ratelimit import (
+    OPENNEM_RATELIMIT_ADMIN,
+    OPENNEM_RATELIMIT_PRO,
+    OPENNEM_RATELIMIT_USER,
+    LocalRateLimiter,
+    get_ratelimit_for_roles,
+)
+from opennem.users.schema import OpenNEMRoles, OpenNEMUser
+
+
+class _StubVerifier:
+    """Stands in for the unkey verify endpoint"""
+
+    def __init__(self, keys: dict[str, UnkeyVerifiedKey], delay: float = 0) -> None:
+        self.keys = keys
+        self.delay = delay
+        self.calls: list[str] = []
+
+    async def __call__(self, api_key: str) -> UnkeyVerifiedKey | None:
+        self.calls.append(api_key)
+        await asyncio.sleep(self.delay)
+        return self.keys.get(api_key)
+
+
+def _verified(key_id: str, remaining: int | None = None) -> UnkeyVerifiedKey:
+    return UnkeyVerifiedKey(user=OpenNEMUser(valid=True, id=key_id, roles=[OpenNEMRoles.user]), remaining=remaining)
+
+
+def _cache(verifier: _StubVerifier, usage: UnkeyUsageSync | None = None) -> UnkeyVerificationCache:
+    return UnkeyVerificationCache(verifier=verifier, usage=usage or UnkeyUsageSync(), maxsize=10, ttl=60, negative_ttl=60)
+
+
+def test_verification_cached() -> None:
+    verifier = _StubVerifier({"on_good": _verified("key_1")})
+    cache = _cache(verifier)
+
+    async def _run() -> list[OpenNEMUser | None]:
+        return [await cache.get("on_good") for _ in range(3)]
+
+    users = asyncio.run(_run())
+
+    assert all(u and u.id == "key_1" for u in users)
+    assert verifier.calls == ["on_good"], "Verified once then served from cache"
+
+
+def test_invalid_key_negative_cached() -> None:
+    verifier = _StubVerifier({})
+    cache = _cache(verifier)
+
+    async def _run() -> list[OpenNEMUser | None]:
+        return [await cache.get("on_bad") for _ in range(3)]
+
+    assert asyncio.run(_run()) == [None, None, None]
+    assert len(verifier.calls) == 1
+
+
+def test_concurrent_lookups_share_verification() -> None:
+    verifier = _StubVerifier({"on_good": _verified("key_1")}, delay=0.01)
+    cache = _cache(verifier)
+
+    async def _run() -> list[OpenNEMUser | None]:
+        return await asyncio.gather(*[cache.get("on_good") for _ in range(5)])
+
+    assert all(asyncio.run(_run()))
+    assert len(verifier.calls) == 1
+
+
+def test_verifier_errors_not_cached() -> None:
+    calls = 0
+
+    async def _failing(api_key: str) -> UnkeyVerifiedKey | None:
+        nonlocal calls
+        calls += 1
+        raise ConnectionError("unkey unreachable")
+
+    cache = UnkeyVerificationCache(verifier=_failing, usage=UnkeyUsageSync(), maxsize=10, ttl=60, negative_ttl=60)
+
+    async def _run() -> None:
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await cache.get("on_good")
+
+    asyncio.run(_run())
+
+    assert calls == 2
+
+
+def test_usage_limited_key_counted_locally() -> None:
+    usage = UnkeyUsageSync()
+    cache = _cache(_StubVerifier({"on_limited": _verified("key_1", remaining=3)}), usage=usage)
+
+    async def _run() -> list[OpenNEMUser | None]:
+        return [await cache.get("on_limited") for _ in range(6)]
+
+    users = asyncio.run(_run())
+
+    # the remote verification uses the first request, three more are served from cache
+    assert [bool(u) for u in users] == [True, True, True, True, False, False]
+    assert usage.pending == {"key_1": 3}
+
+
+def test_ratelimit_for_roles() -> None:
+    assert get_ratelimit_for_roles([OpenNEMRoles.anonymous, OpenNEMRoles.admin]) is OPENNEM_RATELIMIT_ADMIN
+    assert get_ratelimit_for_roles([OpenNEMRoles.pro]) is OPENNEM_RATELIMIT_PRO
+    assert get_ratelimit_for_roles([OpenNEMRoles.anonymous]) is OPENNEM_RATELIMIT_USER
+
+
+def test_local_ratelimiter_token_bucket() -> None:
+    limiter = LocalRateLimiter()
+    ratelimit = OPENNEM_RATELIMIT_ADMIN
+
+    async def _run() -> None:
+        now = 1_700_000_000_000
+
+        for _ in range(ratelimit.limit):
+            assert (await limiter.consume("key_1", ratelimit, now=now)).allowed
+
+        result = await limiter.consume("key_1", ratelimit, now=now + 500)
+        assert not result.allowed
+        assert result.remaining == 0
+        assert result.reset == now + ratelimit.refill_interval
+
+        assert (await limiter.consume("key_2", ratelimit, now=now + 500)).allowed, "Buckets are per key"
+
+        result = await limiter.consume("key_1", ratelimit, now=now + ratelimit.refill_interval)
+        assert result.allowed, "Bucket refilled after the interval"
+        assert result.remaining == ratelimit.limit - 1
+
+        result = await limiter.consume("key_1", ratelimit, now=now + ratelimit.refill_interval * 10)
+        assert result.remaining == ratelimit.limit - 1, "Refill is capped at the limit"
+
+    asyncio.run(_run())
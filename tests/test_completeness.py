@@ -0,0 +1,136 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Any
+
+import pandas as pd
+
+from opennem.core.completeness import (
+    CompletenessKey,
+    CompletenessMetric,
+    CompletenessSource,
+    DayBitmap,
+    bitmap_intervals,
+    completeness_from_records,
+    group_contiguous,
+)
+from opennem.db.bulk_insert_csv import index_inserted_records
+from opennem.db.models.opennem import BalancingSummary
+
+DAY = date(2024, 1, 1)
+MIDNIGHT = datetime(2024, 1, 1)
+
+
+def _at(minutes: int) -> datetime:
+    return MIDNIGHT + timedelta(minutes=minutes)
+
+
+def test_day_bitmap_bitstring() -> None:
+    bitmap = DayBitmap(size=8)
+    bitmap.set(0)
+    bitmap.set(3)
+
+    assert bitmap.to_bitstring() == "10010000"
+    assert DayBitmap.from_bitstring("10010000") == bitmap
+
+
+def test_completeness_from_scada_records() -> None:
+    records = [
+        {"network_id": "NEM", "interval": pd.Timestamp(_at(0)), "generated": 10.0, "energy": None, "is_forecast": False},
+        {"network_id": "NEM", "interval": pd.Timestamp(_at(5)), "generated": 10.0, "energy": 0.8, "is_forecast": False},
+        {"network_id": "NEM", "interval": pd.Timestamp(_at(10)), "generated": 10.0, "energy": 0.8, "is_forecast": True},
+    ]
+
+    bitmaps = completeness_from_records(CompletenessSource.facility_scada, records)
+
+    power = bitmaps[CompletenessKey("NEM", CompletenessSource.facility_scada, CompletenessMetric.power, DAY)]
+    energy = bitmaps[CompletenessKey("NEM", CompletenessSource.facility_scada, CompletenessMetric.energy, DAY)]
+
+    assert power.size == 288
+    assert [power.has(i) for i in range(3)] == [True, True, False]
+    assert [energy.has(i) for i in range(3)] == [False, True, False]
+
+
+def test_completeness_price_interval_size() -> None:
+    # WEM balancing summary holds 30 minute trading interval prices, NEM 5 minute dispatch prices
+    records = [
+        {"network_id": "WEM", "interval": _at(30), "network_region": "WEM", "price": 50.0},
+        {"network_id": "NEM", "interval": _at(35), "network_region": "NSW1", "price": 50.0},
+    ]
+
+    bitmaps = completeness_from_records(CompletenessSource.balancing_summary, records)
+    wem_price = bitmaps[CompletenessKey("WEM", CompletenessSource.balancing_summary, CompletenessMetric.price, DAY)]
+    nem_price = bitmaps[CompletenessKey("NEM", CompletenessSource.balancing_summary, CompletenessMetric.price, DAY)]
+
+    assert wem_price.size == 48
+    assert wem_price.has(1)
+    assert nem_price.size == 288
+    assert nem_price.has(7)
+
+
+class _Session:
+    """Session whose raw connection records the statements run on it"""
+
+    def __init__(self) -> None:
+        self.executed: list[tuple[Any, ...]] = []
+
+        async def _execute(*args: Any) -> None:
+            self.executed.append(args)
+
+        async def _raw_connection() -> SimpleNamespace:
+            return SimpleNamespace(driver_connection=SimpleNamespace(execute=_execute))
+
+        self._connection = SimpleNamespace(get_raw_connection=_raw_connection)
+
+    async def connection(self) -> SimpleNamespace:
+        return self._connection
+
+
+def test_index_inserted_records() -> None:
+    session = _Session()
+    records = [{"network_id": "NEM", "network_region": "NSW1", "interval": _at(5), "price": 50.0}]
+
+    asyncio.run(index_inserted_records(session, BalancingSummary, records))  # type: ignore
+
+    # completeness, then demand and priced facility changed days
+    assert len(session.executed) == 3
+    _, network_ids, sources, metrics, days, intervals = session.executed[0]
+    assert (network_ids, sources, metrics, days) == (["NEM"], ["balancing_summary"], ["price"], [DAY])
+    assert intervals[0][:3] == "010"
+    assert session.executed[1][1:] == (["network_demand"], ["NEM"], [DAY])
+    assert session.executed[2][1:] == (["NEM"], [DAY])
+
+    # regionsum records without a price only mark changed days
+    session.executed.clear()
+    records = [{"network_id": "NEM", "network_region": "NSW1", "interval": _at(5), "demand": 7000.0}]
+
+    asyncio.run(index_inserted_records(session, BalancingSummary, records))  # type: ignore
+    assert [len(args) for args in session.executed] == [4, 3]
+
+
+def test_bitmap_intervals_missing_required() -> None:
+    power, energy = DayBitmap(size=288), DayBitmap(size=288)
+
+    for i in range(6):
+        power.set(i)
+
+    energy.set(0)
+    energy.set(5)
+
+    gaps = bitmap_intervals({DAY: energy}, _at(0), _at(60), 5, present=False, required={DAY: power})
+    assert gaps == [_at(5), _at(10), _at(15), _at(20)]
+
+    # days missing from the index are gaps in full
+    missing = bitmap_intervals({}, _at(-10), _at(10), 5, present=False)
+    assert missing == [_at(-10), _at(-5), _at(0), _at(5)]
+
+
+def test_group_contiguous() -> None:
+    intervals = [_at(0), _at(5), _at(10), _at(30), _at(35), _at(40), _at(45)]
+
+    assert group_contiguous(intervals, 5) == [(_at(0), _at(10)), (_at(30), _at(45))]
+    assert group_contiguous(intervals, 5, max_span=timedelta(minutes=10)) == [
+        (_at(0), _at(10)),
+        (_at(30), _at(40)),
+        (_at(45), _at(45)),
+    ]
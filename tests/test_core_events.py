@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from opennem.core.events import EventBus, IntervalEvent, LocalEventState
+from opennem.settings_schema import OpennemSettings, SettingsException
+from opennem.workers.lanes import WorkerEventLoop
+
+_INTERVAL = datetime.fromisoformat("2024-01-01T10:05:00+10:00")
+
+
+def _event(stage: str, network_id: str = "NEM", interval: datetime = _INTERVAL) -> IntervalEvent:
+    return IntervalEvent(network_id=network_id, interval=interval, stage=stage)
+
+
+def test_subscriber_waits_for_all_required_stages() -> None:
+    bus = EventBus(state=LocalEventState())
+    runs: list[IntervalEvent] = []
+
+    @bus.subscribe("flows", requires={"energy", "dispatch_is"})
+    async def _flows(event: IntervalEvent) -> None:
+        runs.append(event)
+
+    async def _run() -> None:
+        assert not await bus.publish(_event("energy")), "Waiting on dispatch_is"
+        assert len(await bus.publish(_event("dispatch_is"))) == 1
+        await bus.drain()
+
+    asyncio.run(_run())
+
+    assert len(runs) == 1
+
+
+def test_subscriber_runs_once_per_interval() -> None:
+    bus = EventBus(state=LocalEventState())
+    runs: list[IntervalEvent] = []
+
+    @bus.subscribe("energy", requires={"dispatch_scada"}, networks={"NEM"})
+    async def _energy(event: IntervalEvent) -> None:
+        runs.append(event)
+
+    async def _run() -> None:
+        await bus.publish(_event("dispatch_scada"))
+        await bus.publish(_event("dispatch_scada"))
+        await bus.publish(_event("dispatch_scada", network_id="WEM"))
+        await bus.publish(_event("dispatch_scada", interval=datetime.fromisoformat("2024-01-01T10:10:00+10:00")))
+        await bus.drain()
+
+    asyncio.run(_run())
+
+    assert len(runs) == 2, "Duplicate publish and other networks do not trigger a run"
+
+
+def test_subscribers_chain() -> None:
+    bus = EventBus(state=LocalEventState())
+    stages: list[str] = []
+
+    @bus.subscribe("energy", requires={"dispatch_scada"})
+    async def _energy(event: IntervalEvent) -> None:
+        stages.append("energy")
+        await bus.publish(_event("energy"))
+
+    @bus.subscribe("export", requires={"energy"})
+    async def _export(event: IntervalEvent) -> None:
+        stages.append("export")
+
+    async def _run() -> None:
+        await bus.publish(_event("dispatch_scada"))
+        await bus.drain()
+
+    asyncio.run(_run())
+
+    assert stages == ["energy", "export"]
+
+
+def test_subscribers_run_on_subscriber_loop() -> None:
+    # the publisher returns without waiting on the subscribers, which run on the worker loop
+    subscriber_loop = WorkerEventLoop(name="test-subscriber-loop")
+    bus = EventBus(state=LocalEventState(), subscriber_loop=subscriber_loop.get_loop)
+    release = threading.Event()
+    loops: list[asyncio.AbstractEventLoop] = []
+
+    @bus.subscribe("export", requires={"dispatch_scada"})
+    async def _export(event: IntervalEvent) -> None:
+        await asyncio.to_thread(release.wait, 5)
+        loops.append(asyncio.get_running_loop())
+
+    async def _run() -> None:
+        assert await bus.publish(_event("dispatch_scada")) == ["export"]
+        assert not loops, "Publish does not wait for the subscriber"
+
+        release.set()
+        await bus.drain()
+
+    asyncio.run(_run())
+
+    assert loops == [subscriber_loop.get_loop()]
+
+
+def test_local_state_is_bounded() -> None:
+    state = LocalEventState(max_keys=2)
+
+    async def _run() -> None:
+        for key in ["a", "b", "c"]:
+            await state.mark(key, "stage")
+
+        assert await state.mark("a", "other") == {"other"}, "Oldest key evicted"
+
+    asyncio.run(_run())
+
+
+def test_stages_join_on_network_interval() -> None:
+    bus = EventBus(state=LocalEventState())
+    runs: list[IntervalEvent] = []
+
+    @bus.subscribe("flows", requires={"energy", "dispatch_is"})
+    async def _flows(event: IntervalEvent) -> None:
+        runs.append(event)
+
+    async def _run() -> None:
+        await bus.publish(_event("energy", interval=datetime.fromisoformat("2024-01-01T10:05:00")))
+        await bus.publish(_event("dispatch_is", interval=datetime.fromisoformat("2024-01-01T00:05:00+00:00")))
+        await bus.drain()
+
+    asyncio.run(_run())
+
+    assert len(runs) == 1, "Naive network time and aware intervals are the same interval"
+
+
+def test_event_bus_backend_must_be_shared() -> None:
+    with pytest.raises(SettingsException):
+        OpennemSettings(event_bus_backend="local")
+
+    assert OpennemSettings().event_bus_backend is None, "Disabled by default"
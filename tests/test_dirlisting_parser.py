@@ -3,7 +3,14 @@ from pathlib import Path
 
 import pytest
 
-from opennem.core.parsers.dirlisting import DirlistingEntry, parse_dirlisting_datetime, parse_dirlisting_line
+from opennem.core.parsers.dirlisting import (
+    DirectoryListing,
+    DirlistingEntry,
+    DirlistingEntryType,
+    parse_dirlisting,
+    parse_dirlisting_datetime,
+    parse_dirlisting_line,
+)
 
 from .conftest import PATH_TESTS_FIXTURES
 
@@ -68,3 +75,47 @@ def test_dirlisting_line(line: str, result: dict[str, str | datetime | int]) ->
     dirlisting_line_result = parse_dirlisting_line(line)
 
     assert result_model == dirlisting_line_result, "Models match for dirlisting line"
+
+
+@pytest.fixture
+def nemweb_dirlisting() -> DirectoryListing:
+    return parse_dirlisting(load_fixture(), url="http://nemweb.com.au/Reports/Current/DispatchIS_Reports/")
+
+
+def test_parse_dirlisting(nemweb_dirlisting: DirectoryListing) -> None:
+    assert nemweb_dirlisting.count > 0, "Got lines"
+    assert nemweb_dirlisting.directory_count == 1, "Got the duplicate directory"
+    assert nemweb_dirlisting.file_count == nemweb_dirlisting.count - 1, "Everything else is a file"
+    assert [i.entry_type for i in nemweb_dirlisting.get_directories()] == [DirlistingEntryType.directory]
+    assert all(i.entry_type == DirlistingEntryType.file for i in nemweb_dirlisting.get_files())
+
+
+def test_dirlisting_aemo_intervals(nemweb_dirlisting: DirectoryListing) -> None:
+    intervals = [datetime.fromisoformat("2021-11-08T14:40:00"), datetime.fromisoformat("2021-11-08T14:35:00")]
+
+    entries = nemweb_dirlisting.get_files_aemo_intervals(intervals)
+
+    assert [i.aemo_interval_date.date for i in entries if i.aemo_interval_date] == sorted(intervals), "Matched in listing order"
+    assert nemweb_dirlisting.get_files_aemo_intervals([datetime.fromisoformat("2001-01-01T00:00:00")]) == []
+
+
+def test_dirlisting_modified_range(nemweb_dirlisting: DirectoryListing) -> None:
+    start = datetime.fromisoformat("2021-11-08T14:30:00")
+    end = datetime.fromisoformat("2021-11-08T14:45:00")
+
+    entries = nemweb_dirlisting.get_files_modified_between(start, end)
+
+    assert len(entries) == 4, "Range is inclusive"
+    assert all(start <= i.modified_date <= end for i in entries)
+    assert len(nemweb_dirlisting.get_files_modified_since(start)) == nemweb_dirlisting.file_count - 1, "Since is exclusive"
+
+
+def test_dirlisting_index_reset_on_filter(nemweb_dirlisting: DirectoryListing) -> None:
+    interval = datetime.fromisoformat("2021-11-08T14:35:00")
+
+    assert len(nemweb_dirlisting.get_files_aemo_intervals([interval])) == 1
+
+    nemweb_dirlisting.apply_filter(".*_202111081440_.*")
+
+    assert nemweb_dirlisting.count == 1
+    assert nemweb_dirlisting.get_files_aemo_intervals([interval]) == [], "Index rebuilt after filter"
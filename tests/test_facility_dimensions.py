@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from opennem.controllers.nem import generate_facility_scada
+from opennem.core.facility.dimensions import FacilityDimensions, FacilityDimensionStore
+
+_FACILITIES = [
+    {
+        "code": "BAYSW1",
+        "network_id": "NEM",
+        "network_region": "NSW1",
+        "fueltech_id": "coal_black",
+        "emissions_factor_co2": 0.9,
+        "interconnector": False,
+    },
+    {
+        "code": "ANGAST1",
+        "network_id": "NEM",
+        "network_region": "SA1",
+        "fueltech_id": "distillate",
+        "emissions_factor_co2": None,
+        "interconnector": None,
+    },
+    {
+        "code": "V-SA",
+        "network_id": "NEM",
+        "network_region": "VIC1",
+        "fueltech_id": None,
+        "interconnector": True,
+        "interconnector_region_from": "VIC1",
+        "interconnector_region_to": "SA1",
+    },
+]
+
+
+def _dimensions(version: str = "1") -> FacilityDimensions:
+    return FacilityDimensions.from_records(version, _FACILITIES, aliases={"ANGAS1": "ANGAST1", "BAYSW1": "OTHER"})
+
+
+def test_facility_dimensions_lookup() -> None:
+    dimensions = _dimensions()
+
+    columns = dimensions.lookup(["V-SA", "BAYSW1", "MISSING", "ANGAS1"])
+
+    assert columns["network_region"].tolist() == ["VIC1", "NSW1", None, "SA1"]
+    assert columns["interconnector"].tolist() == [True, False, False, False]
+    assert columns["interconnector_region_to"].tolist() == ["SA1", None, None, None]
+    assert np.isnan(columns["emissions_factor_co2"][[2, 3]]).all()
+    assert columns["emissions_factor_co2"][1] == 0.9
+
+
+def test_facility_dimensions_enrich() -> None:
+    records = [{"facility_code": "BAYSW1", "generated": 1.0}, {"facility_code": "MISSING", "generated": 2.0}]
+
+    _dimensions().enrich(records, fields=["network_region", "fueltech_id"])
+
+    assert records == [
+        {"facility_code": "BAYSW1", "generated": 1.0, "network_region": "NSW1", "fueltech_id": "coal_black"},
+        {"facility_code": "MISSING", "generated": 2.0, "network_region": None, "fueltech_id": None},
+    ]
+
+
+def test_facility_dimensions_enrich_frame() -> None:
+    df = pd.DataFrame({"facility_code": ["ANGAST1", "V-SA"], "generated": [1.0, 2.0]})
+
+    _dimensions().enrich_frame(df, fields=["interconnector", "interconnector_region_from"])
+
+    assert df["interconnector"].tolist() == [False, True]
+    assert df["interconnector_region_from"].tolist() == [None, "VIC1"]
+
+
+def test_facility_dimensions_rooftop_facility_codes() -> None:
+    dimensions = FacilityDimensions.from_records(
+        "1",
+        [
+            *_FACILITIES,
+            {"code": "ROOFTOP_NEM_NSW", "network_id": "AEMO_ROOFTOP", "network_region": "NSW1", "fueltech_id": "solar_rooftop"},
+            {"code": "ROOFTOP_APVI_SA", "network_id": "APVI", "network_region": "SA1", "fueltech_id": "solar_rooftop"},
+        ],
+    )
+
+    assert dimensions.rooftop_facility_codes(["NSW1", "SA1", "QLD1"]).tolist() == ["ROOFTOP_NEM_NSW", None, None]
+    assert _dimensions().rooftop_facility_codes(["NSW1"]).tolist() == [None]
+
+
+def test_generate_facility_scada_resolves_retired_duids() -> None:
+    interval = datetime(2024, 1, 1, 0, 5)
+    records = [
+        {"settlementdate": interval, "duid": "ANGAS1", "scadavalue": 10.0},
+        {"settlementdate": interval, "duid": "ANGAS2", "scadavalue": 5.0},
+        {"settlementdate": interval, "duid": "BAYSW1", "scadavalue": 100.0},
+    ]
+    dimensions = FacilityDimensions.from_records("1", _FACILITIES, aliases={"ANGAS1": "ANGAST1", "ANGAS2": "ANGAST1"})
+
+    facility_scada = generate_facility_scada(records, dimensions=dimensions)
+
+    assert {r["facility_code"]: r["generated"] for r in facility_scada} == {"ANGAST1": 15.0, "BAYSW1": 100.0}
+    assert {r["facility_code"] for r in generate_facility_scada(records)} == {"ANGAS1", "ANGAS2", "BAYSW1"}
+
+
+def test_facility_dimension_store_reloads_on_registry_change() -> None:
+    class _Store(FacilityDimensionStore):
+        def __init__(self) -> None:
+            super().__init__(refresh=60, clock=lambda: self.now)
+            self.now = 0.0
+            self.version = "1"
+            self.loads = 0
+
+        async def _registry_version(self) -> str:
+            return self.version
+
+        async def _load(self, version: str) -> FacilityDimensions:
+            self.loads += 1
+            return _dimensions(version)
+
+    store = _Store()
+
+    async def _run() -> None:
+        await asyncio.gather(*[store.get() for _ in range(5)])
+        assert store.loads == 1
+
+        store.version = "2"
+        assert (await store.get()).version == "1"
+
+        store.now += 60
+        assert (await store.get()).version == "2"
+
+        # unchanged registry isn't loaded again
+        store.now += 60
+        await store.get()
+        assert store.loads == 2
+
+        store.version = "3"
+        store.invalidate()
+        assert (await store.get()).version == "3"
+
+    asyncio.run(_run())
@@ -0,0 +1,71 @@
+import pytest
+
+from opennem.core.profiler import LatencyHistogram, ProfileKind, TaskProfiler
+
+
+def test_latency_histogram_percentiles() -> None:
+    histogram = LatencyHistogram()
+
+    for value in range(1, 10_001):
+        histogram.record(value)
+
+    assert histogram.count == 10_000
+    assert histogram.max == 10_000
+
+    # log-linear buckets keep values within a few percent
+    for percentile in [50, 95, 99]:
+        assert histogram.percentile(percentile) == pytest.approx(percentile * 100, rel=0.04)
+
+    assert histogram.percentile(100) == 10_000
+
+
+def test_latency_histogram_merge_and_buckets() -> None:
+    first, second = LatencyHistogram(), LatencyHistogram()
+
+    for value in [5, 1_000, 250_000]:
+        first.record(value)
+
+    second.record(2_000_000, error=True)
+    first.merge(second)
+
+    restored = LatencyHistogram.from_buckets({str(k): v for k, v in first.buckets.items()}, errors=1, max=first.max)
+
+    assert restored.count == first.count == 4
+    assert restored.errors == 1
+    assert restored.percentile(50) == first.percentile(50)
+    assert restored.percentile(100) == 2_000_000
+
+
+def test_task_profiler_span_stats() -> None:
+    profiler = TaskProfiler(buffer_size=100, flush_interval=60)
+
+    profiler.record(ProfileKind.crawler, "AEMONemDispatchScada", 0.5)
+    profiler.record(ProfileKind.crawler, "AEMONemDispatchScada", 1.5)
+
+    with pytest.raises(ValueError):
+        with profiler.span(ProfileKind.task, "failing_task"):
+            raise ValueError("task failed")
+
+    crawlers = profiler.stats(kind=ProfileKind.crawler)
+
+    assert len(crawlers) == 1
+    assert crawlers[0].count == 2
+    assert crawlers[0].mean == pytest.approx(1.0)
+    assert crawlers[0].max == pytest.approx(1.5, rel=0.01)
+
+    tasks = profiler.stats(kind=ProfileKind.task)
+
+    assert tasks[0].name == "failing_task"
+    assert tasks[0].errors == 1
+
+
+def test_task_profiler_ring_buffer_drops_oldest() -> None:
+    profiler = TaskProfiler(buffer_size=3, flush_interval=60)
+
+    for duration in [1, 2, 3, 4, 5]:
+        profiler.record(ProfileKind.task, "task", duration)
+
+    stats = profiler.stats()
+
+    assert stats[0].count == 3
+    assert stats[0].mean == pytest.approx(4, rel=0.01)
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from opennem.api.export.queries import (
+    demand_network_region_query,
+    energy_network_fueltech_query,
+    interconnector_flow_network_regions_query,
+    network_demand_query,
+    power_and_emissions_network_fueltech_query,
+    power_network_fueltech_query,
+    power_network_interconnector_emissions_query,
+    power_network_rooftop_query,
+    price_network_query,
+)
+from opennem.api.time import human_to_interval, human_to_period
+from opennem.controllers.output.schema import OpennemExportSeries
+from opennem.queries import energy as energy_queries
+from opennem.queries.emissions import get_emission_factor_region_query
+from opennem.queries.price import get_network_region_price_query
+from opennem.queries.summary import get_daily_fueltech_summary_query
+from opennem.queries.tod import get_time_of_day_query
+from opennem.queries.utils import network_time
+from opennem.schema.network import NetworkNEM, NetworkWEM
+
+QUERY_BUILDERS = [
+    power_network_fueltech_query,
+    power_network_rooftop_query,
+    power_and_emissions_network_fueltech_query,
+    power_network_interconnector_emissions_query,
+    interconnector_flow_network_regions_query,
+    price_network_query,
+    network_demand_query,
+    demand_network_region_query,
+]
+
+
+def _time_series(end: datetime, interval: str = "5m", period: str = "7d") -> OpennemExportSeries:
+    return OpennemExportSeries(
+        start=end - timedelta(days=7),
+        end=end,
+        network=NetworkNEM,
+        interval=human_to_interval(interval),
+        period=human_to_period(period),
+    )
+
+
+@pytest.mark.parametrize("query_builder", QUERY_BUILDERS)
+@pytest.mark.parametrize("network_region", [None, "NSW1"])
+def test_export_query_text_is_stable(query_builder, network_region: str | None) -> None:
+    first = query_builder(
+        time_series=_time_series(datetime.fromisoformat("2024-01-08T00:00:00+10:00")), network_region=network_region
+    )
+    second = query_builder(
+        time_series=_time_series(datetime.fromisoformat("2024-03-15T12:30:00+10:00")), network_region=network_region
+    )
+
+    assert first.text == second.text, "Same SQL for each call so statement caches are reused"
+    assert first.compile().params != second.compile().params
+    assert "2024" not in first.text
+
+    if network_region:
+        assert first.compile().params["network_region"] == network_region
+
+
+def test_energy_query_binds_network_dates() -> None:
+    query = energy_network_fueltech_query(_time_series(datetime.fromisoformat("2024-01-08T00:00:00+10:00"), "1d", "1Y"))
+
+    params = query.compile().params
+
+    assert "cast(:date_max as date)" in query.text
+    assert params["date_max"] == datetime.fromisoformat("2024-01-08T00:00:00").date()
+    assert params["network_ids"] == ["NEM"]
+
+
+def test_price_and_emission_factor_queries_bind_values() -> None:
+    date_max = datetime.fromisoformat("2024-01-08T00:00:00+10:00")
+    interval = human_to_interval("5m")
+
+    price = get_network_region_price_query(NetworkNEM, date_max - timedelta(hours=1), date_max, interval, "nsw1")
+    emission_factor = get_emission_factor_region_query(date_max - timedelta(hours=1), date_max, interval, NetworkNEM, "nsw1")
+
+    for query in (price, emission_factor):
+        params = query.compile().params
+
+        assert params["network_region"] == "NSW1"
+        assert params["date_max"] == network_time(date_max)
+        assert params["date_max"].tzinfo is None
+
+
+def test_templates_built_once_per_shape() -> None:
+    time_series = _time_series(datetime.fromisoformat("2024-01-08T00:00:00+10:00"))
+
+    first = power_network_fueltech_query(time_series=time_series)
+    second = power_network_fueltech_query(time_series=time_series, network_region="NSW1")
+    third = power_network_fueltech_query(time_series=time_series, network_region="VIC1")
+
+    assert first.text != second.text
+    assert second.text is third.text
+
+
+def test_daily_summary_queries_bind_values() -> None:
+    days = [datetime.fromisoformat("2024-01-08T00:00:00"), datetime.fromisoformat("2024-03-15T00:00:00")]
+
+    for builder in (get_daily_fueltech_summary_query, get_time_of_day_query):
+        first, second = (builder(day=day, network=NetworkNEM) for day in days)
+        params = first.compile().params
+
+        assert first.text == second.text
+        assert "2024" not in first.text and "'NEM'" not in first.text
+        assert params["date_min"] == days[0] and params["date_min"].tzinfo is None
+        assert "battery_discharging" in params["fueltechs_excluded"]
+
+    summary = get_daily_fueltech_summary_query(day=days[0], network=NetworkNEM).compile().params
+    assert summary["day_min"] == datetime.fromisoformat("2024-01-08T00:00:00+10:00")
+    assert summary["network_ids"] == ["NEM", "AEMO_ROOFTOP"]
+
+
+def test_milestone_energy_queries_bind_networks() -> None:
+    date_start = datetime.fromisoformat("2024-01-08T00:00:00")
+
+    for builder in (
+        energy_queries.fueltech_interval_energy_emissions_query,
+        energy_queries.fueltech_generated_energy_emissions_query,
+    ):
+        nem = builder(NetworkNEM, "1 hour", date_start, date_start + timedelta(days=1), region_group=True)
+        wem = builder(NetworkWEM, "1 hour", date_start, date_start + timedelta(days=1), region_group=True)
+
+        assert "'NEM'" not in nem.text and "'WEM'" not in wem.text
+        assert nem.compile().params["network_ids"] == ["NEM", "AEMO_ROOFTOP", "AEMO_ROOFTOP_BACKFILL"]
+        assert "network_regions" not in nem.compile().params
+        assert wem.compile().params["network_regions"] == ["WEM", "WEMDE"]
+
+
+def test_daily_energy_query_binds_network_dates() -> None:
+    time_series = _time_series(datetime.fromisoformat("2024-01-08T00:00:00+10:00"), "1d", "1Y")
+
+    query = energy_queries.energy_network_fueltech_query(NetworkNEM, time_series, network_region="NSW1")
+    params = query.compile().params
+
+    assert "'NSW1'" not in query.text
+    assert params["date_max"] == datetime.fromisoformat("2024-01-08T00:00:00").date()
+    assert (params["network_ids"], params["network_region"]) == (["NEM"], "NSW1")
@@ -1,6 +1,7 @@
 import pytest
 
-from opennem.importer.rooftop import rooftop_remap_regionids
+from opennem.core.facility.dimensions import FacilityDimensions
+from opennem.importer.rooftop import rooftop_remap_facility_codes, rooftop_remap_regionids
 
 
 @pytest.mark.parametrize(
@@ -33,3 +34,30 @@ def test_remap_region_code(region_code: str, region_code_expected: str) -> None:
 def test_rooftop_remap_regionids(rooftop_record: dict, rooftop_record_expected: dict) -> None:
     rooftop_record_remapped = rooftop_remap_regionids(rooftop_record)
     assert rooftop_record_remapped == rooftop_record_expected
+
+
+def test_rooftop_remap_facility_codes(caplog: pytest.LogCaptureFixture) -> None:
+    dimensions = FacilityDimensions.from_records(
+        "1",
+        [
+            {
+                "code": f"ROOFTOP_NEM_{state}",
+                "network_id": "AEMO_ROOFTOP",
+                "network_region": f"{state}1",
+                "fueltech_id": "solar_rooftop",
+            }
+            for state in ["NSW", "SA"]
+        ]
+        + [{"code": "ROOFTOP_APVI_QLD", "network_id": "APVI", "network_region": "QLD1", "fueltech_id": "solar_rooftop"}],
+    )
+    records = [{"facility_code": "NSW1"}, {"facility_code": "QLD1"}, {"facility_code": "QLDC"}, {"facility_code": "SA1"}]
+
+    assert rooftop_remap_facility_codes(records, dimensions) == [
+        {"facility_code": "ROOFTOP_NEM_NSW"},
+        {"facility_code": "ROOFTOP_NEM_SA"},
+    ]
+
+    # QLD1 has no AEMO rooftop facility in the registry. sub-regions like QLDC are dropped quietly
+    assert [r.getMessage() for r in caplog.records if r.levelname == "WARNING"] == [
+        "No rooftop facility in the registry for region QLD1. Dropped 1 rooftop records"
+    ]
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from opennem.core.scada_energy import ENERGY_QUALITY_CALCULATED, ScadaEnergyCache
+from opennem.workers.energy import _group_pending_energy
+
+
+class _StoredScadaEnergyCache(ScadaEnergyCache):
+    """Energy cache reading stored scada from a dict in place of the database"""
+
+    def __init__(self, stored: dict[tuple[str, bool, datetime], float | None]) -> None:
+        super().__init__()
+        self.stored = stored
+        self.loads: list[list[str]] = []
+
+    async def _load(self, network_id, facility_codes, date_start, date_end):
+        self.loads.append(facility_codes)
+
+        return {k: v for k, v in self.stored.items() if k[0] in facility_codes and date_start <= k[2] <= date_end}
+
+
+def _records(interval: datetime, values: dict[str, float], network_id: str = "NEM") -> list[dict]:
+    return [
+        {
+            "network_id": network_id,
+            "interval": pd.Timestamp(interval),
+            "facility_code": code,
+            "generated": value,
+            "is_forecast": False,
+        }
+        for code, value in values.items()
+    ]
+
+
+def test_energy_seeded_from_stored_then_cached() -> None:
+    start = datetime(2024, 1, 1, 10, 0)
+    cache = _StoredScadaEnergyCache({("BAYSW1", False, start): 600.0})
+
+    first = _records(start + timedelta(minutes=5), {"BAYSW1": 660.0, "NEWGEN1": 120.0})
+    assert asyncio.run(cache.calculate(first)) == []
+
+    # trapezoid over the previous interval and zero for a facility with no previous value
+    assert first[0]["energy"] == (600 + 660) / 2 / 12
+    assert first[1]["energy"] == 120 / 2 / 12
+    assert {r["energy_quality_flag"] for r in first} == {ENERGY_QUALITY_CALCULATED}
+
+    second = _records(start + timedelta(minutes=10), {"BAYSW1": 720.0, "NEWGEN1": 240.0})
+    asyncio.run(cache.calculate(second))
+
+    assert second[0]["energy"] == (660 + 720) / 2 / 12
+    assert cache.loads == [["BAYSW1", "NEWGEN1"]]
+
+
+def test_energy_within_batch() -> None:
+    start = datetime(2024, 1, 1, 10, 0)
+    cache = _StoredScadaEnergyCache({})
+
+    records = _records(start, {"BAYSW1": 100.0}) + _records(start + timedelta(minutes=5), {"BAYSW1": 200.0})
+    asyncio.run(cache.calculate(records))
+
+    assert records[1]["energy"] == (100 + 200) / 2 / 12
+
+
+def test_late_record_repairs_stored_next_interval() -> None:
+    start = datetime(2024, 1, 1, 10, 0)
+    cache = _StoredScadaEnergyCache({("BAYSW1", False, start): 600.0, ("BAYSW1", False, start + timedelta(minutes=10)): 700.0})
+
+    asyncio.run(cache.calculate(_records(start + timedelta(minutes=10), {"BAYSW1": 700.0})))
+
+    late = _records(start + timedelta(minutes=5), {"BAYSW1": 650.0})
+    repairs = asyncio.run(cache.calculate(late))
+
+    assert late[0]["energy"] == (600 + 650) / 2 / 12
+    assert len(repairs) == 1
+    assert repairs[0].network_id == "NEM"
+    assert repairs[0].facility_codes == {"BAYSW1"}
+    assert repairs[0].date_start == repairs[0].date_end == start + timedelta(minutes=10)
+
+    # the cache keeps the latest interval
+    assert cache.get(("NEM", "BAYSW1", False)) == (start + timedelta(minutes=10), 700.0)
+
+
+def test_energy_network_interval_size() -> None:
+    start = datetime(2024, 1, 1, 10, 0)
+    cache = _StoredScadaEnergyCache({("NSW1", False, start): 1000.0})
+
+    records = _records(start + timedelta(minutes=30), {"NSW1": 2000.0}, network_id="AEMO_ROOFTOP")
+    asyncio.run(cache.calculate(records))
+
+    assert records[0]["energy"] == (1000 + 2000) / 2 / 2
+
+
+def test_pending_energy_grouped_by_facility_range() -> None:
+    # facilities written in the same batch are repaired together over their own pending intervals
+    start, end = datetime(2024, 1, 1, 10, 0), datetime(2024, 1, 1, 10, 30)
+    pending = [
+        ("WEM", "FAC_A", start, end),
+        ("WEM", "FAC_B", start, end),
+        ("WEM", "FAC_C", start, start),
+        ("APVI", "ROOFTOP_APVI_WA", start, end),
+    ]
+
+    assert _group_pending_energy(pending) == {
+        ("WEM", start, end): ["FAC_A", "FAC_B"],
+        ("WEM", start, start): ["FAC_C"],
+        ("APVI", start, end): ["ROOFTOP_APVI_WA"],
+    }
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from opennem.db.storage_layout import FACILITY_SCADA_LAYOUT, StorageState, layout_statements
+
+
+def test_layout_statements_from_legacy() -> None:
+    state = StorageState(
+        indexes={"facility_scada_pkey", "idx_facility_scada_network_id", "idx_facility_scada_facility_code_interval"},
+        compression_enabled=False,
+    )
+
+    statements = layout_statements(FACILITY_SCADA_LAYOUT, timedelta(days=30), state=state)
+
+    assert statements[0] == "drop index if exists idx_facility_scada_network_id"
+    assert "create index if not exists facility_scada_new_interval_idx on facility_scada (interval DESC)" in statements
+    assert not any("idx_facility_scada_facility_code_interval on" in s for s in statements)
+    assert any("timescaledb.compress_segmentby = 'network_id, facility_code, is_forecast'" in s for s in statements)
+    assert statements[-1] == "select add_compression_policy('facility_scada', compress_after => interval '2592000 seconds')"
+
+
+def test_layout_statements_compression_enabled() -> None:
+    state = StorageState(
+        indexes={"facility_scada_pkey", "idx_facility_scada_facility_code_interval", "facility_scada_new_interval_idx"},
+        compression_enabled=True,
+    )
+
+    statements = layout_statements(FACILITY_SCADA_LAYOUT, timedelta(days=7), state=state)
+
+    # only the chunk interval and compression policy are set again
+    assert len(statements) == 3
+    assert not any(s.startswith(("drop", "create", "alter")) for s in statements)
+
+
+def test_layout_for_table() -> None:
+    layout = FACILITY_SCADA_LAYOUT.for_table("facility_scada_bench")
+
+    assert layout.table == "facility_scada_bench"
+    assert layout.indexes[0].name == "idx_facility_scada_bench_facility_code_interval"
+    assert "idx_facility_scada_bench_network_id" in layout.redundant_indexes
+
+
+def test_layout_statements_without_compression_policy() -> None:
+    statements = layout_statements(FACILITY_SCADA_LAYOUT, None)
+
+    assert statements[-1] == "select remove_compression_policy('facility_scada', if_exists => true)"
+    assert not any("add_compression_policy" in s for s in statements)
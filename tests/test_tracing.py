@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from opennem import settings
+from opennem.core.parsers.aemo.mms import parse_aemo_mms_csv
+from opennem.core.tracing import (
+    STAGE_DURATION_METRIC,
+    BucketHistogram,
+    IngestMetric,
+    IngestStage,
+    ingest_count,
+    ingest_metrics,
+    ingest_span,
+    write_ingest_trace,
+)
+
+MMS_CSV = """C,NEMP.WORLD,DISPATCHIS,AEMO,PUBLIC,2024/01/01,00:05:00,0000000123456789,DISPATCHIS,0000000123456789
+I,DISPATCH,UNIT_SCADA,1,SETTLEMENTDATE,DUID,SCADAVALUE
+D,DISPATCH,UNIT_SCADA,1,"2024/01/01 00:05:00",BAYSW1,500
+D,DISPATCH,UNIT_SCADA,1,"2024/01/01 00:05:00",BAYSW2,600
+C,"END OF REPORT",4
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_ingest_metrics(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "ingest_trace_path", str(tmp_path / "trace.jsonl"))
+    ingest_metrics.reset()
+    yield
+    ingest_metrics.reset()
+
+
+def test_bucket_histogram_cumulative() -> None:
+    histogram = BucketHistogram(bounds=(0.1, 1.0, 10.0))
+
+    for value in [0.05, 0.5, 5.0, 50.0]:
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 3]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(55.55)
+
+
+def test_ingest_metrics_prometheus() -> None:
+    ingest_count(IngestMetric.rows_copied, 10, table="facility_scada")
+    ingest_count(IngestMetric.rows_copied, 5, table="facility_scada")
+    ingest_count(IngestMetric.rows_conflict_skipped, 0, table="facility_scada")
+
+    with ingest_span(IngestStage.copy, table="facility_scada"):
+        pass
+
+    output = ingest_metrics.to_prometheus()
+
+    assert 'opennem_ingest_rows_copied_total{table="facility_scada"} 15' in output
+    assert "opennem_ingest_rows_conflict_skipped_total" not in output
+    assert f'{STAGE_DURATION_METRIC}_bucket{{stage="copy",table="facility_scada",le="+Inf"}} 1' in output
+    assert f'{STAGE_DURATION_METRIC}_count{{stage="copy",table="facility_scada"}} 1' in output
+
+
+def test_ingest_span_records_nested_spans_and_errors() -> None:
+    with ingest_span(IngestStage.download, url="https://nemweb.com.au/file.zip") as download:
+        download.set("bytes", 1024)
+
+        with pytest.raises(ValueError):
+            with ingest_span(IngestStage.parse):
+                raise ValueError("bad csv")
+
+    parse_span, download_span = ingest_metrics.spans
+
+    assert download_span.stage == "download"
+    assert download_span.attributes == {"url": "https://nemweb.com.au/file.zip", "bytes": 1024}
+    assert parse_span.error == "ValueError: bad csv"
+    assert parse_span.trace_id == download_span.trace_id
+    assert parse_span.parent_span_id == download_span.span_id
+
+
+def test_parse_counts_rows_per_table() -> None:
+    table_set = parse_aemo_mms_csv(MMS_CSV)
+
+    assert len(table_set.get_table("dispatch_unit_scada").records) == 2
+    assert ingest_metrics.counters[(IngestMetric.rows_parsed.value, (("table", "dispatch_unit_scada"),))] == 2
+    assert ingest_metrics.spans[0].attributes["rows"] == 2
+
+
+def test_write_ingest_trace(tmp_path) -> None:
+    ingest_count(IngestMetric.bytes_downloaded, 2048, stage="download")
+
+    with ingest_span(IngestStage.transform, table="facility_scada"):
+        pass
+
+    path = write_ingest_trace()
+
+    assert path == tmp_path / "trace.jsonl"
+
+    trace = json.loads(path.read_text().splitlines()[0])
+
+    assert trace["counters"] == [{"name": IngestMetric.bytes_downloaded.value, "labels": {"stage": "download"}, "value": 2048}]
+    assert trace["spans"][0]["stage"] == "transform"
+    assert trace["histograms"][0]["count"] == 1
+
+    # the registry is reset after a write
+    assert not ingest_metrics.spans
+    assert write_ingest_trace(tmp_path / "empty.jsonl").exists()
@@ -0,0 +1,146 @@
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+
+from opennem.utils.httpx import (
+    CachedResponse,
+    HTTPResponseCache,
+    OpenNEMHTTPTransport,
+    RetryBudget,
+    get_http,
+    get_http_client,
+    get_retry_backoff,
+    httpx_factory,
+)
+
+
+class _StubTransport(OpenNEMHTTPTransport):
+    """Transport that returns queued responses instead of going to the network"""
+
+    def __init__(self, responses: list[httpx.Response], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.responses = responses
+        self.requests: list[httpx.Request] = []
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+
+def _get(transport: OpenNEMHTTPTransport, url: str = "http://nemweb.com.au/Reports/") -> httpx.Response:
+    async def _run() -> httpx.Response:
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get(url)
+            await response.aread()
+            return response
+
+    return asyncio.run(_run())
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("opennem.utils.httpx.get_retry_backoff", lambda attempt: 0)
+
+
+def test_retry_backoff_is_capped() -> None:
+    for attempt in range(20):
+        assert 0 <= get_retry_backoff(attempt, base=0.5, cap=4) <= 4
+
+
+def test_retry_budget_exhausts() -> None:
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2)
+
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw(), "Budget exhausted"
+
+    budget.deposit()
+    budget.deposit()
+
+    assert budget.withdraw(), "Deposits refill the budget"
+
+
+def test_transport_retries_on_server_error() -> None:
+    transport = _StubTransport(
+        [httpx.Response(503), httpx.Response(200, content=b"ok")],
+        budget=RetryBudget(ratio=1),
+        max_retries=3,
+    )
+
+    response = _get(transport)
+
+    assert response.status_code == 200
+    assert len(transport.requests) == 2
+
+
+def test_transport_stops_when_budget_exhausted() -> None:
+    transport = _StubTransport(
+        [httpx.Response(503), httpx.Response(200)],
+        budget=RetryBudget(ratio=0, min_per_second=0, max_tokens=0),
+        max_retries=3,
+    )
+
+    response = _get(transport)
+
+    assert response.status_code == 503, "No retries left in budget"
+    assert len(transport.requests) == 1
+
+
+def test_response_cache_roundtrip(tmp_path: Path) -> None:
+    cache = HTTPResponseCache(tmp_path)
+    url = "http://nemweb.com.au/Reports/Current/"
+
+    assert cache.get(url) is None
+
+    cache.set(url, CachedResponse(status_code=200, headers=[("etag", '"a"')], content=b"first", etag='"a"'))
+    cache.set(url, CachedResponse(status_code=200, headers=[("etag", '"b"')], content=b"second", etag='"b"'))
+
+    cached = cache.get(url)
+
+    assert cached and cached.etag == '"b"' and cached.content == b"second"
+    assert len(list(tmp_path.glob("*.body"))) == 1, "Previous etag body removed"
+
+
+def test_transport_serves_not_modified_from_cache(tmp_path: Path) -> None:
+    cache = HTTPResponseCache(tmp_path)
+
+    transport = _StubTransport([httpx.Response(200, headers={"etag": '"v1"'}, content=b"listing")], cache=cache)
+    assert _get(transport).content == b"listing"
+
+    transport = _StubTransport([httpx.Response(304)], cache=cache)
+    response = _get(transport)
+
+    assert transport.requests[0].headers["if-none-match"] == '"v1"'
+    assert response.status_code == 200
+    assert response.content == b"listing"
+
+
+def test_client_follows_redirects() -> None:
+    client = httpx_factory(debug=False)
+
+    assert client.follow_redirects, "Crawlers rely on redirects being followed like requests did"
+    assert not httpx_factory(debug=False, follow_redirects=False).follow_redirects
+
+
+def test_get_http_leaves_shared_client_open() -> None:
+    async def _run() -> None:
+        dependency = get_http()
+        client = await anext(dependency)
+
+        assert client is get_http_client()
+
+        with pytest.raises(StopAsyncIteration):
+            await anext(dependency)
+
+        assert not client.is_closed, "The shared client is still in use by other callers on the loop"
+
+        dedicated = get_http(debug=False)
+        client = await anext(dedicated)
+
+        assert client is not get_http_client()
+        await dedicated.aclose()
+        assert client.is_closed
+
+    asyncio.run(_run())
@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from opennem.core.watermarks import FacilityWatermark, ScadaWatermarks, WatermarkRegistry, watermarks_from_records
+
+START = datetime(2024, 1, 1, 10, 0)
+
+
+def _at(minutes: int) -> datetime:
+    return START + timedelta(minutes=minutes)
+
+
+def _record(facility_code: str, minutes: int, generated: float, is_forecast: bool = False, network_id: str = "NEM") -> dict:
+    return {
+        "network_id": network_id,
+        "facility_code": facility_code,
+        "interval": pd.Timestamp(_at(minutes)),
+        "generated": generated,
+        "is_forecast": is_forecast,
+    }
+
+
+def test_watermarks_from_records() -> None:
+    watermarks = watermarks_from_records(
+        [
+            _record("BAYSW1", 5, 0),
+            _record("BAYSW1", 10, 600),
+            _record("BAYSW1", 15, 650),
+            _record("BAYSW1", 20, 0),
+            _record("BAYSW1", 60, 700, is_forecast=True),
+            _record("ERARING1", 5, 0),
+        ]
+    )
+
+    assert watermarks == [
+        FacilityWatermark(
+            "NEM",
+            "BAYSW1",
+            START + timedelta(minutes=5),
+            START + timedelta(minutes=20),
+            START + timedelta(minutes=10),
+            START + timedelta(minutes=15),
+        ),
+        FacilityWatermark("NEM", "ERARING1", START + timedelta(minutes=5), START + timedelta(minutes=5)),
+    ]
+    assert type(watermarks[0].first_seen) is datetime
+
+
+def test_scada_watermarks_apply_and_select() -> None:
+    watermarks = ScadaWatermarks(
+        facilities={
+            ("NEM", "BAYSW1"): FacilityWatermark("NEM", "BAYSW1", START, START, START, START),
+            ("WEM", "MUJA1"): FacilityWatermark("WEM", "MUJA1", START - timedelta(days=1), START),
+        }
+    )
+
+    watermarks.apply(watermarks_from_records([_record("BAYSW1", 5, 0), _record("ERARING1", 5, 100)]))
+
+    bayswater = watermarks.facility("NEM", "BAYSW1")
+    assert bayswater and (bayswater.first_seen, bayswater.last_seen, bayswater.last_nonzero) == (
+        START,
+        START + timedelta(minutes=5),
+        START,
+    )
+
+    assert {w.facility_code for w in watermarks.select(network_ids=["NEM"])} == {"BAYSW1", "ERARING1"}
+    assert [w.facility_code for w in watermarks.select(facility_codes=["MUJA1"])] == ["MUJA1"]
+
+    networks = {n.network_id: n for n in watermarks.networks()}
+    assert networks["NEM"].last_seen == START + timedelta(minutes=5)
+    assert networks["WEM"].first_seen == START - timedelta(days=1)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _StoredWatermarkRegistry(WatermarkRegistry):
+    def __init__(self, clock: _Clock) -> None:
+        super().__init__(refresh=60, clock=clock)
+        self.loads = 0
+
+    async def _load(self) -> ScadaWatermarks:
+        self.loads += 1
+        return ScadaWatermarks(facilities={})
+
+
+def test_watermark_registry_refresh() -> None:
+    clock = _Clock()
+    registry = _StoredWatermarkRegistry(clock)
+
+    async def _run() -> None:
+        await asyncio.gather(*[registry.get() for _ in range(5)])
+        assert registry.loads == 1
+
+        # writes from this process are applied to the snapshot
+        registry.apply(watermarks_from_records([_record("BAYSW1", 5, 100)]))
+        assert (await registry.get()).facility("NEM", "BAYSW1")
+
+        clock.now += 61
+        assert not (await registry.get()).facility("NEM", "BAYSW1")
+        assert registry.loads == 2
+
+    asyncio.run(_run())
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import pytest
+from huey.api import Task
+from huey.exceptions import CancelExecution, RetryTask
+
+from opennem.workers.lanes import (
+    LaneLimiter,
+    TaskLane,
+    WorkerEventLoop,
+    get_worker_loop,
+    lane_limiter,
+    lane_task,
+    set_current_task,
+)
+
+
+def test_lane_priorities_ordered() -> None:
+    assert TaskLane.critical.priority > TaskLane.crawl.priority > TaskLane.aggregate.priority > TaskLane.export.priority
+
+
+def test_lane_limiter_caps_lane(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("opennem.settings.scheduler_lane_export_concurrency", 1)
+    limiter = LaneLimiter()
+
+    assert limiter.try_acquire(TaskLane.export)
+    assert not limiter.try_acquire(TaskLane.export), "Export lane at capacity"
+
+    for _ in range(10):
+        assert limiter.try_acquire(TaskLane.critical), "Critical lane is uncapped"
+
+    limiter.release(TaskLane.export)
+
+    assert limiter.try_acquire(TaskLane.export)
+
+
+def test_worker_loop_is_reused() -> None:
+    worker_loop = WorkerEventLoop()
+
+    async def _get_loop() -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    results: list[asyncio.AbstractEventLoop] = []
+    threads = [threading.Thread(target=lambda: results.append(worker_loop.run(_get_loop()))) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 4
+    assert len({id(loop) for loop in results}) == 1, "All worker threads share the one loop"
+
+
+def test_lane_task_defers_when_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("opennem.settings.scheduler_lane_export_concurrency", 1)
+
+    @lane_task(TaskLane.export)
+    async def _export_task() -> str:
+        return "exported"
+
+    assert _export_task() == "exported"
+    assert lane_limiter.running(TaskLane.export) == 0, "Lane released after task"
+
+    assert lane_limiter.try_acquire(TaskLane.export)
+
+    try:
+        with pytest.raises(RetryTask):
+            _export_task()
+    finally:
+        lane_limiter.release(TaskLane.export)
+
+
+def test_critical_lane_has_own_loop() -> None:
+    assert get_worker_loop(TaskLane.critical) is not get_worker_loop(TaskLane.crawl)
+    assert get_worker_loop(TaskLane.crawl) is get_worker_loop(TaskLane.export)
+
+
+def test_lane_task_deferrals_are_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("opennem.settings.scheduler_lane_export_concurrency", 1)
+    monkeypatch.setattr("opennem.settings.scheduler_lane_max_deferrals", 2)
+
+    @lane_task(TaskLane.export)
+    async def _export_task() -> str:
+        return "exported"
+
+    task = Task()
+    set_current_task(task)
+
+    assert lane_limiter.try_acquire(TaskLane.export)
+
+    try:
+        for deferrals in range(2):
+            with pytest.raises(RetryTask):
+                _export_task(**task.kwargs)
+
+            assert task.kwargs["_lane_deferrals"] == deferrals + 1, "Deferral count carried on the requeued task"
+
+        with pytest.raises(CancelExecution):
+            _export_task(**task.kwargs)
+    finally:
+        lane_limiter.release(TaskLane.export)
+        set_current_task(None)  # type: ignore
+
+    assert _export_task(_lane_deferrals=2) == "exported", "Counter kwarg is not passed to the coroutine"